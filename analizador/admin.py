@@ -3,24 +3,32 @@ Configuración del panel de administración para la aplicación Analizador SEO c
 """
 
 from django.contrib import admin
-from .models import Analisis, Hallazgo, Imagen, Enlace
+from .models import Analisis, Hallazgo, Incidencia, Imagen, Enlace, ArchivoSEO, RecomendacionIA, ResumenRastreo, TrabajoRastreo
 
 @admin.register(Analisis)
 class AnalisisAdmin(admin.ModelAdmin):
-    list_display = ('url', 'fecha_analisis', 'puntuacion', 'codigo_estado')
-    list_filter = ('fecha_analisis', 'codigo_estado')
-    search_fields = ('url', 'titulo', 'descripcion')
+    list_display = ('url', 'host', 'fecha_analisis', 'puntuacion', 'codigo_estado', 'estado_descarga', 'sin_cambios')
+    list_filter = ('fecha_analisis', 'codigo_estado', 'estado_descarga', 'sin_cambios')
+    search_fields = ('host', 'url', 'titulo', 'descripcion')
     readonly_fields = ('fecha_analisis',)
     ordering = ('-fecha_analisis',)
 
 @admin.register(Hallazgo)
 class HallazgoAdmin(admin.ModelAdmin):
-    list_display = ('analisis', 'tipo', 'descripcion', 'fecha')
+    list_display = ('analisis', 'tipo', 'descripcion', 'incidencia', 'fecha')
     list_filter = ('tipo', 'fecha')
     search_fields = ('descripcion', 'analisis__url')
     readonly_fields = ('fecha',)
     ordering = ('-fecha',)
 
+@admin.register(Incidencia)
+class IncidenciaAdmin(admin.ModelAdmin):
+    list_display = ('descripcion', 'tipo', 'num_ocurrencias', 'estado_recomendacion', 'analisis_principal', 'fecha')
+    list_filter = ('tipo', 'estado_recomendacion', 'fecha')
+    search_fields = ('descripcion', 'recomendacion', 'url_ejemplo')
+    readonly_fields = ('huella', 'fecha')
+    ordering = ('-fecha',)
+
 @admin.register(Imagen)
 class ImagenAdmin(admin.ModelAdmin):
     list_display = ('analisis', 'url', 'alt', 'fecha')
@@ -35,4 +43,35 @@ class EnlaceAdmin(admin.ModelAdmin):
     list_filter = ('fecha',)
     search_fields = ('url', 'texto', 'analisis__url')
     readonly_fields = ('fecha',)
-    ordering = ('-fecha',) 
\ No newline at end of file
+    ordering = ('-fecha',)
+
+@admin.register(ArchivoSEO)
+class ArchivoSEOAdmin(admin.ModelAdmin):
+    list_display = ('analisis', 'tipo', 'codigo_estado', 'fecha_descarga')
+    list_filter = ('tipo', 'fecha_descarga')
+    search_fields = ('url', 'analisis__url')
+    exclude = ('contenido_comprimido',)
+    readonly_fields = ('fecha_descarga',)
+    ordering = ('-fecha_descarga',)
+
+@admin.register(RecomendacionIA)
+class RecomendacionIAAdmin(admin.ModelAdmin):
+    list_display = ('hallazgo_normalizado', 'tipo_hallazgo', 'tecnologia_sitio', 'usos', 'fecha_ultimo_uso')
+    list_filter = ('tipo_hallazgo', 'tecnologia_sitio')
+    search_fields = ('hallazgo_normalizado', 'recomendacion')
+    readonly_fields = ('clave', 'fecha_creacion', 'fecha_ultimo_uso')
+    ordering = ('-fecha_ultimo_uso',)
+
+@admin.register(TrabajoRastreo)
+class TrabajoRastreoAdmin(admin.ModelAdmin):
+    list_display = ('url', 'estado', 'paginas_procesadas', 'fecha_creacion', 'fecha_fin')
+    list_filter = ('estado', 'fecha_creacion')
+    search_fields = ('url',)
+    readonly_fields = ('fecha_creacion', 'fecha_inicio', 'fecha_fin')
+    ordering = ('-fecha_creacion',)
+
+@admin.register(ResumenRastreo)
+class ResumenRastreoAdmin(admin.ModelAdmin):
+    list_display = ('analisis_principal', 'total_paginas', 'puntuacion_minima', 'puntuacion_maxima', 'fecha_actualizacion')
+    search_fields = ('analisis_principal__url',)
+    readonly_fields = ('fecha_actualizacion',)
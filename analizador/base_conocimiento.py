@@ -0,0 +1,249 @@
+"""
+Base de conocimiento local de recomendaciones SEO para la aplicación Analizador SEO con IA.
+
+Los hallazgos que generan `analizar_contenido_pagina` y `verificar_archivos_seo`
+son un conjunto cerrado; para ellos hay plantillas por tecnología que se
+responden al instante, sin llamar a la IA.
+"""
+
+import re
+
+from .forms import AnalisisForm
+
+
+# Cada regla: (código, tema, patrón sobre la descripción del hallazgo en minúsculas)
+REGLAS = [
+    ('titulo_ausente', 'titulo', r'la página no tiene título\b.*'),
+    ('titulo_corto', 'titulo', r'el título es demasiado corto\b.*'),
+    ('titulo_largo', 'titulo', r'el título es demasiado largo\b.*'),
+    ('meta_descripcion_ausente', 'meta_descripcion', r'no se encontró meta descripción\. es importante para el seo\.?'),
+    ('meta_descripcion_corta', 'meta_descripcion', r'la meta descripción es demasiado corta\b.*'),
+    ('meta_descripcion_larga', 'meta_descripcion', r'la meta descripción es demasiado larga\b.*'),
+    ('h1_ausente', 'h1', r'no se encontró encabezado h1\b.*'),
+    ('h1_multiple', 'h1', r'múltiples encabezados h1 encontrados\b.*'),
+    ('imagen_sin_alt', 'imagen_alt', r'imagen sin texto alternativo: .+'),
+    ('pocos_enlaces_internos', 'enlaces_internos', r'pocos enlaces internos\. .+'),
+    ('pocos_enlaces_externos', 'enlaces_externos', r'pocos enlaces externos\. .+'),
+    ('robots_ausente', 'robots', r'no se encontró archivo robots\.txt\b.*'),
+    ('robots_error', 'robots', r'error al intentar acceder a \S+/robots\.txt\.?'),
+    ('sitemap_ausente', 'sitemap', r'no se encontró archivo sitemap\.xml\b.*'),
+    ('sitemap_error', 'sitemap', r'error al intentar acceder a \S+/sitemap\.xml\.?'),
+]
+_REGLAS_COMPILADAS = [(codigo, tema, re.compile(patron, re.DOTALL)) for codigo, tema, patron in REGLAS]
+
+# Por qué importa cada hallazgo y cómo comprobar que está corregido
+EXPLICACIONES = {
+    'titulo_ausente': (
+        'El título (<title>) es lo primero que muestran los buscadores en los resultados y una de las señales de relevancia más fuertes. Sin él, el buscador inventa uno a partir del contenido.',
+        'Abre el código fuente de la página y comprueba que hay una única etiqueta <title> con texto; la pestaña del navegador debe mostrarlo.'
+    ),
+    'titulo_corto': (
+        'Un título muy corto desaprovecha espacio en los resultados de búsqueda y suele no describir bien la página ni incluir las palabras clave principales.',
+        'Comprueba que el nuevo título tiene entre 50 y 60 caracteres e incluye la palabra clave principal y, si procede, la marca.'
+    ),
+    'titulo_largo': (
+        'Los buscadores cortan los títulos de más de unos 60 caracteres, así que la parte final (a menudo la más descriptiva) no se ve en los resultados.',
+        'Comprueba que el título tiene 60 caracteres o menos y que lo importante aparece al principio.'
+    ),
+    'meta_descripcion_ausente': (
+        'La meta descripción es el texto que suele aparecer bajo el título en los resultados. Sin ella el buscador elige un fragmento de la página, que rara vez invita a hacer clic.',
+        'Busca <meta name="description" content="..."> en el código fuente de la página; debe ser única para cada página.'
+    ),
+    'meta_descripcion_corta': (
+        'Una meta descripción muy corta no aprovecha el espacio del resultado de búsqueda para convencer al usuario de que haga clic.',
+        'Comprueba que la meta descripción tiene entre 150 y 160 caracteres y resume el contenido con una llamada a la acción.'
+    ),
+    'meta_descripcion_larga': (
+        'Los buscadores recortan las meta descripciones de más de unos 160 caracteres y el mensaje queda incompleto.',
+        'Comprueba que la meta descripción tiene 160 caracteres o menos y que la idea principal está al principio.'
+    ),
+    'h1_ausente': (
+        'El H1 es el encabezado principal: indica a usuarios y buscadores de qué trata la página y organiza el resto de encabezados.',
+        'Inspecciona la página y comprueba que hay exactamente un <h1> visible con el tema principal.'
+    ),
+    'h1_multiple': (
+        'Varios H1 diluyen cuál es el tema principal de la página y suelen indicar que logotipos o títulos de bloques usan la etiqueta equivocada.',
+        'Inspecciona la página (por ejemplo con document.querySelectorAll("h1") en la consola) y comprueba que solo queda un <h1>.'
+    ),
+    'imagen_sin_alt': (
+        'El texto alternativo describe la imagen a los lectores de pantalla y a los buscadores, que lo usan para entenderla y posicionarla en la búsqueda de imágenes.',
+        'Inspecciona la imagen y comprueba que su etiqueta <img> tiene un atributo alt descriptivo (o alt="" si es puramente decorativa).'
+    ),
+    'pocos_enlaces_internos': (
+        'Los enlaces internos ayudan a los buscadores a descubrir y jerarquizar las páginas del sitio y reparten autoridad entre ellas; también mantienen al usuario navegando.',
+        'Comprueba que la página enlaza al menos a tres páginas relacionadas del mismo dominio con textos de enlace descriptivos.'
+    ),
+    'pocos_enlaces_externos': (
+        'Enlazar a fuentes de referencia cuando aporta valor da contexto al contenido y refuerza su credibilidad.',
+        'Comprueba que las afirmaciones importantes enlazan a fuentes fiables y que esos enlaces funcionan.'
+    ),
+    'robots_ausente': (
+        'robots.txt indica a los rastreadores qué partes del sitio no deben rastrear y dónde está el sitemap. Sin él se rastrea todo, incluidas páginas sin valor.',
+        'Abre https://tu-dominio/robots.txt en el navegador y revísalo con el informe de robots.txt de Google Search Console.'
+    ),
+    'robots_error': (
+        'Si robots.txt no responde, los buscadores pueden dejar de rastrear el sitio por precaución hasta que vuelva a estar disponible.',
+        'Abre https://tu-dominio/robots.txt y comprueba que responde con código 200 en poco tiempo; revisa el informe de robots.txt de Google Search Console.'
+    ),
+    'sitemap_ausente': (
+        'El sitemap.xml lista las URL que quieres indexar y acelera que los buscadores descubran páginas nuevas o actualizadas.',
+        'Abre https://tu-dominio/sitemap.xml, comprueba que es XML válido y envíalo en Google Search Console (Sitemaps).'
+    ),
+    'sitemap_error': (
+        'Si el sitemap no responde, los buscadores no pueden usarlo para descubrir las páginas del sitio.',
+        'Abre https://tu-dominio/sitemap.xml y comprueba que responde con código 200; revisa su estado en Google Search Console (Sitemaps).'
+    ),
+}
+
+# Cómo corregirlo según la tecnología del sitio, por tema
+SOLUCIONES = {
+    'generic': {
+        'titulo': 'Edita la etiqueta <title> dentro de <head> en la plantilla de la página. Escribe un título único por página con la palabra clave principal al principio y la marca al final.',
+        'meta_descripcion': 'Añade o edita <meta name="description" content="..."> dentro de <head>. Escribe un resumen único de la página de 150-160 caracteres.',
+        'h1': 'Deja un único <h1> con el título principal de la página y convierte el resto en <h2>/<h3>, o en elementos sin encabezado si solo son decorativos.',
+        'imagen_alt': 'Añade el atributo alt a cada <img> describiendo lo que muestra la imagen en su contexto, por ejemplo <img src="..." alt="Zapatillas de running azules">.',
+        'enlaces_internos': 'Añade en el contenido enlaces a páginas relacionadas (categorías, artículos, productos) y revisa que el menú y el pie enlacen las secciones principales.',
+        'enlaces_externos': 'Cita y enlaza fuentes de referencia (estudios, documentación oficial, organismos) donde aporten contexto.',
+        'robots': 'Crea un archivo robots.txt en la raíz del dominio, por ejemplo:\nUser-agent: *\nDisallow: /admin/\nSitemap: https://tu-dominio/sitemap.xml',
+        'sitemap': 'Genera un sitemap.xml con las URL indexables (la mayoría de CMS y frameworks tienen un generador) y publícalo en la raíz del dominio. Enlázalo desde robots.txt.',
+    },
+    'wordpress': {
+        'titulo': 'Con Yoast SEO o Rank Math, edita el "Título SEO" en la caja del plugin bajo el editor de cada entrada o página. Configura la plantilla por defecto en Ajustes > Apariencia en el buscador.',
+        'meta_descripcion': 'Con Yoast SEO o Rank Math, rellena la "Meta descripción" en la caja del plugin de cada entrada o página. WordPress no la genera por sí solo.',
+        'h1': 'El tema suele imprimir el título de la entrada como <h1>. En el editor de bloques usa Encabezado H2 o inferior para el resto de títulos, y revisa que el logo del tema no sea también un <h1>.',
+        'imagen_alt': 'En la Biblioteca de medios, rellena el campo "Texto alternativo" de cada imagen. En el editor de bloques, selecciona la imagen y edita "Texto alternativo" en el panel lateral.',
+        'enlaces_internos': 'En el editor, selecciona texto y pulsa Ctrl+K para buscar y enlazar otras entradas. Los bloques "Últimas entradas" o los plugins de entradas relacionadas añaden enlaces automáticamente.',
+        'enlaces_externos': 'En el editor de bloques, enlaza fuentes con Ctrl+K y marca "Abrir en una nueva pestaña" si lo prefieres.',
+        'robots': 'WordPress sirve un robots.txt virtual si no existe el archivo. Edítalo en Yoast SEO > Herramientas > Editor de archivos (o en Rank Math > Ajustes generales > Editar robots.txt), y comprueba que "Disuadir a los motores de búsqueda" en Ajustes > Lectura está desactivado.',
+        'sitemap': 'Desde WordPress 5.5 existe /wp-sitemap.xml. Yoast SEO y Rank Math generan /sitemap_index.xml; redirige /sitemap.xml a él o añade su URL en robots.txt.',
+    },
+    'shopify': {
+        'titulo': 'Edita "Título de la página" en la sección "Vista previa del listado en motores de búsqueda" de cada producto, colección o página. El título de la tienda está en Tienda online > Preferencias.',
+        'meta_descripcion': 'Edita "Meta descripción" en la sección "Vista previa del listado en motores de búsqueda" de cada producto, colección o página, y la de la portada en Tienda online > Preferencias.',
+        'h1': 'Edita la plantilla del tema (Tienda online > Temas > Editar código) para que solo el título del producto o colección use <h1>; suele haber uno extra en el logo de header.liquid.',
+        'imagen_alt': 'En cada producto, pulsa sobre la imagen y elige "Añadir texto alternativo". En los bloques del editor de temas, rellena el campo de texto alternativo de cada imagen.',
+        'enlaces_internos': 'Enlaza colecciones y productos relacionados desde las descripciones y usa los bloques de "Productos recomendados" del tema. Revisa la navegación en Tienda online > Navegación.',
+        'enlaces_externos': 'Añade enlaces a guías o certificaciones del fabricante en las descripciones de producto o en las entradas del blog.',
+        'robots': 'Shopify genera robots.txt automáticamente. Para personalizarlo, crea la plantilla robots.txt.liquid en el tema (Editar código > Añadir plantilla).',
+        'sitemap': 'Shopify genera /sitemap.xml automáticamente para productos, colecciones, páginas y blog. Si no responde, comprueba que la tienda no está protegida con contraseña.',
+    },
+    'joomla': {
+        'titulo': 'En cada elemento de menú, pestaña "Mostrar página", rellena "Título de la página del navegador". Para los artículos usa la pestaña "Publicación".',
+        'meta_descripcion': 'Rellena "Meta descripción" en la pestaña "Publicación" del artículo o en la pestaña "Metadatos" del elemento de menú. La descripción global está en Configuración global > Sitio.',
+        'h1': 'Revisa en el elemento de menú (pestaña "Mostrar página") la opción "Mostrar el encabezado de la página" y ajusta la plantilla con un override para que solo haya un <h1>.',
+        'imagen_alt': 'En el editor, selecciona la imagen, abre "Insertar/editar imagen" y rellena "Descripción de la imagen (Texto alternativo)". En las imágenes de introducción y completa, usa su campo de descripción.',
+        'enlaces_internos': 'Usa el botón "Artículo" del editor para enlazar otros artículos, y los módulos de artículos relacionados o más leídos.',
+        'enlaces_externos': 'Añade enlaces a fuentes con el botón de enlace del editor en el cuerpo del artículo.',
+        'robots': 'Joomla incluye robots.txt.dist en la raíz: renómbralo a robots.txt y revísalo (no bloquees /media/ ni /templates/, que contienen CSS e imágenes).',
+        'sitemap': 'Instala una extensión de sitemap (por ejemplo OSMap o JSitemap) y publícalo en /sitemap.xml, o enlaza su URL desde robots.txt.',
+    },
+    'drupal': {
+        'titulo': 'Instala el módulo Metatag y configura el patrón del título en Configuración > Búsqueda y metadatos > Metatag; puedes sobrescribirlo en cada nodo.',
+        'meta_descripcion': 'Con el módulo Metatag, define la descripción por defecto por tipo de contenido (por ejemplo con el token [node:summary]) y sobrescríbela en cada nodo.',
+        'h1': 'El tema muestra el título del nodo como <h1> (bloque "Título de la página"). Revisa las plantillas Twig y los bloques para que no haya otro <h1>.',
+        'imagen_alt': 'Marca como obligatorio el campo "Texto alternativo" en la configuración del campo de imagen del tipo de contenido y complétalo en las imágenes existentes.',
+        'enlaces_internos': 'Usa los campos de referencia a entidades, las vistas de contenido relacionado y enlaces en el cuerpo. El módulo Linkit facilita enlazar nodos desde el editor.',
+        'enlaces_externos': 'Añade enlaces a fuentes en el cuerpo del contenido con el botón de enlace de CKEditor.',
+        'robots': 'Drupal incluye robots.txt en la raíz. Para editarlo desde la administración instala el módulo RobotsTxt (y elimina el archivo físico).',
+        'sitemap': 'Instala el módulo Simple XML Sitemap, elige los tipos de contenido que se incluyen y regenera el sitemap; se publica en /sitemap.xml.',
+    },
+    'wix': {
+        'titulo': 'En el editor, abre Páginas y menú > (página) > Configuración SEO y edita "Etiqueta de título". Para patrones por tipo de página usa Panel > Marketing y SEO > Herramientas SEO > Configuración SEO.',
+        'meta_descripcion': 'En Páginas y menú > (página) > Configuración SEO, rellena "Meta descripción". Para productos o entradas, usa la pestaña SEO de cada uno.',
+        'h1': 'Selecciona cada texto y comprueba su tema de texto: solo el título principal debe ser "Título 1" (H1); cambia el resto a Título 2 o inferior.',
+        'imagen_alt': 'Selecciona la imagen, pulsa Configuración y rellena "¿Qué hay en la imagen? (Texto alternativo)".',
+        'enlaces_internos': 'Selecciona texto o botones, pulsa el icono de enlace y elige "Página" para enlazar otras páginas del sitio.',
+        'enlaces_externos': 'Selecciona el texto, pulsa el icono de enlace y elige "Dirección web" para enlazar la fuente.',
+        'robots': 'Wix genera robots.txt automáticamente. Puedes editarlo en Panel > Marketing y SEO > Herramientas SEO > Editor de robots.txt (solo con un dominio propio).',
+        'sitemap': 'Wix genera /sitemap.xml automáticamente cuando el sitio está publicado con dominio propio. Compruébalo y envíalo en Google Search Console.',
+    },
+    'squarespace': {
+        'titulo': 'En Páginas, abre la configuración de la página (icono de engranaje) > SEO y edita "Título SEO". El formato por defecto está en Marketing > Apariencia en SEO.',
+        'meta_descripcion': 'En la configuración de la página (engranaje) > SEO, rellena "Descripción SEO". Para productos y entradas, usa la pestaña SEO de cada uno.',
+        'h1': 'En los bloques de texto, usa "Encabezado 1" solo para el título principal de la página y "Encabezado 2/3" para el resto.',
+        'imagen_alt': 'En los bloques de imagen, edita el bloque y rellena el campo de texto alternativo (en algunas versiones es el campo "Descripción de la imagen" o el pie de foto).',
+        'enlaces_internos': 'Selecciona texto en un bloque, pulsa el icono de enlace y busca la página de destino para enlazar otras páginas del sitio.',
+        'enlaces_externos': 'Selecciona el texto, pulsa el icono de enlace y pega la URL de la fuente.',
+        'robots': 'Squarespace genera robots.txt automáticamente y no permite editarlo. Para ocultar páginas usa la opción "Ocultar esta página de los resultados de búsqueda" en su configuración SEO.',
+        'sitemap': 'Squarespace genera /sitemap.xml automáticamente. Envíalo en Google Search Console (o conecta Search Console desde Marketing > Herramientas SEO).',
+    },
+    'django': {
+        'titulo': 'Define en la plantilla base {% block title %}{% endblock %} dentro de <title> y sobrescríbelo en cada plantilla con un título propio, por ejemplo {% block title %}{{ producto.nombre }} | Marca{% endblock %}.',
+        'meta_descripcion': 'Añade en la plantilla base <meta name="description" content="{% block meta_description %}{% endblock %}"> y rellénalo en cada vista, por ejemplo con un campo seo_description en el modelo.',
+        'h1': 'Usa un único <h1> en el bloque de contenido de cada plantilla y evita ponerlo en la plantilla base (cabecera o logo).',
+        'imagen_alt': 'Añade un campo de texto alternativo al modelo que guarda la imagen (por ejemplo alt = models.CharField(max_length=200)) y úsalo en la plantilla: <img src="{{ img.url }}" alt="{{ img.alt }}">.',
+        'enlaces_internos': 'Enlaza contenido relacionado en las plantillas con {% url %} o get_absolute_url(), por ejemplo una lista de objetos relacionados en la vista de detalle.',
+        'enlaces_externos': 'Añade enlaces a fuentes en el contenido (por ejemplo en un campo de texto enriquecido) o en las plantillas.',
+        'robots': 'Sirve robots.txt con una vista (por ejemplo TemplateView con content_type="text/plain" en path("robots.txt", ...)) o con el paquete django-robots.',
+        'sitemap': 'Usa django.contrib.sitemaps: define clases Sitemap para tus modelos y añade path("sitemap.xml", sitemap, {"sitemaps": sitemaps}) en urls.py.',
+    },
+    'ruby_on_rails': {
+        'titulo': 'En el layout usa <title><%= content_for?(:title) ? yield(:title) : "Marca" %></title> y define <% content_for :title, "..." %> en cada vista, o usa la gema meta-tags.',
+        'meta_descripcion': 'Con la gema meta-tags, llama a set_meta_tags description: "..." en el controlador o la vista y añade <%= display_meta_tags %> al layout.',
+        'h1': 'Deja el <h1> en cada vista con el título principal y revisa que el layout y los partials (cabecera, logo) no incluyan otro.',
+        'imagen_alt': 'Pasa alt a image_tag: <%= image_tag producto.foto, alt: producto.nombre %>. Con Active Storage, guarda el texto alternativo en un atributo del modelo.',
+        'enlaces_internos': 'Añade enlaces a recursos relacionados con link_to y los helpers de rutas, por ejemplo en un partial de contenido relacionado.',
+        'enlaces_externos': 'Enlaza las fuentes con link_to "Fuente", url en el contenido.',
+        'robots': 'Edita public/robots.txt (Rails lo genera vacío de reglas) o sírvelo con una ruta y un controlador si depende del entorno.',
+        'sitemap': 'Usa la gema sitemap_generator (rake sitemap:refresh) para generar public/sitemap.xml y regenéralo en cada despliegue o con una tarea programada.',
+    },
+    'react': {
+        'titulo': 'En una SPA el <title> se cambia desde JavaScript: usa react-helmet-async (<Helmet><title>...</title></Helmet>) o, en Next.js, la exportación metadata o <Head>. Considera el renderizado en servidor o el prerenderizado para que los buscadores vean el título sin ejecutar JavaScript.',
+        'meta_descripcion': 'Define la descripción por ruta con react-helmet-async (<meta name="description" content="..." />) o la API metadata de Next.js, con renderizado en servidor o prerenderizado.',
+        'h1': 'Asegúrate de que cada ruta renderiza un único <h1> en su componente de página y que los componentes compartidos (cabecera, tarjetas) usan otros niveles.',
+        'imagen_alt': 'Pasa siempre alt a <img> (o a next/image): <img src={src} alt={producto.nombre} />. La regla jsx-a11y/alt-text de ESLint detecta los que faltan.',
+        'enlaces_internos': 'Usa <Link> de React Router o Next.js, que renderiza etiquetas <a href> reales; no uses onClick con navigate() en elementos que no son enlaces, porque los buscadores no los siguen.',
+        'enlaces_externos': 'Usa <a href="..." target="_blank" rel="noopener"> para las fuentes externas.',
+        'robots': 'Coloca robots.txt en la carpeta public/ (se sirve tal cual en la raíz). En Next.js puedes generarlo con app/robots.js.',
+        'sitemap': 'Genera sitemap.xml en el build (por ejemplo con next-sitemap o un script que recorra las rutas) y colócalo en public/.',
+    },
+    'angular': {
+        'titulo': 'Usa el servicio Title de @angular/platform-browser (this.title.setTitle(...)) o la propiedad title de cada ruta. Con Angular Universal/SSR los buscadores reciben el título ya renderizado.',
+        'meta_descripcion': 'Usa el servicio Meta (this.meta.updateTag({ name: "description", content: "..." })) al cargar cada ruta, junto con SSR o prerenderizado.',
+        'h1': 'Pon un único <h1> en el componente de cada ruta y usa otros niveles en los componentes compartidos.',
+        'imagen_alt': 'Añade alt en las plantillas: <img [src]="producto.foto" [alt]="producto.nombre">, o con NgOptimizedImage (<img ngSrc=... alt=...>).',
+        'enlaces_internos': 'Usa routerLink en etiquetas <a> (<a routerLink="/productos">), que generan href reales que los buscadores pueden seguir.',
+        'enlaces_externos': 'Usa <a href="..." target="_blank" rel="noopener"> para las fuentes externas.',
+        'robots': 'Añade robots.txt a src/ e inclúyelo en "assets" de angular.json para que se copie a la raíz del build.',
+        'sitemap': 'Genera sitemap.xml con un script en el build (o desde el servidor SSR) e inclúyelo en los assets de angular.json.',
+    },
+    'vuejs': {
+        'titulo': 'Cambia el título por ruta con @unhead/vue (useHead({ title: "..." })) o en router.afterEach; con Nuxt usa useHead o useSeoMeta, que se renderizan en el servidor.',
+        'meta_descripcion': 'Define la descripción por ruta con useHead/useSeoMeta ({ description: "..." }) y usa SSR (Nuxt) o prerenderizado para que los buscadores la vean.',
+        'h1': 'Pon un único <h1> en el componente de página de cada ruta y usa otros niveles en los componentes compartidos.',
+        'imagen_alt': 'Enlaza alt en las plantillas: <img :src="producto.foto" :alt="producto.nombre">. eslint-plugin-vuejs-accessibility detecta los que faltan.',
+        'enlaces_internos': 'Usa <router-link> (o <NuxtLink>), que renderiza etiquetas <a href> reales, en lugar de navegar con @click.',
+        'enlaces_externos': 'Usa <a href="..." target="_blank" rel="noopener"> para las fuentes externas.',
+        'robots': 'Coloca robots.txt en public/ para que se sirva en la raíz; en Nuxt también puedes usar el módulo @nuxtjs/robots.',
+        'sitemap': 'Genera sitemap.xml en el build con un script o, en Nuxt, con el módulo @nuxtjs/sitemap.',
+    },
+}
+
+NOMBRES_TECNOLOGIA = dict(AnalisisForm.WEBSITE_TECHNOLOGY_CHOICES)
+
+
+def identificar_hallazgo(descripcion):
+    """Retorna (código, tema) de la regla que cubre el hallazgo, o None si no está en la base."""
+    texto = re.sub(r'\s+', ' ', descripcion).strip().lower()
+    for codigo, tema, patron in _REGLAS_COMPILADAS:
+        if patron.fullmatch(texto):
+            return codigo, tema
+    return None
+
+
+def recomendacion_local(descripcion, tecnologia_sitio):
+    """
+    Recomendación de la base de conocimiento para el hallazgo y la tecnología
+    del sitio (las no incluidas usan la genérica), o None si no está cubierto.
+    """
+    regla = identificar_hallazgo(descripcion)
+    if regla is None:
+        return None
+    codigo, tema = regla
+    tecnologia = tecnologia_sitio if tecnologia_sitio in SOLUCIONES else 'generic'
+    por_que, verificacion = EXPLICACIONES[codigo]
+    return (
+        f"1. **Por qué importa:** {por_que}\n"
+        f"2. **Cómo corregirlo ({NOMBRES_TECNOLOGIA[tecnologia]}):** {SOLUCIONES[tecnologia][tema]}\n"
+        f"3. **Cómo verificarlo:** {verificacion}"
+    )
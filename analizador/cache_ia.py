@@ -0,0 +1,153 @@
+"""
+Caché de recomendaciones de la IA para la aplicación Analizador SEO con IA.
+"""
+
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError
+from django.db.models import F
+from django.utils import timezone
+
+from .models import RecomendacionIA
+
+
+_RE_URL = re.compile(r'https?://\S+|www\.\S+', re.IGNORECASE)
+_RE_NUMERO = re.compile(r'\d+(?:[.,]\d+)*')
+_RE_ESPACIOS = re.compile(r'\s+')
+
+
+def normalizar_hallazgo(descripcion):
+    """
+    Forma canónica de la descripción de un hallazgo: minúsculas, sin URLs ni
+    cifras concretas y con los espacios colapsados. Así "Imagen sin texto
+    alternativo: https://a.com/1.png" y la misma frase con otra imagen
+    comparten recomendación.
+    """
+    texto = _RE_URL.sub('<url>', descripcion.lower())
+    texto = _RE_NUMERO.sub('<n>', texto)
+    return _RE_ESPACIOS.sub(' ', texto).strip(' .')
+
+
+def clave_recomendacion(descripcion, tecnologia_sitio, tipo_hallazgo):
+    """Huella (sha256) del hallazgo normalizado, la tecnología y el tipo de hallazgo."""
+    partes = (normalizar_hallazgo(descripcion), (tecnologia_sitio or 'generic').lower(), tipo_hallazgo or '')
+    return hashlib.sha256('\x1f'.join(partes).encode('utf-8')).hexdigest()
+
+
+class CacheRecomendaciones:
+    """
+    Caché de dos niveles para las recomendaciones de la IA.
+
+    1. LRU en memoria del proceso (`tamano_memoria` entradas, IA_CACHE_LRU_SIZE).
+    2. Tabla RecomendacionIA en la base de datos, compartida entre workers y
+       rastreos. Las entradas caducan a los `ttl` (IA_CACHE_TTL_DAYS días) y,
+       si hay más de `max_entradas` (IA_CACHE_MAX_ENTRIES), se eliminan las
+       usadas hace más tiempo.
+
+    Solo se guardan recomendaciones generadas con éxito: los mensajes de error
+    o de respuesta vacía no se cachean para que se reintenten.
+
+    `estadisticas()` devuelve los contadores de aciertos (por nivel), fallos y
+    entradas guardadas desde que arrancó el proceso.
+    """
+
+    def __init__(self, tamano_memoria=None, ttl=None, max_entradas=None):
+        self.tamano_memoria = tamano_memoria or getattr(settings, 'IA_CACHE_LRU_SIZE', 1024)
+        self.ttl = ttl or timedelta(days=getattr(settings, 'IA_CACHE_TTL_DAYS', 30))
+        self.max_entradas = max_entradas or getattr(settings, 'IA_CACHE_MAX_ENTRIES', 50000)
+        self._memoria = OrderedDict()  # clave -> (recomendacion, caduca)
+        self._lock = threading.Lock()
+        self._contadores = {'aciertos_memoria': 0, 'aciertos_bd': 0, 'fallos': 0, 'guardadas': 0}
+
+    def obtener(self, descripcion, tecnologia_sitio, tipo_hallazgo):
+        """Retorna la recomendación en caché para el hallazgo, o None."""
+        clave = clave_recomendacion(descripcion, tecnologia_sitio, tipo_hallazgo)
+        ahora = timezone.now()
+
+        with self._lock:
+            entrada = self._memoria.get(clave)
+            if entrada is not None and entrada[1] > ahora:
+                self._memoria.move_to_end(clave)
+                self._contadores['aciertos_memoria'] += 1
+                return entrada[0]
+            self._memoria.pop(clave, None)
+
+        registro = RecomendacionIA.objects.filter(clave=clave, fecha_creacion__gt=ahora - self.ttl).first()
+        if registro is None:
+            self._contar('fallos')
+            return None
+
+        RecomendacionIA.objects.filter(pk=registro.pk).update(usos=F('usos') + 1, fecha_ultimo_uso=ahora)
+        self._recordar(clave, registro.recomendacion, registro.fecha_creacion + self.ttl)
+        self._contar('aciertos_bd')
+        return registro.recomendacion
+
+    def guardar(self, descripcion, tecnologia_sitio, tipo_hallazgo, recomendacion):
+        """Guarda una recomendación generada en los dos niveles."""
+        clave = clave_recomendacion(descripcion, tecnologia_sitio, tipo_hallazgo)
+        ahora = timezone.now()
+        datos = {
+            'hallazgo_normalizado': normalizar_hallazgo(descripcion),
+            'tecnologia_sitio': tecnologia_sitio or '',
+            'tipo_hallazgo': tipo_hallazgo or '',
+            'recomendacion': recomendacion,
+            'fecha_creacion': ahora,
+            'fecha_ultimo_uso': ahora,
+        }
+        try:
+            RecomendacionIA.objects.update_or_create(clave=clave, defaults=datos)
+        except IntegrityError:
+            pass  # Otro worker la guardó a la vez: vale cualquiera de las dos
+        self._recordar(clave, recomendacion, ahora + self.ttl)
+
+        with self._lock:
+            self._contadores['guardadas'] += 1
+            purgar = self._contadores['guardadas'] % 100 == 1
+        if purgar:
+            self.purgar()
+
+    def purgar(self):
+        """Elimina de la base de datos las entradas caducadas y las menos usadas recientemente que sobren."""
+        RecomendacionIA.objects.filter(fecha_creacion__lte=timezone.now() - self.ttl).delete()
+        sobrantes = RecomendacionIA.objects.count() - self.max_entradas
+        if sobrantes > 0:
+            antiguas = RecomendacionIA.objects.order_by('fecha_ultimo_uso').values_list('pk', flat=True)[:sobrantes]
+            RecomendacionIA.objects.filter(pk__in=list(antiguas)).delete()
+
+    def limpiar_memoria(self):
+        """Vacía el nivel en memoria (la base de datos no se toca)."""
+        with self._lock:
+            self._memoria.clear()
+
+    def estadisticas(self):
+        with self._lock:
+            return dict(self._contadores, entradas_memoria=len(self._memoria))
+
+    def _recordar(self, clave, recomendacion, caduca):
+        with self._lock:
+            self._memoria[clave] = (recomendacion, caduca)
+            self._memoria.move_to_end(clave)
+            while len(self._memoria) > self.tamano_memoria:
+                self._memoria.popitem(last=False)
+
+    def _contar(self, contador):
+        with self._lock:
+            self._contadores[contador] += 1
+
+
+_cache_recomendaciones = None
+_lock_cache_recomendaciones = threading.Lock()
+
+
+def obtener_cache_recomendaciones():
+    """Retorna la caché de recomendaciones del proceso."""
+    global _cache_recomendaciones
+    with _lock_cache_recomendaciones:
+        if _cache_recomendaciones is None:
+            _cache_recomendaciones = CacheRecomendaciones()
+        return _cache_recomendaciones
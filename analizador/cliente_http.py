@@ -0,0 +1,64 @@
+"""
+Cliente HTTP compartido para las descargas del Analizador SEO con IA.
+"""
+
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+
+
+class ClienteHTTP:
+    """
+    Sesión HTTP con keep-alive y pool de conexiones por host.
+
+    Un rastreo crea un único cliente y lo comparte entre todas sus descargas
+    (páginas, robots.txt, sitemap.xml), de modo que las peticiones al mismo
+    host reutilizan la conexión TCP+TLS en lugar de abrir una nueva cada vez.
+    La sesión de requests es segura para usarse desde los hilos del rastreador.
+    """
+
+    def __init__(self, pool_por_host=None, timeout=None, headers=None):
+        self.pool_por_host = pool_por_host or getattr(settings, 'CRAWL_POOL_PER_HOST', 10)
+        self.timeout = timeout or getattr(settings, 'CRAWL_TIMEOUT', 10)
+
+        self.session = requests.Session()
+        adaptador = HTTPAdapter(pool_connections=10, pool_maxsize=self.pool_por_host)
+        self.session.mount('http://', adaptador)
+        self.session.mount('https://', adaptador)
+        self.session.headers.update({
+            'User-Agent': getattr(settings, 'CRAWL_USER_AGENT', 'AnalizadorSEO/1.0'),
+        })
+        if headers:
+            self.session.headers.update(headers)
+
+    def get(self, url, **kwargs):
+        """Realiza un GET con el timeout unificado del cliente (salvo que se indique otro)."""
+        kwargs.setdefault('timeout', self.timeout)
+        return self.session.get(url, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+_cliente_compartido = None
+_lock_cliente_compartido = threading.Lock()
+
+
+def obtener_cliente_compartido():
+    """
+    Retorna el cliente del proceso, usado por las descargas que no pertenecen
+    a un rastreo concreto (por ejemplo, desde las vistas).
+    """
+    global _cliente_compartido
+    with _lock_cliente_compartido:
+        if _cliente_compartido is None:
+            _cliente_compartido = ClienteHTTP()
+        return _cliente_compartido
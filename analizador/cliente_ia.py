@@ -0,0 +1,297 @@
+"""
+Cliente de la IA (Gemini) compartido por el Analizador SEO con IA.
+"""
+
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import google.generativeai as genai
+from google.api_core import exceptions as google_exceptions
+from django.conf import settings
+
+
+# Errores transitorios: cuota agotada, servicio caído, timeouts y fallos de red
+ERRORES_TRANSITORIOS = (
+    google_exceptions.ResourceExhausted,
+    google_exceptions.TooManyRequests,
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.DeadlineExceeded,
+    google_exceptions.InternalServerError,
+    ConnectionError,
+    TimeoutError,
+)
+
+
+class CircuitoAbierto(Exception):
+    """La IA ha fallado demasiadas veces seguidas y no se la llama hasta que pase el enfriamiento."""
+
+
+class LimitadorTasa:
+    """
+    Cubo de fichas: admite ráfagas de hasta `capacidad` peticiones y, en
+    media, `tasa` peticiones por segundo. `adquirir()` espera hasta que haya
+    una ficha libre.
+    """
+
+    def __init__(self, tasa, capacidad, reloj=time.monotonic, dormir=time.sleep):
+        self.tasa = tasa
+        self.capacidad = capacidad
+        self._reloj = reloj
+        self._dormir = dormir
+        self._fichas = float(capacidad)
+        self._ultima = reloj()
+        self._lock = threading.Lock()
+
+    def adquirir(self):
+        """Consume una ficha y retorna los segundos que hubo que esperar."""
+        with self._lock:  # Los que esperan se atienden de uno en uno
+            ahora = self._reloj()
+            self._fichas = min(self.capacidad, self._fichas + (ahora - self._ultima) * self.tasa)
+            self._ultima = ahora
+            espera = 0.0
+            if self._fichas < 1:
+                espera = (1 - self._fichas) / self.tasa
+                self._dormir(espera)
+                self._fichas, self._ultima = 1.0, self._reloj()
+            self._fichas -= 1
+            return espera
+
+
+class InterruptorCircuito:
+    """
+    Interruptor de circuito: tras `max_fallos` fallos seguidos se abre y
+    rechaza las llamadas durante `enfriamiento` segundos. Pasado ese tiempo
+    deja pasar una llamada de prueba (semiabierto): si sale bien se cierra y,
+    si falla, vuelve a abrirse.
+    """
+
+    def __init__(self, max_fallos, enfriamiento, reloj=time.monotonic):
+        self.max_fallos = max_fallos
+        self.enfriamiento = enfriamiento
+        self._reloj = reloj
+        self._fallos = 0
+        self._abierto_desde = None
+        self._prueba_en_curso = False
+        self._lock = threading.Lock()
+
+    @property
+    def estado(self):
+        with self._lock:
+            if self._abierto_desde is None:
+                return 'cerrado'
+            return 'semiabierto' if self._reloj() - self._abierto_desde >= self.enfriamiento else 'abierto'
+
+    def comprobar(self):
+        """Lanza CircuitoAbierto si no se puede llamar a la IA ahora."""
+        with self._lock:
+            if self._abierto_desde is None:
+                return
+            restante = self.enfriamiento - (self._reloj() - self._abierto_desde)
+            if restante > 0 or self._prueba_en_curso:
+                raise CircuitoAbierto(f"La IA está en pausa tras {self._fallos} fallos seguidos.")
+            self._prueba_en_curso = True
+
+    def registrar_exito(self):
+        with self._lock:
+            self._fallos = 0
+            self._abierto_desde = None
+            self._prueba_en_curso = False
+
+    def registrar_fallo(self):
+        with self._lock:
+            self._fallos += 1
+            if self._prueba_en_curso or self._fallos >= self.max_fallos:
+                self._abierto_desde = self._reloj()
+            self._prueba_en_curso = False
+
+    def liberar_prueba(self):
+        """La llamada terminó sin indicar si la API funciona: el circuito no cambia y otra llamada puede hacer la prueba."""
+        with self._lock:
+            self._prueba_en_curso = False
+
+
+class ClienteIA:
+    """
+    Cliente de larga duración para el modelo generativo.
+
+    - Como mucho `max_concurrencia` peticiones simultáneas (IA_MAX_CONCURRENCY).
+    - Cubo de fichas con `peticiones_por_minuto` de media (IA_REQUESTS_PER_MINUTE),
+      para no superar la cuota de la API.
+    - Los errores transitorios (ERRORES_TRANSITORIOS) se reintentan hasta
+      `max_reintentos` veces (IA_MAX_RETRIES) con espera exponencial con
+      jitter desde `espera_base` hasta `espera_maxima` segundos.
+    - Un InterruptorCircuito deja de llamar a la API durante `enfriamiento`
+      segundos (IA_CIRCUIT_COOLDOWN_SECONDS) tras `fallos_circuito`
+      peticiones fallidas seguidas (IA_CIRCUIT_FAILURES).
+
+    El resto de errores se propagan sin reintentar. Los de la API
+    (GoogleAPICallError: clave no válida, permisos, petición rechazada...)
+    cuentan como fallo para el circuito; los de un solo prompt (contenido
+    bloqueado, respuestas inválidas...) no cuentan ni como fallo ni como
+    éxito: solo una respuesta recibida cierra el circuito. `modelo` es cualquier objeto con
+    `generate_content(prompt)`, por ejemplo un ModeloFalso en los tests.
+    """
+
+    def __init__(self, modelo, max_concurrencia=None, peticiones_por_minuto=None, max_reintentos=None,
+                 espera_base=None, espera_maxima=None, fallos_circuito=None, enfriamiento=None,
+                 reloj=time.monotonic, dormir=time.sleep):
+        self.modelo = modelo
+        self.max_concurrencia = max_concurrencia or getattr(settings, 'IA_MAX_CONCURRENCY', 4)
+        peticiones_por_minuto = peticiones_por_minuto or getattr(settings, 'IA_REQUESTS_PER_MINUTE', 60)
+        self.max_reintentos = max_reintentos if max_reintentos is not None else getattr(settings, 'IA_MAX_RETRIES', 3)
+        self.espera_base = espera_base if espera_base is not None else getattr(settings, 'IA_BACKOFF_BASE_SECONDS', 1)
+        self.espera_maxima = espera_maxima if espera_maxima is not None else getattr(settings, 'IA_BACKOFF_MAX_SECONDS', 30)
+        self._dormir = dormir
+
+        self.limitador = LimitadorTasa(peticiones_por_minuto / 60, self.max_concurrencia, reloj=reloj, dormir=dormir)
+        self.circuito = InterruptorCircuito(
+            fallos_circuito or getattr(settings, 'IA_CIRCUIT_FAILURES', 5),
+            enfriamiento if enfriamiento is not None else getattr(settings, 'IA_CIRCUIT_COOLDOWN_SECONDS', 60),
+            reloj=reloj
+        )
+        self._semaforo = threading.BoundedSemaphore(self.max_concurrencia)
+        self._lock = threading.Lock()
+        self._contadores = {'peticiones': 0, 'reintentos': 0, 'fallos': 0, 'rechazadas': 0}
+
+    def generar(self, prompt):
+        """Envía el prompt al modelo y retorna su respuesta."""
+        try:
+            self.circuito.comprobar()
+        except CircuitoAbierto:
+            self._contar('rechazadas')
+            raise
+        with self._semaforo:
+            for intento in range(self.max_reintentos + 1):
+                self.limitador.adquirir()
+                self._contar('peticiones')
+                try:
+                    respuesta = self.modelo.generate_content(prompt)
+                except ERRORES_TRANSITORIOS:
+                    if intento == self.max_reintentos:
+                        self._contar('fallos')
+                        self.circuito.registrar_fallo()
+                        raise
+                    self._contar('reintentos')
+                    self._dormir(self._espera(intento))
+                    continue
+                except google_exceptions.GoogleAPICallError:
+                    # Error persistente de la API (clave no válida, permisos, petición rechazada...): no se
+                    # reintenta, pero cuenta como fallo para que el circuito se abra si se repite
+                    self._contar('fallos')
+                    self.circuito.registrar_fallo()
+                    raise
+                except Exception:
+                    self.circuito.liberar_prueba()  # Error de este prompt (p. ej. contenido bloqueado)
+                    raise
+                self.circuito.registrar_exito()
+                return respuesta
+
+    def generar_varios(self, prompts):
+        """
+        Envía varios prompts en paralelo (hasta `max_concurrencia` a la vez) y
+        retorna sus respuestas en el mismo orden, con None en las que fallaron.
+        """
+        if len(prompts) <= 1:
+            return [self._generar_o_none(prompt) for prompt in prompts]
+        with ThreadPoolExecutor(max_workers=min(self.max_concurrencia, len(prompts))) as pool:
+            return list(pool.map(self._generar_o_none, prompts))
+
+    def estadisticas(self):
+        with self._lock:
+            return dict(self._contadores, circuito=self.circuito.estado)
+
+    def _generar_o_none(self, prompt):
+        try:
+            return self.generar(prompt)
+        except Exception:
+            return None
+
+    def _espera(self, intento):
+        """Espera exponencial con jitter antes del reintento `intento` + 1."""
+        return min(self.espera_maxima, self.espera_base * 2 ** intento) * random.uniform(0.5, 1)
+
+    def _contar(self, contador):
+        with self._lock:
+            self._contadores[contador] += 1
+
+
+class RespuestaFalsa:
+    """Respuesta con la misma forma que la de Gemini (`text` y `parts`)."""
+
+    def __init__(self, texto):
+        self.text = texto
+        self.parts = [self] if texto else []
+
+
+class ModeloFalso:
+    """
+    Modelo local que imita a `genai.GenerativeModel` sin llamar a la API.
+
+    `respuestas` es un texto fijo o una función prompt -> texto; por defecto
+    contesta una recomendación por hallazgo, en JSON si el prompt es de un
+    lote. `errores` son excepciones que se lanzan, en orden, en las primeras
+    llamadas y `latencia` los segundos que tarda cada respuesta. Los prompts
+    recibidos quedan en `prompts`.
+    """
+
+    _RE_HALLAZGO_LOTE = re.compile(r'^(\d+)\. \(Type: ', re.MULTILINE)
+
+    def __init__(self, respuestas=None, errores=(), latencia=0):
+        self.respuestas = respuestas
+        self.errores = list(errores)
+        self.latencia = latencia
+        self.prompts = []
+        self._lock = threading.Lock()
+
+    def generate_content(self, prompt, **kwargs):
+        with self._lock:
+            self.prompts.append(prompt)
+            error = self.errores.pop(0) if self.errores else None
+        if self.latencia:
+            time.sleep(self.latencia)
+        if error is not None:
+            raise error
+        if callable(self.respuestas):
+            return RespuestaFalsa(self.respuestas(prompt))
+        if self.respuestas is not None:
+            return RespuestaFalsa(self.respuestas)
+        return RespuestaFalsa(self._respuesta_por_defecto(prompt))
+
+    def _respuesta_por_defecto(self, prompt):
+        numeros = self._RE_HALLAZGO_LOTE.findall(prompt)
+        if numeros:
+            return '[' + ', '.join(f'{{"id": {n}, "recomendacion": "Recomendación simulada {n}."}}' for n in numeros) + ']'
+        return 'Recomendación simulada.'
+
+
+_cliente_ia = None
+_api_key_cliente_ia = None
+_lock_cliente_ia = threading.Lock()
+
+
+def obtener_cliente_ia(api_key):
+    """
+    Retorna el cliente de la IA del proceso (se crea una sola vez por API key).
+    Con IA_MODEL='falso' usa un ModeloFalso en lugar de Gemini.
+    """
+    global _cliente_ia, _api_key_cliente_ia
+    with _lock_cliente_ia:
+        if _cliente_ia is None or _api_key_cliente_ia != api_key:
+            nombre_modelo = getattr(settings, 'IA_MODEL', 'gemini-pro')
+            if nombre_modelo == 'falso':
+                modelo = ModeloFalso()
+            else:
+                genai.configure(api_key=api_key)
+                modelo = genai.GenerativeModel(nombre_modelo)
+            _cliente_ia, _api_key_cliente_ia = ClienteIA(modelo), api_key
+        return _cliente_ia
+
+
+def descartar_cliente_ia():
+    """Descarta el cliente del proceso; el siguiente `obtener_cliente_ia` crea uno nuevo."""
+    global _cliente_ia, _api_key_cliente_ia
+    with _lock_cliente_ia:
+        _cliente_ia = _api_key_cliente_ia = None
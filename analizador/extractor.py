@@ -0,0 +1,370 @@
+"""
+Extracción en una sola pasada de las señales SEO de una página.
+"""
+
+import logging
+from html.parser import HTMLParser
+from urllib.parse import urljoin
+
+from bs4 import BeautifulSoup
+from bs4.builder import HTMLTreeBuilder
+from bs4.element import Tag
+from django.conf import settings
+
+try:
+    import lxml  # noqa: F401 (solo se comprueba que esté instalado)
+except ImportError:
+    lxml = None
+
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:
+    LexborHTMLParser = None
+
+
+logger = logging.getLogger(__name__)
+
+ENCABEZADOS = ('h1', 'h2', 'h3', 'h4', 'h5', 'h6')
+
+# Backends de análisis HTML soportados. 'html.parser' (puro Python) es el
+# más lento pero no requiere dependencias y es el de respaldo.
+BACKENDS_HTML = ('html.parser', 'lxml', 'selectolax')
+
+
+class ExtraccionPagina:
+    """
+    Señales SEO extraídas de una página HTML.
+
+    - titulo: texto del primer <title> (vacío si no hay o no es texto simple)
+    - metas / propiedades: contenido de las <meta> por `name` / `property` (gana la primera)
+    - encabezados: textos de h1..h6 en orden de aparición
+    - imagenes: lista de {'src', 'alt'} con `src` absoluta
+    - enlaces: lista de {'url', 'text'} navegables (sin anclas ni javascript:), con `url` absoluta
+    - hrefs: `href` tal cual de todos los <a>, para descubrir nuevas URLs
+    - canonical, idioma: <link rel="canonical"> y atributo lang de <html>
+    """
+
+    def __init__(self, url):
+        self.url = url
+        self.titulo = ''
+        self.metas = {}
+        self.propiedades = {}
+        self.encabezados = {tag: [] for tag in ENCABEZADOS}
+        self.imagenes = []
+        self.enlaces = []
+        self.hrefs = []
+        self.canonical = ''
+        self.idioma = ''
+
+    @property
+    def descripcion_meta(self):
+        return self.metas.get('description', '').strip()
+
+    @property
+    def h1_tags(self):
+        return self.encabezados['h1']
+
+
+def extraer_pagina(soup, url):
+    """
+    Recorre el árbol una única vez y retorna un ExtraccionPagina con todas las
+    señales que usan `analizar_contenido_pagina` y `obtener_urls_sitio`.
+    Solo se vuelve a bajar al subárbol de encabezados y enlaces para leer su texto.
+    """
+    extraccion = ExtraccionPagina(url)
+    titulo_visto = False
+
+    for elemento in soup.descendants:
+        if not isinstance(elemento, Tag):
+            continue
+        nombre = elemento.name
+
+        if nombre == 'a':
+            href = elemento.get('href')
+            if href is None:
+                continue
+            extraccion.hrefs.append(href)
+            if href and not href.startswith('#') and not href.startswith('javascript:'):
+                # Convertir enlaces relativos a absolutos
+                if not href.startswith('http'):
+                    href = urljoin(url, href)
+                extraccion.enlaces.append({'url': href, 'text': elemento.get_text(strip=True)})
+
+        elif nombre == 'img':
+            src = elemento.get('src', '')
+            if src and not src.startswith('http'):
+                src = urljoin(url, src)
+            extraccion.imagenes.append({'src': src, 'alt': elemento.get('alt', '')})
+
+        elif nombre in extraccion.encabezados:
+            extraccion.encabezados[nombre].append(elemento.get_text(strip=True))
+
+        elif nombre == 'meta':
+            if elemento.get('name') is not None:
+                extraccion.metas.setdefault(elemento['name'], elemento.get('content', ''))
+            if elemento.get('property') is not None:
+                extraccion.propiedades.setdefault(elemento['property'], elemento.get('content', ''))
+
+        elif nombre == 'title' and not titulo_visto:
+            titulo_visto = True
+            extraccion.titulo = elemento.string.strip() if elemento.string else ''
+
+        elif nombre == 'link' and not extraccion.canonical:
+            if 'canonical' in (elemento.get('rel') or []):
+                extraccion.canonical = elemento.get('href', '')
+
+        elif nombre == 'html' and not extraccion.idioma:
+            extraccion.idioma = elemento.get('lang', '')
+
+    return extraccion
+
+
+def backend_disponible(backend):
+    """Indica si un backend de análisis HTML puede usarse en este entorno."""
+    if backend == 'html.parser':
+        return True
+    if backend == 'lxml':
+        return lxml is not None
+    if backend == 'selectolax':
+        return LexborHTMLParser is not None
+    return False
+
+
+def resolver_backend(backend=None):
+    """
+    Retorna el backend a usar: el indicado o HTML_PARSER_BACKEND, con
+    'html.parser' como respaldo si no está instalado.
+    """
+    backend = backend or getattr(settings, 'HTML_PARSER_BACKEND', 'html.parser')
+    if backend not in BACKENDS_HTML:
+        raise ValueError(f"Backend de análisis HTML desconocido: {backend}")
+    if not backend_disponible(backend):
+        logger.warning("El backend HTML '%s' no está instalado; se usa 'html.parser'.", backend)
+        return 'html.parser'
+    return backend
+
+
+def extraer_html(html, url, backend=None):
+    """
+    Analiza el HTML con el backend configurado y retorna su ExtraccionPagina.
+    lxml y html.parser construyen un árbol BeautifulSoup; selectolax (lexbor)
+    extrae directamente de su propio árbol, sin pasar por BeautifulSoup.
+    """
+    backend = resolver_backend(backend)
+    if backend == 'selectolax':
+        return _extraer_selectolax(html, url)
+    return extraer_pagina(BeautifulSoup(html, backend), url)
+
+
+def _extraer_selectolax(html, url):
+    """Equivalente de extraer_pagina sobre un árbol de selectolax/lexbor."""
+    extraccion = ExtraccionPagina(url)
+    titulo_visto = False
+    arbol = LexborHTMLParser(html)
+
+    for nodo in arbol.root.traverse() if arbol.root is not None else ():
+        nombre = nodo.tag
+        atributos = nodo.attributes
+
+        if nombre == 'a':
+            if 'href' not in atributos:
+                continue
+            href = atributos['href'] or ''
+            extraccion.hrefs.append(href)
+            if href and not href.startswith('#') and not href.startswith('javascript:'):
+                if not href.startswith('http'):
+                    href = urljoin(url, href)
+                extraccion.enlaces.append({'url': href, 'text': nodo.text(deep=True, separator='', strip=True)})
+
+        elif nombre == 'img':
+            src = atributos.get('src') or ''
+            if src and not src.startswith('http'):
+                src = urljoin(url, src)
+            extraccion.imagenes.append({'src': src, 'alt': atributos.get('alt') or ''})
+
+        elif nombre in extraccion.encabezados:
+            extraccion.encabezados[nombre].append(nodo.text(deep=True, separator='', strip=True))
+
+        elif nombre == 'meta':
+            if 'name' in atributos:
+                extraccion.metas.setdefault(atributos['name'] or '', atributos.get('content') or '')
+            if 'property' in atributos:
+                extraccion.propiedades.setdefault(atributos['property'] or '', atributos.get('content') or '')
+
+        elif nombre == 'title' and not titulo_visto:
+            titulo_visto = True
+            extraccion.titulo = nodo.text(deep=True).strip()
+
+        elif nombre == 'link' and not extraccion.canonical:
+            if 'canonical' in (atributos.get('rel') or '').split():
+                extraccion.canonical = atributos.get('href') or ''
+
+        elif nombre == 'html' and not extraccion.idioma:
+            extraccion.idioma = atributos.get('lang') or ''
+
+    return extraccion
+
+
+class ExtractorIncremental(HTMLParser):
+    """
+    Extrae las mismas señales que `extraer_pagina` sin construir ningún árbol.
+
+    El HTML se entrega por fragmentos con `feed()` a medida que llega de la
+    red y `close()` retorna el ExtraccionPagina. Solo se guardan la pila de
+    elementos abiertos (nombres) y el texto de los <a>, <title> y h1..h6
+    que siguen abiertos, así que la memoria depende del tamaño del fragmento
+    y no del de la página.
+
+    Usa el mismo tokenizador que BeautifulSoup con 'html.parser' y replica
+    cómo este cierra elementos y junta el texto, de modo que el resultado es
+    idéntico al de `extraer_html(..., backend='html.parser')`.
+    """
+
+    def __init__(self, url):
+        super().__init__(convert_charrefs=True)
+        self.extraccion = ExtraccionPagina(url)
+        self._abiertos = []  # pila de [nombre, captura o None]
+        self._capturas = []  # capturas de texto de los elementos abiertos
+        self._texto = []  # trozos de texto aún sin asignar (un mismo nodo puede llegar partido)
+        self._en_script = False
+        self._titulo_visto = False
+
+    def close(self):
+        super().close()
+        self._volcar_texto()
+        while self._abiertos:
+            self._cerrar(self._abiertos.pop()[1])
+        return self.extraccion
+
+    def handle_starttag(self, tag, attrs):
+        self._volcar_texto(nuevo_hijo=True)
+        # Como BeautifulSoup, los atributos sin valor quedan como '' y gana el último repetido
+        atributos = {nombre: valor or '' for nombre, valor in attrs}
+        captura = self._inicio(tag, atributos)
+        if tag in HTMLTreeBuilder.empty_element_tags:
+            self._cerrar(captura)
+        else:
+            self._abiertos.append([tag, captura])
+            self._en_script = tag in ('script', 'style')
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in HTMLTreeBuilder.empty_element_tags:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        self._volcar_texto()
+        self._en_script = False
+        # Se cierra el último elemento abierto con ese nombre y todos los que contiene;
+        # una etiqueta de cierre sin apertura se ignora
+        for i in range(len(self._abiertos) - 1, -1, -1):
+            if self._abiertos[i][0] == tag:
+                while len(self._abiertos) > i:
+                    self._cerrar(self._abiertos.pop()[1])
+                break
+
+    def handle_data(self, data):
+        if not self._en_script and self._capturas:
+            self._texto.append(data)
+
+    def handle_comment(self, data):
+        self._volcar_texto(nuevo_hijo=True)
+
+    def handle_decl(self, decl):
+        self._volcar_texto()
+
+    def handle_pi(self, data):
+        self._volcar_texto()
+
+    def unknown_decl(self, data):
+        self._volcar_texto()
+
+    def _inicio(self, nombre, atributos):
+        """Registra las señales de la etiqueta de apertura; retorna su captura de texto, si la necesita."""
+        extraccion = self.extraccion
+        url = extraccion.url
+
+        if nombre == 'a':
+            if 'href' not in atributos:
+                return None
+            href = atributos['href']
+            extraccion.hrefs.append(href)
+            if href and not href.startswith('#') and not href.startswith('javascript:'):
+                if not href.startswith('http'):
+                    href = urljoin(url, href)
+                enlace = {'url': href, 'text': ''}
+                extraccion.enlaces.append(enlace)
+                return self._capturar(lambda texto: enlace.__setitem__('text', texto))
+
+        elif nombre == 'img':
+            src = atributos.get('src', '')
+            if src and not src.startswith('http'):
+                src = urljoin(url, src)
+            extraccion.imagenes.append({'src': src, 'alt': atributos.get('alt', '')})
+
+        elif nombre in extraccion.encabezados:
+            # Se reserva el hueco ahora para conservar el orden de aparición
+            lista = extraccion.encabezados[nombre]
+            indice = len(lista)
+            lista.append('')
+            return self._capturar(lambda texto: lista.__setitem__(indice, texto))
+
+        elif nombre == 'meta':
+            if 'name' in atributos:
+                extraccion.metas.setdefault(atributos['name'], atributos.get('content', ''))
+            if 'property' in atributos:
+                extraccion.propiedades.setdefault(atributos['property'], atributos.get('content', ''))
+
+        elif nombre == 'title' and not self._titulo_visto:
+            self._titulo_visto = True
+            return self._capturar(self._asignar_titulo, titulo=True)
+
+        elif nombre == 'link' and not extraccion.canonical:
+            if 'canonical' in atributos.get('rel', '').split():
+                extraccion.canonical = atributos.get('href', '')
+
+        elif nombre == 'html' and not extraccion.idioma:
+            extraccion.idioma = atributos.get('lang', '')
+
+        return None
+
+    def _capturar(self, destino, titulo=False):
+        captura = {'destino': destino, 'trozos': [], 'titulo': titulo, 'hijos': 0}
+        self._capturas.append(captura)
+        return captura
+
+    def _cerrar(self, captura):
+        if captura is None:
+            return
+        self._capturas.remove(captura)
+        if captura['titulo']:
+            captura['destino'](captura['trozos'], captura['hijos'])
+        else:
+            # Equivale a get_text(strip=True): cada nodo de texto recortado y unidos sin separador
+            captura['destino'](''.join(captura['trozos']))
+
+    def _asignar_titulo(self, trozos, hijos):
+        # Como `title.string`: solo cuenta si el título es un único nodo de texto
+        self.extraccion.titulo = trozos[0].strip() if len(trozos) == 1 and not hijos else ''
+
+    def _volcar_texto(self, nuevo_hijo=False):
+        """Cierra el nodo de texto en curso y lo reparte entre las capturas abiertas."""
+        if self._texto:
+            texto = ''.join(self._texto)
+            self._texto = []
+            for captura in self._capturas:
+                if captura['titulo']:
+                    captura['trozos'].append(texto)
+                elif texto.strip():
+                    captura['trozos'].append(texto.strip())
+        if nuevo_hijo:
+            for captura in self._capturas:
+                captura['hijos'] += 1
+
+
+def extraer_fragmentos(fragmentos, url):
+    """Extrae las señales SEO de un HTML recibido como iterable de fragmentos de texto."""
+    extractor = ExtractorIncremental(url)
+    for fragmento in fragmentos:
+        extractor.feed(fragmento)
+    return extractor.close()
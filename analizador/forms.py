@@ -63,7 +63,7 @@ class AnalisisForm(forms.Form):
     def clean(self):
         cleaned_data = super().clean()
         crawl_scope = cleaned_data.get("crawl_scope")
-        num_pages = cleaned_data.g<ctrl61>et("num_pages")
+        num_pages = cleaned_data.get("num_pages")
 
         if crawl_scope == "multiple_pages":
             if not num_pages:
@@ -0,0 +1,251 @@
+"""
+Frontera de rastreo para la aplicación Analizador SEO con IA.
+"""
+
+import base64
+import hashlib
+import heapq
+import itertools
+import math
+from array import array
+from urllib.parse import urlparse
+
+
+class Frontera:
+    """
+    Cola de URLs pendientes de rastrear, ordenada por prioridad.
+
+    Por defecto la prioridad es la profundidad (distancia en clics desde la
+    URL inicial), de modo que el rastreo es en anchura: las páginas más
+    superficiales, normalmente las más importantes, se descargan primero.
+    Dentro de una misma prioridad se respeta el orden de llegada (FIFO).
+
+    `vistas` es el índice de todas las URLs que han entrado alguna vez en la
+    frontera (pendientes o ya entregadas). Se mantiene de forma incremental,
+    así que comprobar si una URL es conocida cuesta O(1) y nunca hace falta
+    copiar conjuntos. La frontera se puede pasar directamente a
+    `obtener_urls_sitio` como contenedor de URLs conocidas.
+
+    `vistas` puede ser un `set` (exacto) o, en rastreos muy grandes, uno de
+    los conjuntos compactos de este módulo (ver `crear_conjunto_vistas`).
+
+    Las URLs se agrupan en una cola por host para que el rastreador pueda
+    saltarse los hosts que ya tienen todas sus conexiones ocupadas.
+    """
+
+    def __init__(self, max_profundidad=None, vistas=None):
+        self.max_profundidad = max_profundidad
+        self.vistas = vistas if vistas is not None else set()
+        self._colas = {}  # host -> heap de (prioridad, secuencia, url, profundidad)
+        self._secuencia = itertools.count()
+        self._pendientes = 0
+
+    def __len__(self):
+        """Número de URLs pendientes."""
+        return self._pendientes
+
+    def __bool__(self):
+        return self._pendientes > 0
+
+    def __contains__(self, url):
+        return url in self.vistas
+
+    def agregar(self, url, profundidad=0, prioridad=None):
+        """
+        Encola una URL si no se ha visto antes y no supera `max_profundidad`.
+        Una `prioridad` menor se rastrea antes; si no se indica se usa la profundidad.
+        Retorna True si la URL se encoló.
+        """
+        if url in self.vistas:
+            return False
+        if self.max_profundidad is not None and profundidad > self.max_profundidad:
+            return False
+
+        self.vistas.add(url)
+        host = urlparse(url).netloc
+        entrada = (profundidad if prioridad is None else prioridad, next(self._secuencia), url, profundidad)
+        heapq.heappush(self._colas.setdefault(host, []), entrada)
+        self._pendientes += 1
+        return True
+
+    def reencolar(self, url, profundidad=0, prioridad=None):
+        """Vuelve a encolar una URL ya entregada (p. ej. para reintentarla), aunque ya esté en `vistas`."""
+        entrada = (profundidad if prioridad is None else prioridad, next(self._secuencia), url, profundidad)
+        heapq.heappush(self._colas.setdefault(urlparse(url).netloc, []), entrada)
+        self._pendientes += 1
+
+    def pendientes(self):
+        """URLs pendientes como listas [prioridad, url, profundidad], en orden de llegada."""
+        entradas = sorted((entrada for cola in self._colas.values() for entrada in cola), key=lambda entrada: entrada[1])
+        return [[prioridad, url, profundidad] for prioridad, _, url, profundidad in entradas]
+
+    def siguiente(self, hosts_excluidos=()):
+        """
+        Retorna la URL pendiente de mayor prioridad como tupla (url, profundidad),
+        ignorando los hosts de `hosts_excluidos`. Retorna None si no hay ninguna disponible.
+        """
+        mejor_host = None
+        for host, cola in self._colas.items():
+            if host in hosts_excluidos:
+                continue
+            if mejor_host is None or cola[0] < self._colas[mejor_host][0]:
+                mejor_host = host
+        if mejor_host is None:
+            return None
+
+        cola = self._colas[mejor_host]
+        _, _, url, profundidad = heapq.heappop(cola)
+        if not cola:
+            del self._colas[mejor_host]
+        self._pendientes -= 1
+        return url, profundidad
+
+
+class ConjuntoHuellas:
+    """
+    Conjunto de URLs vistas que guarda solo una huella de 64 bits por URL.
+
+    Es una tabla hash de direccionamiento abierto (sondeo lineal) sobre un
+    `array('Q')`, con factor de carga máximo de 1/2: ocupa entre 16 y 32
+    bytes por URL, frente a los ~150 de un `set` de cadenas. La probabilidad
+    de que dos URLs distintas compartan huella es despreciable (~n²/2⁶⁵).
+    """
+
+    def __init__(self, capacidad_inicial=1024):
+        capacidad = 8
+        while capacidad < capacidad_inicial * 2:
+            capacidad *= 2
+        self._tabla = array('Q', [0]) * capacidad
+        self._mascara = capacidad - 1
+        self._n = 0
+
+    @staticmethod
+    def huella(url):
+        """Huella de 64 bits de una URL (0 se reserva para las celdas vacías)."""
+        h = int.from_bytes(hashlib.blake2b(url.encode('utf-8'), digest_size=8).digest(), 'little')
+        return h or 1
+
+    def __len__(self):
+        return self._n
+
+    def __contains__(self, url):
+        h = self.huella(url)
+        return self._tabla[self._posicion(h)] == h
+
+    def add(self, url):
+        h = self.huella(url)
+        i = self._posicion(h)
+        if self._tabla[i] == h:
+            return
+        self._tabla[i] = h
+        self._n += 1
+        if self._n * 2 > len(self._tabla):
+            self._crecer()
+
+    def _posicion(self, h):
+        """Celda donde está `h` o, si no está, la celda vacía donde le tocaría ir."""
+        tabla, mascara = self._tabla, self._mascara
+        i = h & mascara
+        while True:
+            valor = tabla[i]
+            if valor == 0 or valor == h:
+                return i
+            i = (i + 1) & mascara
+
+    def _crecer(self):
+        anterior = self._tabla
+        self._tabla = array('Q', [0]) * (len(anterior) * 2)
+        self._mascara = len(self._tabla) - 1
+        for h in anterior:
+            if h:
+                self._tabla[self._posicion(h)] = h
+
+
+class FiltroBloom:
+    """
+    Conjunto aproximado de URLs vistas con tamaño fijo.
+
+    Se dimensiona para `capacidad` URLs con una tasa de falsos positivos
+    `tasa_falsos_positivos`: ~1,2 bytes por URL al 1 % y ~1,8 bytes al 0,1 %.
+    No hay falsos negativos, pero un falso positivo hace que una URL nueva
+    se dé por vista y no se rastree; por encima de `capacidad` la tasa real
+    empeora.
+    """
+
+    def __init__(self, capacidad, tasa_falsos_positivos=0.001):
+        capacidad = max(1, capacidad)
+        self.num_bits = max(8, math.ceil(-capacidad * math.log(tasa_falsos_positivos) / math.log(2) ** 2))
+        self.num_hashes = max(1, round(self.num_bits / capacidad * math.log(2)))
+        self._bits = bytearray((self.num_bits + 7) // 8)
+        self._n = 0
+
+    def _posiciones(self, url):
+        # Doble hashing (Kirsch-Mitzenmacher) a partir de un único digest de 128 bits
+        digest = hashlib.blake2b(url.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % self.num_bits
+
+    def __len__(self):
+        """Número de URLs añadidas (sin contar las que ya parecían vistas)."""
+        return self._n
+
+    def __contains__(self, url):
+        bits = self._bits
+        return all(bits[p >> 3] & (1 << (p & 7)) for p in self._posiciones(url))
+
+    def add(self, url):
+        bits = self._bits
+        nueva = False
+        for p in self._posiciones(url):
+            mascara = 1 << (p & 7)
+            if not bits[p >> 3] & mascara:
+                bits[p >> 3] |= mascara
+                nueva = True
+        if nueva:
+            self._n += 1
+
+
+def crear_conjunto_vistas(modo='set', capacidad=None, tasa_falsos_positivos=0.001):
+    """
+    Crea el conjunto de URLs vistas de una Frontera según `modo`:
+    'set' (exacto), 'huellas' (ConjuntoHuellas) o 'bloom' (FiltroBloom,
+    dimensionado para `capacidad` URLs).
+    """
+    if modo == 'huellas':
+        return ConjuntoHuellas(capacidad_inicial=min(capacidad or 1024, 1 << 20))
+    if modo == 'bloom':
+        return FiltroBloom(capacidad or 100000, tasa_falsos_positivos)
+    if modo == 'set':
+        return set()
+    raise ValueError(f"Modo de conjunto de URLs vistas desconocido: {modo}")
+
+
+def exportar_vistas(vistas):
+    """Representación en JSON de un conjunto de URLs vistas (para el punto de control de un rastreo)."""
+    if isinstance(vistas, ConjuntoHuellas):
+        return {'modo': 'huellas', 'n': vistas._n, 'tabla': base64.b64encode(vistas._tabla.tobytes()).decode('ascii')}
+    if isinstance(vistas, FiltroBloom):
+        return {
+            'modo': 'bloom', 'n': vistas._n, 'num_bits': vistas.num_bits, 'num_hashes': vistas.num_hashes,
+            'bits': base64.b64encode(bytes(vistas._bits)).decode('ascii'),
+        }
+    return {'modo': 'set', 'urls': list(vistas)}
+
+
+def importar_vistas(datos):
+    """Reconstruye un conjunto de URLs vistas a partir de `exportar_vistas`."""
+    if datos['modo'] == 'huellas':
+        vistas = ConjuntoHuellas()
+        vistas._tabla = array('Q')
+        vistas._tabla.frombytes(base64.b64decode(datos['tabla']))
+        vistas._mascara = len(vistas._tabla) - 1
+        vistas._n = datos['n']
+        return vistas
+    if datos['modo'] == 'bloom':
+        vistas = FiltroBloom(1)
+        vistas.num_bits, vistas.num_hashes, vistas._n = datos['num_bits'], datos['num_hashes'], datos['n']
+        vistas._bits = bytearray(base64.b64decode(datos['bits']))
+        return vistas
+    return set(datos['urls'])
@@ -0,0 +1,110 @@
+"""
+Compara la extracción en una sola pasada con la implementación anterior de varios recorridos,
+el coste de análisis + extracción de cada backend HTML instalado y la memoria
+pico de la extracción incremental sin árbol frente a la de BeautifulSoup.
+"""
+
+import time
+import tracemalloc
+
+from bs4 import BeautifulSoup
+from django.core.management.base import BaseCommand
+
+from analizador.extractor import BACKENDS_HTML, backend_disponible, extraer_fragmentos, extraer_html, extraer_pagina
+from analizador.utils import obtener_imagenes, obtener_enlaces, obtener_urls_sitio
+
+
+URL_BASE = 'https://www.ejemplo.com/listado'
+
+
+def generar_pagina(num_enlaces, num_imagenes):
+    """Genera un listado de productos sintético con muchos enlaces e imágenes."""
+    bloques = []
+    for i in range(max(num_enlaces, num_imagenes)):
+        partes = ['<div class="producto"><h2>Producto %d</h2>' % i]
+        if i < num_imagenes:
+            partes.append('<img src="/img/%d.jpg" alt="%s">' % (i, '' if i % 5 == 0 else 'Producto %d' % i))
+        if i < num_enlaces:
+            href = '/producto/%d' % i if i % 4 else 'https://externo.com/%d' % i
+            partes.append('<a href="%s"><span>Ver</span> producto %d</a>' % (href, i))
+        partes.append('<p>Descripción del producto con <b>texto</b> de relleno.</p></div>')
+        bloques.append(''.join(partes))
+    return (
+        '<html lang="es"><head><title>Listado de productos</title>'
+        '<meta name="description" content="Listado completo de productos de ejemplo.">'
+        '<link rel="canonical" href="%s"></head><body><h1>Productos</h1>%s</body></html>'
+    ) % (URL_BASE, ''.join(bloques))
+
+
+def extraer_varios_recorridos(soup, url):
+    """Extracción anterior: un recorrido completo del árbol por cada señal."""
+    titulo = soup.title.string.strip() if soup.title and soup.title.string else ''
+    meta_desc_tag = soup.find('meta', attrs={'name': 'description'})
+    descripcion = meta_desc_tag.get('content', '').strip() if meta_desc_tag else ''
+    h1_tags = [h1.get_text(strip=True) for h1 in soup.find_all('h1')]
+    imagenes = obtener_imagenes(soup, url)
+    enlaces = obtener_enlaces(soup, url)
+    nuevas_urls = obtener_urls_sitio(url, soup, set())
+    return titulo, descripcion, h1_tags, imagenes, enlaces, nuevas_urls
+
+
+def extraer_una_pasada(soup, url):
+    extraccion = extraer_pagina(soup, url)
+    nuevas_urls = obtener_urls_sitio(url, extraccion, set())
+    return (
+        extraccion.titulo, extraccion.descripcion_meta, extraccion.h1_tags,
+        extraccion.imagenes, extraccion.enlaces, nuevas_urls
+    )
+
+
+class Command(BaseCommand):
+    help = 'Mide la extracción de señales SEO en una pasada frente a la de varios recorridos.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--enlaces', type=int, default=5000, help='Enlaces en la página sintética (por defecto 5000).')
+        parser.add_argument('--imagenes', type=int, default=1000, help='Imágenes en la página sintética (por defecto 1000).')
+        parser.add_argument('--repeticiones', type=int, default=5, help='Repeticiones por implementación (por defecto 5).')
+        parser.add_argument('--fragmento', type=int, default=64 * 1024, help='Tamaño de fragmento de la extracción incremental (por defecto 65536).')
+
+    def handle(self, *args, **options):
+        html = generar_pagina(options['enlaces'], options['imagenes'])
+        soup = BeautifulSoup(html, 'html.parser')
+        self.stdout.write(f"Página sintética: {len(html) / 1024:.0f} KiB, {options['enlaces']} enlaces, {options['imagenes']} imágenes")
+
+        resultados = {}
+        for nombre, funcion in (('varios recorridos', extraer_varios_recorridos), ('una pasada', extraer_una_pasada)):
+            tiempos = []
+            for _ in range(options['repeticiones']):
+                inicio = time.perf_counter()
+                resultados[nombre] = funcion(soup, URL_BASE)
+                tiempos.append(time.perf_counter() - inicio)
+            self.stdout.write(f"{nombre:<20}{min(tiempos) * 1000:>10.1f} ms (mejor de {options['repeticiones']})")
+
+        if resultados['varios recorridos'] != resultados['una pasada']:
+            self.stderr.write('Las dos implementaciones no producen el mismo resultado.')
+
+        # Análisis del HTML + extracción, partiendo del texto de la respuesta
+        self.stdout.write('Backends HTML (análisis + extracción):')
+        for backend in BACKENDS_HTML:
+            if not backend_disponible(backend):
+                self.stdout.write(f"{backend:<20}{'no instalado':>13}")
+                continue
+            tiempos = []
+            for _ in range(options['repeticiones']):
+                inicio = time.perf_counter()
+                extraer_html(html, URL_BASE, backend=backend)
+                tiempos.append(time.perf_counter() - inicio)
+            self.stdout.write(f"{backend:<20}{min(tiempos) * 1000:>10.1f} ms (mejor de {options['repeticiones']})")
+
+        # Memoria pico sin contar el propio HTML (en un rastreo llega de la red por fragmentos)
+        tamano = options['fragmento']
+        self.stdout.write(f"Memoria pico (fragmentos de {tamano // 1024} KiB):")
+        for nombre, funcion in (
+            ('árbol html.parser', lambda: extraer_html(html, URL_BASE, backend='html.parser')),
+            ('incremental', lambda: extraer_fragmentos((html[i:i + tamano] for i in range(0, len(html), tamano)), URL_BASE)),
+        ):
+            tracemalloc.start()
+            funcion()
+            _, pico = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            self.stdout.write(f"{nombre:<20}{pico / 1024 / 1024:>10.1f} MiB")
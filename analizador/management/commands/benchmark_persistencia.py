@@ -0,0 +1,62 @@
+"""
+Mide las páginas por segundo que se guardan fila a fila frente a por lotes con EscritorAnalisis.
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from analizador.models import Analisis, Hallazgo, Imagen, Enlace
+from analizador.persistencia import EscritorAnalisis
+
+
+URL_BASE = 'https://benchmark-persistencia.invalid'
+
+
+def guardar_fila_a_fila(paginas):
+    """Persistencia anterior: un create (y su commit) por cada fila."""
+    for i, (num_hallazgos, num_imagenes, num_enlaces) in enumerate(paginas):
+        analisis = Analisis.objects.create(url=f'{URL_BASE}/{i}', codigo_estado=200)
+        for j in range(num_hallazgos):
+            Hallazgo.objects.create(analisis=analisis, tipo='recomendacion', descripcion=f'Recomendación {j}')
+        for j in range(num_imagenes):
+            Imagen.objects.create(analisis=analisis, url=f'{URL_BASE}/{i}/img/{j}.png', alt='')
+        for j in range(num_enlaces):
+            Enlace.objects.create(analisis=analisis, url=f'{URL_BASE}/{i}/{j}', texto='Enlace', tipo='interno')
+
+
+def guardar_por_lotes(paginas):
+    escritor = EscritorAnalisis(segundos_por_lote=float('inf'))
+    for i, (num_hallazgos, num_imagenes, num_enlaces) in enumerate(paginas):
+        analisis = Analisis(url=f'{URL_BASE}/{i}', codigo_estado=200)
+        escritor.agregar(
+            analisis,
+            hallazgos=[Hallazgo(analisis=analisis, tipo='recomendacion', descripcion=f'Recomendación {j}') for j in range(num_hallazgos)],
+            imagenes=[Imagen(analisis=analisis, url=f'{URL_BASE}/{i}/img/{j}.png', alt='') for j in range(num_imagenes)],
+            enlaces=[Enlace(analisis=analisis, url=f'{URL_BASE}/{i}/{j}', texto='Enlace', tipo='interno') for j in range(num_enlaces)],
+        )
+    escritor.escribir()
+
+
+class Command(BaseCommand):
+    help = 'Mide páginas/segundo al guardar análisis fila a fila o por lotes (escribe en la base de datos configurada y lo borra al terminar).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--paginas', type=int, default=50, help='Páginas a guardar (por defecto 50).')
+        parser.add_argument('--enlaces', type=int, default=300, help='Enlaces por página (por defecto 300).')
+        parser.add_argument('--imagenes', type=int, default=80, help='Imágenes por página (por defecto 80).')
+        parser.add_argument('--hallazgos', type=int, default=10, help='Hallazgos por página (por defecto 10).')
+
+    def handle(self, *args, **options):
+        paginas = [(options['hallazgos'], options['imagenes'], options['enlaces'])] * options['paginas']
+        filas = options['paginas'] * (1 + options['hallazgos'] + options['imagenes'] + options['enlaces'])
+        self.stdout.write(f"{options['paginas']} páginas, {filas} filas en total")
+
+        for nombre, funcion in (('fila a fila', guardar_fila_a_fila), ('por lotes', guardar_por_lotes)):
+            try:
+                inicio = time.perf_counter()
+                funcion(paginas)
+                duracion = time.perf_counter() - inicio
+            finally:
+                Analisis.objects.filter(url__startswith=URL_BASE).delete()
+            self.stdout.write(f"{nombre:<15}{options['paginas'] / duracion:>10.1f} páginas/s{filas / duracion:>12.0f} filas/s")
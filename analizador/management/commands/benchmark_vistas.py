@@ -0,0 +1,49 @@
+"""
+Mide la memoria por URL de cada tipo de conjunto de URLs vistas de la Frontera.
+"""
+
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+
+from analizador.frontera import crear_conjunto_vistas
+
+
+class Command(BaseCommand):
+    help = 'Mide memoria por URL y tiempo de inserción de los conjuntos de URLs vistas (set, huellas, bloom).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--urls', type=int, default=200000, help='Número de URLs a insertar (por defecto 200000).')
+        parser.add_argument('--tasa-bloom', type=float, default=0.001, help='Tasa de falsos positivos del filtro Bloom.')
+
+    def handle(self, *args, **options):
+        n = options['urls']
+        self.stdout.write(f"{'modo':<10}{'bytes/URL':>12}{'µs/insert':>12}{'falsos +':>12}")
+
+        for modo in ('set', 'huellas', 'bloom'):
+            # Memoria (con tracemalloc) y tiempo (sin él, que ralentiza cada asignación) se miden por separado
+            tracemalloc.start()
+            vistas = self._llenar(modo, n, options['tasa_bloom'])
+            memoria, _ = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            del vistas
+
+            inicio = time.perf_counter()
+            vistas = self._llenar(modo, n, options['tasa_bloom'])
+            duracion = time.perf_counter() - inicio
+
+            # Falsos positivos: URLs nunca insertadas que el conjunto da por vistas
+            muestras = 20000
+            falsos = sum(f"https://otro.ejemplo.com/{i}" in vistas for i in range(muestras))
+
+            self.stdout.write(
+                f"{modo:<10}{memoria / n:>12.1f}{duracion / n * 1e6:>12.2f}{falsos / muestras:>12.4%}"
+            )
+            del vistas
+
+    def _llenar(self, modo, n, tasa_bloom):
+        vistas = crear_conjunto_vistas(modo, capacidad=n, tasa_falsos_positivos=tasa_bloom)
+        for i in range(n):
+            vistas.add(f"https://www.ejemplo.com/categoria/{i % 997}/producto-{i}?pagina={i % 13}")
+        return vistas
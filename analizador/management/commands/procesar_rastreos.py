@@ -0,0 +1,64 @@
+"""
+Worker que reclama y ejecuta los trabajos de rastreo en cola.
+"""
+
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+
+from analizador.models import ConcesionPerdida
+from analizador.recomendaciones import enriquecer_programadas
+from analizador.trabajos import reclamar_siguiente_trabajo, ejecutar_trabajo, devolver_a_la_cola
+
+
+class Command(BaseCommand):
+    help = 'Procesa los trabajos de rastreo en cola (ejecutar como proceso worker).'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Procesa los trabajos pendientes y termina en lugar de quedarse esperando nuevos.'
+        )
+        parser.add_argument(
+            '--intervalo',
+            type=float,
+            default=2.0,
+            help='Segundos de espera entre consultas cuando la cola está vacía (por defecto 2).'
+        )
+
+    def handle(self, *args, **options):
+        # SIGTERM (p. ej. al desplegar) se trata como Ctrl+C: el trabajo en curso vuelve a la cola
+        signal.signal(signal.SIGTERM, signal.default_int_handler)
+        while True:
+            trabajo = reclamar_siguiente_trabajo()
+            if trabajo is None:
+                # Sin rastreos en cola: recomendaciones de la IA por reintentar o pedidas desde un informe
+                try:
+                    if enriquecer_programadas():
+                        continue
+                except KeyboardInterrupt: # Lo ya generado está guardado; el resto sigue programado
+                    return
+                except Exception as e: # Se volverán a intentar en la siguiente vuelta
+                    self.stderr.write(f"No se pudieron generar las recomendaciones programadas: {e}")
+                if options['once']:
+                    return
+                try:
+                    time.sleep(options['intervalo'])
+                except KeyboardInterrupt:
+                    return
+                continue
+
+            self.stdout.write(f"Procesando trabajo #{trabajo.pk}: {trabajo.url}")
+            try:
+                trabajo = ejecutar_trabajo(trabajo)
+            except KeyboardInterrupt:
+                if devolver_a_la_cola(trabajo):
+                    self.stdout.write(f"Trabajo #{trabajo.pk} interrumpido: vuelve a la cola y se reanudará desde su último punto de control")
+                return
+            except ConcesionPerdida:
+                # El worker se quedó sin renovar la concesión y otro reclamó el trabajo: este no escribe nada más
+                self.stdout.write(f"Trabajo #{trabajo.pk} lo continúa otro worker")
+                continue
+            self.stdout.write(f"Trabajo #{trabajo.pk} {trabajo.get_estado_display().lower()} ({trabajo.paginas_procesadas} página(s))")
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.7 on 2026-10-17 22:13
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analizador', '0006_add_new_analisis_fields'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrabajoRastreo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('url', models.URLField(max_length=500, verbose_name='URL')),
+                ('crawl_scope', models.CharField(choices=[('single_url', 'Single URL'), ('multiple_pages', 'Multiple Pages')], default='single_url', max_length=20, verbose_name='Crawl Scope')),
+                ('num_pages', models.PositiveIntegerField(blank=True, null=True, verbose_name='Number of Pages Requested')),
+                ('tecnologia_sitio', models.CharField(blank=True, max_length=100, verbose_name='Website Technology')),
+                ('estado', models.CharField(choices=[('pendiente', 'En cola'), ('en_curso', 'En curso'), ('completado', 'Completado'), ('fallido', 'Fallido')], db_index=True, default='pendiente', max_length=20, verbose_name='Estado')),
+                ('paginas_procesadas', models.PositiveIntegerField(default=0, verbose_name='Páginas Procesadas')),
+                ('mensajes', models.JSONField(blank=True, default=list, verbose_name='Mensajes')),
+                ('error', models.TextField(blank=True, verbose_name='Error')),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de Creación')),
+                ('fecha_inicio', models.DateTimeField(blank=True, null=True, verbose_name='Fecha de Inicio')),
+                ('fecha_fin', models.DateTimeField(blank=True, null=True, verbose_name='Fecha de Fin')),
+                ('analisis_principal', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='trabajos', to='analizador.analisis')),
+            ],
+            options={
+                'verbose_name': 'Trabajo de Rastreo',
+                'verbose_name_plural': 'Trabajos de Rastreo',
+                'ordering': ['-fecha_creacion'],
+            },
+        ),
+    ]
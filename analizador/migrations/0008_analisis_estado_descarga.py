@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-17 22:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analizador', '0007_trabajorastreo'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='analisis',
+            name='estado_descarga',
+            field=models.CharField(choices=[('completa', 'Completa'), ('truncada', 'Truncada'), ('omitida', 'Omitida')], default='completa', max_length=20, verbose_name='Estado de la descarga'),
+        ),
+        migrations.AddField(
+            model_name='analisis',
+            name='motivo_descarga',
+            field=models.CharField(blank=True, max_length=255, verbose_name='Motivo de omisión o truncado'),
+        ),
+    ]
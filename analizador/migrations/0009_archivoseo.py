@@ -0,0 +1,32 @@
+# Generated by Django 4.2.7 on 2026-10-17 22:33
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analizador', '0008_analisis_estado_descarga'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivoSEO',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('robots.txt', 'robots.txt'), ('sitemap.xml', 'sitemap.xml')], max_length=20, verbose_name='Tipo')),
+                ('url', models.URLField(max_length=500, verbose_name='URL del Archivo')),
+                ('codigo_estado', models.IntegerField(blank=True, null=True, verbose_name='Código de Estado')),
+                ('contenido_comprimido', models.BinaryField(blank=True, default=b'', verbose_name='Contenido (zlib)')),
+                ('fecha_descarga', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Fecha de Descarga')),
+                ('analisis', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archivos_seo', to='analizador.analisis')),
+            ],
+            options={
+                'verbose_name': 'Archivo SEO',
+                'verbose_name_plural': 'Archivos SEO',
+                'ordering': ['tipo'],
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-17 22:35
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analizador', '0009_archivoseo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecomendacionIA',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('clave', models.CharField(max_length=64, unique=True, verbose_name='Clave')),
+                ('hallazgo_normalizado', models.TextField(verbose_name='Hallazgo Normalizado')),
+                ('tecnologia_sitio', models.CharField(blank=True, max_length=100, verbose_name='Website Technology')),
+                ('tipo_hallazgo', models.CharField(max_length=20, verbose_name='Tipo de Hallazgo')),
+                ('recomendacion', models.TextField(verbose_name='Recomendación')),
+                ('usos', models.PositiveIntegerField(default=0, verbose_name='Usos desde la Caché')),
+                ('fecha_creacion', models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='Fecha de Creación')),
+                ('fecha_ultimo_uso', models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='Último Uso')),
+            ],
+            options={
+                'verbose_name': 'Recomendación IA en caché',
+                'verbose_name_plural': 'Recomendaciones IA en caché',
+                'ordering': ['-fecha_ultimo_uso'],
+            },
+        ),
+    ]
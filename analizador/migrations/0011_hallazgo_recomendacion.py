@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-17 22:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analizador', '0010_recomendacionia'),
+    ]
+
+    operations = [
+        # Los hallazgos existentes ya son recomendaciones generadas durante el rastreo
+        migrations.AddField(
+            model_name='hallazgo',
+            name='estado_recomendacion',
+            field=models.CharField(choices=[('pendiente', 'Pendiente'), ('lista', 'Lista')], db_index=True, default='lista', max_length=20, verbose_name='Estado de la recomendación'),
+        ),
+        migrations.AlterField(
+            model_name='hallazgo',
+            name='estado_recomendacion',
+            field=models.CharField(choices=[('pendiente', 'Pendiente'), ('lista', 'Lista')], db_index=True, default='pendiente', max_length=20, verbose_name='Estado de la recomendación'),
+        ),
+        migrations.AddField(
+            model_name='hallazgo',
+            name='recomendacion',
+            field=models.TextField(blank=True, verbose_name='Recomendación IA'),
+        ),
+    ]
@@ -0,0 +1,94 @@
+# Generated by Django 4.2.7 on 2026-10-17 22:48
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+import hashlib
+
+
+def agrupar_hallazgos(apps, schema_editor):
+    """Agrupa los hallazgos existentes de cada rastreo en incidencias y les pasa su recomendación."""
+    Hallazgo = apps.get_model('analizador', 'Hallazgo')
+    Incidencia = apps.get_model('analizador', 'Incidencia')
+
+    incidencias = {}
+    lote = []
+    hallazgos = Hallazgo.objects.exclude(tipo='recomendacion').select_related('analisis').order_by('pk')
+    for hallazgo in hallazgos.iterator(chunk_size=2000):
+        principal_id = hallazgo.analisis.analisis_principal_id or hallazgo.analisis_id
+        huella = hashlib.sha256(f"{hallazgo.tipo}\x1f{' '.join(hallazgo.descripcion.split())}".encode('utf-8')).hexdigest()
+        incidencia = incidencias.get((principal_id, huella))
+        if incidencia is None:
+            incidencia = incidencias[(principal_id, huella)] = Incidencia.objects.create(
+                analisis_principal_id=principal_id,
+                huella=huella,
+                tipo=hallazgo.tipo,
+                descripcion=hallazgo.descripcion,
+                url_ejemplo=hallazgo.analisis.url[:500],
+                estado_recomendacion='lista'
+            )
+        incidencia.num_ocurrencias += 1
+        if hallazgo.recomendacion and not incidencia.recomendacion:
+            incidencia.recomendacion = hallazgo.recomendacion
+        if hallazgo.estado_recomendacion == 'pendiente' and not incidencia.recomendacion:
+            incidencia.estado_recomendacion = 'pendiente'
+        elif incidencia.recomendacion:
+            incidencia.estado_recomendacion = 'lista'
+        hallazgo.incidencia_id = incidencia.pk
+        lote.append(hallazgo)
+        if len(lote) >= 2000:
+            Hallazgo.objects.bulk_update(lote, ['incidencia'])
+            lote = []
+    Hallazgo.objects.bulk_update(lote, ['incidencia'])
+
+    Incidencia.objects.bulk_update(
+        incidencias.values(), ['num_ocurrencias', 'recomendacion', 'estado_recomendacion'], batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analizador', '0011_hallazgo_recomendacion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Incidencia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('huella', models.CharField(max_length=64, verbose_name='Huella')),
+                ('tipo', models.CharField(choices=[('error', 'Error'), ('warning', 'Advertencia'), ('info', 'Información'), ('recomendacion', 'Recomendación')], max_length=20, verbose_name='Tipo')),
+                ('descripcion', models.TextField(verbose_name='Descripción')),
+                ('url_ejemplo', models.URLField(blank=True, max_length=500, verbose_name='Primera URL donde aparece')),
+                ('num_ocurrencias', models.PositiveIntegerField(default=0, verbose_name='Ocurrencias')),
+                ('recomendacion', models.TextField(blank=True, verbose_name='Recomendación IA')),
+                ('estado_recomendacion', models.CharField(choices=[('pendiente', 'Pendiente'), ('lista', 'Lista')], db_index=True, default='pendiente', max_length=20, verbose_name='Estado de la recomendación')),
+                ('fecha', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Fecha de Creación')),
+                ('analisis_principal', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='incidencias', to='analizador.analisis')),
+            ],
+            options={
+                'verbose_name': 'Incidencia',
+                'verbose_name_plural': 'Incidencias',
+                'ordering': ['-num_ocurrencias', 'pk'],
+            },
+        ),
+        migrations.AddField(
+            model_name='hallazgo',
+            name='incidencia',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='ocurrencias', to='analizador.incidencia'),
+        ),
+        migrations.RunPython(agrupar_hallazgos, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='hallazgo',
+            name='estado_recomendacion',
+        ),
+        migrations.RemoveField(
+            model_name='hallazgo',
+            name='recomendacion',
+        ),
+        migrations.AddConstraint(
+            model_name='incidencia',
+            constraint=models.UniqueConstraint(fields=('analisis_principal', 'huella'), name='incidencia_unica_por_rastreo'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-17 22:51
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analizador', '0012_incidencia'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenRastreo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_paginas', models.PositiveIntegerField(default=0, verbose_name='Páginas')),
+                ('paginas_puntuadas', models.PositiveIntegerField(default=0, verbose_name='Páginas con puntuación')),
+                ('suma_puntuacion', models.PositiveIntegerField(default=0, verbose_name='Suma de puntuaciones')),
+                ('puntuacion_minima', models.IntegerField(blank=True, null=True, verbose_name='Puntuación mínima')),
+                ('puntuacion_maxima', models.IntegerField(blank=True, null=True, verbose_name='Puntuación máxima')),
+                ('hallazgos_por_tipo', models.JSONField(blank=True, default=dict, verbose_name='Hallazgos por tipo')),
+                ('codigos_estado', models.JSONField(blank=True, default=dict, verbose_name='Páginas por código de estado')),
+                ('fecha_actualizacion', models.DateTimeField(auto_now=True, verbose_name='Última Actualización')),
+                ('analisis_principal', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='resumen', to='analizador.analisis')),
+            ],
+            options={
+                'verbose_name': 'Resumen de rastreo',
+                'verbose_name_plural': 'Resúmenes de rastreo',
+            },
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 4.2.7 on 2026-10-17 22:52
+
+from django.db import migrations, models
+from urllib.parse import urlparse
+
+
+def rellenar_host(apps, schema_editor):
+    """Rellena el dominio normalizado de los análisis existentes, por lotes."""
+    Analisis = apps.get_model('analizador', 'Analisis')
+    lote = []
+    for analisis in Analisis.objects.filter(host='').only('pk', 'url').iterator(chunk_size=2000):
+        host = (urlparse(analisis.url).hostname or '').rstrip('.')
+        analisis.host = host[4:] if host.startswith('www.') else host
+        lote.append(analisis)
+        if len(lote) >= 2000:
+            Analisis.objects.bulk_update(lote, ['host'])
+            lote = []
+    Analisis.objects.bulk_update(lote, ['host'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analizador', '0013_resumenrastreo'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='analisis',
+            name='host',
+            field=models.CharField(blank=True, max_length=255, verbose_name='Dominio'),
+        ),
+        migrations.RunPython(rellenar_host, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='analisis',
+            index=models.Index(fields=['analisis_principal', 'fecha_analisis'], name='analisis_principal_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='analisis',
+            index=models.Index(fields=['host', 'fecha_analisis'], name='analisis_host_fecha_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-17 22:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analizador', '0014_analisis_host'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='enlace',
+            index=models.Index(fields=['analisis', 'tipo'], name='enlace_analisis_tipo_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='hallazgo',
+            index=models.Index(fields=['analisis', 'tipo'], name='hallazgo_analisis_tipo_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-17 23:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analizador', '0015_indices_listados'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='analisis',
+            name='etag',
+            field=models.CharField(blank=True, max_length=255, verbose_name='ETag'),
+        ),
+        migrations.AddField(
+            model_name='analisis',
+            name='huella_contenido',
+            field=models.CharField(blank=True, max_length=64, verbose_name='Huella del contenido (sha256)'),
+        ),
+        migrations.AddField(
+            model_name='analisis',
+            name='sin_cambios',
+            field=models.BooleanField(default=False, verbose_name='Sin cambios desde el análisis anterior'),
+        ),
+        migrations.AddField(
+            model_name='analisis',
+            name='ultima_modificacion',
+            field=models.CharField(blank=True, max_length=64, verbose_name='Last-Modified'),
+        ),
+    ]
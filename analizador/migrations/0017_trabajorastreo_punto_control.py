@@ -0,0 +1,25 @@
+# Generated by Django 4.2.7 on 2026-10-17 23:40
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analizador', '0016_analisis_validadores'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trabajorastreo',
+            name='fecha_actualizacion',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now, verbose_name='Última Actualización'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='trabajorastreo',
+            name='punto_control_comprimido',
+            field=models.BinaryField(blank=True, default=b'', verbose_name='Punto de control (zlib)'),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 4.2.7 on 2026-10-18 00:10
+
+from django.db import migrations, models
+from django.db.models import Q
+
+
+# Comienzo de los mensajes que se guardaban como recomendación cuando la IA fallaba
+MENSAJES_DE_FALLO = (
+    'Error: AI recommendations are currently unavailable',
+    "AI recommendation for '",
+    "AI recommendation generation for '",
+    "AI recommendation could not be generated for '",
+    'AI received an empty or non-textual response for:',
+    'AI analysis complete, but no specific textual recommendation was generated for:',
+)
+
+
+def reabrir_fallos(apps, schema_editor):
+    """Vuelve a dejar pendientes las incidencias 'lista' cuya recomendación era un mensaje de fallo de la IA."""
+    Incidencia = apps.get_model('analizador', 'Incidencia')
+    fallos = Q()
+    for mensaje in MENSAJES_DE_FALLO:
+        fallos |= Q(recomendacion__startswith=mensaje)
+    Incidencia.objects.filter(fallos, estado_recomendacion='lista').update(recomendacion='', estado_recomendacion='pendiente')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analizador', '0017_trabajorastreo_punto_control'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='incidencia',
+            name='intentos_recomendacion',
+            field=models.PositiveSmallIntegerField(default=0, verbose_name='Intentos fallidos de la IA'),
+        ),
+        migrations.AddField(
+            model_name='incidencia',
+            name='proximo_intento',
+            field=models.DateTimeField(blank=True, db_index=True, null=True, verbose_name='Próximo intento'),
+        ),
+        migrations.AlterField(
+            model_name='incidencia',
+            name='estado_recomendacion',
+            field=models.CharField(choices=[('pendiente', 'Pendiente'), ('lista', 'Lista'), ('error', 'No disponible')], db_index=True, default='pendiente', max_length=20, verbose_name='Estado de la recomendación'),
+        ),
+        migrations.RunPython(reabrir_fallos, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 4.2.7 on 2026-10-18 00:20
+
+from django.db import migrations
+
+
+# Aviso que se guardaba como recomendación con IA_RECOMMENDATION_SOURCE='local'
+AVISO_SIN_IA = 'AI recommendations are disabled (offline mode)'
+
+
+def reabrir_avisos_sin_ia(apps, schema_editor):
+    """Vuelve a dejar pendientes las incidencias 'lista' cuya recomendación era el aviso del modo sin IA."""
+    Incidencia = apps.get_model('analizador', 'Incidencia')
+    Incidencia.objects.filter(recomendacion__startswith=AVISO_SIN_IA, estado_recomendacion='lista').update(
+        recomendacion='', estado_recomendacion='pendiente'
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analizador', '0018_incidencia_reintentos'),
+    ]
+
+    operations = [
+        migrations.RunPython(reabrir_avisos_sin_ia, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-18 00:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analizador', '0019_reabrir_recomendaciones_sin_ia'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trabajorastreo',
+            name='concesion',
+            field=models.CharField(blank=True, max_length=32, verbose_name='Concesión del worker'),
+        ),
+        migrations.AddField(
+            model_name='trabajorastreo',
+            name='concesion_hasta',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Concesión válida hasta'),
+        ),
+    ]
@@ -2,15 +2,31 @@
 Modelos para la aplicación Analizador SEO con IA.
 """
 
-from django.db import models
+import copy
+import hashlib
+import json
+import zlib
+from datetime import timedelta
+from urllib.parse import urlparse
+
+from django.conf import settings
+from django.db import IntegrityError, models, transaction
 from django.utils import timezone
 
 
+def normalizar_host(url):
+    """Dominio de una URL en minúsculas, sin puerto ni 'www.' (https://WWW.Ejemplo.com:443/a -> ejemplo.com)."""
+    host = (urlparse(url).hostname or '').rstrip('.')
+    return host[4:] if host.startswith('www.') else host
+
+
 class Analisis(models.Model):
     """
     Modelo para almacenar los resultados del análisis SEO.
     """
     url = models.URLField(max_length=500, verbose_name='URL')
+    # Dominio normalizado de la URL (ver normalizar_host), para buscar análisis del mismo sitio por índice
+    host = models.CharField(max_length=255, blank=True, verbose_name='Dominio')
     fecha_analisis = models.DateTimeField(auto_now_add=True, verbose_name='Fecha de Análisis')
     puntuacion = models.IntegerField(verbose_name='Puntuación SEO', default=0)
     codigo_estado = models.IntegerField(verbose_name='Código de Estado')
@@ -44,19 +60,55 @@ class Analisis(models.Model):
         on_delete=models.CASCADE,
         related_name='urls_analizadas'
     )
+
+    # Descarga limitada por tipo de contenido y tamaño (CRAWL_ALLOWED_CONTENT_TYPES, CRAWL_MAX_PAGE_BYTES)
+    ESTADOS_DESCARGA = [
+        ('completa', 'Completa'),
+        ('truncada', 'Truncada'),
+        ('omitida', 'Omitida'),
+    ]
+    estado_descarga = models.CharField(
+        max_length=20,
+        choices=ESTADOS_DESCARGA,
+        default='completa',
+        verbose_name='Estado de la descarga'
+    )
+    motivo_descarga = models.CharField(
+        max_length=255,
+        blank=True,
+        verbose_name='Motivo de omisión o truncado'
+    )
+
+    # Validadores de la descarga, para pedir la página de forma condicional en el siguiente rastreo del sitio
+    etag = models.CharField(max_length=255, blank=True, verbose_name='ETag')
+    ultima_modificacion = models.CharField(max_length=64, blank=True, verbose_name='Last-Modified')
+    huella_contenido = models.CharField(max_length=64, blank=True, verbose_name='Huella del contenido (sha256)')
+    # La página respondió 304 o con el mismo contenido: su análisis se copió del rastreo anterior
+    sin_cambios = models.BooleanField(default=False, verbose_name='Sin cambios desde el análisis anterior')
     
     class Meta:
         verbose_name = 'Análisis SEO'
         verbose_name_plural = 'Análisis SEO'
         ordering = ['-fecha_analisis']
+        indexes = [
+            models.Index(fields=['analisis_principal', 'fecha_analisis'], name='analisis_principal_fecha_idx'),
+            models.Index(fields=['host', 'fecha_analisis'], name='analisis_host_fecha_idx'),
+        ]
     
     def __str__(self):
         return f"Análisis de {self.url} - {self.fecha_analisis}"
 
+    def save(self, *args, **kwargs):
+        if not self.host:
+            self.host = normalizar_host(self.url)
+        super().save(*args, **kwargs)
+
 
 class Hallazgo(models.Model):
     """
     Modelo para almacenar los hallazgos del análisis SEO.
+    Cada hallazgo es una ocurrencia en una página de una Incidencia del
+    rastreo, que es donde se guarda la recomendación de la IA.
     """
     TIPOS = [
         ('error', 'Error'),
@@ -66,6 +118,13 @@ class Hallazgo(models.Model):
     ]
     
     analisis = models.ForeignKey(Analisis, on_delete=models.CASCADE, related_name='hallazgos')
+    incidencia = models.ForeignKey(
+        'Incidencia',
+        null=True,
+        blank=True,
+        on_delete=models.CASCADE,
+        related_name='ocurrencias'
+    )
     tipo = models.CharField(max_length=20, choices=TIPOS, verbose_name='Tipo')
     descripcion = models.TextField(verbose_name='Descripción')
     fecha = models.DateTimeField(default=timezone.now, verbose_name='Fecha de Creación')
@@ -74,10 +133,98 @@ class Hallazgo(models.Model):
         verbose_name = 'Hallazgo'
         verbose_name_plural = 'Hallazgos'
         ordering = ['-fecha']
+        # Listados paginados por tipo de un análisis (ver views.hallazgos_json)
+        indexes = [models.Index(fields=['analisis', 'tipo'], name='hallazgo_analisis_tipo_idx')]
     
     def __str__(self):
         return f"{self.get_tipo_display()}: {self.descripcion[:50]}..."
 
+    @property
+    def recomendacion(self):
+        """Recomendación de la IA de su incidencia ('' en hallazgos sin incidencia)."""
+        return self.incidencia.recomendacion if self.incidencia_id else ''
+
+    @property
+    def estado_recomendacion(self):
+        return self.incidencia.estado_recomendacion if self.incidencia_id else 'lista'
+
+
+class Incidencia(models.Model):
+    """
+    Problema del sitio agrupado por su huella (tipo y descripción): un fallo
+    de la plantilla común, como el logo sin texto alternativo, es una sola
+    incidencia con una ocurrencia (Hallazgo) por página. La recomendación de
+    la IA se genera y se guarda una vez por incidencia (ver recomendaciones.py).
+
+    Si la IA no la genera (sin clave de API, servicio en pausa, error), la
+    incidencia sigue 'pendiente' y el worker la reintenta en `proximo_intento`;
+    tras IA_RECOMMENDATION_MAX_ATTEMPTS intentos pasa a 'error'. Solo las
+    'lista' tienen una recomendación de verdad.
+    """
+    # La recomendación de la IA se genera después del rastreo
+    ESTADOS_RECOMENDACION = [
+        ('pendiente', 'Pendiente'),
+        ('lista', 'Lista'),
+        ('error', 'No disponible'),
+    ]
+
+    analisis_principal = models.ForeignKey(
+        Analisis,
+        null=True,
+        blank=True,
+        on_delete=models.CASCADE,
+        related_name='incidencias'
+    )
+    huella = models.CharField(max_length=64, verbose_name='Huella')
+    tipo = models.CharField(max_length=20, choices=Hallazgo.TIPOS, verbose_name='Tipo')
+    descripcion = models.TextField(verbose_name='Descripción')
+    url_ejemplo = models.URLField(max_length=500, blank=True, verbose_name='Primera URL donde aparece')
+    num_ocurrencias = models.PositiveIntegerField(default=0, verbose_name='Ocurrencias')
+    recomendacion = models.TextField(blank=True, verbose_name='Recomendación IA')
+    estado_recomendacion = models.CharField(
+        max_length=20,
+        choices=ESTADOS_RECOMENDACION,
+        default='pendiente',
+        db_index=True,
+        verbose_name='Estado de la recomendación'
+    )
+    intentos_recomendacion = models.PositiveSmallIntegerField(default=0, verbose_name='Intentos fallidos de la IA')
+    # Cuándo debe generarla el worker: reintentos y recomendaciones pedidas desde un informe
+    proximo_intento = models.DateTimeField(null=True, blank=True, db_index=True, verbose_name='Próximo intento')
+    fecha = models.DateTimeField(default=timezone.now, verbose_name='Fecha de Creación')
+
+    class Meta:
+        verbose_name = 'Incidencia'
+        verbose_name_plural = 'Incidencias'
+        ordering = ['-num_ocurrencias', 'pk']
+        constraints = [
+            models.UniqueConstraint(fields=['analisis_principal', 'huella'], name='incidencia_unica_por_rastreo'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_tipo_display()} ({self.num_ocurrencias}): {self.descripcion[:50]}"
+
+    def registrar_fallo_recomendacion(self, ahora=None):
+        """
+        Anota que la IA no generó la recomendación: se reintentará con una
+        espera exponencial desde IA_RECOMMENDATION_RETRY_SECONDS o, agotados
+        los intentos, queda como 'error'. No guarda la incidencia.
+        """
+        self.recomendacion = ''
+        self.intentos_recomendacion += 1
+        if self.intentos_recomendacion >= getattr(settings, 'IA_RECOMMENDATION_MAX_ATTEMPTS', 3):
+            self.estado_recomendacion = 'error'
+            self.proximo_intento = None
+        else:
+            self.estado_recomendacion = 'pendiente'
+            espera = getattr(settings, 'IA_RECOMMENDATION_RETRY_SECONDS', 300) * 2 ** (self.intentos_recomendacion - 1)
+            self.proximo_intento = (ahora or timezone.now()) + timedelta(seconds=espera)
+
+    @staticmethod
+    def calcular_huella(tipo, descripcion):
+        """Huella (sha256) del tipo y la descripción con los espacios normalizados."""
+        return hashlib.sha256(f"{tipo}\x1f{' '.join(descripcion.split())}".encode('utf-8')).hexdigest()
+
 
 class Imagen(models.Model):
     """
@@ -114,6 +261,267 @@ class Enlace(models.Model):
         verbose_name = 'Enlace'
         verbose_name_plural = 'Enlaces'
         ordering = ['url']
+        # Listados paginados por tipo de un análisis (ver views.enlaces_json)
+        indexes = [models.Index(fields=['analisis', 'tipo'], name='enlace_analisis_tipo_idx')]
     
     def __str__(self):
-        return f"{self.tipo}: {self.url}" 
\ No newline at end of file
+        return f"{self.tipo}: {self.url}" 
+
+class ArchivoSEO(models.Model):
+    """
+    Copia de robots.txt o sitemap.xml descargada durante el rastreo.
+    El contenido se guarda comprimido con zlib para que los informes lo
+    muestren sin volver a pedirlo al sitio.
+    """
+    TIPOS = [
+        ('robots.txt', 'robots.txt'),
+        ('sitemap.xml', 'sitemap.xml'),
+    ]
+
+    analisis = models.ForeignKey(Analisis, on_delete=models.CASCADE, related_name='archivos_seo')
+    tipo = models.CharField(max_length=20, choices=TIPOS, verbose_name='Tipo')
+    url = models.URLField(max_length=500, verbose_name='URL del Archivo')
+    codigo_estado = models.IntegerField(null=True, blank=True, verbose_name='Código de Estado')
+    contenido_comprimido = models.BinaryField(blank=True, default=b'', verbose_name='Contenido (zlib)')
+    fecha_descarga = models.DateTimeField(default=timezone.now, verbose_name='Fecha de Descarga')
+
+    class Meta:
+        verbose_name = 'Archivo SEO'
+        verbose_name_plural = 'Archivos SEO'
+        ordering = ['tipo']
+
+    def __str__(self):
+        return f"{self.tipo}: {self.url}"
+
+    @property
+    def contenido(self):
+        if not self.contenido_comprimido:
+            return ''
+        return zlib.decompress(bytes(self.contenido_comprimido)).decode('utf-8')
+
+    @contenido.setter
+    def contenido(self, texto):
+        self.contenido_comprimido = zlib.compress(texto.encode('utf-8')) if texto else b''
+
+
+class ResumenRastreo(models.Model):
+    """
+    Agregados de un rastreo (páginas, puntuación, hallazgos por tipo y
+    códigos de estado) para que el resumen no recorra todas sus páginas.
+    EscritorAnalisis los actualiza en la misma transacción en que escribe
+    cada lote de páginas; los análisis anteriores se calculan con
+    `calcular` la primera vez que se consultan.
+    """
+    CONTADORES = (
+        'total_paginas', 'paginas_puntuadas', 'suma_puntuacion', 'puntuacion_minima', 'puntuacion_maxima',
+        'hallazgos_por_tipo', 'codigos_estado',
+    )
+
+    analisis_principal = models.OneToOneField(Analisis, on_delete=models.CASCADE, related_name='resumen')
+    total_paginas = models.PositiveIntegerField(default=0, verbose_name='Páginas')
+    # Las páginas omitidas (contenido no HTML) no tienen puntuación
+    paginas_puntuadas = models.PositiveIntegerField(default=0, verbose_name='Páginas con puntuación')
+    suma_puntuacion = models.PositiveIntegerField(default=0, verbose_name='Suma de puntuaciones')
+    puntuacion_minima = models.IntegerField(null=True, blank=True, verbose_name='Puntuación mínima')
+    puntuacion_maxima = models.IntegerField(null=True, blank=True, verbose_name='Puntuación máxima')
+    hallazgos_por_tipo = models.JSONField(default=dict, blank=True, verbose_name='Hallazgos por tipo')
+    codigos_estado = models.JSONField(default=dict, blank=True, verbose_name='Páginas por código de estado')
+    fecha_actualizacion = models.DateTimeField(auto_now=True, verbose_name='Última Actualización')
+
+    class Meta:
+        verbose_name = 'Resumen de rastreo'
+        verbose_name_plural = 'Resúmenes de rastreo'
+
+    def __str__(self):
+        return f"Resumen de {self.analisis_principal.url}: {self.total_paginas} página(s)"
+
+    @property
+    def puntuacion_promedio(self):
+        return self.suma_puntuacion / self.paginas_puntuadas if self.paginas_puntuadas else 0
+
+    @property
+    def total_hallazgos(self):
+        return sum(self.hallazgos_por_tipo.values())
+
+    def acumular(self, paginas, hallazgos=()):
+        """Suma a los agregados un grupo de análisis y sus hallazgos."""
+        for pagina in paginas:
+            self.total_paginas += 1
+            codigo = str(pagina.codigo_estado)
+            self.codigos_estado[codigo] = self.codigos_estado.get(codigo, 0) + 1
+            if pagina.estado_descarga != 'omitida':
+                self.paginas_puntuadas += 1
+                self.suma_puntuacion += pagina.puntuacion
+                if self.puntuacion_minima is None or pagina.puntuacion < self.puntuacion_minima:
+                    self.puntuacion_minima = pagina.puntuacion
+                if self.puntuacion_maxima is None or pagina.puntuacion > self.puntuacion_maxima:
+                    self.puntuacion_maxima = pagina.puntuacion
+        for hallazgo in hallazgos:
+            self.hallazgos_por_tipo[hallazgo.tipo] = self.hallazgos_por_tipo.get(hallazgo.tipo, 0) + 1
+
+    def contadores(self):
+        """Copia de los agregados, para restaurarlos si no se llega a guardar un lote."""
+        return {campo: copy.copy(getattr(self, campo)) for campo in self.CONTADORES}
+
+    @classmethod
+    def calcular(cls, analisis_principal):
+        """Calcula (sin guardarlo) el resumen de un rastreo ya guardado con consultas de agregación."""
+        paginas = Analisis.objects.filter(models.Q(pk=analisis_principal.pk) | models.Q(analisis_principal=analisis_principal))
+        puntuadas = ~models.Q(estado_descarga='omitida')
+        agregados = paginas.aggregate(
+            total_paginas=models.Count('pk'),
+            paginas_puntuadas=models.Count('pk', filter=puntuadas),
+            suma_puntuacion=models.Sum('puntuacion', filter=puntuadas),
+            puntuacion_minima=models.Min('puntuacion', filter=puntuadas),
+            puntuacion_maxima=models.Max('puntuacion', filter=puntuadas),
+        )
+        agregados['suma_puntuacion'] = agregados['suma_puntuacion'] or 0
+        return cls(
+            analisis_principal=analisis_principal,
+            codigos_estado={
+                str(fila['codigo_estado']): fila['n']
+                for fila in paginas.order_by().values('codigo_estado').annotate(n=models.Count('pk'))
+            },
+            hallazgos_por_tipo={
+                fila['tipo']: fila['n']
+                for fila in Hallazgo.objects.filter(analisis__in=paginas).order_by().values('tipo').annotate(n=models.Count('pk'))
+            },
+            **agregados
+        )
+
+    @classmethod
+    def de_analisis(cls, analisis_principal):
+        """Retorna el resumen del rastreo; si aún no existe (análisis antiguos) lo calcula y lo guarda."""
+        try:
+            return cls.objects.get(analisis_principal=analisis_principal)
+        except cls.DoesNotExist:
+            resumen = cls.calcular(analisis_principal)
+            try:
+                with transaction.atomic():
+                    resumen.save()
+            except IntegrityError:
+                return cls.objects.get(analisis_principal=analisis_principal)  # Otra petición lo guardó a la vez
+            return resumen
+
+
+class RecomendacionIA(models.Model):
+    """
+    Recomendación de la IA guardada en caché para un hallazgo normalizado,
+    una tecnología y un tipo de hallazgo (ver `cache_ia.CacheRecomendaciones`).
+    """
+    clave = models.CharField(max_length=64, unique=True, verbose_name='Clave')
+    hallazgo_normalizado = models.TextField(verbose_name='Hallazgo Normalizado')
+    tecnologia_sitio = models.CharField(max_length=100, blank=True, verbose_name='Website Technology')
+    tipo_hallazgo = models.CharField(max_length=20, verbose_name='Tipo de Hallazgo')
+    recomendacion = models.TextField(verbose_name='Recomendación')
+    usos = models.PositiveIntegerField(default=0, verbose_name='Usos desde la Caché')
+    fecha_creacion = models.DateTimeField(default=timezone.now, db_index=True, verbose_name='Fecha de Creación')
+    fecha_ultimo_uso = models.DateTimeField(default=timezone.now, db_index=True, verbose_name='Último Uso')
+
+    class Meta:
+        verbose_name = 'Recomendación IA en caché'
+        verbose_name_plural = 'Recomendaciones IA en caché'
+        ordering = ['-fecha_ultimo_uso']
+
+    def __str__(self):
+        return f"{self.tipo_hallazgo} ({self.tecnologia_sitio or 'generic'}): {self.hallazgo_normalizado[:50]}"
+
+
+class ConcesionPerdida(Exception):
+    """La concesión de un trabajo caducó y otro worker lo reclamó: este no debe escribir nada más en su nombre."""
+
+
+class TrabajoRastreo(models.Model):
+    """
+    Modelo para la cola de rastreos que ejecuta el worker en segundo plano.
+
+    Durante un rastreo de varias páginas se guarda cada cierto número de
+    páginas un punto de control (frontera, URLs vistas y contadores, en JSON
+    comprimido con zlib) para reanudarlo si el worker se detiene.
+
+    El worker que reclama un trabajo obtiene una concesión (`concesion`, un
+    token propio) válida hasta `concesion_hasta`. La renueva periódicamente,
+    llegue o no alguna página, y antes de cada escritura comprueba que sigue
+    siendo suya (ver renovar_concesion). Solo un trabajo 'en_curso' cuya
+    concesión caducó se da por abandonado (ver reclamar_siguiente_trabajo).
+    """
+    ESTADOS = [
+        ('pendiente', 'En cola'),
+        ('en_curso', 'En curso'),
+        ('completado', 'Completado'),
+        ('fallido', 'Fallido'),
+    ]
+
+    url = models.URLField(max_length=500, verbose_name='URL')
+    crawl_scope = models.CharField(
+        max_length=20,
+        choices=[('single_url', 'Single URL'), ('multiple_pages', 'Multiple Pages')],
+        default='single_url',
+        verbose_name='Crawl Scope'
+    )
+    num_pages = models.PositiveIntegerField(null=True, blank=True, verbose_name='Number of Pages Requested')
+    tecnologia_sitio = models.CharField(max_length=100, blank=True, verbose_name='Website Technology')
+
+    estado = models.CharField(max_length=20, choices=ESTADOS, default='pendiente', db_index=True, verbose_name='Estado')
+    paginas_procesadas = models.PositiveIntegerField(default=0, verbose_name='Páginas Procesadas')
+    mensajes = models.JSONField(default=list, blank=True, verbose_name='Mensajes')
+    error = models.TextField(blank=True, verbose_name='Error')
+    analisis_principal = models.ForeignKey(
+        Analisis,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name='trabajos'
+    )
+
+    fecha_creacion = models.DateTimeField(auto_now_add=True, verbose_name='Fecha de Creación')
+    fecha_inicio = models.DateTimeField(null=True, blank=True, verbose_name='Fecha de Inicio')
+    fecha_fin = models.DateTimeField(null=True, blank=True, verbose_name='Fecha de Fin')
+    fecha_actualizacion = models.DateTimeField(auto_now=True, verbose_name='Última Actualización')
+    punto_control_comprimido = models.BinaryField(blank=True, default=b'', verbose_name='Punto de control (zlib)')
+    concesion = models.CharField(max_length=32, blank=True, verbose_name='Concesión del worker')
+    concesion_hasta = models.DateTimeField(null=True, blank=True, verbose_name='Concesión válida hasta')
+
+    class Meta:
+        verbose_name = 'Trabajo de Rastreo'
+        verbose_name_plural = 'Trabajos de Rastreo'
+        ordering = ['-fecha_creacion']
+
+    def __str__(self):
+        return f"Rastreo de {self.url} ({self.get_estado_display()})"
+
+    @property
+    def terminado(self):
+        return self.estado in ('completado', 'fallido')
+
+    def registrar_mensaje(self, nivel, texto):
+        """Agrega un mensaje (nivel de django.contrib.messages) al historial del trabajo."""
+        self.mensajes.append({'nivel': nivel, 'texto': texto})
+
+    def renovar_concesion(self):
+        """
+        Prolonga CRAWL_STALE_JOB_SECONDS la concesión del worker sobre el
+        trabajo. Lanza ConcesionPerdida si ya no es suya (caducó y otro
+        worker reclamó el trabajo); dentro de una transacción, la fila queda
+        bloqueada hasta el commit y nadie la puede reclamar mientras tanto.
+        Los trabajos sin concesión (ejecutados sin reclamarlos) no se comprueban.
+        """
+        if not self.concesion:
+            return
+        hasta = timezone.now() + timedelta(seconds=getattr(settings, 'CRAWL_STALE_JOB_SECONDS', 600))
+        renovada = TrabajoRastreo.objects.filter(pk=self.pk, estado='en_curso', concesion=self.concesion).update(
+            concesion_hasta=hasta
+        )
+        if not renovada:
+            raise ConcesionPerdida(f"El trabajo #{self.pk} ya no pertenece a este worker.")
+        self.concesion_hasta = hasta
+
+    @property
+    def punto_control(self):
+        if not self.punto_control_comprimido:
+            return None
+        return json.loads(zlib.decompress(bytes(self.punto_control_comprimido)).decode('utf-8'))
+
+    @punto_control.setter
+    def punto_control(self, datos):
+        self.punto_control_comprimido = zlib.compress(json.dumps(datos).encode('utf-8')) if datos else b''
@@ -0,0 +1,129 @@
+"""
+Escritura por lotes de los resultados de un rastreo del Analizador SEO con IA.
+"""
+
+import time
+from itertools import chain
+
+from django.conf import settings
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import connection, transaction
+
+from .models import Analisis, Hallazgo, Incidencia, Imagen, Enlace, ArchivoSEO, normalizar_host
+
+
+class EscritorAnalisis:
+    """
+    Acumula los análisis de un rastreo con sus hallazgos, imágenes, enlaces y
+    archivos SEO y los escribe por lotes, con un `bulk_create` por modelo dentro de una
+    única transacción.
+
+    Una página con 300 enlaces y 80 imágenes pasa de ~400 INSERT con su
+    propio commit a cuatro INSERT por lote. El lote se escribe al reunir
+    `paginas_por_lote` páginas (CRAWL_DB_BATCH_PAGES) o cuando han pasado
+    `segundos_por_lote` segundos (CRAWL_DB_BATCH_SECONDS) desde la última
+    escritura, para que la página de estado del trabajo no se quede atrás.
+
+    Si se indica `trabajo`, su progreso (páginas procesadas y mensajes) se
+    guarda en la misma transacción que cada lote, que antes renueva la
+    concesión del worker sobre el trabajo (ver TrabajoRastreo.renovar_concesion). Lo mismo con `resumen`
+    (un ResumenRastreo), al que se suman las páginas y hallazgos de cada lote;
+    se guarda en cuanto tiene `analisis_principal`.
+
+    Las filas hijas se construyen sin guardar apuntando al Analisis (también
+    sin guardar); `bulk_create` les asigna la clave en cuanto el Analisis la tiene.
+    Las incidencias nuevas del lote se escriben antes que los hallazgos que
+    las referencian; las de lotes anteriores ya tienen clave.
+    """
+
+    def __init__(self, trabajo=None, paginas_por_lote=None, segundos_por_lote=None, resumen=None):
+        self.trabajo = trabajo
+        self.resumen = resumen
+        self.paginas_por_lote = paginas_por_lote or getattr(settings, 'CRAWL_DB_BATCH_PAGES', 50)
+        if segundos_por_lote is None:
+            segundos_por_lote = getattr(settings, 'CRAWL_DB_BATCH_SECONDS', 2)
+        self.segundos_por_lote = segundos_por_lote
+        self._analisis = []
+        self._hallazgos = []
+        self._incidencias = []
+        self._imagenes = []
+        self._enlaces = []
+        self._archivos = []
+        self._ultima_escritura = time.monotonic()
+
+    def __len__(self):
+        """Número de páginas pendientes de escribir."""
+        return len(self._analisis)
+
+    def agregar(self, analisis, hallazgos=(), imagenes=(), enlaces=(), archivos=(), incidencias=()):
+        """Encola un Analisis sin guardar y sus filas; escribe el lote si ya está lleno."""
+        self._analisis.append(analisis)
+        self._hallazgos.append(hallazgos)
+        self._incidencias.extend(incidencias)
+        self._imagenes.append(imagenes)
+        self._enlaces.append(enlaces)
+        self._archivos.append(archivos)
+        self.escribir_si_toca()
+
+    def escribir_si_toca(self):
+        """Escribe el lote si está lleno o si ha pasado demasiado tiempo desde la última escritura."""
+        if (len(self._analisis) >= self.paginas_por_lote
+                or time.monotonic() - self._ultima_escritura >= self.segundos_por_lote):
+            self.escribir()
+
+    def escribir(self):
+        """
+        Escribe en una transacción todo lo pendiente y el progreso del trabajo.
+        Si la escritura falla el lote se descarta, para no arrastrar el error a los siguientes:
+        sus análisis e incidencias vuelven a quedar sin clave.
+        """
+        contadores = self.resumen.contadores() if self.resumen is not None else None
+        try:
+            with transaction.atomic():
+                if self.trabajo is not None:
+                    self.trabajo.renovar_concesion()  # Si otro worker reclamó el trabajo, no se escribe nada
+                if self._analisis:
+                    for analisis in self._analisis:
+                        analisis.host = analisis.host or normalizar_host(analisis.url)  # bulk_create no llama a save()
+                    if connection.features.can_return_rows_from_bulk_insert:
+                        Analisis.objects.bulk_create(self._analisis)
+                    else:
+                        # Sin RETURNING (p. ej. MySQL) bulk_create no rellena las claves que necesitan las filas hijas
+                        for analisis in self._analisis:
+                            analisis.save()
+                    Incidencia.objects.bulk_create(self._incidencias)
+                    hallazgos = list(chain.from_iterable(self._hallazgos))
+                    for hallazgo in hallazgos:
+                        if hallazgo.incidencia_id is None and hallazgo.incidencia is not None and hallazgo.incidencia.pk is None:
+                            hallazgo.incidencia = None  # Su incidencia se perdió en un lote fallido
+                    Hallazgo.objects.bulk_create(hallazgos)
+                    Imagen.objects.bulk_create(chain.from_iterable(self._imagenes))
+                    Enlace.objects.bulk_create(chain.from_iterable(self._enlaces))
+                    ArchivoSEO.objects.bulk_create(chain.from_iterable(self._archivos))
+                    if self.resumen is not None:
+                        self.resumen.acumular(self._analisis, hallazgos)
+                        if self._resumen_tiene_principal():
+                            self.resumen.save()
+                if self.trabajo is not None:
+                    self.trabajo.save(update_fields=['paginas_procesadas', 'mensajes', 'fecha_actualizacion'])
+        except Exception:
+            for analisis in self._analisis:
+                # bulk_create ya les había dado la clave de una fila que el rollback deshizo
+                analisis.pk = None
+                analisis._state.adding = True
+            for incidencia in self._incidencias:
+                incidencia.pk = None  # No se guardó: sus siguientes ocurrencias se escriben sin ella
+            if contadores is not None:
+                for campo, valor in contadores.items():
+                    setattr(self.resumen, campo, valor)
+            raise
+        finally:
+            self._analisis, self._hallazgos, self._imagenes, self._enlaces, self._archivos = [], [], [], [], []
+            self._incidencias = []
+            self._ultima_escritura = time.monotonic()
+
+    def _resumen_tiene_principal(self):
+        try:
+            return self.resumen.analisis_principal is not None
+        except ObjectDoesNotExist:  # Aún no se conoce el análisis principal del rastreo
+            return False
@@ -0,0 +1,180 @@
+"""
+Planificador de descargas por host (cortesía adaptativa) del Analizador SEO con IA.
+"""
+
+import time
+from datetime import datetime, timezone as dt_timezone
+from email.utils import parsedate_to_datetime
+
+from django.conf import settings
+
+
+# Peso de la última observación en las medias móviles de latencia y de errores
+_PESO_MEDIA = 0.2
+
+
+def segundos_retry_after(valor, ahora=None):
+    """
+    Segundos que pide esperar una cabecera Retry-After (en segundos o como
+    fecha HTTP), acotados entre 0 y CRAWL_BACKOFF_MAX_SECONDS; None si falta o no es válida.
+    """
+    valor = (valor or '').strip()
+    if not valor:
+        return None
+    if valor.isdigit():
+        segundos = int(valor)
+    else:
+        try:
+            fecha = parsedate_to_datetime(valor)
+        except (TypeError, ValueError):
+            return None
+        if fecha.tzinfo is None:
+            fecha = fecha.replace(tzinfo=dt_timezone.utc)
+        segundos = (fecha - (ahora or datetime.now(dt_timezone.utc))).total_seconds()
+    return min(max(0, segundos), getattr(settings, 'CRAWL_BACKOFF_MAX_SECONDS', 120))
+
+
+class EstadoHost:
+    """Lo que el planificador sabe de un host: su límite actual de concurrencia y cómo está respondiendo."""
+
+    def __init__(self, limite):
+        self.limite = limite  # Descargas simultáneas permitidas ahora
+        self.en_vuelo = 0
+        self.retraso = 0  # Segundos entre el inicio de dos descargas (Crawl-delay)
+        self.proxima = 0.0  # Instante (reloj del planificador) desde el que puede empezar otra descarga
+        self.latencia = None  # Media móvil de la latencia en segundos
+        self.latencia_minima = None
+        self.tasa_errores = 0.0  # Media móvil de fallos (1) y respuestas (0)
+        self.respuestas_ventana = 0  # Respuestas desde el último ajuste del límite
+        self.limitaciones_seguidas = 0
+        self.limitaciones = 0  # Respuestas 429/503 recibidas
+
+    def latencia_sana(self):
+        """La latencia media no se ha alejado de la mejor observada (con 100 ms de margen)."""
+        return self.latencia is None or self.latencia <= 3 * self.latencia_minima + 0.1
+
+
+class PlanificadorHosts:
+    """
+    Decide cuántas descargas puede haber en vuelo contra cada host y cuándo
+    puede empezar la siguiente, a partir de cómo responde.
+
+    El límite de cada host sigue un esquema AIMD, como el control de
+    congestión de TCP: empieza en `max_por_host` (CRAWL_MAX_PER_HOST), se
+    reduce a la mitad cuando el host responde 429 o 503 o cuando la mayoría
+    de sus peticiones fallan, y vuelve a subir de uno en uno tras cada
+    ventana de `limite` respuestas correctas con latencia sana. Si la
+    latencia media se dispara, baja de uno en uno.
+
+    Un 429 o 503 además pausa el host lo que indique su Retry-After o, si no
+    lo indica, una espera exponencial desde `espera_base`
+    (CRAWL_BACKOFF_BASE_SECONDS) hasta CRAWL_BACKOFF_MAX_SECONDS. Un host
+    con retraso (Crawl-delay) tiene una sola descarga en vuelo a la vez.
+    Lo usa el Rastreador desde un único hilo, así que no necesita locks.
+    """
+
+    def __init__(self, max_por_host, espera_base=None, reloj=time.monotonic):
+        self.max_por_host = max_por_host
+        self.espera_base = espera_base if espera_base is not None else getattr(settings, 'CRAWL_BACKOFF_BASE_SECONDS', 1)
+        self._reloj = reloj
+        self._hosts = {}
+
+    def estado(self, host):
+        estado = self._hosts.get(host)
+        if estado is None:
+            estado = self._hosts[host] = EstadoHost(self.max_por_host)
+        return estado
+
+    def fijar_retraso(self, host, segundos):
+        """Espacia las descargas de `host` al menos `segundos`, como mucho CRAWL_MAX_CRAWL_DELAY; 0 o None lo quita."""
+        self.estado(host).retraso = min(segundos or 0, getattr(settings, 'CRAWL_MAX_CRAWL_DELAY', 30))
+
+    def disponible(self, host, ahora=None):
+        """Indica si puede empezar ya otra descarga contra `host`."""
+        estado = self._hosts.get(host)
+        if estado is None:
+            return True
+        ahora = self._reloj() if ahora is None else ahora
+        limite = 1 if estado.retraso else estado.limite
+        return estado.en_vuelo < limite and estado.proxima <= ahora
+
+    def hosts_no_disponibles(self, ahora=None):
+        ahora = self._reloj() if ahora is None else ahora
+        return {host for host in self._hosts if not self.disponible(host, ahora)}
+
+    def espera(self, ahora=None):
+        """Segundos hasta que termine la primera pausa en curso, o None si ningún host está pausado."""
+        ahora = self._reloj() if ahora is None else ahora
+        esperas = [estado.proxima - ahora for estado in self._hosts.values() if estado.proxima > ahora]
+        return min(esperas) if esperas else None
+
+    def iniciar(self, host, ahora=None):
+        """Anota el inicio de una descarga contra `host`."""
+        estado = self.estado(host)
+        estado.en_vuelo += 1
+        if estado.retraso:
+            ahora = self._reloj() if ahora is None else ahora
+            estado.proxima = max(estado.proxima, ahora + estado.retraso)
+
+    def terminar(self, host):
+        """Anota el final de una descarga contra `host`, haya salido bien o mal."""
+        estado = self.estado(host)
+        estado.en_vuelo = max(0, estado.en_vuelo - 1)
+
+    def registrar_exito(self, host, latencia=None):
+        """El host respondió (aunque sea con un 404) en `latencia` segundos."""
+        estado = self.estado(host)
+        estado.tasa_errores *= 1 - _PESO_MEDIA
+        estado.limitaciones_seguidas = 0
+        if latencia is not None:
+            estado.latencia_minima = latencia if estado.latencia_minima is None else min(estado.latencia_minima, latencia)
+            estado.latencia = latencia if estado.latencia is None else (
+                (1 - _PESO_MEDIA) * estado.latencia + _PESO_MEDIA * latencia
+            )
+
+        estado.respuestas_ventana += 1
+        if estado.respuestas_ventana < estado.limite:
+            return
+        estado.respuestas_ventana = 0
+        if not estado.latencia_sana():
+            estado.limite = max(1, estado.limite - 1)
+        elif estado.tasa_errores < 0.1:
+            estado.limite = min(self.max_por_host, estado.limite + 1)
+
+    def registrar_fallo(self, host):
+        """La descarga falló por el host (error de red, timeout o 5xx)."""
+        estado = self.estado(host)
+        estado.tasa_errores = (1 - _PESO_MEDIA) * estado.tasa_errores + _PESO_MEDIA
+        estado.respuestas_ventana = 0
+        if estado.tasa_errores >= 0.5:
+            estado.limite = max(1, estado.limite // 2)
+
+    def registrar_limitacion(self, host, retry_after=None):
+        """
+        El host pidió bajar el ritmo (429 o 503): se reduce su límite a la
+        mitad y se pausa `retry_after` segundos o, sin Retry-After, una
+        espera exponencial según las limitaciones seguidas.
+        """
+        estado = self.estado(host)
+        estado.limitaciones += 1
+        estado.limitaciones_seguidas += 1
+        estado.respuestas_ventana = 0
+        estado.limite = max(1, estado.limite // 2)
+        if retry_after is None:
+            retry_after = min(
+                self.espera_base * 2 ** (estado.limitaciones_seguidas - 1),
+                getattr(settings, 'CRAWL_BACKOFF_MAX_SECONDS', 120)
+            )
+        estado.proxima = max(estado.proxima, self._reloj() + retry_after)
+
+    def estadisticas(self):
+        """Límite, latencia media, tasa de errores y limitaciones (429/503) de cada host."""
+        return {
+            host: {
+                'limite': estado.limite,
+                'latencia': estado.latencia,
+                'tasa_errores': estado.tasa_errores,
+                'limitaciones': estado.limitaciones,
+            }
+            for host, estado in self._hosts.items()
+        }
@@ -0,0 +1,404 @@
+"""
+Motor de rastreo concurrente para la aplicación Analizador SEO con IA.
+"""
+
+import codecs
+import hashlib
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from urllib.parse import urlparse
+
+import requests
+from django.conf import settings
+from requests.compat import chardet
+
+from .cliente_http import ClienteHTTP
+from .extractor import extraer_html, extraer_fragmentos
+from .frontera import Frontera, crear_conjunto_vistas, exportar_vistas, importar_vistas
+from .planificador import PlanificadorHosts, segundos_retry_after
+
+
+class PaginaRastreada:
+    """
+    Resultado de la descarga de una URL: la respuesta y las señales SEO
+    extraídas de su HTML, o la excepción que impidió obtenerlas.
+
+    `estado_descarga` es 'completa', 'truncada' (el cuerpo superaba
+    CRAWL_MAX_PAGE_BYTES y solo se analizó el principio), 'omitida' (no es
+    HTML y no se leyó el cuerpo, así que no hay extracción) o 'sin_cambios'
+    (respondió 304 o con la misma huella que en el rastreo anterior, y no se
+    analizó); en los tres últimos casos `motivo_descarga` explica por qué.
+    `huella_contenido` es el sha256 de lo leído del cuerpo.
+    """
+
+    def __init__(self, url, profundidad=0, response=None, extraccion=None, error=None,
+                 estado_descarga='completa', motivo_descarga='', huella_contenido=''):
+        self.url = url
+        self.profundidad = profundidad
+        self.response = response
+        self.extraccion = extraccion
+        self.error = error
+        self.estado_descarga = estado_descarga
+        self.motivo_descarga = motivo_descarga
+        self.huella_contenido = huella_contenido
+
+
+def descargar_pagina(cliente, url, profundidad=0, validadores=None):
+    """
+    Descarga una URL y extrae sus señales SEO.
+
+    Las cabeceras se comprueban antes de leer el cuerpo: si el tipo de
+    contenido no está en CRAWL_ALLOWED_CONTENT_TYPES la descarga se aborta, y
+    del cuerpo solo se analizan los primeros CRAWL_MAX_PAGE_BYTES bytes.
+    Se ejecuta dentro de los hilos del pool, por lo que no debe tocar la base de datos.
+
+    `validadores` son los de la descarga anterior de la URL ('etag',
+    'ultima_modificacion' y 'huella'): la petición se hace condicional con
+    If-None-Match / If-Modified-Since y, si el servidor responde 304 o el
+    cuerpo tiene la misma huella, la página se da por 'sin_cambios' sin analizarla.
+    """
+    validadores = validadores or {}
+    cabeceras = cabeceras_condicionales(validadores)
+    response = cliente.get(url, stream=True, headers=cabeceras) if cabeceras else cliente.get(url, stream=True)
+    try:
+        response.raise_for_status()
+        if response.status_code == 304:
+            return PaginaRastreada(
+                url, profundidad, response=response, estado_descarga='sin_cambios',
+                motivo_descarga="No modificada (304)", huella_contenido=validadores.get('huella', '')
+            )
+
+        tipo = tipo_contenido(response)
+        permitidos = getattr(settings, 'CRAWL_ALLOWED_CONTENT_TYPES', ('text/html', 'application/xhtml+xml'))
+        if tipo and tipo not in permitidos:
+            return PaginaRastreada(
+                url, profundidad, response=response, estado_descarga='omitida',
+                motivo_descarga=f"Tipo de contenido no HTML: {tipo}"
+            )
+
+        max_bytes = getattr(settings, 'CRAWL_MAX_PAGE_BYTES', 10 * 1024 * 1024)
+        huella = hashlib.sha256()
+        extraccion, truncada = extraer_respuesta(
+            response, url, max_bytes=max_bytes, huella=huella, huella_anterior=validadores.get('huella')
+        )
+    finally:
+        # Con stream=True, cerrar sin leer el cuerpo corta la transferencia
+        response.close()
+
+    if extraccion is None:
+        return PaginaRastreada(
+            url, profundidad, response=response, estado_descarga='sin_cambios',
+            motivo_descarga="Mismo contenido que en el análisis anterior", huella_contenido=huella.hexdigest()
+        )
+    if not truncada:
+        return PaginaRastreada(url, profundidad, response=response, extraccion=extraccion, huella_contenido=huella.hexdigest())
+
+    longitud = longitud_contenido(response)
+    if longitud is not None:
+        motivo = f"Página de {longitud} bytes truncada a los primeros {max_bytes} bytes"
+    else:
+        motivo = f"Página truncada a los primeros {max_bytes} bytes"
+    return PaginaRastreada(
+        url, profundidad, response=response, extraccion=extraccion,
+        estado_descarga='truncada', motivo_descarga=motivo, huella_contenido=huella.hexdigest()
+    )
+
+
+def cabeceras_condicionales(validadores):
+    """Cabeceras If-None-Match / If-Modified-Since a partir del ETag y el Last-Modified de la descarga anterior."""
+    cabeceras = {}
+    if validadores.get('etag'):
+        cabeceras['If-None-Match'] = validadores['etag']
+    if validadores.get('ultima_modificacion'):
+        cabeceras['If-Modified-Since'] = validadores['ultima_modificacion']
+    return cabeceras
+
+
+def tipo_contenido(response):
+    """Tipo MIME de la cabecera Content-Type, sin parámetros y en minúsculas ('' si no hay)."""
+    return response.headers.get('Content-Type', '').split(';')[0].strip().lower()
+
+
+def longitud_contenido(response):
+    """Valor de la cabecera Content-Length, o None si falta o no es válido."""
+    try:
+        return int(response.headers['Content-Length'])
+    except (KeyError, ValueError):
+        return None
+
+
+def extraer_respuesta(response, url, umbral=None, tamano_fragmento=None, max_bytes=None, huella=None, huella_anterior=None):
+    """
+    Lee el cuerpo de la respuesta por fragmentos y extrae sus señales SEO.
+    Retorna la tupla (extraccion, truncada).
+
+    Mientras el cuerpo no supera `umbral` bytes (HTML_STREAMING_THRESHOLD) se
+    acumula y se analiza entero con el backend HTML_PARSER_BACKEND. Si lo
+    supera, se pasa a la extracción incremental sin árbol: lo ya leído y el
+    resto de fragmentos se entregan a `ExtractorIncremental` a medida que
+    llegan, y nunca se tiene la página completa en memoria.
+
+    Con `max_bytes` solo se leen los primeros `max_bytes` bytes del cuerpo
+    (0 o None, sin límite); `truncada` indica si quedó cuerpo sin leer.
+
+    `huella` (un objeto de hashlib) se actualiza con los bytes leídos. Si el
+    cuerpo no supera `umbral` y su huella coincide con `huella_anterior`, no
+    se analiza y `extraccion` es None; una página grande se analiza a medida
+    que llega, así que se compara cuando ya está analizada.
+    """
+    if umbral is None:
+        umbral = getattr(settings, 'HTML_STREAMING_THRESHOLD', 2 * 1024 * 1024)
+    tamano_fragmento = tamano_fragmento or getattr(settings, 'HTML_STREAMING_CHUNK_SIZE', 64 * 1024)
+
+    if max_bytes:
+        tamano_fragmento = min(tamano_fragmento, max_bytes)
+    fragmentos = _CuerpoLimitado(response.iter_content(chunk_size=tamano_fragmento), max_bytes or None, huella)
+
+    leidos = []
+    tamano = 0
+    for fragmento in fragmentos:
+        leidos.append(fragmento)
+        tamano += len(fragmento)
+        if tamano > umbral:
+            break
+    else:
+        if huella_anterior and huella is not None and huella.hexdigest() == huella_anterior:
+            return None, fragmentos.truncado
+        cuerpo = b''.join(leidos)
+        # Misma codificación que usaría response.text
+        codificacion = _codificacion_valida(response.encoding or chardet.detect(cuerpo)['encoding'])
+        return extraer_html(cuerpo.decode(codificacion, errors='replace'), url), fragmentos.truncado
+
+    # Página grande: se decodifica de forma incremental (un carácter puede quedar partido entre fragmentos)
+    decodificador = codecs.getincrementaldecoder(_codificacion_valida(response.encoding))(errors='replace')
+
+    def texto():
+        for fragmento in leidos:
+            yield decodificador.decode(fragmento)
+        leidos.clear()
+        for fragmento in fragmentos:
+            yield decodificador.decode(fragmento)
+        yield decodificador.decode(b'', final=True)
+
+    return extraer_fragmentos(texto(), url), fragmentos.truncado
+
+
+class _CuerpoLimitado:
+    """
+    Itera los fragmentos del cuerpo hasta sumar `max_bytes` y anota si quedó
+    cuerpo sin leer (para saberlo se pide, como mucho, un fragmento más).
+    Si se indica `huella`, la actualiza con cada fragmento entregado.
+    """
+
+    def __init__(self, fragmentos, max_bytes, huella=None):
+        self._fragmentos = iter(fragmentos)
+        self._restantes = max_bytes
+        self._huella = huella
+        self.truncado = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        fragmento = next(self._fragmentos)
+        if self._restantes is not None:
+            if self._restantes <= 0:
+                self.truncado = True
+                raise StopIteration
+            if len(fragmento) > self._restantes:
+                self.truncado = True
+                fragmento = fragmento[:self._restantes]
+            self._restantes -= len(fragmento)
+        if self._huella is not None:
+            self._huella.update(fragmento)
+        return fragmento
+
+
+def _codificacion_valida(codificacion):
+    try:
+        return codecs.lookup(codificacion).name if codificacion else 'utf-8'
+    except LookupError:
+        return 'utf-8'
+
+
+class Rastreador:
+    """
+    Rastreador concurrente basado en un pool de hilos acotado.
+
+    Mantiene hasta `max_workers` descargas en vuelo. Cuántas puede haber
+    contra cada host lo decide un `PlanificadorHosts`: hasta `max_por_host`
+    mientras el host responde bien y menos, con pausas, cuando se satura o
+    responde 429/503. Las páginas descargadas
+    se entregan en el hilo que itera `rastrear()`, que es quien las analiza,
+    las guarda y encola las nuevas URLs mediante `encolar()`.
+
+    Todas las descargas usan el mismo `ClienteHTTP`; si no se indica uno,
+    el rastreador crea el suyo y lo cierra al terminar.
+
+    Las URLs pendientes viven en una `Frontera` (rastreo en anchura, con
+    `max_profundidad` opcional); como la frontera recuerda todas las URLs
+    encoladas, `max_urls` limita el total de páginas que se descargan. El
+    tipo de conjunto de URLs vistas se elige con CRAWL_SEEN_SET.
+
+    Con `fijar_retraso()` (p. ej. con el Crawl-delay de robots.txt) un host
+    pasa a tener una sola descarga en vuelo y al menos ese retraso entre el
+    inicio de una y el de la siguiente; el resto de hosts no esperan.
+
+    Una URL que recibe 429 o 503 se vuelve a encolar, hasta `max_reintentos`
+    veces (CRAWL_MAX_RETRIES), y se descarga cuando acaba la pausa del host.
+
+    `validadores` (URL -> validadores de su descarga anterior, ver
+    `descargar_pagina`) hace condicionales las descargas de esas URLs.
+
+    `punto_control()` y `restaurar()` guardan y recuperan la frontera y las
+    URLs vistas, para reanudar un rastreo interrumpido.
+    """
+
+    def __init__(self, max_urls, max_workers=None, max_por_host=None, cliente=None, max_profundidad=None,
+                 max_reintentos=None, reloj=time.monotonic, dormir=time.sleep):
+        self.max_urls = max_urls
+        self.max_workers = max_workers or getattr(settings, 'CRAWL_MAX_WORKERS', 8)
+        self.max_por_host = max_por_host or getattr(settings, 'CRAWL_MAX_PER_HOST', 4)
+        self.max_reintentos = max_reintentos if max_reintentos is not None else getattr(settings, 'CRAWL_MAX_RETRIES', 3)
+        self._cliente_propio = cliente is None
+        self.cliente = cliente or ClienteHTTP()
+
+        if max_profundidad is None:
+            max_profundidad = getattr(settings, 'CRAWL_MAX_DEPTH', None)
+        vistas = crear_conjunto_vistas(
+            getattr(settings, 'CRAWL_SEEN_SET', 'set'),
+            capacidad=max_urls,
+            tasa_falsos_positivos=getattr(settings, 'CRAWL_BLOOM_ERROR_RATE', 0.001)
+        )
+        self.frontera = Frontera(max_profundidad=max_profundidad, vistas=vistas)
+        self.planificador = PlanificadorHosts(self.max_por_host, reloj=reloj)
+        self._en_vuelo = {}  # futuro -> (url, profundidad)
+        self._reintentos = defaultdict(int)  # url -> reintentos tras un 429/503
+        self.validadores = {}
+        self._reloj = reloj
+        self._dormir = dormir
+
+    def encolar(self, urls, profundidad=0):
+        """
+        Agrega nuevas URLs a la frontera sin superar el límite global `max_urls`.
+        `profundidad` es la de las nuevas URLs (la de la página que las enlaza + 1).
+        """
+        for url in urls:
+            if len(self.frontera.vistas) >= self.max_urls:
+                break  # Stop adding if we've hit the limit
+            self.frontera.agregar(url, profundidad)
+
+    def sembrar(self, entradas, profundidad=1):
+        """
+        Agrega URLs con su propia prioridad, como pares (prioridad, url), sin
+        superar `max_urls`; p. ej. las de los sitemaps (ver sitemap.py).
+        Retorna el número de URLs agregadas.
+        """
+        agregadas = 0
+        for prioridad, url in entradas:
+            if len(self.frontera.vistas) >= self.max_urls:
+                break
+            agregadas += self.frontera.agregar(url, profundidad, prioridad=prioridad)
+        return agregadas
+
+    def fijar_retraso(self, host, segundos):
+        """
+        Espacia las descargas de `host` (netloc) al menos `segundos`, como
+        mucho CRAWL_MAX_CRAWL_DELAY; con 0 o None se quita el retraso.
+        """
+        self.planificador.fijar_retraso(host, segundos)
+
+    def punto_control(self, sin_procesar=()):
+        """
+        Estado del rastreo en JSON: las URLs pendientes (también las que se
+        están descargando y las ya entregadas `sin_procesar`, como pares
+        (url, profundidad)) y las URLs vistas.
+        """
+        pendientes = self.frontera.pendientes()
+        for url, profundidad in list(self._en_vuelo.values()) + list(sin_procesar):
+            pendientes.append([profundidad, url, profundidad])
+        return {'pendientes': pendientes, 'vistas': exportar_vistas(self.frontera.vistas)}
+
+    def restaurar(self, punto_control):
+        """Recupera la frontera y las URLs vistas de `punto_control()`; se llama antes de `rastrear()`."""
+        self.frontera = Frontera(max_profundidad=self.frontera.max_profundidad, vistas=importar_vistas(punto_control['vistas']))
+        for prioridad, url, profundidad in punto_control['pendientes']:
+            self.frontera.reencolar(url, profundidad, prioridad=prioridad)
+
+    def rastrear(self, url_inicial):
+        """
+        Rastrea a partir de `url_inicial` y produce un `PaginaRastreada` por cada
+        URL descargada (o fallida), en el orden en que terminan las descargas.
+        """
+        self.encolar([url_inicial])
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+                while self.frontera or self._en_vuelo:
+                    espera = self._lanzar_descargas(pool)
+                    if not self._en_vuelo:
+                        if espera is None:
+                            break
+                        self._dormir(espera)  # Solo quedan hosts en pausa
+                        continue
+
+                    completadas, _ = wait(self._en_vuelo, timeout=espera, return_when=FIRST_COMPLETED)
+                    for futuro in completadas:
+                        url, profundidad = self._en_vuelo.pop(futuro)
+                        host = urlparse(url).netloc
+                        self.planificador.terminar(host)
+                        try:
+                            pagina = futuro.result()
+                        except Exception as e:
+                            if self._registrar_error(host, url, profundidad, e):
+                                continue  # Se reintentará cuando acabe la pausa del host
+                            yield PaginaRastreada(url, profundidad, error=e)
+                        else:
+                            self.planificador.registrar_exito(host, pagina.response.elapsed.total_seconds())
+                            yield pagina
+        finally:
+            if self._cliente_propio:
+                self.cliente.close()
+
+    def _lanzar_descargas(self, pool):
+        """
+        Lanza descargas pendientes respetando el límite global y lo que el
+        planificador permite a cada host. Retorna los segundos hasta que un
+        host pausado pueda descargar de nuevo, o None si no hay ninguno.
+        """
+        ahora = self._reloj()
+        hosts_excluidos = self.planificador.hosts_no_disponibles(ahora)
+        while len(self._en_vuelo) < self.max_workers:
+            siguiente = self.frontera.siguiente(hosts_excluidos=hosts_excluidos)
+            if siguiente is None:
+                break
+            url, profundidad = siguiente
+
+            host = urlparse(url).netloc
+            self.planificador.iniciar(host, ahora)
+            if not self.planificador.disponible(host, ahora):
+                hosts_excluidos.add(host)
+            futuro = pool.submit(descargar_pagina, self.cliente, url, profundidad, self.validadores.get(url))
+            self._en_vuelo[futuro] = (url, profundidad)
+        return self.planificador.espera(ahora) if self.frontera else None
+
+    def _registrar_error(self, host, url, profundidad, error):
+        """
+        Informa al planificador de una descarga fallida. Si el host pidió
+        bajar el ritmo (429/503) y a la URL le quedan reintentos, la vuelve
+        a encolar y retorna True.
+        """
+        response = getattr(error, 'response', None)
+        codigo_estado = response.status_code if response is not None else None
+        if codigo_estado in (429, 503):
+            self.planificador.registrar_limitacion(host, segundos_retry_after(response.headers.get('Retry-After')))
+            if self._reintentos[url] < self.max_reintentos:
+                self._reintentos[url] += 1
+                self.frontera.reencolar(url, profundidad)
+                return True
+        elif isinstance(error, requests.RequestException) and (codigo_estado is None or codigo_estado >= 500):
+            self.planificador.registrar_fallo(host)
+        elif response is not None:
+            self.planificador.registrar_exito(host, response.elapsed.total_seconds())  # Un 4xx: el host responde bien
+        return False
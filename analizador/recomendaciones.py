@@ -0,0 +1,98 @@
+"""
+Enriquecimiento de las incidencias con recomendaciones de la IA para el Analizador SEO con IA.
+"""
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Incidencia
+from .utils import RecomendacionNoDisponible, generar_recomendacion_ia, obtener_recomendaciones_ia_lote
+
+
+def enriquecer_incidencias(incidencias, tecnologia_sitio, url, modo=None):
+    """
+    Genera la recomendación de la IA de las incidencias pendientes y la guarda.
+    Retorna el número de incidencias completadas.
+
+    Cada incidencia agrupa todas las ocurrencias de un mismo hallazgo en el
+    sitio, así que se pide una sola recomendación aunque aparezca en cientos
+    de páginas. Las incidencias se agrupan según `modo` (IA_BATCH_MODE):
+    'pagina', una petición por página donde aparecieron por primera vez;
+    'rastreo', una por tipo de hallazgo con la URL principal `url`;
+    'hallazgo', una por incidencia. Cada grupo se guarda en cuanto llega su
+    respuesta, para que los informes lo muestren sin esperar al resto.
+
+    Las que la IA no genera quedan pendientes de reintento (ver
+    Incidencia.registrar_fallo_recomendacion), sin ningún texto de error
+    guardado como si fuera una recomendación.
+    """
+    modo = modo or getattr(settings, 'IA_BATCH_MODE', 'pagina')
+    pendientes = [incidencia for incidencia in incidencias if incidencia.estado_recomendacion == 'pendiente']
+
+    grupos = {}
+    for incidencia in pendientes:
+        if modo == 'rastreo':
+            clave = incidencia.tipo
+        elif modo == 'hallazgo':
+            clave = incidencia.pk
+        else:
+            clave = incidencia.url_ejemplo
+        grupos.setdefault(clave, []).append(incidencia)
+
+    completadas = 0
+    for grupo in grupos.values():
+        url_grupo = url if modo == 'rastreo' else (grupo[0].url_ejemplo or url)
+        if modo == 'hallazgo':
+            try:
+                recomendaciones = [generar_recomendacion_ia(grupo[0].descripcion, url_grupo, tecnologia_sitio, grupo[0].tipo)]
+            except RecomendacionNoDisponible:
+                recomendaciones = [None]
+        else:
+            recomendaciones = obtener_recomendaciones_ia_lote(
+                [{'tipo': incidencia.tipo, 'descripcion': incidencia.descripcion} for incidencia in grupo],
+                url_grupo,
+                tecnologia_sitio
+            )
+        ahora = timezone.now()
+        for incidencia, recomendacion in zip(grupo, recomendaciones):
+            if recomendacion:
+                incidencia.recomendacion = recomendacion
+                incidencia.estado_recomendacion = 'lista'
+                incidencia.proximo_intento = None
+                completadas += 1
+            else:
+                incidencia.registrar_fallo_recomendacion(ahora)
+        Incidencia.objects.bulk_update(
+            grupo, ['recomendacion', 'estado_recomendacion', 'intentos_recomendacion', 'proximo_intento']
+        )
+
+    return completadas
+
+
+def enriquecer_rastreo(analisis_principal):
+    """Completa las recomendaciones pendientes de todas las incidencias de un rastreo."""
+    incidencias = analisis_principal.incidencias.filter(estado_recomendacion='pendiente').order_by('pk')
+    return enriquecer_incidencias(list(incidencias), analisis_principal.tecnologia_sitio, analisis_principal.url)
+
+
+def enriquecer_programadas(limite=100):
+    """
+    Genera las recomendaciones que esperan al worker: las de las incidencias
+    pendientes cuyo `proximo_intento` ya llegó (reintentos tras un fallo de
+    la IA y las pedidas desde un informe), como mucho `limite`, agrupadas
+    por rastreo. Retorna el número de incidencias procesadas.
+    """
+    incidencias = list(
+        Incidencia.objects.filter(
+            estado_recomendacion='pendiente',
+            proximo_intento__lte=timezone.now(),
+            analisis_principal__isnull=False
+        ).select_related('analisis_principal').order_by('proximo_intento', 'pk')[:limite]
+    )
+    por_rastreo = {}
+    for incidencia in incidencias:
+        por_rastreo.setdefault(incidencia.analisis_principal_id, []).append(incidencia)
+    for grupo in por_rastreo.values():
+        principal = grupo[0].analisis_principal
+        enriquecer_incidencias(grupo, principal.tecnologia_sitio, principal.url)
+    return len(incidencias)
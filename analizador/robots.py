@@ -0,0 +1,201 @@
+"""
+Reglas de robots.txt para el rastreo del Analizador SEO con IA.
+"""
+
+import re
+import threading
+import time
+from urllib.parse import quote, urljoin, urlparse
+
+import requests
+from django.conf import settings
+
+
+# Caracteres que no se escapan al normalizar rutas y patrones (los reservados de una URL, '%' y los comodines)
+_SEGUROS = "!$&'()*+,-./:;=?@_~%"
+
+
+def _normalizar_ruta(ruta):
+    """Ruta con los caracteres no ASCII y los espacios escapados, como llega en una URL."""
+    return quote(ruta, safe=_SEGUROS)
+
+
+class ReglasRobots:
+    """
+    Reglas Allow/Disallow de robots.txt aplicables a un user-agent,
+    compiladas para evaluarlas rápido con cada URL candidata.
+
+    Sigue el RFC 9309: gana la regla cuyo patrón es más largo y, a igual
+    longitud, Allow. Los patrones admiten `*` (cualquier secuencia) y `$`
+    final (fin de la URL). Las reglas se ordenan de más a menos específica,
+    así que `permite()` se queda con la primera que coincide; las que no
+    tienen comodines se comparan con `startswith`, sin expresiones regulares.
+
+    `crawl_delay` son los segundos entre peticiones que pide el sitio
+    (None si no lo indica).
+    """
+
+    def __init__(self, reglas=(), crawl_delay=None, bloquear_todo=False):
+        self.crawl_delay = crawl_delay
+        self.bloquear_todo = bloquear_todo
+        self._reglas = []  # (permitir, prefijo, regex o None), de más a menos específica
+        for permitir, patron in sorted(reglas, key=lambda regla: (-len(regla[1]), not regla[0])):
+            self._reglas.append((permitir,) + self._compilar(patron))
+
+    @classmethod
+    def permitir_todo(cls):
+        return cls()
+
+    @classmethod
+    def desde_texto(cls, contenido, user_agent=None):
+        """Reglas de robots.txt (`contenido`) para `user_agent` (por defecto el de CRAWL_USER_AGENT)."""
+        agente = _token_agente(user_agent or getattr(settings, 'CRAWL_USER_AGENT', 'AnalizadorSEO/1.0'))
+
+        grupos = []  # (agentes, reglas, crawl_delay)
+        agentes, reglas, delay = [], [], None
+        en_reglas = False
+        for linea in (contenido or '').splitlines():
+            clave, separador, valor = linea.split('#', 1)[0].partition(':')
+            if not separador:
+                continue
+            clave, valor = clave.strip().lower(), valor.strip()
+            if clave == 'user-agent':
+                if en_reglas:  # Un user-agent tras las reglas empieza un grupo nuevo
+                    grupos.append((agentes, reglas, delay))
+                    agentes, reglas, delay = [], [], None
+                    en_reglas = False
+                agentes.append(_token_agente(valor) if valor else '')
+            elif clave in ('allow', 'disallow'):
+                en_reglas = True
+                if valor:  # "Disallow:" vacío no bloquea nada
+                    reglas.append((clave == 'allow', valor))
+            elif clave == 'crawl-delay':
+                en_reglas = True
+                try:
+                    delay = max(0.0, float(valor))
+                except ValueError:
+                    pass
+        if agentes:
+            grupos.append((agentes, reglas, delay))
+
+        # Se combinan todos los grupos que nombran el token del agente (RFC 9309: el token completo,
+        # sin distinguir mayúsculas; 'bot' no vale para 'AnalizadorSEO'); si no hay ninguno, los de '*'
+        elegidos = [grupo for grupo in grupos if agente in grupo[0]]
+        elegidos = elegidos or [grupo for grupo in grupos if '*' in grupo[0]]
+        delays = [grupo[2] for grupo in elegidos if grupo[2] is not None]
+        return cls(
+            [regla for grupo in elegidos for regla in grupo[1]],
+            crawl_delay=max(delays) if delays else None
+        )
+
+    def permite(self, url):
+        """Indica si robots.txt permite rastrear `url` (absoluta o solo ruta)."""
+        if self.bloquear_todo:
+            return False
+        if not self._reglas:
+            return True
+        parsed = urlparse(url)
+        ruta = _normalizar_ruta((parsed.path or '/') + ('?' + parsed.query if parsed.query else ''))
+        for permitir, prefijo, regex in self._reglas:
+            if regex is None:
+                if ruta.startswith(prefijo):
+                    return permitir
+            elif ruta.startswith(prefijo) and regex.match(ruta):
+                return permitir
+        return True
+
+    @staticmethod
+    def _compilar(patron):
+        """(prefijo literal, regex o None) de un patrón; el prefijo descarta rápido las rutas que no coinciden."""
+        patron = _normalizar_ruta(patron)
+        anclado = patron.endswith('$')
+        if anclado:
+            patron = patron[:-1]
+        if '*' not in patron and not anclado:
+            return patron, None
+        prefijo = patron.split('*', 1)[0]
+        regex = '.*'.join(re.escape(parte) for parte in patron.split('*'))
+        return prefijo, re.compile(regex + (r'\Z' if anclado else ''), re.DOTALL)
+
+
+def _token_agente(user_agent):
+    """Nombre del producto de un User-Agent en minúsculas ('AnalizadorSEO/1.0 (...)' -> 'analizadorseo')."""
+    return user_agent.split('/', 1)[0].split()[0].lower() if user_agent.strip() else '*'
+
+
+def reglas_desde_respuesta(codigo_estado, contenido, user_agent=None):
+    """
+    Reglas según la respuesta a /robots.txt (RFC 9309): con 2xx se analizan,
+    con 4xx se permite todo y si no se pudo obtener (5xx o error de red,
+    `codigo_estado` None) se bloquea todo.
+    """
+    if codigo_estado is None or codigo_estado >= 500:
+        return ReglasRobots(bloquear_todo=True)
+    if codigo_estado >= 400:
+        return ReglasRobots.permitir_todo()
+    return ReglasRobots.desde_texto(contenido, user_agent)
+
+
+class CacheRobots:
+    """
+    Reglas de robots.txt por host (esquema y dominio) ya compiladas, durante
+    `ttl` segundos (CRAWL_ROBOTS_CACHE_TTL). Las comparten todos los rastreos
+    del proceso, de modo que el mismo robots.txt no se descarga ni se vuelve
+    a analizar con cada página ni con cada rastreo del mismo sitio.
+    """
+
+    def __init__(self, ttl=None, reloj=time.monotonic):
+        self.ttl = ttl if ttl is not None else getattr(settings, 'CRAWL_ROBOTS_CACHE_TTL', 86400)
+        self._reloj = reloj
+        self._reglas = {}  # host -> (ReglasRobots, caduca)
+        self._lock = threading.Lock()
+
+    def reglas(self, url, cliente):
+        """Reglas del host de `url`; si no están en caché o han caducado, descarga su robots.txt."""
+        host = self._host(url)
+        with self._lock:
+            entrada = self._reglas.get(host)
+            if entrada is not None and entrada[1] > self._reloj():
+                return entrada[0]
+
+        url_robots = urljoin(host, '/robots.txt')
+        try:
+            response = cliente.get(url_robots)
+            reglas = reglas_desde_respuesta(response.status_code, response.text if response.status_code < 300 else '')
+        except requests.RequestException:
+            reglas = reglas_desde_respuesta(None, '')
+        return self._guardar(host, reglas)
+
+    def guardar(self, url, codigo_estado, contenido):
+        """Guarda las reglas de un robots.txt ya descargado (p. ej. por verificar_archivos_seo)."""
+        return self._guardar(self._host(url), reglas_desde_respuesta(codigo_estado, contenido))
+
+    def _guardar(self, host, reglas):
+        with self._lock:
+            self._reglas[host] = (reglas, self._reloj() + self.ttl)
+        return reglas
+
+    @staticmethod
+    def _host(url):
+        parsed = urlparse(url)
+        return f"{parsed.scheme}://{parsed.netloc.lower()}"
+
+
+_cache_robots = None
+_lock_cache_robots = threading.Lock()
+
+
+def obtener_cache_robots():
+    """Retorna la caché de reglas de robots.txt del proceso."""
+    global _cache_robots
+    with _lock_cache_robots:
+        if _cache_robots is None:
+            _cache_robots = CacheRobots()
+        return _cache_robots
+
+
+def descartar_cache_robots():
+    """Descarta la caché del proceso; la siguiente `obtener_cache_robots` crea una vacía."""
+    global _cache_robots
+    with _lock_cache_robots:
+        _cache_robots = None
@@ -0,0 +1,269 @@
+"""
+Lectura de sitemaps para sembrar la frontera de rastreo del Analizador SEO con IA.
+"""
+
+import gzip
+import heapq
+import io
+import itertools
+import xml.etree.ElementTree as ET
+from collections import deque, namedtuple
+from datetime import datetime, timezone as dt_timezone
+from urllib.parse import urljoin, urlparse
+
+import requests
+from django.conf import settings
+from django.utils import timezone
+
+
+EntradaSitemap = namedtuple('EntradaSitemap', ['url', 'lastmod'])
+
+_MAGIA_GZIP = b'\x1f\x8b'
+
+
+def parsear_lastmod(texto):
+    """
+    Fecha de `<lastmod>` (formato W3C: 2024, 2024-05, 2024-05-31 o con hora y
+    zona) como datetime con zona horaria (UTC si no la indica), o None si
+    falta o no es válida.
+    """
+    texto = (texto or '').strip()
+    if not texto:
+        return None
+    try:
+        if len(texto) == 4:
+            fecha = datetime(int(texto), 1, 1)
+        elif len(texto) == 7:
+            anio, mes = texto.split('-')
+            fecha = datetime(int(anio), int(mes), 1)
+        else:
+            fecha = datetime.fromisoformat(texto[:-1] + '+00:00' if texto.endswith('Z') else texto)
+    except ValueError:
+        return None
+    return fecha if fecha.tzinfo else fecha.replace(tzinfo=dt_timezone.utc)
+
+
+def sitemaps_de_robots(contenido_robots):
+    """URLs de las líneas `Sitemap:` de un robots.txt."""
+    urls = []
+    for linea in (contenido_robots or '').splitlines():
+        clave, _, valor = linea.partition(':')
+        if clave.strip().lower() == 'sitemap' and valor.strip():
+            urls.append(valor.strip())
+    return urls
+
+
+def leer_sitemaps(urls, cliente, contenidos=None, max_archivos=None, max_bytes=None):
+    """
+    Produce las entradas (EntradaSitemap) de los sitemaps `urls`, siguiendo
+    los índices de sitemaps, en el orden en que aparecen.
+
+    Cada archivo se descarga por fragmentos y se analiza con `iterparse`,
+    liberando cada `<url>` en cuanto se ha leído: un sitemap de 50.000 URLs
+    nunca está entero en memoria. Los `.gz` se descomprimen también por
+    fragmentos. Los archivos cuyo contenido ya se tiene (`contenidos`, URL
+    -> texto) no se vuelven a descargar.
+
+    Se leen como mucho `max_archivos` archivos (CRAWL_SITEMAP_MAX_FILES) y
+    `max_bytes` bytes descomprimidos de cada uno (CRAWL_SITEMAP_MAX_BYTES).
+    Un archivo que no se puede descargar o no es XML válido se salta,
+    conservando las entradas leídas hasta el error.
+    """
+    max_archivos = max_archivos or getattr(settings, 'CRAWL_SITEMAP_MAX_FILES', 50)
+    max_bytes = max_bytes or getattr(settings, 'CRAWL_SITEMAP_MAX_BYTES', 50 * 1024 * 1024)
+
+    contenidos = contenidos or {}
+    pendientes = deque(dict.fromkeys(urls))
+    vistos = set(pendientes)
+    leidos = 0
+    while pendientes and leidos < max_archivos:
+        url_sitemap = pendientes.popleft()
+        leidos += 1
+        try:
+            for etiqueta, loc, lastmod in _leer_archivo(url_sitemap, cliente, contenidos.get(url_sitemap), max_bytes):
+                if etiqueta == 'sitemap':  # Índice de sitemaps: se leen después, en orden
+                    loc = urljoin(url_sitemap, loc)
+                    if loc not in vistos:
+                        vistos.add(loc)
+                        pendientes.append(loc)
+                else:
+                    yield EntradaSitemap(loc, lastmod)
+        except (requests.RequestException, ET.ParseError, OSError, EOFError):
+            continue
+
+
+def seleccionar_urls(entradas, limite, dominio, conocidas=(), max_edad_dias=None, ahora=None):
+    """
+    Elige de `entradas` las `limite` URLs de `dominio` modificadas más
+    recientemente y retorna pares (prioridad, url) para la frontera.
+
+    Las entradas con `<lastmod>` de hace más de `max_edad_dias` días se
+    descartan. La prioridad va de 0 (modificada ahora) hacia 1 a medida que
+    la página es más antigua; las que no tienen `<lastmod>` reciben 1, la
+    misma que las páginas enlazadas desde la principal. Con un montículo de
+    tamaño `limite` la selección ocupa O(limite) aunque el sitemap sea enorme.
+    """
+    if limite <= 0:
+        return []
+    ahora = ahora or timezone.now()
+    monticulo, en_monticulo = [], set()
+    secuencia = itertools.count()
+    for entrada in entradas:
+        parsed = urlparse(entrada.url)
+        if parsed.netloc != dominio:
+            continue
+        url = parsed._replace(fragment='').geturl()
+        if url in conocidas or url in en_monticulo:
+            continue
+        edad = (ahora - entrada.lastmod).total_seconds() / 86400 if entrada.lastmod else None
+        if edad is not None and max_edad_dias is not None and edad > max_edad_dias:
+            continue
+
+        # Las más antiguas (y las que no tienen fecha) salen primero del montículo
+        clave = (-edad if edad is not None else float('-inf'), -next(secuencia))
+        if len(monticulo) < limite:
+            heapq.heappush(monticulo, (clave, url, edad))
+            en_monticulo.add(url)
+        elif clave > monticulo[0][0]:
+            _, saliente, _ = heapq.heapreplace(monticulo, (clave, url, edad))
+            en_monticulo.discard(saliente)
+            en_monticulo.add(url)
+
+    seleccion = sorted(monticulo, reverse=True)
+    return [(max(edad, 0) / (max(edad, 0) + 30) if edad is not None else 1, url) for _, url, edad in seleccion]
+
+
+def sembrar_desde_sitemaps(rastreador, url_inicial, cliente, archivos_seo=(), reglas_robots=None):
+    """
+    Agrega a la frontera del rastreador las URLs de los sitemaps del sitio:
+    los de las líneas `Sitemap:` de robots.txt y /sitemap.xml. `archivos_seo`
+    son los descargados por `verificar_archivos_seo`: se reutiliza el
+    robots.txt, y /sitemap.xml se lee (por fragmentos) si allí existía, ya
+    que de él solo se guardó el principio. Las URLs que no permiten
+    `reglas_robots` se descartan. Como mucho se agrega la fracción
+    CRAWL_SITEMAP_SHARE de las páginas del rastreo, para que las enlazadas
+    se sigan descubriendo. Retorna el número de URLs agregadas.
+    """
+    robots = next((archivo.get('contenido') for archivo in archivos_seo if archivo.get('tipo') == 'robots.txt'), '')
+
+    sitemaps = sitemaps_de_robots(robots)
+    sitemaps += [
+        archivo['url'] for archivo in archivos_seo
+        if archivo.get('tipo') == 'sitemap.xml' and archivo.get('codigo_estado') == 200 and archivo.get('contenido')
+    ]
+    if not sitemaps:
+        return 0
+
+    entradas = leer_sitemaps(sitemaps, cliente)
+    if reglas_robots is not None:
+        entradas = (entrada for entrada in entradas if reglas_robots.permite(entrada.url))
+    # Los sitemaps solo ocupan su parte de las páginas del rastreo: el resto queda para los enlaces
+    cuota = int(rastreador.max_urls * getattr(settings, 'CRAWL_SITEMAP_SHARE', 0.5))
+    seleccion = seleccionar_urls(
+        entradas,
+        limite=min(cuota, rastreador.max_urls - len(rastreador.frontera.vistas)),
+        dominio=urlparse(url_inicial).netloc,
+        conocidas=rastreador.frontera,
+        max_edad_dias=getattr(settings, 'CRAWL_SITEMAP_MAX_AGE_DAYS', None)
+    )
+    return rastreador.sembrar(seleccion)
+
+
+def _leer_archivo(url, cliente, contenido, max_bytes):
+    """Produce las tuplas (etiqueta, loc, lastmod) de un archivo de sitemap."""
+    if contenido is not None:
+        yield from _entradas_xml(_LecturaLimitada(io.BytesIO(contenido.encode('utf-8')), max_bytes))
+        return
+
+    response = cliente.get(url, stream=True)
+    try:
+        response.raise_for_status()
+        yield from _entradas_xml(_LecturaLimitada(abrir_cuerpo(response), max_bytes))
+    finally:
+        response.close()
+
+
+def abrir_cuerpo(response):
+    """
+    Fichero de solo lectura (read) sobre el cuerpo de una respuesta pedida con
+    stream=True, descomprimido si es un .gz: se lee por fragmentos, sin
+    cargarlo entero en memoria.
+    """
+    fichero = _LectorFragmentos(response.iter_content(chunk_size=64 * 1024))
+    if fichero.asomar(2) == _MAGIA_GZIP:
+        # requests solo descomprime el Content-Encoding; un sitemap.xml.gz servido tal cual llega comprimido
+        fichero = gzip.GzipFile(fileobj=fichero)
+    return fichero
+
+
+def _entradas_xml(fichero):
+    """Recorre un `<urlset>` o un `<sitemapindex>` liberando cada elemento tras leerlo."""
+    raiz = None
+    for evento, elemento in ET.iterparse(fichero, events=('start', 'end')):
+        if raiz is None:
+            raiz = elemento
+            continue
+        if evento != 'end':
+            continue
+        etiqueta = _nombre_local(elemento.tag)
+        if etiqueta not in ('url', 'sitemap'):
+            continue
+        loc = lastmod = None
+        for hijo in elemento:
+            nombre = _nombre_local(hijo.tag)
+            if nombre == 'loc':
+                loc = (hijo.text or '').strip()
+            elif nombre == 'lastmod':
+                lastmod = parsear_lastmod(hijo.text)
+        if loc:
+            yield etiqueta, loc, lastmod
+        raiz.clear()
+
+
+def _nombre_local(etiqueta):
+    """Nombre de una etiqueta sin su espacio de nombres ('{http://...}url' -> 'url')."""
+    return etiqueta.rsplit('}', 1)[-1]
+
+
+class _LectorFragmentos:
+    """Objeto de solo lectura (read) sobre los fragmentos de bytes de una respuesta."""
+
+    def __init__(self, fragmentos):
+        self._fragmentos = iter(fragmentos)
+        self._pendiente = b''
+
+    def asomar(self, n):
+        """Los primeros `n` bytes por leer, sin consumirlos."""
+        self._llenar(n)
+        return self._pendiente[:n]
+
+    def read(self, n=-1):
+        self._llenar(n)
+        if n is None or n < 0:
+            datos, self._pendiente = self._pendiente, b''
+        else:
+            datos, self._pendiente = self._pendiente[:n], self._pendiente[n:]
+        return datos
+
+    def _llenar(self, n):
+        while n is None or n < 0 or len(self._pendiente) < n:
+            fragmento = next(self._fragmentos, None)
+            if fragmento is None:
+                break
+            self._pendiente += fragmento
+
+
+class _LecturaLimitada:
+    """Deja de entregar datos al llegar a `max_bytes` (protege de sitemaps y .gz desmesurados)."""
+
+    def __init__(self, fichero, max_bytes):
+        self._fichero = fichero
+        self._restantes = max_bytes
+
+    def read(self, n=-1):
+        if self._restantes <= 0:
+            return b''
+        n = self._restantes if n is None or n < 0 else min(n, self._restantes)
+        datos = self._fichero.read(n)
+        self._restantes -= len(datos)
+        return datos
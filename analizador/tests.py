@@ -1,13 +1,61 @@
 import os # For os.getenv mocking
-from django.test import TestCase, Client
+import requests
+import threading
+import time
+from collections import defaultdict
+from urllib.parse import urlparse
+from django.test import TestCase, Client, RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.db import DatabaseError, connection
 from django.urls import reverse
-from .models import Analisis, Hallazgo, Imagen, Enlace
+from django.utils import timezone
+from datetime import datetime, timedelta, timezone as dt_timezone
+import gzip
+import json
+import hashlib
+import tracemalloc
+from django.core.management import call_command
+from io import StringIO
+from .models import Analisis, Hallazgo, Incidencia, Imagen, Enlace, ArchivoSEO, ResumenRastreo, TrabajoRastreo, ConcesionPerdida, normalizar_host
 from .forms import AnalisisForm
-from unittest.mock import patch, MagicMock, PropertyMock
+from unittest.mock import patch, MagicMock, PropertyMock, ANY
 from bs4 import BeautifulSoup
 from .utils import obtener_recomendacion_ia, analizar_contenido_pagina, verificar_archivos_seo # Import the function to test
+from .utils import obtener_recomendaciones_ia_lote, generar_recomendacion_ia, RecomendacionNoDisponible
+from .utils import obtener_imagenes, obtener_enlaces, obtener_urls_sitio
+from .extractor import ExtraccionPagina, extraer_pagina, extraer_html, extraer_fragmentos, resolver_backend, backend_disponible, BACKENDS_HTML
+from .rastreador import Rastreador, descargar_pagina, extraer_respuesta
+from .frontera import Frontera, ConjuntoHuellas, FiltroBloom, crear_conjunto_vistas, exportar_vistas, importar_vistas
+from .cliente_http import ClienteHTTP
+from .trabajos import reclamar_siguiente_trabajo, ejecutar_trabajo, devolver_a_la_cola
+from .views import DetalleAnalisisView
+from .recomendaciones import enriquecer_rastreo, enriquecer_programadas
+from .base_conocimiento import SOLUCIONES, identificar_hallazgo, recomendacion_local
+from .persistencia import EscritorAnalisis
+from .planificador import PlanificadorHosts, segundos_retry_after
+from .robots import CacheRobots, ReglasRobots, descartar_cache_robots, reglas_desde_respuesta
+from .sitemap import EntradaSitemap, leer_sitemaps, parsear_lastmod, seleccionar_urls, sitemaps_de_robots
+from .cache_ia import CacheRecomendaciones, normalizar_hallazgo, obtener_cache_recomendaciones
+from .models import RecomendacionIA
+from .cliente_ia import ClienteIA, CircuitoAbierto, InterruptorCircuito, LimitadorTasa, ModeloFalso, descartar_cliente_ia
+from google.api_core import exceptions as google_exceptions
 import google.generativeai as genai # To mock its exceptions
 
+
+# Helper to build a real HTTP response (the crawler reads bodies with iter_content)
+def crear_respuesta_html(html, status_code=200, headers=None):
+    respuesta = requests.Response()
+    respuesta.status_code = status_code
+    respuesta.headers.update(headers or {})
+    respuesta.encoding = 'utf-8'
+    respuesta._content = html.encode('utf-8')
+    respuesta._content_consumed = True
+    return respuesta
+
+# Stand-in for obtener_recomendaciones_ia_lote: one recommendation per finding
+def recomendaciones_falsas(hallazgos, url_pagina, tecnologia_sitio):
+    return [f"Recomendación: {hallazgo['descripcion']}" for hallazgo in hallazgos]
+
 # Helper function to create a basic Analisis object for tests that need one
 def crear_analisis_test(url="https://ejemplo.com", tecnologia="generic", scope="single_url", num_pages=None):
     return Analisis.objects.create(
@@ -156,7 +204,27 @@ class AnalizadorViewsTests(TestCase): # Renamed from AnalizadorTests for clarity
         self.assertEqual(response.status_code, 200)
         self.assertTemplateUsed(response, 'analizador/resumen_analisis.html')
         self.assertEqual(response.context['analisis_principal'], self.analisis_principal)
-        self.assertEqual(len(response.context['urls_analizadas']), 2) # Principal + 1 relacionada
+        self.assertNotIn('urls_analizadas', response.context)  # La tabla se pide a paginas_json
+        self.assertEqual(response.context['total_urls'], 2) # Principal + 1 relacionada
+        self.assertContains(response, reverse('analizador:paginas_json', args=[self.analisis_principal.pk]))
+
+    @patch('analizador.cliente_http.ClienteHTTP.get', side_effect=AssertionError('Los informes no deben hacer peticiones'))
+    def test_informes_usan_archivos_seo_guardados(self, mock_get):
+        """robots.txt y sitemap.xml se muestran desde la copia guardada, sin peticiones al sitio."""
+        self.analisis_principal.robots_txt = True
+        self.analisis_principal.save()
+        ArchivoSEO.objects.create(
+            analisis=self.analisis_principal, tipo='robots.txt', url='https://ejemplo.com/robots.txt',
+            codigo_estado=200, contenido='User-agent: *\nDisallow: /privado/'
+        )
+        ArchivoSEO.objects.create(
+            analisis=self.analisis_principal, tipo='sitemap.xml', url='https://ejemplo.com/sitemap.xml', codigo_estado=404
+        )
+        response = self.client.get(reverse('analizador:resumen_analisis', args=[self.analisis_principal.pk]))
+        self.assertEqual(response.context['robots_content'], 'User-agent: *\nDisallow: /privado/')
+        self.assertIsNone(response.context['sitemap_content'])
+        self.assertContains(response, 'Disallow: /privado/')
+        mock_get.assert_not_called()
 
 class AnalizadorModelsTests(TestCase):
     def setUp(self):
@@ -220,16 +288,15 @@ class AnalizadorModelsTests(TestCase):
 
 # Tests for utils.py functions will be added in a new class TestUtils
 
-    @patch('analizador.views.requests.get')
-    @patch('analizador.views.analizar_contenido_pagina')
-    @patch('analizador.views.verificar_archivos_seo')
-    @patch('analizador.views.obtener_urls_sitio')
-    def test_inicio_view_post_single_url(self, mock_obtener_urls, mock_verificar_seo, mock_analizar_contenido, mock_requests_get):
+    @patch('analizador.cliente_http.ClienteHTTP.get')
+    @patch('analizador.trabajos.analizar_contenido_pagina')
+    @patch('analizador.trabajos.verificar_archivos_seo')
+    @patch('analizador.trabajos.obtener_urls_sitio')
+    @patch('analizador.recomendaciones.obtener_recomendaciones_ia_lote', side_effect=recomendaciones_falsas)
+    def test_inicio_view_post_single_url(self, mock_obtener_rec_ia, mock_obtener_urls, mock_verificar_seo, mock_analizar_contenido, mock_requests_get):
         """Test POST to inicio view for a single URL analysis with mocking."""
         # Configure mocks
-        mock_response_get = MagicMock()
-        mock_response_get.status_code = 200
-        mock_response_get.text = "<html><head><title>Test Page</title></head><body><h1>Hello</h1></body></html>"
+        mock_response_get = crear_respuesta_html("<html><head><title>Test Page</title></head><body><h1>Hello</h1></body></html>")
         mock_requests_get.return_value = mock_response_get
 
         mock_analizar_contenido.return_value = {
@@ -254,8 +321,11 @@ class AnalizadorModelsTests(TestCase):
         }
         
         response = self.client.post(reverse('analizador:inicio'), form_data)
+        self.assertEqual(response.status_code, 302) # Should redirect to estado_trabajo
+        with patch('analizador.trabajos.enriquecer_rastreo', side_effect=self._registrar_antes_de_enriquecer) as mock_enriquecer:
+            call_command('procesar_rastreos', once=True, stdout=StringIO()) # Run the queued crawl job
+        mock_enriquecer.assert_called_once()
 
-        self.assertEqual(response.status_code, 302) # Should redirect to resumen_analisis
         self.assertTrue(Analisis.objects.exists())
         analisis_obj = Analisis.objects.first()
         self.assertEqual(analisis_obj.url, 'https://testserver.com')
@@ -266,35 +336,54 @@ class AnalizadorModelsTests(TestCase):
         self.assertFalse(analisis_obj.sitemap_xml) # From mock_verificar_seo
         
         # Check that mocks were called
-        mock_requests_get.assert_called_once_with('https://testserver.com', timeout=10)
+        mock_requests_get.assert_called_once_with('https://testserver.com', stream=True)
         mock_analizar_contenido.assert_called_once()
-        mock_verificar_seo.assert_called_once_with('https://testserver.com')
+        mock_verificar_seo.assert_called_once_with('https://testserver.com', cliente=ANY)
         mock_obtener_urls.assert_not_called() # Not called for single_url after the first page
 
-        # Check Hallazgos created (1 from analizar_contenido, 1 from verificar_seo, 2 AI recommendations)
-        self.assertEqual(Hallazgo.objects.filter(analisis=analisis_obj).count(), 2 * 2) # Original finding + AI rec for each
-        self.assertEqual(Hallazgo.objects.filter(analisis=analisis_obj, tipo='recomendacion').count(), 2)
+        # The findings (1 from analizar_contenido, 1 from verificar_seo) were stored with the page,
+        # before any recommendation existed; no inline 'recomendacion' rows are created
+        self.assertEqual(self.antes_de_enriquecer, {
+            'hallazgos': [('info', 'Test info finding'), ('warning', 'Sitemap not found')],
+            'estados': {'pendiente'},
+        })
+        self.assertFalse(Hallazgo.objects.filter(tipo='recomendacion').exists())
+
+        # The recommendations arrive afterwards on each Incidencia (completar_recomendaciones)
+        incidencias = analisis_obj.incidencias.order_by('tipo')
+        self.assertEqual(
+            [(incidencia.tipo, incidencia.estado_recomendacion, incidencia.recomendacion) for incidencia in incidencias],
+            [('info', 'lista', 'Recomendación: Test info finding'), ('warning', 'lista', 'Recomendación: Sitemap not found')]
+        )
+        for hallazgo in analisis_obj.hallazgos.all():
+            self.assertEqual(hallazgo.recomendacion, f'Recomendación: {hallazgo.descripcion}')
+        mock_obtener_rec_ia.assert_called_once()
+
+    def _registrar_antes_de_enriquecer(self, analisis_principal):
+        """Stand-in for enriquecer_rastreo: records what was stored before the AI stage, then runs it."""
+        self.antes_de_enriquecer = {
+            'hallazgos': sorted(Hallazgo.objects.filter(analisis=analisis_principal).values_list('tipo', 'descripcion')),
+            'estados': set(analisis_principal.incidencias.values_list('estado_recomendacion', flat=True)),
+        }
+        return enriquecer_rastreo(analisis_principal)
 
 
-    @patch('analizador.views.requests.get')
-    @patch('analizador.views.analizar_contenido_pagina')
-    @patch('analizador.views.verificar_archivos_seo')
-    @patch('analizador.views.obtener_urls_sitio')
-    @patch('analizador.views.obtener_recomendacion_ia') # Mock AI recommendations
+    @patch('analizador.cliente_http.ClienteHTTP.get')
+    @patch('analizador.trabajos.analizar_contenido_pagina')
+    @patch('analizador.trabajos.verificar_archivos_seo')
+    @patch('analizador.trabajos.obtener_urls_sitio')
+    @patch('analizador.recomendaciones.obtener_recomendaciones_ia_lote') # Mock AI recommendations
     def test_inicio_view_post_multiple_pages(self, mock_obtener_rec_ia, mock_obtener_urls, mock_verificar_seo, mock_analizar_contenido, mock_requests_get):
         """Test POST to inicio view for multiple pages with mocking."""
+        descartar_cache_robots() # robots.txt rules are cached per host for the whole process
         # --- Configure Mocks ---
         # Mock requests.get to return different content for different URLs if needed
-        def mock_get_requests_side_effect(url_actual, timeout):
-            mock_resp = MagicMock()
-            mock_resp.status_code = 200
+        def mock_get_requests_side_effect(url_actual, **kwargs):
             if url_actual == 'https://multipage.com':
-                mock_resp.text = "<html><head><title>Main Page</title></head><body><a href='/page2'>Page 2</a><h1>Main</h1></body></html>"
+                return crear_respuesta_html("<html><head><title>Main Page</title></head><body><a href='/page2'>Page 2</a><h1>Main</h1></body></html>")
             elif url_actual == 'https://multipage.com/page2':
-                mock_resp.text = "<html><head><title>Page 2</title></head><body><h1>Subpage</h1></body></html>"
-            else:
-                mock_resp.text = "<html><head><title>Other Page</title></head><body><h1>Other</h1></body></html>"
-            return mock_resp
+                return crear_respuesta_html("<html><head><title>Page 2</title></head><body><h1>Subpage</h1></body></html>")
+            return crear_respuesta_html("<html><head><title>Other Page</title></head><body><h1>Other</h1></body></html>")
         mock_requests_get.side_effect = mock_get_requests_side_effect
 
         # Mock analizar_contenido_pagina
@@ -310,14 +399,14 @@ class AnalizadorModelsTests(TestCase):
         mock_verificar_seo.return_value = {'robots_txt_exists': True, 'sitemap_xml_exists': True, 'hallazgos_info': []}
         
         # Mock obtener_urls_sitio
-        def mock_urls_side_effect(url_actual, soup, urls_visitadas_union):
+        def mock_urls_side_effect(url_actual, soup, urls_visitadas_union, reglas_robots=None, bloqueadas=None):
             if url_actual == 'https://multipage.com':
-                return {'https://multipage.com/page2'}
-            return set()
+                return ['https://multipage.com/page2']
+            return []
         mock_obtener_urls.side_effect = mock_urls_side_effect
 
         # Mock AI recommendations
-        mock_obtener_rec_ia.return_value = "AI Recommendation placeholder"
+        mock_obtener_rec_ia.side_effect = lambda hallazgos, *args: ["AI Recommendation placeholder"] * len(hallazgos)
 
         # --- Form Data ---
         form_data = {
@@ -329,10 +418,12 @@ class AnalizadorModelsTests(TestCase):
 
         # --- Make POST request ---
         response = self.client.post(reverse('analizador:inicio'), form_data)
+        self.assertEqual(response.status_code, 302) # Redirect to estado_trabajo
+        with patch('analizador.trabajos.enriquecer_rastreo', side_effect=self._registrar_antes_de_enriquecer):
+            call_command('procesar_rastreos', once=True, stdout=StringIO()) # Run the queued crawl job
         
         # --- Assertions ---
-        self.assertEqual(response.status_code, 302) # Redirect to resumen
-        self.assertEqual(Analisis.objects.count(), 2) # Main page + page2
+        self.assertEqual(Analisis.objects.exclude(pk=self.analisis.pk).count(), 2) # Main page + page2 (self.analisis is from setUp)
         
         main_analisis = Analisis.objects.get(url='https://multipage.com')
         self.assertEqual(main_analisis.tecnologia_sitio, 'generic')
@@ -342,21 +433,37 @@ class AnalizadorModelsTests(TestCase):
         self.assertTrue(main_analisis.sitemap_xml)
 
         # Check calls to mocks
-        self.assertEqual(mock_requests_get.call_count, 2) # multipage.com and multipage.com/page2
+        # multipage.com, its robots.txt (user-agent rules, fetched once per host) and multipage.com/page2
+        self.assertEqual(
+            sorted(llamada.args[0] for llamada in mock_requests_get.call_args_list),
+            ['https://multipage.com', 'https://multipage.com/page2', 'https://multipage.com/robots.txt']
+        )
         self.assertEqual(mock_analizar_contenido.call_count, 2)
-        mock_verificar_seo.assert_called_once_with('https://multipage.com')
-        mock_obtener_urls.assert_called_once() # Called for the first page
+        mock_verificar_seo.assert_called_once_with('https://multipage.com', cliente=ANY)
+        # Links are discovered on every page (the frontier enforces num_pages), with the site's robots.txt rules
+        self.assertEqual([llamada.args[0] for llamada in mock_obtener_urls.call_args_list], ['https://multipage.com', 'https://multipage.com/page2'])
+        self.assertIsInstance(mock_obtener_urls.call_args.args[3], ReglasRobots)
 
-        # Check Hallazgos for the main page (1 original error + 1 AI rec)
-        self.assertEqual(Hallazgo.objects.filter(analisis=main_analisis).count(), 1 * 2)
-        self.assertEqual(Hallazgo.objects.filter(analisis=main_analisis, tipo='error').count(), 0) # Original error is not saved as 'error'
-        self.assertEqual(Hallazgo.objects.filter(analisis=main_analisis, tipo='recomendacion').count(), 1 * 1) # One AI rec for the one finding
+        # The main page's finding is stored as found, before the AI stage, and without inline 'recomendacion' rows
+        self.assertEqual(self.antes_de_enriquecer, {'hallazgos': [('error', 'Error main')], 'estados': {'pendiente'}})
+        self.assertFalse(Hallazgo.objects.filter(tipo='recomendacion').exists())
+
+        # Its recommendation arrives afterwards on the site's Incidencia
+        incidencia = main_analisis.incidencias.get()
+        self.assertEqual((incidencia.tipo, incidencia.num_ocurrencias), ('error', 1))
+        self.assertEqual((incidencia.estado_recomendacion, incidencia.recomendacion), ('lista', 'AI Recommendation placeholder'))
+        self.assertEqual(Hallazgo.objects.get(analisis=main_analisis).recomendacion, 'AI Recommendation placeholder')
 
         page2_analisis = Analisis.objects.get(url='https://multipage.com/page2')
         self.assertEqual(Hallazgo.objects.filter(analisis=page2_analisis).count(), 0) # No findings for page 2 in mock setup
 
 
 class AnalizadorUtilsTests(TestCase):
+    def setUp(self):
+        # La caché en memoria de recomendaciones y el cliente de la IA son del proceso y sobreviven entre tests
+        obtener_cache_recomendaciones().limpiar_memoria()
+        descartar_cliente_ia()
+
     def test_analizar_contenido_pagina_full_content(self):
         """Test analizar_contenido_pagina with typical content."""
         html_content = """
@@ -416,16 +523,12 @@ class AnalizadorUtilsTests(TestCase):
         self.assertIn({'tipo': 'info', 'descripcion': 'Pocos enlaces externos. Los enlaces a sitios autoritativos pueden mejorar el SEO.'}, resultado['hallazgos_info'])
 
 
-    @patch('analizador.utils.requests.get')
+    @patch('analizador.cliente_http.ClienteHTTP.get')
     def test_verificar_archivos_seo_both_exist(self, mock_get):
         """Test verificar_archivos_seo when both robots.txt and sitemap.xml exist."""
-        mock_robots_response = MagicMock()
-        mock_robots_response.status_code = 200
-        mock_robots_response.text = "User-agent: *\nDisallow: /private/"
+        mock_robots_response = crear_respuesta_html("User-agent: *\nDisallow: /private/")
         
-        mock_sitemap_response = MagicMock()
-        mock_sitemap_response.status_code = 200
-        mock_sitemap_response.text = "<xml></xml>"
+        mock_sitemap_response = crear_respuesta_html("<xml></xml>")
 
         mock_get.side_effect = [mock_robots_response, mock_sitemap_response]
         
@@ -433,10 +536,10 @@ class AnalizadorUtilsTests(TestCase):
         self.assertTrue(resultado['robots_txt_exists'])
         self.assertTrue(resultado['sitemap_xml_exists'])
         self.assertEqual(len(resultado['hallazgos_info']), 0)
-        mock_get.assert_any_call("https://ejemplo.com/robots.txt", timeout=5)
-        mock_get.assert_any_call("https://ejemplo.com/sitemap.xml", timeout=5)
+        mock_get.assert_any_call("https://ejemplo.com/robots.txt")
+        mock_get.assert_any_call("https://ejemplo.com/sitemap.xml", stream=True)
 
-    @patch('analizador.utils.requests.get')
+    @patch('analizador.cliente_http.ClienteHTTP.get')
     def test_verificar_archivos_seo_none_exist(self, mock_get):
         """Test verificar_archivos_seo when neither file exists."""
         mock_response = MagicMock()
@@ -450,7 +553,7 @@ class AnalizadorUtilsTests(TestCase):
         self.assertIn({'tipo': 'info', 'descripcion': 'No se encontró archivo robots.txt o está vacío.'}, resultado['hallazgos_info'])
         self.assertIn({'tipo': 'info', 'descripcion': 'No se encontró archivo sitemap.xml o está vacío.'}, resultado['hallazgos_info'])
 
-    @patch('analizador.utils.requests.get')
+    @patch('analizador.cliente_http.ClienteHTTP.get')
     def test_verificar_archivos_seo_request_exception(self, mock_get):
         """Test verificar_archivos_seo with requests.RequestException."""
         mock_get.side_effect = requests.exceptions.RequestException("Connection error")
@@ -593,4 +696,2069 @@ class AnalizadorUtilsTests(TestCase):
         mock_generative_model.return_value = mock_model_instance
         
         resultado = obtener_recomendacion_ia("Another finding", "https://test.com", "generic", "info")
-        self.assertEqual(resultado, "AI recommendation could not be generated for 'Another finding'. An unexpected error occurred with the AI service.")
\ No newline at end of file
+        self.assertEqual(resultado, "AI recommendation could not be generated for 'Another finding'. An unexpected error occurred with the AI service.")
+
+    def test_obtener_urls_sitio_respeta_el_orden_del_documento(self):
+        html = ''.join(f'<a href="/p{i}">{i}</a>' for i in (9, 3, 7, 1, 3, 5)) + '<a href="/p7#seccion">7</a>'
+        soup = BeautifulSoup(html, 'html.parser')
+        urls = obtener_urls_sitio('https://ejemplo.com/', soup, {'https://ejemplo.com/p1'})
+        self.assertEqual(urls, [f'https://ejemplo.com/p{i}' for i in (9, 3, 7, 5)])
+
+
+class RastreadorTests(TestCase):
+    def _respuesta(self, html="<html><body></body></html>"):
+        return crear_respuesta_html(html)
+
+    @patch('analizador.cliente_http.ClienteHTTP.get')
+    def test_rastrear_respeta_limite_por_host(self, mock_get):
+        """Las descargas se solapan, pero nunca más de max_por_host contra un mismo host."""
+        import threading
+        import time
+        lock = threading.Lock()
+        estado = {'actuales': 0, 'maximo': 0}
+
+        def lento(url, **kwargs):
+            with lock:
+                estado['actuales'] += 1
+                estado['maximo'] = max(estado['maximo'], estado['actuales'])
+            time.sleep(0.05)
+            with lock:
+                estado['actuales'] -= 1
+            return self._respuesta()
+        mock_get.side_effect = lento
+
+        rastreador = Rastreador(max_urls=10, max_workers=8, max_por_host=3)
+        visitadas = []
+        for pagina in rastreador.rastrear('https://ejemplo.com'):
+            visitadas.append(pagina.url)
+            if pagina.url == 'https://ejemplo.com':
+                rastreador.encolar(f'https://ejemplo.com/p{i}' for i in range(20))
+
+        self.assertEqual(len(visitadas), 10) # Límite global max_urls
+        self.assertEqual(estado['maximo'], 3)
+
+    @patch('analizador.cliente_http.ClienteHTTP.get')
+    def test_rastrear_entrega_errores_sin_detenerse(self, mock_get):
+        """Un fallo de descarga se entrega como error y el rastreo continúa."""
+        def side_effect(url, **kwargs):
+            if url.endswith('/rota'):
+                raise requests.ConnectionError("sin conexión")
+            return self._respuesta()
+        mock_get.side_effect = side_effect
+
+        rastreador = Rastreador(max_urls=5)
+        resultados = {}
+        for pagina in rastreador.rastrear('https://ejemplo.com'):
+            resultados[pagina.url] = pagina
+            if pagina.url == 'https://ejemplo.com':
+                rastreador.encolar(['https://ejemplo.com/rota', 'https://ejemplo.com/ok', 'https://ejemplo.com'])
+
+        self.assertEqual(set(resultados), {'https://ejemplo.com', 'https://ejemplo.com/rota', 'https://ejemplo.com/ok'})
+        self.assertIsInstance(resultados['https://ejemplo.com/rota'].error, requests.RequestException)
+        self.assertIsNotNone(resultados['https://ejemplo.com/ok'].extraccion)
+
+
+class TrabajoRastreoTests(TestCase):
+    def test_inicio_post_encola_trabajo_sin_rastrear(self):
+        """El POST solo encola el trabajo y redirige a su página de estado."""
+        with patch('analizador.cliente_http.ClienteHTTP.get') as mock_get:
+            response = self.client.post(reverse('analizador:inicio'), {
+                'url': 'https://ejemplo.com',
+                'crawl_scope': 'single_url',
+            })
+            mock_get.assert_not_called()
+
+        trabajo = TrabajoRastreo.objects.get()
+        self.assertEqual(trabajo.estado, 'pendiente')
+        self.assertRedirects(response, reverse('analizador:estado_trabajo', args=[trabajo.pk]), fetch_redirect_response=False)
+
+    def test_reclamar_siguiente_trabajo(self):
+        """Se reclama el trabajo más antiguo y no se vuelve a entregar."""
+        primero = TrabajoRastreo.objects.create(url='https://uno.com')
+        TrabajoRastreo.objects.create(url='https://dos.com')
+
+        reclamado = reclamar_siguiente_trabajo()
+        self.assertEqual(reclamado.pk, primero.pk)
+        self.assertEqual(reclamado.estado, 'en_curso')
+        self.assertIsNotNone(reclamado.fecha_inicio)
+        self.assertEqual(reclamar_siguiente_trabajo().url, 'https://dos.com')
+        self.assertIsNone(reclamar_siguiente_trabajo())
+
+    @patch('analizador.trabajos.rastrear_sitio', return_value=None)
+    def test_ejecutar_trabajo_fallido(self, mock_rastrear):
+        """Si la URL principal no pudo analizarse, el trabajo queda como fallido."""
+        trabajo = TrabajoRastreo.objects.create(url='https://caido.com')
+        ejecutar_trabajo(trabajo)
+        trabajo.refresh_from_db()
+        self.assertEqual(trabajo.estado, 'fallido')
+        self.assertIn('https://caido.com', trabajo.error)
+        self.assertIsNotNone(trabajo.fecha_fin)
+
+    def test_estado_trabajo_json(self):
+        """El endpoint de estado expone el avance y el enlace al resumen."""
+        analisis = crear_analisis_test()
+        trabajo = TrabajoRastreo.objects.create(
+            url='https://ejemplo.com', estado='completado', paginas_procesadas=3, analisis_principal=analisis
+        )
+        response = self.client.get(reverse('analizador:estado_trabajo_json', args=[trabajo.pk]))
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['estado'], 'completado')
+        self.assertTrue(data['terminado'])
+        self.assertEqual(data['paginas_procesadas'], 3)
+        self.assertEqual(data['url_resumen'], reverse('analizador:resumen_analisis', args=[analisis.pk]))
+
+
+class ClienteHTTPTests(TestCase):
+    def test_cliente_configura_pool_y_cabeceras(self):
+        """El cliente monta un adaptador con el tamaño de pool por host y cabeceras unificadas."""
+        with ClienteHTTP(pool_por_host=7, timeout=3, headers={'Accept-Language': 'es'}) as cliente:
+            adaptador = cliente.session.get_adapter('https://ejemplo.com')
+            self.assertEqual(adaptador._pool_maxsize, 7)
+            self.assertEqual(cliente.session.headers['Accept-Language'], 'es')
+            self.assertIn('User-Agent', cliente.session.headers)
+
+    @patch('analizador.cliente_http.requests.Session.get')
+    def test_get_aplica_timeout_unificado(self, mock_session_get):
+        """Las peticiones usan el timeout del cliente salvo que se indique otro."""
+        cliente = ClienteHTTP(timeout=3)
+        cliente.get('https://ejemplo.com')
+        mock_session_get.assert_called_with('https://ejemplo.com', timeout=3)
+        cliente.get('https://ejemplo.com', timeout=1)
+        mock_session_get.assert_called_with('https://ejemplo.com', timeout=1)
+
+    @patch('analizador.cliente_http.ClienteHTTP.get')
+    def test_rastreo_comparte_un_cliente(self, mock_get):
+        """Páginas, robots.txt y sitemap.xml de un rastreo salen del mismo cliente."""
+        mock_resp = crear_respuesta_html("<html><head><title>Inicio</title></head><body></body></html>")
+        mock_get.return_value = mock_resp
+
+        clientes = []
+        original_init = ClienteHTTP.__init__
+        def registrar(self, *args, **kwargs):
+            original_init(self, *args, **kwargs)
+            clientes.append(self)
+
+        with patch.object(ClienteHTTP, '__init__', registrar), patch('analizador.recomendaciones.obtener_recomendaciones_ia_lote', side_effect=recomendaciones_falsas):
+            trabajo = TrabajoRastreo.objects.create(url='https://ejemplo.com')
+            ejecutar_trabajo(trabajo)
+
+        self.assertEqual(len(clientes), 1)
+        self.assertEqual(mock_get.call_count, 3) # Página + robots.txt + sitemap.xml
+
+
+class FronteraTests(TestCase):
+    def test_orden_en_anchura_y_fifo(self):
+        """Las URLs menos profundas salen primero; a igual profundidad, en orden de llegada."""
+        frontera = Frontera()
+        frontera.agregar('https://ejemplo.com/a/1', profundidad=2)
+        frontera.agregar('https://ejemplo.com/b', profundidad=1)
+        frontera.agregar('https://ejemplo.com/c', profundidad=1)
+        frontera.agregar('https://ejemplo.com', profundidad=0)
+
+        orden = []
+        while frontera:
+            orden.append(frontera.siguiente()[0])
+        self.assertEqual(orden, ['https://ejemplo.com', 'https://ejemplo.com/b', 'https://ejemplo.com/c', 'https://ejemplo.com/a/1'])
+
+    def test_deduplicacion_y_profundidad_maxima(self):
+        """Una URL vista no se vuelve a encolar, ni siquiera tras ser entregada."""
+        frontera = Frontera(max_profundidad=1)
+        self.assertTrue(frontera.agregar('https://ejemplo.com'))
+        self.assertFalse(frontera.agregar('https://ejemplo.com'))
+        frontera.siguiente()
+        self.assertFalse(frontera.agregar('https://ejemplo.com', profundidad=1))
+        self.assertFalse(frontera.agregar('https://ejemplo.com/profunda', profundidad=2))
+        self.assertIn('https://ejemplo.com', frontera)
+        self.assertNotIn('https://ejemplo.com/profunda', frontera)
+        self.assertEqual(len(frontera), 0)
+
+    def test_siguiente_excluye_hosts(self):
+        """Los hosts excluidos (sin conexiones libres) se saltan sin perder sus URLs."""
+        frontera = Frontera()
+        frontera.agregar('https://uno.com/', profundidad=0)
+        frontera.agregar('https://dos.com/', profundidad=3)
+        self.assertEqual(frontera.siguiente(hosts_excluidos={'uno.com'}), ('https://dos.com/', 3))
+        self.assertIsNone(frontera.siguiente(hosts_excluidos={'uno.com'}))
+        self.assertEqual(frontera.siguiente(), ('https://uno.com/', 0))
+
+    @patch('analizador.cliente_http.ClienteHTTP.get')
+    def test_rastreador_respeta_profundidad(self, mock_get):
+        """El rastreador entrega la profundidad de cada página y no baja más de max_profundidad."""
+        mock_resp = crear_respuesta_html("<html></html>")
+        mock_get.return_value = mock_resp
+
+        rastreador = Rastreador(max_urls=50, max_profundidad=1)
+        profundidades = {}
+        for pagina in rastreador.rastrear('https://ejemplo.com'):
+            profundidades[pagina.url] = pagina.profundidad
+            rastreador.encolar([pagina.url + '/hijo'], profundidad=pagina.profundidad + 1)
+
+        self.assertEqual(profundidades, {'https://ejemplo.com': 0, 'https://ejemplo.com/hijo': 1})
+
+
+class ConjuntosVistasTests(TestCase):
+    def test_conjunto_huellas_crece_sin_perder_urls(self):
+        """La tabla de huellas se redimensiona y conserva todas las URLs."""
+        vistas = ConjuntoHuellas(capacidad_inicial=4)
+        urls = [f"https://ejemplo.com/p{i}" for i in range(1000)]
+        for url in urls:
+            vistas.add(url)
+        vistas.add(urls[0]) # Duplicado
+        self.assertEqual(len(vistas), 1000)
+        self.assertTrue(all(url in vistas for url in urls))
+        self.assertNotIn("https://ejemplo.com/otra", vistas)
+
+    def test_filtro_bloom_sin_falsos_negativos(self):
+        """El filtro Bloom nunca olvida una URL y respeta aproximadamente la tasa configurada."""
+        vistas = FiltroBloom(capacidad=2000, tasa_falsos_positivos=0.01)
+        urls = [f"https://ejemplo.com/p{i}" for i in range(2000)]
+        for url in urls:
+            vistas.add(url)
+        self.assertTrue(all(url in vistas for url in urls))
+        falsos = sum(f"https://otro.com/{i}" in vistas for i in range(5000))
+        self.assertLess(falsos / 5000, 0.03)
+
+    def test_crear_conjunto_vistas_modo_desconocido(self):
+        self.assertIsInstance(crear_conjunto_vistas('set'), set)
+        with self.assertRaises(ValueError):
+            crear_conjunto_vistas('trie')
+
+    @override_settings(CRAWL_SEEN_SET='huellas')
+    @patch('analizador.cliente_http.ClienteHTTP.get')
+    def test_rastreador_con_conjunto_compacto(self, mock_get):
+        """El rastreador deduplica igual con el conjunto de huellas."""
+        mock_resp = crear_respuesta_html("<html></html>")
+        mock_get.return_value = mock_resp
+
+        rastreador = Rastreador(max_urls=10)
+        self.assertIsInstance(rastreador.frontera.vistas, ConjuntoHuellas)
+        visitadas = []
+        for pagina in rastreador.rastrear('https://ejemplo.com'):
+            visitadas.append(pagina.url)
+            rastreador.encolar(['https://ejemplo.com', 'https://ejemplo.com/a'], profundidad=pagina.profundidad + 1)
+        self.assertEqual(sorted(visitadas), ['https://ejemplo.com', 'https://ejemplo.com/a'])
+
+
+class ExtractorTests(TestCase):
+    HTML = """
+    <html lang="es">
+        <head>
+            <title> Título de la página </title>
+            <meta property="og:title" content="Título OG">
+            <meta name="description" content="Descripción de prueba">
+            <meta name="description" content="Descripción duplicada">
+            <link rel="stylesheet" href="/estilos.css">
+            <link rel="canonical" href="https://ejemplo.com/pagina">
+        </head>
+        <body>
+            <h1>Principal <small>con subtítulo</small></h1>
+            <h2>Sección</h2>
+            <img src="/a.png" alt="A"><img src="https://cdn.com/b.png">
+            <a href="/interna">Interna</a>
+            <a href="#ancla">Ancla</a>
+            <a href="javascript:void(0)">JS</a>
+            <a href="https://externo.com/x"><span>Externa</span></a>
+            <a>Sin href</a>
+        </body>
+    </html>
+    """
+
+    def test_extraer_pagina_recoge_todas_las_senales(self):
+        """Una única pasada obtiene título, metas, encabezados, imágenes, enlaces, canonical e idioma."""
+        extraccion = extraer_pagina(BeautifulSoup(self.HTML, 'html.parser'), 'https://ejemplo.com/pagina')
+        self.assertEqual(extraccion.titulo, 'Título de la página')
+        self.assertEqual(extraccion.descripcion_meta, 'Descripción de prueba')
+        self.assertEqual(extraccion.propiedades, {'og:title': 'Título OG'})
+        self.assertEqual(extraccion.h1_tags, ['Principalcon subtítulo'])
+        self.assertEqual(extraccion.encabezados['h2'], ['Sección'])
+        self.assertEqual(extraccion.canonical, 'https://ejemplo.com/pagina')
+        self.assertEqual(extraccion.idioma, 'es')
+        self.assertEqual(extraccion.hrefs, ['/interna', '#ancla', 'javascript:void(0)', 'https://externo.com/x'])
+
+    def test_extraer_pagina_equivale_a_los_recorridos_separados(self):
+        """Imágenes, enlaces y URLs descubiertas coinciden con las funciones de varios recorridos."""
+        soup = BeautifulSoup(self.HTML, 'html.parser')
+        url = 'https://ejemplo.com/pagina'
+        extraccion = extraer_pagina(soup, url)
+        self.assertEqual(extraccion.imagenes, obtener_imagenes(soup, url))
+        self.assertEqual(extraccion.enlaces, obtener_enlaces(soup, url))
+        self.assertEqual(obtener_urls_sitio(url, extraccion, set()), obtener_urls_sitio(url, soup, set()))
+
+    def test_analizar_contenido_pagina_acepta_extraccion(self):
+        """analizar_contenido_pagina da el mismo resultado con el árbol o con su extracción."""
+        soup = BeautifulSoup(self.HTML, 'html.parser')
+        url = 'https://ejemplo.com/pagina'
+        self.assertEqual(
+            analizar_contenido_pagina(soup, url),
+            analizar_contenido_pagina(extraer_pagina(soup, url), url)
+        )
+
+
+class ConformidadBackendsHTMLTests(TestCase):
+    """Todos los backends de análisis HTML deben producir exactamente el mismo análisis."""
+
+    URL = 'https://ejemplo.com/dir/pagina'
+    PAGINAS = {
+        'completa': ExtractorTests.HTML,
+        'minima': '<html><head></head><body><p>Solo texto</p></body></html>',
+        'sin_html': '<title>Fragmento</title><h1>Encabezado</h1><a href="otra">Otra</a>',
+        'atributos_vacios': (
+            '<html lang=""><head><title></title><meta name="description"><link rel="canonical"></head>'
+            '<body><img src="" alt=""><img><a href="">Vacío</a><a href="?q=1">Consulta</a></body></html>'
+        ),
+        'entidades_y_anidado': (
+            '<html lang="en"><head><title>A &amp; B</title>'
+            '<meta name="description" content="  Tienda &quot;online&quot;  "></head>'
+            '<body><h1>Uno</h1><div><h1>Dos <em>y</em> tres</h1></div>'
+            '<h3>  Espacios  </h3><a href="../subir"><img src="i.png" alt="Icono"> Subir</a>'
+            '<a href="HTTPS://MAYUS.com/x">Mayúsculas</a><a href="mailto:a@b.com">Correo</a></body></html>'
+        ),
+        'html_roto': (
+            '<html><head><title>Roto</title><body><h1>Sin cerrar<p>párrafo<a href="/x">enlace'
+            '<img src="/y.png" alt="Y"></div></span><h2>Fin'
+        ),
+    }
+
+    def _firma(self, extraccion):
+        return (
+            extraccion.titulo, extraccion.metas, extraccion.propiedades, extraccion.encabezados,
+            extraccion.imagenes, extraccion.enlaces, extraccion.hrefs, extraccion.canonical, extraccion.idioma,
+        )
+
+    def test_backends_producen_el_mismo_analisis(self):
+        referencia = {
+            nombre: extraer_pagina(BeautifulSoup(html, 'html.parser'), self.URL) for nombre, html in self.PAGINAS.items()
+        }
+        for backend in BACKENDS_HTML:
+            if not backend_disponible(backend):
+                continue
+            for nombre, html in self.PAGINAS.items():
+                if nombre == 'html_roto' and backend != 'html.parser':
+                    continue  # Cada parser repara el HTML mal formado a su manera
+                with self.subTest(backend=backend, pagina=nombre):
+                    extraccion = extraer_html(html, self.URL, backend=backend)
+                    self.assertEqual(self._firma(extraccion), self._firma(referencia[nombre]))
+                    self.assertEqual(
+                        analizar_contenido_pagina(extraccion, self.URL),
+                        analizar_contenido_pagina(referencia[nombre], self.URL)
+                    )
+                    self.assertEqual(
+                        obtener_urls_sitio(self.URL, extraccion, set()),
+                        obtener_urls_sitio(self.URL, referencia[nombre], set())
+                    )
+
+    def test_html_roto_no_falla_con_ningun_backend(self):
+        for backend in BACKENDS_HTML:
+            if backend_disponible(backend):
+                with self.subTest(backend=backend):
+                    extraccion = extraer_html(self.PAGINAS['html_roto'], self.URL, backend=backend)
+                    self.assertEqual(extraccion.titulo, 'Roto')
+                    self.assertIn('https://ejemplo.com/x', [e['url'] for e in extraccion.enlaces])
+
+    @override_settings(HTML_PARSER_BACKEND='selectolax')
+    def test_backend_no_instalado_usa_html_parser(self):
+        with patch('analizador.extractor.LexborHTMLParser', None), self.assertLogs('analizador.extractor', 'WARNING'):
+            self.assertEqual(resolver_backend(), 'html.parser')
+
+    def test_backend_desconocido(self):
+        with self.assertRaises(ValueError):
+            resolver_backend('html5lib')
+
+
+class ExtraccionIncrementalTests(TestCase):
+    URL = ConformidadBackendsHTMLTests.URL
+    PAGINAS = dict(ConformidadBackendsHTMLTests.PAGINAS, **{
+        'comentarios_y_scripts': (
+            '<html><head><title>Con <!-- nota --> comentario</title><script>var a = "<h1>no</h1>";</script></head>'
+            '<body><h1>Uno<!-- c -->Dos</h1><a href="/s">Ver<script>x()</script> más</a>'
+            '<h2><a href="/dentro">Enlace en h2</a> y texto</h2><br/><div/><p>Después</p></body></html>'
+        ),
+    })
+    _firma = ConformidadBackendsHTMLTests._firma
+
+    def test_equivale_a_html_parser_con_cualquier_tamano_de_fragmento(self):
+        """Sin árbol y por fragmentos se obtienen las mismas señales, aunque los cortes partan etiquetas o texto."""
+        for nombre, html in self.PAGINAS.items():
+            referencia = self._firma(extraer_html(html, self.URL, backend='html.parser'))
+            for tamano in (1, 7, 64, len(html)):
+                with self.subTest(pagina=nombre, tamano=tamano):
+                    fragmentos = (html[i:i + tamano] for i in range(0, len(html), tamano))
+                    self.assertEqual(self._firma(extraer_fragmentos(fragmentos, self.URL)), referencia)
+
+    def test_extraer_respuesta_pasa_a_fragmentos_por_encima_del_umbral(self):
+        """Por encima del umbral se usa la extracción incremental, también con caracteres multibyte partidos."""
+        html = '<html><head><title>Cañón</title></head><body>%s</body></html>' % ''.join(
+            '<h2>Año %d</h2><a href="/p/%d">Página ñ %d</a>' % (i, i, i) for i in range(300)
+        )
+        esperado = self._firma(extraer_html(html, self.URL, backend='html.parser'))
+
+        with patch('analizador.rastreador.extraer_fragmentos', wraps=extraer_fragmentos) as incremental:
+            extraccion, truncada = extraer_respuesta(crear_respuesta_html(html), self.URL, umbral=1024, tamano_fragmento=333)
+            self.assertTrue(incremental.called)
+        self.assertEqual(self._firma(extraccion), esperado)
+
+        with patch('analizador.rastreador.extraer_fragmentos') as incremental:
+            extraccion, truncada = extraer_respuesta(crear_respuesta_html(html), self.URL, umbral=len(html.encode()))
+            self.assertFalse(incremental.called)
+        self.assertEqual(self._firma(extraccion), esperado)
+
+
+class LimitesDescargaTests(TestCase):
+    URL = 'https://ejemplo.com/recurso'
+
+    def _cliente(self, respuesta):
+        cliente = MagicMock()
+        cliente.get.return_value = respuesta
+        return cliente
+
+    def test_contenido_no_html_se_omite_sin_leer_el_cuerpo(self):
+        respuesta = crear_respuesta_html('%PDF-1.4', headers={'Content-Type': 'application/pdf'})
+        with patch.object(respuesta, 'iter_content') as iter_content:
+            pagina = descargar_pagina(self._cliente(respuesta), self.URL)
+        iter_content.assert_not_called()
+        self.assertEqual(pagina.estado_descarga, 'omitida')
+        self.assertIn('application/pdf', pagina.motivo_descarga)
+        self.assertIsNone(pagina.extraccion)
+
+    def test_html_con_charset_y_sin_content_type_se_analiza(self):
+        for headers in ({'Content-Type': 'text/html; charset=utf-8'}, {'Content-Type': 'application/XHTML+xml'}, {}):
+            with self.subTest(headers=headers):
+                respuesta = crear_respuesta_html('<title>Hola</title>', headers=headers)
+                pagina = descargar_pagina(self._cliente(respuesta), self.URL)
+                self.assertEqual(pagina.estado_descarga, 'completa')
+                self.assertEqual(pagina.extraccion.titulo, 'Hola')
+
+    @override_settings(CRAWL_MAX_PAGE_BYTES=100, HTML_STREAMING_CHUNK_SIZE=16)
+    def test_cuerpo_mayor_que_el_limite_se_trunca(self):
+        html = '<html><head><title>Grande</title></head><body>' + '<a href="/x">x</a>' * 50 + '</body></html>'
+        respuesta = crear_respuesta_html(html, headers={'Content-Length': str(len(html))})
+        pagina = descargar_pagina(self._cliente(respuesta), self.URL)
+        self.assertEqual(pagina.estado_descarga, 'truncada')
+        self.assertIn(f'{len(html)} bytes', pagina.motivo_descarga)
+        self.assertEqual(pagina.extraccion.titulo, 'Grande')
+        self.assertLess(len(pagina.extraccion.enlaces), 50)
+
+    def test_limite_exacto_no_trunca(self):
+        html = '<title>Justo</title>'
+        extraccion, truncada = extraer_respuesta(crear_respuesta_html(html), self.URL, max_bytes=len(html), tamano_fragmento=4)
+        self.assertFalse(truncada)
+        self.assertEqual(extraccion.titulo, 'Justo')
+
+    @patch('analizador.recomendaciones.obtener_recomendaciones_ia_lote', side_effect=recomendaciones_falsas)
+    @patch('analizador.trabajos.verificar_archivos_seo', return_value={'robots_txt_exists': True, 'sitemap_xml_exists': True, 'hallazgos_info': []})
+    @patch('analizador.cliente_http.ClienteHTTP.get')
+    def test_trabajo_registra_paginas_omitidas(self, mock_get, mock_verificar, mock_ia):
+        def side_effect(url, **kwargs):
+            if url.endswith('.pdf'):
+                return crear_respuesta_html('%PDF', headers={'Content-Type': 'application/pdf'})
+            return crear_respuesta_html('<title>Inicio</title><a href="/manual.pdf">PDF</a>', headers={'Content-Type': 'text/html'})
+        mock_get.side_effect = side_effect
+
+        trabajo = TrabajoRastreo.objects.create(url='https://ejemplo.com', crawl_scope='multiple_pages', num_pages=5)
+        ejecutar_trabajo(trabajo)
+
+        trabajo.refresh_from_db()
+        self.assertEqual(trabajo.estado, 'completado')
+        omitido = Analisis.objects.get(url='https://ejemplo.com/manual.pdf')
+        self.assertEqual(omitido.estado_descarga, 'omitida')
+        self.assertEqual(omitido.analisis_principal, trabajo.analisis_principal)
+        self.assertFalse(omitido.hallazgos.exists())
+        self.assertEqual(trabajo.analisis_principal.estado_descarga, 'completa')
+
+
+class EscritorAnalisisTests(TestCase):
+    def _pagina(self, i, principal=None):
+        analisis = Analisis(url=f'https://ejemplo.com/{i}', codigo_estado=200, analisis_principal=principal)
+        hallazgos = [Hallazgo(analisis=analisis, tipo='recomendacion', descripcion=f'Hallazgo {j}') for j in range(3)]
+        imagenes = [Imagen(analisis=analisis, url=f'https://ejemplo.com/{i}/{j}.png') for j in range(80)]
+        enlaces = [Enlace(analisis=analisis, url=f'https://ejemplo.com/{i}/{j}', tipo='interno') for j in range(300)]
+        return analisis, hallazgos, imagenes, enlaces
+
+    def test_lote_se_escribe_con_consultas_constantes(self):
+        """Un lote de páginas cuesta las mismas consultas tenga las filas que tenga."""
+        trabajo = TrabajoRastreo.objects.create(url='https://ejemplo.com')
+        escritor = EscritorAnalisis(trabajo, paginas_por_lote=100, segundos_por_lote=60)
+        for i in range(5):
+            analisis, hallazgos, imagenes, enlaces = self._pagina(i)
+            escritor.agregar(analisis, hallazgos=hallazgos, imagenes=imagenes, enlaces=enlaces)
+        trabajo.paginas_procesadas = 5
+        self.assertEqual(Analisis.objects.count(), 0)
+
+        # 1.920 filas: unas pocas sentencias INSERT multi-fila (SQLite limita las variables por sentencia)
+        with CaptureQueriesContext(connection) as consultas:
+            escritor.escribir()
+        self.assertLess(len(consultas), 20)
+        self.assertEqual(len(escritor), 0)
+        self.assertEqual(Analisis.objects.count(), 5)
+        self.assertEqual(Enlace.objects.count(), 1500)
+        self.assertEqual(Imagen.objects.filter(analisis__url='https://ejemplo.com/3').count(), 80)
+        self.assertEqual(Hallazgo.objects.count(), 15)
+        trabajo.refresh_from_db()
+        self.assertEqual(trabajo.paginas_procesadas, 5)
+
+    def test_escribe_al_llenar_el_lote(self):
+        escritor = EscritorAnalisis(paginas_por_lote=2, segundos_por_lote=60)
+        principal = self._pagina('principal')[0]
+        escritor.agregar(principal)
+        self.assertEqual(len(escritor), 1)
+        escritor.agregar(self._pagina(1)[0])
+        self.assertEqual(len(escritor), 0)
+        self.assertIsNotNone(principal.pk)
+
+    def test_fallo_de_escritura_descarta_el_lote(self):
+        escritor = EscritorAnalisis(paginas_por_lote=10, segundos_por_lote=60)
+        escritor.agregar(Analisis(url='https://ejemplo.com/sin-codigo', codigo_estado=None))
+        with self.assertRaises(Exception):
+            escritor.escribir()
+        self.assertEqual(len(escritor), 0)
+        escritor.agregar(self._pagina(1)[0])
+        escritor.escribir()
+        self.assertEqual(Analisis.objects.count(), 1)
+
+    @override_settings(CRAWL_DB_BATCH_PAGES=2)
+    @patch('analizador.recomendaciones.obtener_recomendaciones_ia_lote', side_effect=recomendaciones_falsas)
+    @patch('analizador.trabajos.verificar_archivos_seo', return_value={'robots_txt_exists': True, 'sitemap_xml_exists': True, 'hallazgos_info': []})
+    @patch('analizador.cliente_http.ClienteHTTP.get')
+    def test_trabajo_enlaza_todas_las_paginas_con_el_principal(self, mock_get, mock_verificar, mock_ia):
+        def side_effect(url, **kwargs):
+            if url == 'https://ejemplo.com':
+                return crear_respuesta_html(''.join(f'<a href="/p{i}">P{i}</a>' for i in range(5)) + '<img src="/a.png">')
+            return crear_respuesta_html('<title>Hija</title><h1>Hija</h1>')
+        mock_get.side_effect = side_effect
+
+        trabajo = TrabajoRastreo.objects.create(url='https://ejemplo.com', crawl_scope='multiple_pages', num_pages=6)
+        ejecutar_trabajo(trabajo)
+
+        principal = trabajo.analisis_principal
+        self.assertEqual(principal.urls_analizadas.count(), 5)
+        self.assertEqual(principal.enlaces.count(), 5)
+        self.assertEqual(principal.imagenes.count(), 1)
+        self.assertTrue(principal.hallazgos.exists())
+        trabajo.refresh_from_db()
+        self.assertEqual(trabajo.paginas_procesadas, 6)
+
+    def test_fallo_de_escritura_deja_los_analisis_sin_clave(self):
+        escritor = EscritorAnalisis(paginas_por_lote=10, segundos_por_lote=60)
+        principal, _, _, enlaces = self._pagina('principal')
+        escritor.agregar(principal, enlaces=enlaces)
+        with patch.object(Enlace.objects, 'bulk_create', side_effect=DatabaseError('disco lleno')):
+            with self.assertRaises(DatabaseError):
+                escritor.escribir()
+        self.assertIsNone(principal.pk)
+        self.assertTrue(principal._state.adding)
+
+        # Se puede volver a escribir, y las páginas que lo referencian apuntan a la fila nueva
+        escritor.agregar(principal)
+        escritor.escribir()
+        escritor.agregar(self._pagina(1, principal=principal)[0])
+        escritor.escribir()
+        self.assertEqual(Analisis.objects.filter(analisis_principal=principal).count(), 1)
+
+    def _rastrear_con_fallos(self, mock_get, fallidas):
+        """Rastrea 6 páginas haciendo fallar las llamadas `fallidas` (1, 2...) a Enlace.objects.bulk_create."""
+        descartar_cache_robots()
+        def side_effect(url, **kwargs):
+            if url == 'https://ejemplo.com':
+                return crear_respuesta_html(''.join(f'<a href="/p{i}">P{i}</a>' for i in range(5)))
+            if url.endswith('/robots.txt'):
+                return crear_respuesta_html('', status_code=404)
+            if url.endswith('/p4'):
+                raise requests.ConnectionError('sin conexión')
+            return crear_respuesta_html('<title>Hija</title>')
+        mock_get.side_effect = side_effect
+
+        bulk_create, llamadas = Enlace.objects.bulk_create, []
+        def fallar(filas, *args, **kwargs):
+            llamadas.append(1)
+            if len(llamadas) in fallidas:
+                raise DatabaseError('disco lleno')
+            return bulk_create(filas, *args, **kwargs)
+
+        with patch.object(Enlace.objects, 'bulk_create', side_effect=fallar):
+            return ejecutar_trabajo(TrabajoRastreo.objects.create(url='https://ejemplo.com', crawl_scope='multiple_pages', num_pages=6))
+
+    @override_settings(CRAWL_DB_BATCH_PAGES=2)
+    @patch('analizador.recomendaciones.obtener_recomendaciones_ia_lote', side_effect=recomendaciones_falsas)
+    @patch('analizador.trabajos.verificar_archivos_seo', return_value={'robots_txt_exists': True, 'sitemap_xml_exists': True, 'hallazgos_info': []})
+    @patch('analizador.cliente_http.ClienteHTTP.get')
+    def test_lote_sin_guardar_no_detiene_el_rastreo(self, mock_get, mock_verificar, mock_ia):
+        trabajo = self._rastrear_con_fallos(mock_get, fallidas={2})
+
+        self.assertEqual(trabajo.estado, 'completado')
+        self.assertEqual(trabajo.paginas_procesadas, 6)
+        self.assertEqual(trabajo.analisis_principal.urls_analizadas.count(), 2)  # Las 2 del lote descartado faltan
+        self.assertTrue(any('disco lleno' in mensaje['texto'] for mensaje in trabajo.mensajes))
+        self.assertEqual(trabajo.analisis_principal.resumen.total_paginas, 3)
+
+    @override_settings(CRAWL_DB_BATCH_PAGES=2)
+    @patch('analizador.recomendaciones.obtener_recomendaciones_ia_lote', side_effect=recomendaciones_falsas)
+    @patch('analizador.trabajos.verificar_archivos_seo', return_value={'robots_txt_exists': True, 'sitemap_xml_exists': True, 'hallazgos_info': []})
+    @patch('analizador.cliente_http.ClienteHTTP.get')
+    def test_principal_sin_guardar_no_figura_como_guardada(self, mock_get, mock_verificar, mock_ia):
+        trabajo = self._rastrear_con_fallos(mock_get, fallidas={1})
+
+        self.assertEqual(trabajo.estado, 'fallido')
+        self.assertIsNone(trabajo.analisis_principal)
+        self.assertFalse(Analisis.objects.exists())
+        self.assertFalse(ResumenRastreo.objects.exists())
+        self.assertTrue(any('disco lleno' in mensaje['texto'] for mensaje in trabajo.mensajes))
+
+
+class ArchivoSEOTests(TestCase):
+    def test_contenido_se_guarda_comprimido(self):
+        contenido = 'User-agent: *\nDisallow: /privado/\n' * 200
+        archivo = ArchivoSEO.objects.create(
+            analisis=crear_analisis_test(), tipo='robots.txt', url='https://ejemplo.com/robots.txt', codigo_estado=200, contenido=contenido
+        )
+        archivo = ArchivoSEO.objects.get(pk=archivo.pk)
+        self.assertEqual(archivo.contenido, contenido)
+        self.assertLess(len(archivo.contenido_comprimido), len(contenido) // 10)
+
+    @patch('analizador.recomendaciones.obtener_recomendaciones_ia_lote', side_effect=recomendaciones_falsas)
+    @patch('analizador.cliente_http.ClienteHTTP.get')
+    def test_rastreo_guarda_robots_y_sitemap(self, mock_get, mock_ia):
+        def side_effect(url, **kwargs):
+            if url.endswith('/robots.txt'):
+                return crear_respuesta_html('User-agent: *\nAllow: /')
+            if url.endswith('/sitemap.xml'):
+                raise requests.ConnectionError('sin conexión')
+            return crear_respuesta_html('<title>Inicio</title>')
+        mock_get.side_effect = side_effect
+
+        trabajo = ejecutar_trabajo(TrabajoRastreo.objects.create(url='https://ejemplo.com'))
+        archivos = {archivo.tipo: archivo for archivo in trabajo.analisis_principal.archivos_seo.all()}
+        self.assertEqual(archivos['robots.txt'].codigo_estado, 200)
+        self.assertEqual(archivos['robots.txt'].contenido, 'User-agent: *\nAllow: /')
+        self.assertIsNone(archivos['sitemap.xml'].codigo_estado)
+        self.assertEqual(archivos['sitemap.xml'].contenido, '')
+
+
+class CacheRecomendacionesTests(TestCase):
+    def setUp(self):
+        obtener_cache_recomendaciones().limpiar_memoria()
+        descartar_cliente_ia()
+
+    def test_normalizar_hallazgo_ignora_urls_cifras_y_espacios(self):
+        self.assertEqual(
+            normalizar_hallazgo('Imagen sin texto alternativo: https://a.com/1.png'),
+            normalizar_hallazgo('imagen  sin texto alternativo: https://b.com/otra.jpg.')
+        )
+        self.assertEqual(normalizar_hallazgo('El título tiene 75 caracteres'), 'el título tiene <n> caracteres')
+
+    def test_niveles_memoria_y_base_de_datos(self):
+        cache = CacheRecomendaciones(tamano_memoria=10)
+        self.assertIsNone(cache.obtener('Pocos enlaces internos', 'wordpress', 'warning'))
+        cache.guardar('Pocos enlaces internos', 'wordpress', 'warning', 'Añade enlaces internos.')
+
+        self.assertEqual(cache.obtener('Pocos  enlaces internos.', 'wordpress', 'warning'), 'Añade enlaces internos.')
+        self.assertIsNone(cache.obtener('Pocos enlaces internos', 'django', 'warning'))  # Otra tecnología
+        self.assertIsNone(cache.obtener('Pocos enlaces internos', 'wordpress', 'info'))  # Otro tipo
+
+        # Otro proceso (caché en memoria vacía) la encuentra en la base de datos
+        otra = CacheRecomendaciones()
+        self.assertEqual(otra.obtener('Pocos enlaces internos', 'wordpress', 'warning'), 'Añade enlaces internos.')
+        self.assertEqual(RecomendacionIA.objects.get().usos, 1)
+
+        self.assertEqual(cache.estadisticas()['aciertos_memoria'], 1)
+        self.assertEqual(cache.estadisticas()['fallos'], 3)
+        self.assertEqual(otra.estadisticas()['aciertos_bd'], 1)
+
+    def test_lru_y_caducidad(self):
+        cache = CacheRecomendaciones(tamano_memoria=2, ttl=timedelta(days=1), max_entradas=2)
+        for i in range(3):
+            cache.guardar(f'Hallazgo {chr(97 + i)}', 'generic', 'info', f'Recomendación {i}')
+        self.assertEqual(cache.estadisticas()['entradas_memoria'], 2)
+
+        cache.purgar()
+        self.assertEqual(RecomendacionIA.objects.count(), 2)
+        self.assertFalse(RecomendacionIA.objects.filter(hallazgo_normalizado='hallazgo a').exists())
+
+        RecomendacionIA.objects.update(fecha_creacion=timezone.now() - timedelta(days=2))
+        cache.limpiar_memoria()
+        self.assertIsNone(cache.obtener('Hallazgo b', 'generic', 'info'))
+        cache.purgar()
+        self.assertEqual(RecomendacionIA.objects.count(), 0)
+
+    @patch('analizador.utils.os.getenv', return_value='fake_key')
+    @patch('analizador.utils.genai.configure')
+    @patch('analizador.utils.genai.GenerativeModel')
+    def test_hallazgos_repetidos_consultan_la_ia_una_vez(self, mock_generative_model, mock_configure, mock_getenv):
+        respuesta = MagicMock()
+        type(respuesta).parts = PropertyMock(return_value=[])
+        type(respuesta).text = PropertyMock(return_value='Escribe una meta descripción.')
+        mock_generative_model.return_value.generate_content.return_value = respuesta
+
+        for i in range(5):
+            resultado = obtener_recomendacion_ia('No se encontró meta descripción', f'https://ejemplo.com/{i}', 'generic', 'error')
+            self.assertEqual(resultado, 'Escribe una meta descripción.')
+        self.assertEqual(mock_generative_model.return_value.generate_content.call_count, 1)
+
+    @patch('analizador.utils.os.getenv', return_value='fake_key')
+    @patch('analizador.utils.genai.configure')
+    @patch('analizador.utils.genai.GenerativeModel')
+    def test_errores_no_se_cachean(self, mock_generative_model, mock_configure, mock_getenv):
+        mock_generative_model.return_value.generate_content.side_effect = Exception('fallo')
+        obtener_recomendacion_ia('Hallazgo con error', 'https://ejemplo.com', 'generic', 'info')
+        obtener_recomendacion_ia('Hallazgo con error', 'https://ejemplo.com', 'generic', 'info')
+        self.assertEqual(mock_generative_model.return_value.generate_content.call_count, 2)
+        self.assertFalse(RecomendacionIA.objects.exists())
+
+
+class RecomendacionesLoteTests(TestCase):
+    HALLAZGOS = [
+        {'tipo': 'error', 'descripcion': 'No se encontró meta descripción'},
+        {'tipo': 'warning', 'descripcion': 'Pocos enlaces internos'},
+        {'tipo': 'error', 'descripcion': 'No se encontró etiqueta H1'},
+    ]
+
+    def setUp(self):
+        obtener_cache_recomendaciones().limpiar_memoria()
+        descartar_cliente_ia()
+
+    def _respuesta(self, texto):
+        respuesta = MagicMock()
+        type(respuesta).parts = PropertyMock(return_value=[])
+        type(respuesta).text = PropertyMock(return_value=texto)
+        return respuesta
+
+    @patch('analizador.utils.os.getenv', return_value='fake_key')
+    @patch('analizador.utils.genai.configure')
+    @patch('analizador.utils.genai.GenerativeModel')
+    def test_una_peticion_para_todos_los_hallazgos(self, mock_generative_model, mock_configure, mock_getenv):
+        generate_content = mock_generative_model.return_value.generate_content
+        generate_content.return_value = self._respuesta(
+            '```json\n[{"id": 2, "recomendacion": "Añade un H1."}, {"id": 0, "recomendacion": "Añade una meta descripción."},'
+            ' {"id": 1, "recomendacion": "Enlaza otras páginas."}]\n```'
+        )
+        hallazgos = self.HALLAZGOS + [{'tipo': 'error', 'descripcion': 'No se encontró meta descripción'}]
+
+        resultado = obtener_recomendaciones_ia_lote(hallazgos, 'https://ejemplo.com', 'wordpress')
+
+        self.assertEqual(resultado, ['Añade una meta descripción.', 'Enlaza otras páginas.', 'Añade un H1.', 'Añade una meta descripción.'])
+        self.assertEqual(generate_content.call_count, 1)
+        prompt = generate_content.call_args[0][0]
+        self.assertEqual(prompt.count('No se encontró meta descripción'), 1)  # Los repetidos se envían una vez
+        self.assertIn('wordpress', prompt)
+        self.assertEqual(RecomendacionIA.objects.count(), 3)
+
+        # Ya en caché: no se vuelve a consultar
+        self.assertEqual(obtener_recomendaciones_ia_lote(self.HALLAZGOS, 'https://ejemplo.com/2', 'wordpress')[1], 'Enlaza otras páginas.')
+        self.assertEqual(generate_content.call_count, 1)
+
+    @override_settings(IA_BATCH_SIZE=2)
+    @patch('analizador.utils.os.getenv', return_value='fake_key')
+    @patch('analizador.utils.genai.configure')
+    @patch('analizador.utils.genai.GenerativeModel')
+    def test_lotes_de_ia_batch_size(self, mock_generative_model, mock_configure, mock_getenv):
+        generate_content = mock_generative_model.return_value.generate_content
+        generate_content.side_effect = [
+            self._respuesta('[{"id": 0, "recomendacion": "A"}, {"id": 1, "recomendacion": "B"}]'),
+            self._respuesta('[{"id": 0, "recomendacion": "C"}]'),
+        ]
+        self.assertEqual(obtener_recomendaciones_ia_lote(self.HALLAZGOS, 'https://ejemplo.com', 'generic'), ['A', 'B', 'C'])
+        self.assertEqual(generate_content.call_count, 2)
+
+    @patch('analizador.utils.os.getenv', return_value='fake_key')
+    @patch('analizador.utils.genai.configure')
+    @patch('analizador.utils.genai.GenerativeModel')
+    def test_respuesta_no_interpretable_recurre_a_uno_por_uno(self, mock_generative_model, mock_configure, mock_getenv):
+        generate_content = mock_generative_model.return_value.generate_content
+        generate_content.side_effect = [
+            self._respuesta('[{"id": 1, "recomendacion": "Enlaza otras páginas."}, {"id": 7, "recomendacion": "?"}'),
+            self._respuesta('Recomendación individual 0'),
+            self._respuesta('Recomendación individual 1'),
+            self._respuesta('Recomendación individual 2'),
+        ]
+        resultado = obtener_recomendaciones_ia_lote(self.HALLAZGOS, 'https://ejemplo.com', 'generic')
+        self.assertEqual(resultado, ['Recomendación individual 0', 'Recomendación individual 1', 'Recomendación individual 2'])
+        self.assertEqual(generate_content.call_count, 4)
+
+    @patch('analizador.utils.os.getenv', return_value='fake_key')
+    @patch('analizador.utils.genai.configure')
+    @patch('analizador.utils.genai.GenerativeModel')
+    def test_hallazgos_que_faltan_se_piden_uno_a_uno(self, mock_generative_model, mock_configure, mock_getenv):
+        generate_content = mock_generative_model.return_value.generate_content
+        generate_content.side_effect = [
+            self._respuesta('[{"id": 0, "recomendacion": "A"}, {"id": 2, "recomendacion": ""}]'),
+            self._respuesta('B'),
+            self._respuesta('C'),
+        ]
+        self.assertEqual(obtener_recomendaciones_ia_lote(self.HALLAZGOS, 'https://ejemplo.com', 'generic'), ['A', 'B', 'C'])
+        self.assertEqual(generate_content.call_count, 3)
+
+    @override_settings(IA_BATCH_MODE='pagina')
+    @patch('analizador.recomendaciones.obtener_recomendaciones_ia_lote', side_effect=recomendaciones_falsas)
+    @patch('analizador.trabajos.verificar_archivos_seo', return_value={'robots_txt_exists': True, 'sitemap_xml_exists': True, 'hallazgos_info': []})
+    @patch('analizador.cliente_http.ClienteHTTP.get')
+    def test_modo_pagina_una_llamada_por_pagina(self, mock_get, mock_verificar, mock_lote):
+        mock_get.return_value = crear_respuesta_html('<img src="/a.png"><img src="/b.png">')
+        trabajo = ejecutar_trabajo(TrabajoRastreo.objects.create(url='https://ejemplo.com'))
+
+        mock_lote.assert_called_once()
+        hallazgos_info = mock_lote.call_args[0][0]
+        self.assertGreater(len(hallazgos_info), 1)
+        for hallazgo in trabajo.analisis_principal.hallazgos.all():
+            self.assertEqual(hallazgo.recomendacion, f"Recomendación: {hallazgo.descripcion}")
+            self.assertEqual(hallazgo.estado_recomendacion, 'lista')
+        self.assertEqual(trabajo.analisis_principal.hallazgos.count(), len(hallazgos_info))
+
+    @override_settings(IA_BATCH_MODE='rastreo')
+    @patch('analizador.recomendaciones.obtener_recomendaciones_ia_lote', side_effect=recomendaciones_falsas)
+    @patch('analizador.trabajos.verificar_archivos_seo', return_value={'robots_txt_exists': True, 'sitemap_xml_exists': True, 'hallazgos_info': []})
+    @patch('analizador.cliente_http.ClienteHTTP.get')
+    def test_modo_rastreo_agrupa_por_tipo(self, mock_get, mock_verificar, mock_lote):
+        def side_effect(url, **kwargs):
+            if url == 'https://ejemplo.com':
+                return crear_respuesta_html('<a href="/p1">P1</a><a href="/p2">P2</a>')
+            return crear_respuesta_html('<title>Hija</title>')
+        mock_get.side_effect = side_effect
+
+        trabajo = ejecutar_trabajo(TrabajoRastreo.objects.create(url='https://ejemplo.com', crawl_scope='multiple_pages', num_pages=3))
+
+        tipos = [{hallazgo['tipo'] for hallazgo in llamada[0][0]} for llamada in mock_lote.call_args_list]
+        self.assertTrue(all(len(tipo) == 1 for tipo in tipos))
+        self.assertEqual(len(tipos), len(set.union(*tipos)))  # Una llamada por tipo
+        self.assertEqual(sum(len(llamada[0][0]) for llamada in mock_lote.call_args_list), Incidencia.objects.count())
+        for analisis in Analisis.objects.all():
+            self.assertTrue(analisis.hallazgos.exists())
+        self.assertEqual(trabajo.analisis_principal.urls_analizadas.count(), 2)
+
+    @override_settings(IA_BATCH_MODE='hallazgo')
+    @patch('analizador.recomendaciones.generar_recomendacion_ia', return_value='Recomendación')
+    @patch('analizador.trabajos.verificar_archivos_seo', return_value={'robots_txt_exists': True, 'sitemap_xml_exists': True, 'hallazgos_info': []})
+    @patch('analizador.cliente_http.ClienteHTTP.get')
+    def test_modo_hallazgo_una_llamada_por_hallazgo(self, mock_get, mock_verificar, mock_ia):
+        mock_get.return_value = crear_respuesta_html('<img src="/a.png">')
+        trabajo = ejecutar_trabajo(TrabajoRastreo.objects.create(url='https://ejemplo.com'))
+        self.assertEqual(mock_ia.call_count, trabajo.analisis_principal.hallazgos.count())
+        self.assertGreater(mock_ia.call_count, 1)
+
+
+class RelojFalso:
+    """Reloj para los tests: dormir() adelanta el tiempo en lugar de esperar."""
+
+    def __init__(self):
+        self.ahora = 0.0
+        self.esperas = []
+
+    def __call__(self):
+        return self.ahora
+
+    def dormir(self, segundos):
+        self.esperas.append(segundos)
+        self.ahora += segundos
+
+
+class ClienteIATests(TestCase):
+    def _cliente(self, modelo, **kwargs):
+        reloj = RelojFalso()
+        opciones = dict(max_concurrencia=2, peticiones_por_minuto=60, max_reintentos=3, espera_base=1, espera_maxima=4,
+                        fallos_circuito=2, enfriamiento=30, reloj=reloj, dormir=reloj.dormir)
+        opciones.update(kwargs)
+        return ClienteIA(modelo, **opciones), reloj
+
+    def test_limitador_tasa_admite_rafaga_y_despues_espera(self):
+        reloj = RelojFalso()
+        limitador = LimitadorTasa(tasa=2, capacidad=3, reloj=reloj, dormir=reloj.dormir)
+        self.assertEqual([limitador.adquirir() for _ in range(3)], [0, 0, 0])
+        self.assertAlmostEqual(limitador.adquirir(), 0.5)
+        reloj.ahora += 10
+        self.assertEqual(limitador.adquirir(), 0)  # La ráfaga se recupera, sin pasar de la capacidad
+        self.assertEqual([limitador.adquirir() for _ in range(2)], [0, 0])
+        self.assertAlmostEqual(limitador.adquirir(), 0.5)
+
+    def test_reintenta_errores_transitorios_con_espera_exponencial(self):
+        modelo = ModeloFalso(respuestas='Hecho', errores=[google_exceptions.ResourceExhausted('cuota'), google_exceptions.ServiceUnavailable('caído')])
+        cliente, reloj = self._cliente(modelo)
+        with patch('analizador.cliente_ia.random.uniform', return_value=1):
+            self.assertEqual(cliente.generar('prompt').text, 'Hecho')
+        self.assertEqual(reloj.esperas, [1, 2])
+        self.assertEqual(len(modelo.prompts), 3)
+        self.assertEqual(cliente.estadisticas()['reintentos'], 2)
+
+    def test_errores_no_transitorios_no_se_reintentan(self):
+        modelo = ModeloFalso(errores=[ValueError('bloqueado')])
+        cliente, reloj = self._cliente(modelo)
+        with self.assertRaises(ValueError):
+            cliente.generar('prompt')
+        self.assertEqual(len(modelo.prompts), 1)
+        self.assertEqual(cliente.circuito.estado, 'cerrado')
+
+    def test_circuito_se_abre_y_se_recupera(self):
+        modelo = ModeloFalso(respuestas='Hecho', errores=[google_exceptions.ServiceUnavailable('caído')] * 4)
+        cliente, reloj = self._cliente(modelo, max_reintentos=1)
+        for _ in range(2):
+            with self.assertRaises(google_exceptions.ServiceUnavailable):
+                cliente.generar('prompt')
+        self.assertEqual(cliente.circuito.estado, 'abierto')
+
+        with self.assertRaises(CircuitoAbierto):
+            cliente.generar('prompt')
+        self.assertEqual(len(modelo.prompts), 4)  # Abierto: no se llama al modelo
+
+        reloj.ahora += 30
+        self.assertEqual(cliente.circuito.estado, 'semiabierto')
+        self.assertEqual(cliente.generar('prompt').text, 'Hecho')
+        self.assertEqual(cliente.circuito.estado, 'cerrado')
+        self.assertEqual(cliente.estadisticas()['rechazadas'], 1)
+
+    def test_errores_persistentes_de_la_api_abren_el_circuito(self):
+        modelo = ModeloFalso(respuestas='Hecho', errores=[google_exceptions.PermissionDenied('clave no válida')] * 3)
+        cliente, reloj = self._cliente(modelo)
+        for _ in range(2):
+            with self.assertRaises(google_exceptions.PermissionDenied):
+                cliente.generar('prompt')
+        self.assertEqual(len(modelo.prompts), 2)  # No se reintentan
+        self.assertEqual(cliente.circuito.estado, 'abierto')
+
+        # La prueba del semiabierto también falla: el circuito se vuelve a abrir
+        reloj.ahora += 30
+        with self.assertRaises(google_exceptions.PermissionDenied):
+            cliente.generar('prompt')
+        self.assertEqual(cliente.circuito.estado, 'abierto')
+        self.assertEqual(cliente.estadisticas()['fallos'], 3)
+
+    def test_error_de_un_prompt_no_cierra_el_circuito(self):
+        modelo = ModeloFalso(respuestas='Hecho', errores=[google_exceptions.ServiceUnavailable('caído')] * 2 + [ValueError('bloqueado')])
+        cliente, reloj = self._cliente(modelo, max_reintentos=0)
+        for _ in range(2):
+            with self.assertRaises(google_exceptions.ServiceUnavailable):
+                cliente.generar('prompt')
+        reloj.ahora += 30
+        with self.assertRaises(ValueError):
+            cliente.generar('prompt')  # La prueba no dice nada de la API: sigue semiabierto
+        self.assertEqual(cliente.circuito.estado, 'semiabierto')
+        self.assertEqual(cliente.generar('prompt').text, 'Hecho')
+        self.assertEqual(cliente.circuito.estado, 'cerrado')
+
+    def test_prueba_fallida_reabre_el_circuito(self):
+        circuito = InterruptorCircuito(max_fallos=1, enfriamiento=10, reloj=RelojFalso())
+        circuito.registrar_fallo()
+        circuito._reloj.ahora = 10
+        circuito.comprobar()  # Llamada de prueba
+        with self.assertRaises(CircuitoAbierto):
+            circuito.comprobar()  # Solo una prueba a la vez
+        circuito.registrar_fallo()
+        self.assertEqual(circuito.estado, 'abierto')
+
+    def test_generar_varios_respeta_la_concurrencia(self):
+        en_vuelo, maximo = [0], [0]
+        lock = threading.Lock()
+
+        def respuesta(prompt):
+            with lock:
+                en_vuelo[0] += 1
+                maximo[0] = max(maximo[0], en_vuelo[0])
+            time.sleep(0.02)
+            with lock:
+                en_vuelo[0] -= 1
+            return prompt.upper()
+
+        cliente, _ = self._cliente(ModeloFalso(respuestas=respuesta), max_concurrencia=3, peticiones_por_minuto=6000)
+        respuestas = cliente.generar_varios([f'p{i}' for i in range(9)])
+        self.assertEqual([r.text for r in respuestas], [f'P{i}' for i in range(9)])
+        self.assertLessEqual(maximo[0], 3)
+        self.assertGreater(maximo[0], 1)
+
+    @override_settings(IA_MODEL='falso')
+    @patch('analizador.utils.os.getenv', return_value='fake_key')
+    def test_recomendaciones_con_modelo_falso(self, mock_getenv):
+        descartar_cliente_ia()
+        obtener_cache_recomendaciones().limpiar_memoria()
+        hallazgos = [{'tipo': 'error', 'descripcion': 'Sin título'}, {'tipo': 'warning', 'descripcion': 'Sin H1'}]
+        self.assertEqual(
+            obtener_recomendaciones_ia_lote(hallazgos, 'https://ejemplo.com', 'generic'),
+            ['Recomendación simulada 0.', 'Recomendación simulada 1.']
+        )
+        self.assertEqual(obtener_recomendacion_ia('Sin meta descripción', 'https://ejemplo.com', 'generic', 'error'), 'Recomendación simulada.')
+        descartar_cliente_ia()
+
+
+class RecomendacionesDiferidasTests(TestCase):
+    def setUp(self):
+        obtener_cache_recomendaciones().limpiar_memoria()
+        self.parches = [
+            patch('analizador.trabajos.verificar_archivos_seo', return_value={
+                'robots_txt_exists': True, 'sitemap_xml_exists': False,
+                'hallazgos_info': [{'tipo': 'warning', 'descripcion': 'No se encontró sitemap.xml'}]
+            }),
+            patch('analizador.cliente_http.ClienteHTTP.get', return_value=crear_respuesta_html('<title>Inicio</title><img src="/a.png">')),
+        ]
+        for parche in self.parches:
+            parche.start()
+            self.addCleanup(parche.stop)
+
+    @override_settings(IA_ENRICHMENT_MODE='bajo_demanda')
+    @patch('analizador.recomendaciones.obtener_recomendaciones_ia_lote', side_effect=recomendaciones_falsas)
+    def test_rastreo_guarda_hallazgos_sin_esperar_a_la_ia(self, mock_lote):
+        trabajo = ejecutar_trabajo(TrabajoRastreo.objects.create(url='https://ejemplo.com'))
+
+        self.assertEqual(trabajo.estado, 'completado')
+        mock_lote.assert_not_called()
+        hallazgos = trabajo.analisis_principal.hallazgos.all()
+        self.assertIn(('warning', 'No se encontró sitemap.xml'), [(h.tipo, h.descripcion) for h in hallazgos])
+        self.assertTrue(all(h.estado_recomendacion == 'pendiente' and not h.recomendacion for h in hallazgos))
+
+        # La primera consulta de la página no llama a la IA: encola las que faltan para el worker
+        url = reverse('analizador:recomendaciones_json', args=[trabajo.analisis_principal.pk])
+        datos = self.client.get(url).json()
+        self.assertEqual(datos['pendientes'], len(hallazgos))
+        mock_lote.assert_not_called()
+        self.assertFalse(Incidencia.objects.filter(proximo_intento__isnull=True).exists())
+
+        self.assertEqual(enriquecer_programadas(), Incidencia.objects.count())
+        mock_lote.assert_called_once()
+
+        # Las consultas siguientes solo piden el estado de los hallazgos que la página muestra pendientes
+        ids = [hallazgo.pk for hallazgo in hallazgos]
+        with self.assertNumQueries(3):
+            datos = self.client.get(url, {'ids': ','.join(map(str, ids[:1]))}).json()
+        self.assertEqual([h['id'] for h in datos['resultados']], ids[:1])
+        datos = self.client.get(url, {'ids': ','.join(map(str, ids))}).json()
+        self.assertEqual(datos['pendientes'], 0)
+        self.assertEqual(
+            {h['recomendacion'] for h in datos['resultados']},
+            {f'Recomendación: {h.descripcion}' for h in hallazgos}
+        )
+        mock_lote.assert_called_once()
+        self.assertEqual(self.client.get(url, {'ids': 'x'}).status_code, 400)
+
+    @patch('analizador.recomendaciones.obtener_recomendaciones_ia_lote', side_effect=recomendaciones_falsas)
+    def test_worker_completa_las_recomendaciones_tras_el_rastreo(self, mock_lote):
+        estados = []
+
+        def enriquecer(analisis_principal):
+            estados.append(TrabajoRastreo.objects.get().estado)  # El informe ya está disponible
+            return enriquecer_rastreo(analisis_principal)
+
+        with patch('analizador.trabajos.enriquecer_rastreo', side_effect=enriquecer):
+            trabajo = ejecutar_trabajo(TrabajoRastreo.objects.create(url='https://ejemplo.com'))
+
+        self.assertEqual(estados, ['completado'])
+        self.assertFalse(Incidencia.objects.filter(estado_recomendacion='pendiente').exists())
+        self.assertTrue(Incidencia.objects.filter(recomendacion='Recomendación: No se encontró sitemap.xml').exists())
+
+        # Sin pendientes, la vista solo informa del estado
+        datos = self.client.get(reverse('analizador:recomendaciones_json', args=[trabajo.analisis_principal.pk])).json()
+        self.assertEqual(datos['pendientes'], 0)
+        self.assertEqual(mock_lote.call_count, 1)
+
+    @override_settings(IA_RECOMMENDATION_SOURCE='ia', IA_RECOMMENDATION_MAX_ATTEMPTS=2, IA_RECOMMENDATION_RETRY_SECONDS=60)
+    @patch('analizador.utils.os.getenv', return_value=None)
+    def test_fallo_de_la_ia_no_se_guarda_como_recomendacion(self, mock_getenv):
+        self.assertIsNone(obtener_recomendaciones_ia_lote(
+            [{'tipo': 'warning', 'descripcion': 'No se encontró sitemap.xml'}], 'https://ejemplo.com', 'generic'
+        )[0])
+
+        trabajo = ejecutar_trabajo(TrabajoRastreo.objects.create(url='https://ejemplo.com'))
+
+        # Sin clave de API: ninguna recomendación, todas pendientes de reintento
+        incidencias = trabajo.analisis_principal.incidencias.all()
+        self.assertTrue(incidencias.exists())
+        for incidencia in incidencias:
+            self.assertEqual((incidencia.estado_recomendacion, incidencia.recomendacion, incidencia.intentos_recomendacion), ('pendiente', '', 1))
+            self.assertGreater(incidencia.proximo_intento, timezone.now())
+
+        # Aún no toca reintentar; cuando toca, el segundo fallo agota los intentos
+        self.assertEqual(enriquecer_programadas(), 0)
+        incidencias.update(proximo_intento=timezone.now())
+        self.assertEqual(enriquecer_programadas(), incidencias.count())
+        self.assertEqual(set(incidencias.values_list('estado_recomendacion', 'recomendacion', 'proximo_intento')), {('error', '', None)})
+        self.assertEqual(enriquecer_programadas(), 0)
+
+    @patch('analizador.recomendaciones.obtener_recomendaciones_ia_lote', side_effect=recomendaciones_falsas)
+    def test_reintento_programado_completa_la_recomendacion(self, mock_lote):
+        trabajo = ejecutar_trabajo(TrabajoRastreo.objects.create(url='https://ejemplo.com', crawl_scope='multiple_pages', num_pages=1))
+        incidencias = trabajo.analisis_principal.incidencias.all()
+        # Como si la IA hubiera fallado la primera vez y ya tocara reintentar
+        incidencias.update(recomendacion='', estado_recomendacion='pendiente', intentos_recomendacion=1, proximo_intento=timezone.now())
+
+        call_command('procesar_rastreos', once=True, stdout=StringIO())
+
+        self.assertEqual(set(incidencias.values_list('estado_recomendacion', flat=True)), {'lista'})
+        self.assertFalse(incidencias.filter(proximo_intento__isnull=False).exists())
+
+        # Un nuevo rastreo solo reutiliza las recomendaciones de verdad
+        incidencias.filter(descripcion='No se encontró sitemap.xml').update(recomendacion='', estado_recomendacion='error')
+        mock_lote.reset_mock()
+        ejecutar_trabajo(TrabajoRastreo.objects.create(url='https://ejemplo.com', crawl_scope='multiple_pages', num_pages=1))
+        pedidos = [hallazgo['descripcion'] for llamada in mock_lote.call_args_list for hallazgo in llamada.args[0]]
+        self.assertEqual(pedidos, ['No se encontró sitemap.xml'])
+
+    def test_resumen_cuenta_recomendaciones_pendientes(self):
+        analisis = crear_analisis_test()
+        for tipo, descripcion, recomendacion in [('error', 'Sin título', 'Añade un título.'), ('warning', 'Sin H1', '')]:
+            incidencia = Incidencia.objects.create(
+                analisis_principal=analisis, huella=Incidencia.calcular_huella(tipo, descripcion), tipo=tipo,
+                descripcion=descripcion, num_ocurrencias=1, recomendacion=recomendacion,
+                estado_recomendacion='lista' if recomendacion else 'pendiente'
+            )
+            Hallazgo.objects.create(analisis=analisis, incidencia=incidencia, tipo=tipo, descripcion=descripcion)
+        Hallazgo.objects.create(analisis=analisis, tipo='recomendacion', descripcion='Recomendación antigua')
+
+        response = self.client.get(reverse('analizador:resumen_analisis', args=[analisis.pk]))
+        self.assertEqual(response.context['hallazgos_totales'], {'error': 1, 'warning': 1, 'recomendacion': 2})
+        self.assertEqual(response.context['total_hallazgos'], 3)
+        self.assertEqual(response.context['recomendaciones_pendientes'], 1)
+        self.assertContains(response, '1 pendiente de generar')
+
+
+class IncidenciasTests(TestCase):
+    def setUp(self):
+        obtener_cache_recomendaciones().limpiar_memoria()
+
+    def test_huella_ignora_espacios_pero_distingue_descripciones(self):
+        self.assertEqual(Incidencia.calcular_huella('error', 'Falta  el H1 '), Incidencia.calcular_huella('error', 'Falta el H1'))
+        self.assertNotEqual(Incidencia.calcular_huella('error', 'Falta el H1'), Incidencia.calcular_huella('warning', 'Falta el H1'))
+        self.assertNotEqual(
+            Incidencia.calcular_huella('warning', 'Imagen sin texto alternativo: https://ejemplo.com/a.png'),
+            Incidencia.calcular_huella('warning', 'Imagen sin texto alternativo: https://ejemplo.com/b.png')
+        )
+
+    @override_settings(CRAWL_DB_BATCH_PAGES=2)
+    @patch('analizador.recomendaciones.obtener_recomendaciones_ia_lote', side_effect=recomendaciones_falsas)
+    @patch('analizador.trabajos.verificar_archivos_seo', return_value={'robots_txt_exists': True, 'sitemap_xml_exists': True, 'hallazgos_info': []})
+    @patch('analizador.cliente_http.ClienteHTTP.get')
+    def test_hallazgo_repetido_en_varias_paginas_es_una_incidencia(self, mock_get, mock_verificar, mock_lote):
+        # Todas las páginas comparten la plantilla: el logo sin alt y sin título ni H1
+        plantilla = '<img src="/logo.png"><a href="/p1">1</a><a href="/p2">2</a><a href="/p3">3</a><a href="/p4">4</a>'
+        mock_get.side_effect = lambda url, **kwargs: crear_respuesta_html(
+            plantilla + ('<img src="/solo-p2.png">' if url.endswith('/p2') else '')
+        )
+
+        trabajo = ejecutar_trabajo(TrabajoRastreo.objects.create(url='https://ejemplo.com', crawl_scope='multiple_pages', num_pages=5))
+
+        principal = trabajo.analisis_principal
+        self.assertEqual(Analisis.objects.count(), 5)
+        logo = principal.incidencias.get(descripcion__contains='/logo.png')
+        self.assertEqual(logo.num_ocurrencias, 5)
+        self.assertEqual(logo.ocurrencias.count(), 5)
+        self.assertEqual(logo.url_ejemplo, 'https://ejemplo.com')
+        self.assertEqual(principal.incidencias.get(descripcion__contains='/solo-p2.png').num_ocurrencias, 1)
+        self.assertEqual(Incidencia.objects.count(), principal.incidencias.count())
+        self.assertFalse(Hallazgo.objects.filter(incidencia__isnull=True).exists())
+
+        # Una recomendación por incidencia, compartida por todas sus ocurrencias
+        self.assertEqual(sum(len(llamada[0][0]) for llamada in mock_lote.call_args_list), Incidencia.objects.count())
+        self.assertEqual(
+            {hallazgo.recomendacion for hallazgo in logo.ocurrencias.all()},
+            {f'Recomendación: {logo.descripcion}'}
+        )
+        response = self.client.get(reverse('analizador:resumen_analisis', args=[principal.pk]))
+        self.assertEqual(len(response.context['incidencias']), Incidencia.objects.count())
+        self.assertEqual(response.context['incidencias'][0].num_ocurrencias, 5)
+
+
+class ResumenRastreoTests(TestCase):
+    def _rastrear(self, num_pages):
+        enlaces = ''.join(f'<a href="/p{i}">{i}</a>' for i in range(1, num_pages))
+
+        def respuesta(url, **kwargs):
+            if url.endswith('/p3'):
+                return crear_respuesta_html('%PDF', headers={'Content-Type': 'application/pdf'})
+            return crear_respuesta_html(f'<title>Página</title><img src="/logo.png">{enlaces}')
+
+        with patch('analizador.cliente_http.ClienteHTTP.get', side_effect=respuesta), \
+                patch('analizador.trabajos.verificar_archivos_seo', return_value={'robots_txt_exists': True, 'sitemap_xml_exists': True, 'hallazgos_info': []}), \
+                patch('analizador.trabajos.enriquecer_rastreo'):
+            trabajo = ejecutar_trabajo(TrabajoRastreo.objects.create(url='https://ejemplo.com', crawl_scope='multiple_pages', num_pages=num_pages))
+        return trabajo.analisis_principal
+
+    @override_settings(CRAWL_DB_BATCH_PAGES=2)
+    def test_resumen_se_mantiene_al_escribir_los_lotes(self):
+        principal = self._rastrear(5)
+        resumen = ResumenRastreo.objects.get(analisis_principal=principal)
+        calculado = ResumenRastreo.calcular(principal)
+        for campo in ResumenRastreo.CONTADORES:
+            self.assertEqual(getattr(resumen, campo), getattr(calculado, campo), campo)
+        self.assertEqual(resumen.total_paginas, 5)
+        self.assertEqual(resumen.paginas_puntuadas, 4)  # El PDF se omite y no tiene puntuación
+        self.assertEqual(resumen.codigos_estado, {'200': 5})
+        self.assertEqual(resumen.total_hallazgos, Hallazgo.objects.count())
+
+    def test_resumen_de_analisis_antiguos_se_calcula_una_vez(self):
+        analisis = crear_analisis_test()
+        Analisis.objects.create(url='https://ejemplo.com/b', analisis_principal=analisis, codigo_estado=404, puntuacion=40)
+        Hallazgo.objects.create(analisis=analisis, tipo='error', descripcion='Sin título')
+
+        resumen = ResumenRastreo.de_analisis(analisis)
+        self.assertEqual((resumen.total_paginas, resumen.puntuacion_minima), (2, 40))
+        self.assertEqual(resumen.hallazgos_por_tipo, {'error': 1})
+        self.assertEqual(resumen.codigos_estado, {'200': 1, '404': 1})
+        with self.assertNumQueries(1):
+            self.assertEqual(ResumenRastreo.de_analisis(analisis).pk, resumen.pk)
+
+    def test_vista_resumen_no_depende_del_numero_de_paginas(self):
+        consultas = []
+        for num_pages in (2, 6):
+            principal = self._rastrear(num_pages)
+            url = reverse('analizador:resumen_analisis', args=[principal.pk])
+            with CaptureQueriesContext(connection) as contexto:
+                response = self.client.get(url)
+            self.assertEqual(response.context['total_urls'], num_pages)
+            consultas.append(len(contexto.captured_queries))
+        self.assertEqual(consultas[0], consultas[1])
+
+
+class DominioAnalisisTests(TestCase):
+    def test_normalizar_host(self):
+        self.assertEqual(normalizar_host('https://WWW.Ejemplo.com:8443/a?b=1'), 'ejemplo.com')
+        self.assertEqual(normalizar_host('http://blog.ejemplo.com'), 'blog.ejemplo.com')
+        self.assertEqual(normalizar_host('no es una url'), '')
+        self.assertEqual(crear_analisis_test(url='https://www.ejemplo.com/').host, 'ejemplo.com')
+
+    @override_settings(CRAWL_DB_BATCH_PAGES=2)
+    @patch('analizador.trabajos.enriquecer_rastreo')
+    @patch('analizador.trabajos.verificar_archivos_seo', return_value={'robots_txt_exists': True, 'sitemap_xml_exists': True, 'hallazgos_info': []})
+    @patch('analizador.cliente_http.ClienteHTTP.get')
+    def test_paginas_del_rastreo_e_historial_del_dominio(self, mock_get, mock_verificar, mock_enriquecer):
+        mock_get.return_value = crear_respuesta_html('<title>P</title><a href="/p1">1</a><a href="/p2">2</a>')
+        anterior = crear_analisis_test(url='https://www.ejemplo.com')
+        Analisis.objects.filter(pk=anterior.pk).update(fecha_analisis=timezone.now() - timedelta(days=1))
+        crear_analisis_test(url='https://otro.com')
+
+        principal = ejecutar_trabajo(TrabajoRastreo.objects.create(
+            url='https://ejemplo.com', crawl_scope='multiple_pages', num_pages=3
+        )).analisis_principal
+        hija = principal.urls_analizadas.first()
+        self.assertEqual(set(Analisis.objects.filter(pk__in=[principal.pk, hija.pk]).values_list('host', flat=True)), {'ejemplo.com'})
+
+        # Las páginas hermanas se encuentran aunque no compartan la fecha exacta
+        Analisis.objects.filter(pk=hija.pk).update(fecha_analisis=timezone.now() + timedelta(seconds=5))
+        vista = DetalleAnalisisView()
+        vista.setup(RequestFactory().get('/'), pk=hija.pk)
+        vista.object = vista.get_object()
+        contexto = vista.get_context_data()
+        self.assertEqual(
+            {analisis.pk for analisis in contexto['paginas_analizadas']},
+            {principal.pk, *principal.urls_analizadas.exclude(pk=hija.pk).values_list('pk', flat=True)}
+        )
+        self.assertEqual(len(contexto['paginas_analizadas']), 2)
+        self.assertEqual(list(contexto['historial']), [anterior])
+
+
+class ListadosPaginadosTests(TestCase):
+    def setUp(self):
+        self.analisis = crear_analisis_test()
+        Enlace.objects.bulk_create(
+            Enlace(analisis=self.analisis, url=f'https://ejemplo.com/{i}', tipo='interno' if i % 3 else 'externo')
+            for i in range(250)
+        )
+        Imagen.objects.bulk_create(
+            Imagen(analisis=self.analisis, url=f'https://ejemplo.com/{i}.png', alt='' if i % 2 else f'Imagen {i}')
+            for i in range(10)
+        )
+        Hallazgo.objects.create(analisis=self.analisis, tipo='error', descripcion='Sin título')
+        Hallazgo.objects.create(analisis=self.analisis, tipo='warning', descripcion='Sin H1')
+
+    def _recorrer(self, nombre, **parametros):
+        url = reverse(f'analizador:{nombre}_json', args=[self.analisis.pk])
+        resultados, paginas = [], 0
+        while True:
+            datos = self.client.get(url, parametros).json()
+            resultados += datos['resultados']
+            paginas += 1
+            if datos['siguiente'] is None:
+                return resultados, paginas
+            parametros['despues'] = datos['siguiente']
+
+    def test_paginacion_por_clave_recorre_todo_sin_repetir(self):
+        enlaces, paginas = self._recorrer('enlaces', limite=100)
+        self.assertEqual(paginas, 3)
+        self.assertEqual(len({enlace['id'] for enlace in enlaces}), 250)
+        self.assertEqual([enlace['id'] for enlace in enlaces], sorted(enlace['id'] for enlace in enlaces))
+
+        # Cada página cuesta lo mismo, vaya por donde vaya el cursor
+        url = reverse('analizador:enlaces_json', args=[self.analisis.pk])
+        with self.assertNumQueries(2):
+            self.client.get(url, {'limite': 10, 'despues': enlaces[200]['id']})
+
+    @override_settings(REPORT_MAX_PAGE_SIZE=50)
+    def test_filtros_y_limites(self):
+        externos, _ = self._recorrer('enlaces', tipo='externo')
+        self.assertEqual(len(externos), 84)
+        self.assertTrue(all(enlace['tipo'] == 'externo' for enlace in externos))
+        _, paginas = self._recorrer('enlaces', limite=1000)
+        self.assertEqual(paginas, 5)  # El límite no pasa de REPORT_MAX_PAGE_SIZE
+
+        sin_alt, _ = self._recorrer('imagenes', sin_alt='1')
+        self.assertEqual(len(sin_alt), 5)
+        self.assertTrue(all(imagen['alt'] == '' for imagen in sin_alt))
+
+        errores, _ = self._recorrer('hallazgos', tipo='error')
+        self.assertEqual([(h['tipo'], h['descripcion']) for h in errores], [('error', 'Sin título')])
+
+        url = reverse('analizador:enlaces_json', args=[self.analisis.pk])
+        self.assertEqual(self.client.get(url, {'tipo': 'roto'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'despues': 'x'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('analizador:enlaces_json', args=[999999])).status_code, 404)
+
+    def test_detalle_no_incluye_los_listados(self):
+        response = self.client.get(reverse('analizador:detalle_analisis', args=[self.analisis.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, 'https://ejemplo.com/249')
+        self.assertEqual(
+            (response.context['total_enlaces'], response.context['total_imagenes'], response.context['total_hallazgos']),
+            (250, 10, 2)
+        )
+        self.assertContains(response, reverse('analizador:enlaces_json', args=[self.analisis.pk]))
+
+    def test_paginas_del_rastreo_paginadas(self):
+        Analisis.objects.bulk_create(
+            Analisis(url=f'https://ejemplo.com/pagina-{i}', analisis_principal=self.analisis, codigo_estado=200, puntuacion=70)
+            for i in range(120)
+        )
+        crear_analisis_test(url='https://otro.com')
+        paginas, num_paginas = self._recorrer('paginas')
+        self.assertEqual(num_paginas, 2)  # REPORT_PAGE_SIZE = 100
+        self.assertEqual(len(paginas), 121)
+        self.assertEqual(paginas[0]['id'], self.analisis.pk)
+        self.assertEqual(paginas[0]['url_detalle'], reverse('analizador:detalle_analisis', args=[self.analisis.pk]))
+
+        url = reverse('analizador:paginas_json', args=[self.analisis.pk])
+        with self.assertNumQueries(2):
+            self.client.get(url, {'limite': 10, 'despues': paginas[100]['id']})
+
+
+def crear_sitemap(urls, indice=False):
+    """XML de un sitemap (o de un índice de sitemaps) con pares (loc, lastmod); lastmod puede ser None."""
+    etiqueta, raiz = ('sitemap', 'sitemapindex') if indice else ('url', 'urlset')
+    entradas = ''.join(
+        f'<{etiqueta}><loc>{loc}</loc>' + (f'<lastmod>{lastmod}</lastmod>' if lastmod else '') + f'</{etiqueta}>'
+        for loc, lastmod in urls
+    )
+    return f'<?xml version="1.0" encoding="UTF-8"?><{raiz} xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{entradas}</{raiz}>'
+
+
+def crear_respuesta_bytes(contenido, status_code=200):
+    respuesta = requests.Response()
+    respuesta.status_code = status_code
+    respuesta._content = contenido
+    respuesta._content_consumed = True
+    return respuesta
+
+
+class SitemapTests(TestCase):
+    def test_parsear_lastmod(self):
+        self.assertEqual(parsear_lastmod('2024'), datetime(2024, 1, 1, tzinfo=dt_timezone.utc))
+        self.assertEqual(parsear_lastmod('2024-05'), datetime(2024, 5, 1, tzinfo=dt_timezone.utc))
+        self.assertEqual(parsear_lastmod(' 2024-05-31 '), datetime(2024, 5, 31, tzinfo=dt_timezone.utc))
+        self.assertEqual(parsear_lastmod('2024-05-31T10:00:00Z'), datetime(2024, 5, 31, 10, tzinfo=dt_timezone.utc))
+        self.assertEqual(parsear_lastmod('2024-05-31T12:00+02:00'), datetime(2024, 5, 31, 10, tzinfo=dt_timezone.utc))
+        self.assertIsNone(parsear_lastmod('ayer'))
+        self.assertIsNone(parsear_lastmod(None))
+
+    def test_sitemaps_de_robots(self):
+        robots = 'User-agent: *\nDisallow: /privado/\nSitemap: https://ejemplo.com/mapa.xml\nsitemap:https://ejemplo.com/b.xml.gz\n'
+        self.assertEqual(sitemaps_de_robots(robots), ['https://ejemplo.com/mapa.xml', 'https://ejemplo.com/b.xml.gz'])
+
+    def test_indice_con_sitemaps_comprimidos(self):
+        respuestas = {
+            'https://ejemplo.com/indice.xml': crear_respuesta_html(crear_sitemap(
+                [('https://ejemplo.com/a.xml.gz', None), ('/b.xml', None), ('https://ejemplo.com/roto.xml', None)], indice=True
+            )),
+            'https://ejemplo.com/a.xml.gz': crear_respuesta_bytes(gzip.compress(crear_sitemap(
+                [('https://ejemplo.com/1', '2024-01-01'), ('https://ejemplo.com/2', None)]
+            ).encode('utf-8'))),
+            'https://ejemplo.com/b.xml': crear_respuesta_html(crear_sitemap([('https://ejemplo.com/3', None)])),
+            'https://ejemplo.com/roto.xml': crear_respuesta_html('<urlset><url><loc>https://ejemplo.com/4</loc></url><url>'),
+        }
+        cliente = MagicMock()
+        cliente.get.side_effect = lambda url, **kwargs: respuestas[url]
+
+        entradas = list(leer_sitemaps(['https://ejemplo.com/indice.xml'], cliente))
+        self.assertEqual(
+            entradas,
+            [
+                EntradaSitemap('https://ejemplo.com/1', datetime(2024, 1, 1, tzinfo=dt_timezone.utc)),
+                EntradaSitemap('https://ejemplo.com/2', None),
+                EntradaSitemap('https://ejemplo.com/3', None),
+                EntradaSitemap('https://ejemplo.com/4', None),  # Lo leído antes del error se conserva
+            ]
+        )
+        self.assertEqual(list(leer_sitemaps(['https://ejemplo.com/indice.xml'], cliente, max_archivos=2))[-1].url, 'https://ejemplo.com/2')
+
+    def test_sitemap_grande_se_lee_por_partes(self):
+        urls = [(f'https://ejemplo.com/pagina-{i}', '2024-01-01') for i in range(50000)]
+        comprimido = gzip.compress(crear_sitemap(urls).encode('utf-8'))
+        cliente = MagicMock()
+        cliente.get.return_value = crear_respuesta_bytes(comprimido)
+
+        tracemalloc.start()
+        try:
+            total = sum(1 for _ in leer_sitemaps(['https://ejemplo.com/sitemap.xml.gz'], cliente))
+            _, pico = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        self.assertEqual(total, 50000)
+        self.assertLess(pico, 2 * 1024 * 1024)  # El XML descomprimido ocupa más de 3 MB
+
+    def test_seleccionar_urls_prioriza_las_recientes(self):
+        ahora = timezone.now()
+        entradas = [
+            EntradaSitemap('https://ejemplo.com/vieja', ahora - timedelta(days=400)),
+            EntradaSitemap('https://ejemplo.com/sin-fecha', None),
+            EntradaSitemap('https://ejemplo.com/nueva', ahora - timedelta(days=1)),
+            EntradaSitemap('https://otro.com/nueva', ahora),
+            EntradaSitemap('https://ejemplo.com/conocida', ahora),
+            EntradaSitemap('https://ejemplo.com/media#seccion', ahora - timedelta(days=30)),
+        ]
+        seleccion = seleccionar_urls(entradas, 3, 'ejemplo.com', conocidas={'https://ejemplo.com/conocida'}, ahora=ahora)
+        self.assertEqual([url for _, url in seleccion], ['https://ejemplo.com/nueva', 'https://ejemplo.com/media', 'https://ejemplo.com/vieja'])
+        self.assertEqual([prioridad for prioridad, _ in seleccion], sorted(prioridad for prioridad, _ in seleccion))
+        self.assertTrue(all(prioridad < 1 for prioridad, _ in seleccion))
+
+        seleccion = seleccionar_urls(entradas, 10, 'ejemplo.com', max_edad_dias=90, ahora=ahora)
+        self.assertNotIn('https://ejemplo.com/vieja', [url for _, url in seleccion])
+        self.assertEqual(seleccion[-1], (1, 'https://ejemplo.com/sin-fecha'))
+
+    @patch('analizador.trabajos.enriquecer_rastreo')
+    @patch('analizador.cliente_http.ClienteHTTP.get')
+    def test_rastreo_siembra_la_frontera_desde_el_sitemap(self, mock_get, mock_enriquecer):
+        hoy = timezone.now().date().isoformat()
+        respuestas = {
+            'https://ejemplo.com/robots.txt': crear_respuesta_html('User-agent: *\nSitemap: https://ejemplo.com/sitemap_index.xml'),
+            'https://ejemplo.com/sitemap.xml': crear_respuesta_html('', status_code=404),
+            'https://ejemplo.com/sitemap_index.xml': crear_respuesta_html(crear_sitemap([('https://ejemplo.com/posts.xml', None)], indice=True)),
+            'https://ejemplo.com/posts.xml': crear_respuesta_html(crear_sitemap([
+                ('https://ejemplo.com/antiguo', '2015-01-01'), ('https://ejemplo.com/reciente', hoy), ('https://ejemplo.com/medio', '2023-06-01'),
+            ])),
+            'https://ejemplo.com': crear_respuesta_html('<title>Inicio</title><a href="/enlazada-1">1</a><a href="/enlazada-2">2</a>'),
+        }
+        mock_get.side_effect = lambda url, **kwargs: respuestas.get(url) or crear_respuesta_html('<title>Sin enlaces</title>')
+
+        trabajo = ejecutar_trabajo(TrabajoRastreo.objects.create(url='https://ejemplo.com', crawl_scope='multiple_pages', num_pages=5))
+
+        # El sitemap llena la mitad del rastreo (CRAWL_SITEMAP_SHARE) y los enlaces el resto
+        self.assertEqual(
+            set(trabajo.analisis_principal.urls_analizadas.values_list('url', flat=True)),
+            {'https://ejemplo.com/reciente', 'https://ejemplo.com/medio', 'https://ejemplo.com/enlazada-1', 'https://ejemplo.com/enlazada-2'}
+        )
+        self.assertTrue(any('2 URL(s) desde el sitemap' in mensaje['texto'] for mensaje in trabajo.mensajes))
+
+    @override_settings(CRAWL_SITEMAP_PREVIEW_BYTES=1024)
+    @patch('analizador.trabajos.enriquecer_rastreo')
+    @patch('analizador.cliente_http.ClienteHTTP.get')
+    def test_sitemap_raiz_comprimido_se_lee_por_fragmentos(self, mock_get, mock_enriquecer):
+        hoy = timezone.now().date().isoformat()
+        sitemap = crear_sitemap([(f'https://ejemplo.com/pagina-{i}', hoy if i == 499 else '2020-01-01') for i in range(500)])
+        respuestas = {
+            'https://ejemplo.com/robots.txt': crear_respuesta_html('User-agent: *\nAllow: /'),
+            'https://ejemplo.com/sitemap.xml': crear_respuesta_bytes(gzip.compress(sitemap.encode('utf-8'))),
+        }
+        mock_get.side_effect = lambda url, **kwargs: respuestas.get(url) or crear_respuesta_html('<title>Sin enlaces</title>')
+
+        trabajo = ejecutar_trabajo(TrabajoRastreo.objects.create(url='https://ejemplo.com', crawl_scope='multiple_pages', num_pages=2))
+
+        # El informe guarda solo el principio, ya descomprimido; la siembra lee el archivo entero
+        archivo = trabajo.analisis_principal.archivos_seo.get(tipo='sitemap.xml')
+        self.assertEqual(archivo.contenido, sitemap[:1024])
+        self.assertTrue(trabajo.analisis_principal.sitemap_xml)
+        self.assertEqual(
+            list(trabajo.analisis_principal.urls_analizadas.values_list('url', flat=True)),
+            ['https://ejemplo.com/pagina-499']
+        )
+        self.assertTrue(all(
+            llamada.kwargs.get('stream') for llamada in mock_get.call_args_list if llamada.args[0].endswith('/sitemap.xml')
+        ))
+
+
+class RobotsTests(TestCase):
+    def setUp(self):
+        descartar_cache_robots()
+        self.addCleanup(descartar_cache_robots)
+
+    def test_gana_la_regla_mas_especifica(self):
+        reglas = ReglasRobots.desde_texto(
+            'User-agent: *\n'
+            'Disallow: /privado  # comentario\n'
+            'Allow: /privado/publico\n'
+            'Disallow: /*.pdf$\n'
+            'Disallow: /*?sesion=\n'
+            'Disallow: /carpeta\n'
+            'Allow: /carpeta\n'
+            'Disallow:\n'
+        )
+        self.assertTrue(reglas.permite('https://ejemplo.com/'))
+        self.assertFalse(reglas.permite('https://ejemplo.com/privado/datos'))
+        self.assertTrue(reglas.permite('https://ejemplo.com/privado/publico/pagina'))
+        self.assertFalse(reglas.permite('https://ejemplo.com/docs/manual.pdf'))
+        self.assertTrue(reglas.permite('https://ejemplo.com/docs/manual.pdf?v=2'))  # '$' ancla al final
+        self.assertFalse(reglas.permite('https://ejemplo.com/lista?sesion=abc&orden=1'))
+        self.assertTrue(reglas.permite('https://ejemplo.com/carpeta/a'))  # Empate: gana Allow
+        self.assertTrue(reglas.permite('https://ejemplo.com/público'))
+
+    def test_grupo_del_agente_y_crawl_delay(self):
+        contenido = (
+            'User-agent: *\nDisallow: /\n\n'
+            'User-agent: OtroBot\nUser-agent: analizadorseo\nDisallow: /admin\nCrawl-delay: 2.5\n'
+        )
+        reglas = ReglasRobots.desde_texto(contenido, user_agent='AnalizadorSEO/1.0 (+https://ejemplo.com)')
+        self.assertTrue(reglas.permite('/blog'))
+        self.assertFalse(reglas.permite('/admin/usuarios'))
+        self.assertEqual(reglas.crawl_delay, 2.5)
+
+        reglas = ReglasRobots.desde_texto(contenido, user_agent='Desconocido/2.0')
+        self.assertFalse(reglas.permite('/blog'))
+        self.assertIsNone(reglas.crawl_delay)
+
+    def test_grupo_por_token_completo_del_agente(self):
+        contenido = (
+            'User-agent: bot\nUser-agent: s\nUser-agent: seo\nDisallow: /parcial\n\n'
+            'User-agent: AnalizadorSEO-Extra\nDisallow: /extra\n\n'
+            'User-agent: *\nDisallow: /todos\n'
+        )
+        reglas = ReglasRobots.desde_texto(contenido, user_agent='AnalizadorSEO/1.0')
+        # Ningún grupo nombra el token completo: se aplica el de '*'
+        self.assertTrue(reglas.permite('/parcial'))
+        self.assertTrue(reglas.permite('/extra'))
+        self.assertFalse(reglas.permite('/todos'))
+
+        reglas = ReglasRobots.desde_texto(contenido + '\nUser-agent: ANALIZADORSEO/2.0\nDisallow: /propio\n', user_agent='AnalizadorSEO/1.0')
+        self.assertFalse(reglas.permite('/propio'))
+        self.assertTrue(reglas.permite('/todos'))
+
+    def test_reglas_segun_codigo_de_estado(self):
+        self.assertTrue(reglas_desde_respuesta(404, '').permite('/cualquiera'))
+        self.assertFalse(reglas_desde_respuesta(503, '').permite('/cualquiera'))
+        self.assertFalse(reglas_desde_respuesta(None, '').permite('/cualquiera'))
+
+    def test_cache_por_host_con_caducidad(self):
+        instante = [0.0]
+        cache = CacheRobots(ttl=60, reloj=lambda: instante[0])
+        cliente = MagicMock()
+        cliente.get.return_value = crear_respuesta_html('User-agent: *\nDisallow: /privado')
+
+        self.assertFalse(cache.reglas('https://ejemplo.com/privado/a', cliente).permite('/privado/a'))
+        self.assertTrue(cache.reglas('https://EJEMPLO.com/otra', cliente).permite('/otra'))
+        cliente.get.assert_called_once_with('https://ejemplo.com/robots.txt')
+
+        instante[0] = 61
+        cliente.get.side_effect = requests.ConnectionError('sin conexión')
+        self.assertFalse(cache.reglas('https://ejemplo.com/otra', cliente).permite('/otra'))
+        self.assertEqual(cliente.get.call_count, 2)
+
+        cache.guardar('https://ejemplo.com/robots.txt', 200, 'User-agent: *\nAllow: /')
+        self.assertTrue(cache.reglas('https://ejemplo.com/otra', cliente).permite('/otra'))
+        self.assertEqual(cliente.get.call_count, 2)
+
+    def test_obtener_urls_sitio_descarta_las_bloqueadas(self):
+        reglas = ReglasRobots.desde_texto('User-agent: *\nDisallow: /privado')
+        soup = BeautifulSoup('<a href="/publico">P</a><a href="/privado/a">A</a><a href="/privado/a#x">A</a>', 'html.parser')
+        bloqueadas = set()
+
+        urls = obtener_urls_sitio('https://ejemplo.com/', soup, set(), reglas, bloqueadas)
+
+        self.assertEqual(urls, ['https://ejemplo.com/publico'])
+        self.assertEqual(bloqueadas, {'https://ejemplo.com/privado/a'})
+
+    @patch('analizador.cliente_http.ClienteHTTP.get')
+    def test_retraso_por_host_espacia_las_descargas(self, mock_get):
+        inicios = defaultdict(list)
+
+        def registrar(url, **kwargs):
+            inicios[urlparse(url).netloc].append(time.monotonic())
+            return crear_respuesta_html('<title>P</title>')
+        mock_get.side_effect = registrar
+
+        rastreador = Rastreador(max_urls=7, max_workers=4)
+        rastreador.fijar_retraso('lento.com', 0.05)
+        for pagina in rastreador.rastrear('https://rapido.com'):
+            if pagina.url == 'https://rapido.com':
+                rastreador.encolar([f'https://lento.com/{i}' for i in range(3)] + [f'https://rapido.com/{i}' for i in range(3)])
+
+        self.assertEqual(len(inicios['lento.com']), 3)
+        separaciones = [b - a for a, b in zip(inicios['lento.com'], inicios['lento.com'][1:])]
+        self.assertTrue(all(separacion >= 0.045 for separacion in separaciones), separaciones)
+        self.assertEqual(len(inicios['rapido.com']), 4)
+
+    @override_settings(CRAWL_MAX_CRAWL_DELAY=0.01)
+    @patch('analizador.trabajos.enriquecer_rastreo')
+    @patch('analizador.cliente_http.ClienteHTTP.get')
+    def test_rastreo_respeta_robots(self, mock_get, mock_enriquecer):
+        def responder(url, **kwargs):
+            if url.endswith('/robots.txt'):
+                return crear_respuesta_html('User-agent: *\nDisallow: /privado\nCrawl-delay: 5')
+            return crear_respuesta_html('<title>P</title><a href="/publico">P</a><a href="/privado/a">A</a><a href="/privado/b">B</a>')
+        mock_get.side_effect = responder
+
+        trabajo = TrabajoRastreo.objects.create(url='https://ejemplo.com', crawl_scope='multiple_pages', num_pages=5)
+        with patch('analizador.trabajos.Rastreador.fijar_retraso', autospec=True, side_effect=Rastreador.fijar_retraso) as mock_retraso:
+            trabajo = ejecutar_trabajo(trabajo)
+
+        urls = set(Analisis.objects.values_list('url', flat=True))
+        self.assertEqual(urls, {'https://ejemplo.com', 'https://ejemplo.com/publico'})
+        self.assertIn(('ejemplo.com', 5.0), [llamada.args[1:] for llamada in mock_retraso.call_args_list])
+        self.assertTrue(any('2 URL(s) no permitidas por robots.txt' in mensaje['texto'] for mensaje in trabajo.mensajes))
+        # El robots.txt descargado por verificar_archivos_seo se reutiliza
+        self.assertEqual(sum(1 for llamada in mock_get.call_args_list if llamada.args[0].endswith('/robots.txt')), 1)
+
+    @override_settings(CRAWL_RESPECT_ROBOTS=False)
+    @patch('analizador.trabajos.enriquecer_rastreo')
+    @patch('analizador.cliente_http.ClienteHTTP.get')
+    def test_rastreo_sin_respetar_robots(self, mock_get, mock_enriquecer):
+        mock_get.side_effect = lambda url, **kwargs: crear_respuesta_html(
+            'User-agent: *\nDisallow: /' if url.endswith('/robots.txt') else '<title>P</title><a href="/privado">A</a>'
+        )
+        ejecutar_trabajo(TrabajoRastreo.objects.create(url='https://ejemplo.com', crawl_scope='multiple_pages', num_pages=5))
+        self.assertTrue(Analisis.objects.filter(url='https://ejemplo.com/privado').exists())
+
+
+class PlanificadorHostsTests(TestCase):
+    def setUp(self):
+        self.instante = 0.0
+        self.planificador = PlanificadorHosts(4, espera_base=1, reloj=lambda: self.instante)
+
+    def test_segundos_retry_after(self):
+        ahora = datetime(2024, 5, 31, 10, 0, 0, tzinfo=dt_timezone.utc)
+        self.assertEqual(segundos_retry_after('5'), 5)
+        self.assertEqual(segundos_retry_after('Fri, 31 May 2024 10:00:30 GMT', ahora=ahora), 30)
+        self.assertEqual(segundos_retry_after('Fri, 31 May 2024 09:00:00 GMT', ahora=ahora), 0)
+        self.assertEqual(segundos_retry_after('999999'), 120)
+        self.assertIsNone(segundos_retry_after('pronto'))
+        self.assertIsNone(segundos_retry_after(None))
+
+    def test_limitacion_reduce_y_pausa_el_host(self):
+        self.planificador.registrar_limitacion('ejemplo.com', retry_after=10)
+        self.assertEqual(self.planificador.estado('ejemplo.com').limite, 2)
+        self.assertFalse(self.planificador.disponible('ejemplo.com'))
+        self.assertTrue(self.planificador.disponible('otro.com'))
+        self.assertEqual(self.planificador.espera(), 10)
+
+        self.instante = 10
+        self.assertTrue(self.planificador.disponible('ejemplo.com'))
+        self.assertIsNone(self.planificador.espera())
+
+        # Sin Retry-After la pausa crece de forma exponencial
+        self.planificador.registrar_limitacion('ejemplo.com')
+        self.assertEqual(self.planificador.espera(), 2)
+        self.planificador.registrar_limitacion('ejemplo.com')
+        self.assertEqual(self.planificador.espera(), 4)
+        self.assertEqual(self.planificador.estado('ejemplo.com').limite, 1)
+        self.assertEqual(self.planificador.estadisticas()['ejemplo.com']['limitaciones'], 3)
+
+    def test_recupera_la_concurrencia_si_el_host_esta_sano(self):
+        self.planificador.registrar_limitacion('ejemplo.com', retry_after=0)
+        self.planificador.registrar_limitacion('ejemplo.com', retry_after=0)
+        self.assertEqual(self.planificador.estado('ejemplo.com').limite, 1)
+        limites = []
+        for _ in range(10):
+            self.planificador.registrar_exito('ejemplo.com', latencia=0.2)
+            limites.append(self.planificador.estado('ejemplo.com').limite)
+        self.assertEqual(limites, [2, 2, 3, 3, 3, 4, 4, 4, 4, 4])  # Ventanas de 1, 2 y 3 respuestas
+
+    def test_latencia_disparada_o_fallos_reducen_el_limite(self):
+        for _ in range(4):
+            self.planificador.registrar_exito('lento.com', latencia=0.1)
+        for _ in range(8):
+            self.planificador.registrar_exito('lento.com', latencia=5)
+        self.assertLess(self.planificador.estado('lento.com').limite, 4)
+
+        for _ in range(3):
+            self.planificador.registrar_fallo('caido.com')
+        self.assertEqual(self.planificador.estado('caido.com').limite, 4)  # Un fallo aislado no basta
+        for _ in range(2):
+            self.planificador.registrar_fallo('caido.com')
+        self.assertEqual(self.planificador.estado('caido.com').limite, 1)
+
+    def test_concurrencia_segun_limite_y_retraso(self):
+        for _ in range(4):
+            self.planificador.iniciar('ejemplo.com')
+        self.assertFalse(self.planificador.disponible('ejemplo.com'))
+        self.planificador.terminar('ejemplo.com')
+        self.assertTrue(self.planificador.disponible('ejemplo.com'))
+
+        self.planificador.fijar_retraso('lento.com', 2)
+        self.planificador.iniciar('lento.com')
+        self.planificador.terminar('lento.com')
+        self.assertFalse(self.planificador.disponible('lento.com'))
+        self.instante = 2
+        self.assertTrue(self.planificador.disponible('lento.com'))
+
+    @override_settings(CRAWL_BACKOFF_BASE_SECONDS=0)
+    @patch('analizador.cliente_http.ClienteHTTP.get')
+    def test_rastreador_reintenta_tras_429_y_503(self, mock_get):
+        llamadas = defaultdict(int)
+
+        def responder(url, **kwargs):
+            llamadas[url] += 1
+            if url.endswith('/limitada') and llamadas[url] == 1:
+                return crear_respuesta_html('', status_code=429, headers={'Retry-After': '0'})
+            if url.endswith('/caida'):
+                return crear_respuesta_html('', status_code=503)
+            return crear_respuesta_html('<title>P</title>')
+        mock_get.side_effect = responder
+
+        rastreador = Rastreador(max_urls=5, max_reintentos=2)
+        resultados = {}
+        for pagina in rastreador.rastrear('https://ejemplo.com'):
+            resultados[pagina.url] = pagina
+            if pagina.url == 'https://ejemplo.com':
+                rastreador.encolar(['https://ejemplo.com/limitada', 'https://ejemplo.com/caida'])
+
+        self.assertIsNone(resultados['https://ejemplo.com/limitada'].error)
+        self.assertEqual(llamadas['https://ejemplo.com/limitada'], 2)
+        self.assertIsInstance(resultados['https://ejemplo.com/caida'].error, requests.HTTPError)
+        self.assertEqual(llamadas['https://ejemplo.com/caida'], 3)  # El intento inicial y dos reintentos
+        self.assertEqual(rastreador.planificador.estadisticas()['ejemplo.com']['limitaciones'], 4)
+
+    @override_settings(CRAWL_BACKOFF_BASE_SECONDS=0)
+    @patch('analizador.trabajos.enriquecer_rastreo')
+    @patch('analizador.trabajos.verificar_archivos_seo', return_value={'robots_txt_exists': True, 'sitemap_xml_exists': True, 'hallazgos_info': []})
+    @patch('analizador.cliente_http.ClienteHTTP.get')
+    def test_trabajo_avisa_de_las_limitaciones(self, mock_get, mock_verificar, mock_enriquecer):
+        llamadas = defaultdict(int)
+
+        def responder(url, **kwargs):
+            llamadas[url] += 1
+            if url.endswith('/p1') and llamadas[url] == 1:
+                return crear_respuesta_html('', status_code=429)
+            return crear_respuesta_html('<title>P</title><a href="/p1">1</a>')
+        mock_get.side_effect = responder
+
+        trabajo = ejecutar_trabajo(TrabajoRastreo.objects.create(url='https://ejemplo.com', crawl_scope='multiple_pages', num_pages=5))
+
+        self.assertEqual(trabajo.paginas_procesadas, 2)
+        self.assertTrue(Analisis.objects.filter(url='https://ejemplo.com/p1').exists())
+        self.assertTrue(any('ejemplo.com pidió bajar el ritmo 1 vez/veces' in mensaje['texto'] for mensaje in trabajo.mensajes))
+
+
+class RastreoCondicionalTests(TestCase):
+    URL = 'https://ejemplo.com/pagina'
+
+    def test_descarga_condicional_con_304(self):
+        cliente = MagicMock()
+        cliente.get.return_value = crear_respuesta_html('', status_code=304)
+
+        pagina = descargar_pagina(cliente, self.URL, validadores={
+            'etag': '"v1"', 'ultima_modificacion': 'Wed, 01 May 2024 10:00:00 GMT', 'huella': 'abc'
+        })
+
+        cliente.get.assert_called_once_with(self.URL, stream=True, headers={
+            'If-None-Match': '"v1"', 'If-Modified-Since': 'Wed, 01 May 2024 10:00:00 GMT'
+        })
+        self.assertEqual(pagina.estado_descarga, 'sin_cambios')
+        self.assertIsNone(pagina.extraccion)
+        self.assertEqual(pagina.huella_contenido, 'abc')
+
+    def test_misma_huella_no_se_analiza(self):
+        html = '<title>Igual</title>'
+        cliente = MagicMock()
+        cliente.get.side_effect = lambda url, **kwargs: crear_respuesta_html(html)
+
+        primera = descargar_pagina(cliente, self.URL)
+        self.assertEqual(primera.huella_contenido, hashlib.sha256(html.encode('utf-8')).hexdigest())
+        cliente.get.assert_called_once_with(self.URL, stream=True)
+
+        with patch('analizador.rastreador.extraer_html') as mock_extraer:
+            segunda = descargar_pagina(cliente, self.URL, validadores={'huella': primera.huella_contenido})
+        mock_extraer.assert_not_called()
+        self.assertEqual(segunda.estado_descarga, 'sin_cambios')
+        self.assertEqual(segunda.huella_contenido, primera.huella_contenido)
+
+        html = '<title>Distinta</title>'
+        tercera = descargar_pagina(cliente, self.URL, validadores={'huella': primera.huella_contenido})
+        self.assertEqual(tercera.estado_descarga, 'completa')
+        self.assertEqual(tercera.extraccion.titulo, 'Distinta')
+
+    @patch('analizador.recomendaciones.obtener_recomendaciones_ia_lote', side_effect=recomendaciones_falsas)
+    @patch('analizador.trabajos.verificar_archivos_seo', return_value={'robots_txt_exists': True, 'sitemap_xml_exists': True, 'hallazgos_info': []})
+    @patch('analizador.cliente_http.ClienteHTTP.get')
+    def test_nuevo_rastreo_reutiliza_las_paginas_sin_cambios(self, mock_get, mock_verificar, mock_ia):
+        paginas = {
+            'https://ejemplo.com': '<title>Inicio</title><a href="/a">A</a><a href="/b">B</a>',
+            'https://ejemplo.com/a': '<title>A</title><a href="/c">C</a><img src="/foto.png">',
+            'https://ejemplo.com/b': '<title>B</title>',
+            'https://ejemplo.com/c': '<title>C</title>',
+        }
+        condicionales = []
+
+        def responder(url, headers=None, **kwargs):
+            if url.endswith('/robots.txt'):
+                return crear_respuesta_html('', status_code=404)
+            if headers:
+                condicionales.append((url, headers))
+            if url == 'https://ejemplo.com/a':
+                if headers and headers.get('If-None-Match') == '"v1"':
+                    return crear_respuesta_html('', status_code=304, headers={'ETag': '"v1"'})
+                return crear_respuesta_html(paginas[url], headers={'ETag': '"v1"'})
+            return crear_respuesta_html(paginas[url])
+        mock_get.side_effect = responder
+
+        primero = ejecutar_trabajo(TrabajoRastreo.objects.create(url='https://ejemplo.com', crawl_scope='multiple_pages', num_pages=10))
+        llamadas_ia = mock_ia.call_count
+        self.assertGreater(llamadas_ia, 0)
+
+        paginas['https://ejemplo.com/c'] = '<title>C cambiada</title>'
+        segundo = ejecutar_trabajo(TrabajoRastreo.objects.create(url='https://ejemplo.com', crawl_scope='multiple_pages', num_pages=10))
+
+        # Solo /a tenía ETag; /b y /c se comparan por la huella de su contenido
+        self.assertEqual(condicionales, [('https://ejemplo.com/a', {'If-None-Match': '"v1"'})])
+
+        anteriores = {analisis.url: analisis for analisis in primero.analisis_principal.urls_analizadas.all()}
+        nuevas = {analisis.url: analisis for analisis in segundo.analisis_principal.urls_analizadas.all()}
+        self.assertEqual(set(nuevas), {'https://ejemplo.com/a', 'https://ejemplo.com/b', 'https://ejemplo.com/c'})
+        self.assertEqual({url for url, analisis in nuevas.items() if analisis.sin_cambios}, {'https://ejemplo.com/a', 'https://ejemplo.com/b'})
+
+        # Misma información que en el primer rastreo, sin volver a analizar el HTML
+        a_antes, a_ahora = anteriores['https://ejemplo.com/a'], nuevas['https://ejemplo.com/a']
+        self.assertEqual((a_ahora.titulo, a_ahora.puntuacion, a_ahora.codigo_estado, a_ahora.etag), (a_antes.titulo, a_antes.puntuacion, 200, '"v1"'))
+        self.assertEqual(
+            list(a_ahora.hallazgos.values_list('tipo', 'descripcion')),
+            list(a_antes.hallazgos.values_list('tipo', 'descripcion'))
+        )
+        self.assertEqual(list(a_ahora.imagenes.values_list('url', flat=True)), ['https://ejemplo.com/foto.png'])
+        self.assertEqual(a_ahora.enlaces.count(), a_antes.enlaces.count())
+        self.assertEqual(nuevas['https://ejemplo.com/c'].titulo, 'C cambiada')
+
+        # Las recomendaciones de los hallazgos que ya existían no se vuelven a pedir a la IA
+        self.assertFalse(segundo.analisis_principal.incidencias.filter(estado_recomendacion='pendiente').exists())
+        pedidos = [hallazgo['descripcion'] for llamada in mock_ia.call_args_list[llamadas_ia:] for hallazgo in llamada.args[0]]
+        self.assertTrue(all(
+            not Incidencia.objects.filter(analisis_principal=primero.analisis_principal, descripcion=descripcion).exists()
+            for descripcion in pedidos
+        ))
+        self.assertTrue(any('2 página(s) sin cambios' in mensaje['texto'] for mensaje in segundo.mensajes))
+
+
+class PuntoControlTests(TestCase):
+    def test_exportar_e_importar_vistas(self):
+        urls = [f'https://ejemplo.com/p{i}' for i in range(50)]
+        for modo in ('set', 'huellas', 'bloom'):
+            vistas = crear_conjunto_vistas(modo, capacidad=100)
+            for url in urls:
+                vistas.add(url)
+            copia = importar_vistas(json.loads(json.dumps(exportar_vistas(vistas))))
+            self.assertEqual(type(copia), type(vistas))
+            self.assertEqual(len(copia), 50)
+            self.assertTrue(all(url in copia for url in urls))
+            self.assertNotIn('https://ejemplo.com/otra', copia)
+
+    def test_rastreador_restaura_frontera_y_vistas(self):
+        rastreador = Rastreador(max_urls=10)
+        rastreador.encolar(['https://ejemplo.com', 'https://ejemplo.com/a'])
+        rastreador.frontera.siguiente()  # https://ejemplo.com, ya entregada
+        rastreador.sembrar([(0.2, 'https://ejemplo.com/nueva')])
+        punto = json.loads(json.dumps(rastreador.punto_control(sin_procesar=[('https://ejemplo.com', 0)])))
+
+        restaurado = Rastreador(max_urls=10)
+        restaurado.restaurar(punto)
+        self.assertEqual(len(restaurado.frontera), 3)
+        self.assertFalse(restaurado.frontera.agregar('https://ejemplo.com/a'))  # Ya vista
+        entregadas = [restaurado.frontera.siguiente() for _ in range(3)]
+        # Cada URL conserva su prioridad; a igual prioridad, las que estaban en la frontera salen antes
+        self.assertEqual(entregadas, [('https://ejemplo.com/a', 0), ('https://ejemplo.com', 0), ('https://ejemplo.com/nueva', 1)])
+
+    def test_trabajo_guarda_el_punto_control_comprimido(self):
+        trabajo = TrabajoRastreo.objects.create(url='https://ejemplo.com')
+        self.assertIsNone(trabajo.punto_control)
+        trabajo.punto_control = {'pendientes': [[1, 'https://ejemplo.com/a', 1]] * 100}
+        trabajo.save()
+        trabajo.refresh_from_db()
+        self.assertEqual(trabajo.punto_control['pendientes'][0], [1, 'https://ejemplo.com/a', 1])
+        self.assertLess(len(trabajo.punto_control_comprimido), 200)
+
+    def test_reclama_trabajos_abandonados(self):
+        abandonado = TrabajoRastreo.objects.create(url='https://ejemplo.com', estado='en_curso')
+        activo = TrabajoRastreo.objects.create(url='https://otro.com', estado='en_curso')
+        TrabajoRastreo.objects.filter(pk=abandonado.pk).update(fecha_actualizacion=timezone.now() - timedelta(hours=1))
+
+        self.assertEqual(reclamar_siguiente_trabajo().pk, abandonado.pk)
+        self.assertIsNone(reclamar_siguiente_trabajo())
+        activo.refresh_from_db()
+        self.assertEqual(activo.estado, 'en_curso')
+
+    def test_solo_reclama_trabajos_con_la_concesion_caducada(self):
+        TrabajoRastreo.objects.create(url='https://ejemplo.com')
+        trabajo = reclamar_siguiente_trabajo()
+        self.assertTrue(trabajo.concesion)
+        # Una fase larga sin guardar progreso no basta: la concesión sigue vigente
+        TrabajoRastreo.objects.filter(pk=trabajo.pk).update(fecha_actualizacion=timezone.now() - timedelta(hours=1))
+        self.assertIsNone(reclamar_siguiente_trabajo())
+
+        vigente_hasta = trabajo.concesion_hasta
+        trabajo.renovar_concesion()
+        self.assertGreaterEqual(trabajo.concesion_hasta, vigente_hasta)
+
+        TrabajoRastreo.objects.filter(pk=trabajo.pk).update(concesion_hasta=timezone.now() - timedelta(seconds=1))
+        reclamado = reclamar_siguiente_trabajo()
+        self.assertEqual(reclamado.pk, trabajo.pk)
+        self.assertNotEqual(reclamado.concesion, trabajo.concesion)
+
+    def test_worker_sin_concesion_no_escribe(self):
+        TrabajoRastreo.objects.create(url='https://ejemplo.com')
+        anterior = reclamar_siguiente_trabajo()
+        TrabajoRastreo.objects.filter(pk=anterior.pk).update(concesion_hasta=timezone.now() - timedelta(seconds=1))
+        actual = reclamar_siguiente_trabajo()
+
+        escritor = EscritorAnalisis(anterior)
+        escritor.agregar(Analisis(url='https://ejemplo.com', titulo='Ejemplo', codigo_estado=200, puntuacion=100))
+        with self.assertRaises(ConcesionPerdida):
+            escritor.escribir()
+        self.assertFalse(Analisis.objects.exists())
+        self.assertRaises(ConcesionPerdida, anterior.renovar_concesion)
+        self.assertFalse(devolver_a_la_cola(anterior))
+
+        actual.refresh_from_db()
+        self.assertEqual(actual.estado, 'en_curso')
+        self.assertEqual(actual.paginas_procesadas, 0)
+
+    @patch('analizador.trabajos.verificar_archivos_seo')
+    @patch('analizador.cliente_http.ClienteHTTP.get', return_value=crear_respuesta_html('<title>Ejemplo</title>'))
+    def test_trabajo_reclamado_por_otro_worker_no_se_guarda(self, mock_get, mock_verificar):
+        TrabajoRastreo.objects.create(url='https://ejemplo.com', crawl_scope='single_url')
+        trabajo = reclamar_siguiente_trabajo()
+
+        def verificar_y_perder_la_concesion(url, **kwargs):
+            # Mientras analiza la página, el worker pierde la concesión y otro reclama el trabajo
+            TrabajoRastreo.objects.filter(pk=trabajo.pk).update(concesion_hasta=timezone.now() - timedelta(seconds=1))
+            reclamar_siguiente_trabajo()
+            return {'robots_txt_exists': True, 'sitemap_xml_exists': True, 'hallazgos_info': []}
+        mock_verificar.side_effect = verificar_y_perder_la_concesion
+
+        with self.assertRaises(ConcesionPerdida):
+            ejecutar_trabajo(trabajo)
+        self.assertFalse(Analisis.objects.exists())
+        guardado = TrabajoRastreo.objects.get(pk=trabajo.pk)
+        self.assertEqual(guardado.estado, 'en_curso')
+        self.assertNotEqual(guardado.concesion, trabajo.concesion)
+
+    @override_settings(CRAWL_CHECKPOINT_PAGES=2, CRAWL_DB_BATCH_SECONDS=0)
+    @patch('analizador.recomendaciones.obtener_recomendaciones_ia_lote', side_effect=recomendaciones_falsas)
+    @patch('analizador.trabajos.verificar_archivos_seo', return_value={'robots_txt_exists': True, 'sitemap_xml_exists': True, 'hallazgos_info': []})
+    @patch('analizador.cliente_http.ClienteHTTP.get')
+    def test_rastreo_interrumpido_se_reanuda_sin_duplicados(self, mock_get, mock_verificar, mock_ia):
+        descartar_cache_robots()
+        urls = ['https://ejemplo.com'] + [f'https://ejemplo.com/p{i}' for i in range(1, 8)]
+        enlaces = ''.join(f'<a href="{url}">{url}</a>' for url in urls[1:])
+
+        def responder(url, **kwargs):
+            if url.endswith('/robots.txt'):
+                return crear_respuesta_html('', status_code=404)
+            return crear_respuesta_html(f'<title>{url}</title>' + (enlaces if url == urls[0] else ''))
+        mock_get.side_effect = responder
+
+        analizadas = []
+
+        def analizar_e_interrumpir(extraccion, url, tecnologia):
+            analizadas.append(url)
+            if len(analizadas) == 5:
+                raise KeyboardInterrupt  # El worker se detiene a mitad de rastreo
+            return analizar_contenido_pagina(extraccion, url, tecnologia)
+
+        TrabajoRastreo.objects.create(url=urls[0], crawl_scope='multiple_pages', num_pages=8)
+        trabajo = reclamar_siguiente_trabajo()
+        with patch('analizador.trabajos.analizar_contenido_pagina', side_effect=analizar_e_interrumpir):
+            with self.assertRaises(KeyboardInterrupt):
+                ejecutar_trabajo(trabajo)
+        trabajo.refresh_from_db()
+        punto = trabajo.punto_control
+        self.assertEqual(punto['paginas_procesadas'], 3)
+        # La página analizada tras el punto de control ya se había guardado
+        self.assertEqual(Analisis.objects.count(), 4)
+
+        self.assertTrue(devolver_a_la_cola(trabajo))
+        trabajo = ejecutar_trabajo(reclamar_siguiente_trabajo())
+
+        self.assertEqual(trabajo.estado, 'completado')
+        self.assertIsNone(trabajo.punto_control)
+        self.assertEqual(trabajo.paginas_procesadas, 8)
+        self.assertTrue(any('reanudado' in mensaje['texto'] for mensaje in trabajo.mensajes))
+
+        # Cada URL se analizó y se guardó una sola vez
+        principal = trabajo.analisis_principal
+        self.assertEqual(sorted(Analisis.objects.values_list('url', flat=True)), sorted(urls))
+        self.assertEqual(principal.urls_analizadas.count(), 7)
+        for incidencia in principal.incidencias.all():
+            self.assertEqual(incidencia.num_ocurrencias, incidencia.ocurrencias.count())
+        self.assertEqual(principal.resumen.total_paginas, 8)
+        self.assertEqual(principal.resumen.total_hallazgos, Hallazgo.objects.count())
+
+    @patch('analizador.management.commands.procesar_rastreos.enriquecer_programadas', side_effect=KeyboardInterrupt)
+    def test_worker_se_detiene_mientras_genera_recomendaciones(self, mock_programadas):
+        # SIGTERM con la cola vacía, mientras se generan las recomendaciones programadas
+        salida = StringIO()
+        call_command('procesar_rastreos', stdout=salida, stderr=salida)
+        mock_programadas.assert_called_once()
+        self.assertEqual(salida.getvalue(), '')
+
+
+class BaseConocimientoTests(TestCase):
+    def setUp(self):
+        obtener_cache_recomendaciones().limpiar_memoria()
+        descartar_cliente_ia()
+
+    def _hallazgos_generados(self):
+        """Todos los hallazgos que pueden generar analizar_contenido_pagina y verificar_archivos_seo."""
+        hallazgos = []
+        paginas = [
+            '<img src="/a.png">',
+            '<title>Corto</title><meta name="description" content="Corta"><h1>A</h1><h1>B</h1>',
+            f'<title>{"Largo " * 20}</title><meta name="description" content="{"Larga " * 40}">',
+        ]
+        for html in paginas:
+            hallazgos += analizar_contenido_pagina(BeautifulSoup(html, 'html.parser'), 'https://ejemplo.com', 'generic')['hallazgos_info']
+
+        cliente = MagicMock()
+        cliente.get.return_value = crear_respuesta_html('', status_code=404)
+        hallazgos += verificar_archivos_seo('https://ejemplo.com', cliente=cliente)['hallazgos_info']
+        cliente.get.side_effect = requests.ConnectionError('sin conexión')
+        hallazgos += verificar_archivos_seo('https://ejemplo.com', cliente=cliente)['hallazgos_info']
+        return hallazgos
+
+    def test_cubre_todos_los_hallazgos_generados(self):
+        hallazgos = self._hallazgos_generados()
+        codigos = {identificar_hallazgo(hallazgo['descripcion']) for hallazgo in hallazgos}
+        self.assertNotIn(None, codigos)
+        self.assertEqual(len(codigos), 15)
+
+    def test_plantillas_por_tecnologia(self):
+        self.assertEqual(set(SOLUCIONES), {codigo for codigo, _ in AnalisisForm.WEBSITE_TECHNOLOGY_CHOICES})
+        for soluciones in SOLUCIONES.values():
+            self.assertEqual(set(soluciones), set(SOLUCIONES['generic']))
+
+        descripcion = 'Imagen sin texto alternativo: https://ejemplo.com/a.png'
+        self.assertIn('Biblioteca de medios', recomendacion_local(descripcion, 'wordpress'))
+        self.assertIn('image_tag', recomendacion_local(descripcion, 'ruby_on_rails'))
+        self.assertEqual(recomendacion_local(descripcion, 'desconocida'), recomendacion_local(descripcion, 'generic'))
+        self.assertIsNone(recomendacion_local('Hallazgo que no está en la base', 'wordpress'))
+
+    @patch('analizador.utils.os.getenv', return_value='fake_key')
+    @patch('analizador.utils.genai.configure')
+    @patch('analizador.utils.genai.GenerativeModel')
+    def test_modo_mixto_solo_consulta_la_ia_para_lo_no_cubierto(self, mock_generative_model, mock_configure, mock_getenv):
+        respuesta = MagicMock()
+        type(respuesta).text = PropertyMock(return_value='[{"id": 0, "recomendacion": "Revisa el canonical."}]')
+        mock_generative_model.return_value.generate_content.return_value = respuesta
+
+        hallazgos = [
+            {'tipo': 'error', 'descripcion': 'No se encontró encabezado H1. Cada página debe tener un H1.'},
+            {'tipo': 'warning', 'descripcion': 'La URL canónica apunta a otra página'},
+        ]
+        resultado = obtener_recomendaciones_ia_lote(hallazgos, 'https://ejemplo.com', 'django')
+
+        self.assertIn('<h1>', resultado[0])
+        self.assertEqual(resultado[1], 'Revisa el canonical.')
+        prompt = mock_generative_model.return_value.generate_content.call_args[0][0]
+        self.assertNotIn('H1', prompt)
+
+    @override_settings(IA_RECOMMENDATION_SOURCE='local')
+    @patch('analizador.utils.os.getenv', return_value='fake_key')
+    @patch('analizador.utils.genai.GenerativeModel')
+    def test_modo_local_no_llama_a_la_api(self, mock_generative_model, mock_getenv):
+        hallazgos = self._hallazgos_generados() + [{'tipo': 'info', 'descripcion': 'Hallazgo desconocido'}]
+        resultado = obtener_recomendaciones_ia_lote(hallazgos, 'https://ejemplo.com', 'shopify')
+        self.assertTrue(all(resultado[:-1]))
+        self.assertIsNone(resultado[-1])  # Sin recomendación local: queda pendiente, sin guardar el aviso
+        self.assertIn('offline mode', obtener_recomendacion_ia('Hallazgo desconocido', 'https://ejemplo.com', 'shopify', 'info'))
+        with self.assertRaises(RecomendacionNoDisponible):
+            generar_recomendacion_ia('Hallazgo desconocido', 'https://ejemplo.com', 'shopify', 'info')
+        mock_generative_model.assert_not_called()
+        self.assertFalse(RecomendacionIA.objects.exists())
+
+    @override_settings(IA_RECOMMENDATION_SOURCE='ia')
+    @patch('analizador.utils.os.getenv', return_value=None)
+    def test_modo_ia_no_usa_la_base_local(self, mock_getenv):
+        resultado = obtener_recomendacion_ia('No se encontró encabezado H1. Cada página debe tener un H1.', 'https://ejemplo.com', 'generic', 'error')
+        self.assertIn('API key not configured', resultado)
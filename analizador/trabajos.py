@@ -0,0 +1,663 @@
+"""
+Ejecución en segundo plano de los trabajos de rastreo del Analizador SEO con IA.
+"""
+
+import threading
+import uuid
+from contextlib import contextmanager
+from datetime import timedelta
+from urllib.parse import urlparse
+
+import requests
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from .cache_ia import obtener_cache_recomendaciones
+from .cliente_http import ClienteHTTP
+from .extractor import ExtraccionPagina
+from .models import (
+    Analisis, Hallazgo, Incidencia, Imagen, Enlace, ArchivoSEO, ResumenRastreo, TrabajoRastreo, ConcesionPerdida,
+    normalizar_host
+)
+from .persistencia import EscritorAnalisis
+from .rastreador import Rastreador
+from .recomendaciones import enriquecer_rastreo
+from .robots import obtener_cache_robots
+from .sitemap import sembrar_desde_sitemaps
+from .utils import (
+    obtener_urls_sitio,
+    analizar_contenido_pagina,
+    verificar_archivos_seo
+)
+
+
+def reclamar_siguiente_trabajo():
+    """
+    Reclama el trabajo pendiente más antiguo, lo marca como 'en_curso' y le
+    da una concesión (un token propio) válida CRAWL_STALE_JOB_SECONDS, que el
+    latido del worker renueva mientras lo ejecuta (ver _Latido). El UPDATE
+    condicionado al estado garantiza que dos workers no reclamen el mismo
+    trabajo. Retorna None si no hay trabajos en cola.
+
+    Antes se devuelven a la cola los trabajos 'en_curso' cuya concesión ha
+    caducado (su worker se detuvo): se reanudan desde su último punto de
+    control, y el worker anterior, si sigue vivo, ya no puede escribir en
+    su nombre. Los reclamados antes de existir las concesiones se devuelven
+    si llevan CRAWL_STALE_JOB_SECONDS sin guardar progreso.
+    """
+    duracion = timedelta(seconds=getattr(settings, 'CRAWL_STALE_JOB_SECONDS', 600))
+    ahora = timezone.now()
+    TrabajoRastreo.objects.filter(
+        Q(concesion_hasta__lt=ahora) | Q(concesion_hasta__isnull=True, fecha_actualizacion__lt=ahora - duracion),
+        estado='en_curso'
+    ).update(estado='pendiente', concesion='', concesion_hasta=None)
+
+    while True:
+        trabajo = TrabajoRastreo.objects.filter(estado='pendiente').order_by('fecha_creacion').first()
+        if trabajo is None:
+            return None
+
+        ahora = timezone.now()
+        reclamado = TrabajoRastreo.objects.filter(pk=trabajo.pk, estado='pendiente').update(
+            estado='en_curso',
+            concesion=uuid.uuid4().hex,
+            concesion_hasta=ahora + duracion,
+            fecha_inicio=ahora,
+            fecha_actualizacion=ahora # update() no aplica auto_now
+        )
+        if reclamado:
+            trabajo.refresh_from_db()
+            return trabajo
+        # Otro worker lo reclamó primero: probar con el siguiente
+
+
+def devolver_a_la_cola(trabajo):
+    """
+    Devuelve a la cola un trabajo 'en_curso' cuyo worker se detiene (p. ej.
+    en un despliegue); conserva su punto de control para reanudarlo.
+    Retorna True si el trabajo seguía en curso a cargo de este worker.
+    """
+    return bool(TrabajoRastreo.objects.filter(pk=trabajo.pk, estado='en_curso', concesion=trabajo.concesion).update(
+        estado='pendiente', concesion='', concesion_hasta=None
+    ))
+
+
+@contextmanager
+def _con_concesion(trabajo):
+    """
+    Transacción que solo escribe si el worker conserva la concesión del
+    trabajo: la renueva al empezar y, si otro worker lo ha reclamado, lanza
+    ConcesionPerdida sin escribir nada.
+    """
+    with transaction.atomic():
+        trabajo.renovar_concesion()
+        yield
+
+
+class _Latido(threading.Thread):
+    """
+    Renueva la concesión de un trabajo cada CRAWL_JOB_HEARTBEAT_SECONDS
+    mientras el worker lo ejecuta, lleguen o no páginas (descargas lentas,
+    un Crawl-delay largo o la escritura final). Se detiene si la pierde:
+    el worker lo notará en su próxima escritura.
+    """
+
+    def __init__(self, trabajo):
+        super().__init__(name=f'latido-trabajo-{trabajo.pk}', daemon=True)
+        # Copia propia: el hilo del rastreo sigue modificando `trabajo`
+        self.trabajo = TrabajoRastreo(pk=trabajo.pk, concesion=trabajo.concesion)
+        self.parar = threading.Event()
+
+    def run(self):
+        intervalo = getattr(settings, 'CRAWL_JOB_HEARTBEAT_SECONDS', 60)
+        try:
+            while not self.parar.wait(intervalo):
+                try:
+                    self.trabajo.renovar_concesion()
+                except ConcesionPerdida:
+                    return
+                except Exception: # p. ej. base de datos bloqueada: se reintenta en el siguiente latido
+                    pass
+        finally:
+            connection.close() # Cada hilo tiene su propia conexión
+
+    def detener(self):
+        self.parar.set()
+        self.join()
+
+
+def ejecutar_trabajo(trabajo):
+    """
+    Ejecuta un trabajo de rastreo ya reclamado y registra su resultado
+    ('completado' o 'fallido') en la base de datos. Lanza ConcesionPerdida,
+    sin guardar nada más, si entretanto otro worker ha reclamado el trabajo.
+    """
+    latido = None
+    if trabajo.concesion:
+        latido = _Latido(trabajo)
+        latido.start()
+    try:
+        try:
+            analisis_principal = rastrear_sitio(trabajo)
+        except ConcesionPerdida:
+            raise
+        except Exception as e: # Cualquier fallo no previsto marca el trabajo como fallido
+            trabajo.estado = 'fallido'
+            trabajo.error = f"Error inesperado durante el rastreo: {str(e)}"
+        else:
+            if analisis_principal:
+                trabajo.estado = 'completado'
+                trabajo.analisis_principal = analisis_principal
+                trabajo.registrar_mensaje('success', f'Análisis completado. Se procesaron {trabajo.paginas_procesadas} página(s).')
+            elif trabajo.crawl_scope == 'single_url': # Failed to analyze even the single main URL
+                trabajo.estado = 'fallido'
+                trabajo.error = f'No se pudo analizar la URL proporcionada: {trabajo.url}. Verifique la URL e intente de nuevo.'
+            else:
+                trabajo.estado = 'fallido'
+                trabajo.error = f'No se pudo analizar la URL inicial: {trabajo.url}. No se pudieron rastrear más páginas.'
+
+        trabajo.fecha_fin = timezone.now()
+        trabajo.punto_control = None # El rastreo terminó: ya no hay nada que reanudar
+        with _con_concesion(trabajo):
+            trabajo.concesion, trabajo.concesion_hasta = '', None
+            trabajo.save()
+    finally:
+        if latido is not None:
+            latido.detener()
+
+    if trabajo.estado == 'completado' and getattr(settings, 'IA_ENRICHMENT_MODE', 'tras_rastreo') == 'tras_rastreo':
+        completar_recomendaciones(trabajo)
+    return trabajo
+
+
+def completar_recomendaciones(trabajo):
+    """
+    Etapa posterior al rastreo: genera las recomendaciones de la IA de los
+    hallazgos guardados. El trabajo ya figura como completado, así que el
+    informe se puede consultar mientras tanto y las recomendaciones aparecen
+    a medida que se guardan.
+    """
+    cache_ia = obtener_cache_recomendaciones()
+    cache_ia_inicial = cache_ia.estadisticas()
+    try:
+        enriquecer_rastreo(trabajo.analisis_principal)
+    except Exception as e: # Las recomendaciones que falten se generarán al consultar la página
+        trabajo.registrar_mensaje('warning', f"No se pudieron completar las recomendaciones IA: {str(e)}")
+    else:
+        cache_ia_final = cache_ia.estadisticas()
+        aciertos_ia = sum(cache_ia_final[c] - cache_ia_inicial[c] for c in ('aciertos_memoria', 'aciertos_bd'))
+        consultas_ia = cache_ia_final['fallos'] - cache_ia_inicial['fallos']
+        if aciertos_ia or consultas_ia:
+            trabajo.registrar_mensaje('info', f"Recomendaciones IA: {aciertos_ia} desde la caché y {consultas_ia} consultadas a la IA.")
+    trabajo.save(update_fields=['mensajes'])
+
+
+def rastrear_sitio(trabajo):
+    """
+    Rastrea el sitio de un trabajo, guarda un Analisis por página y retorna
+    el análisis de la URL principal (o None si no pudo analizarse).
+    Todas las descargas del rastreo (páginas, robots.txt y sitemap.xml)
+    comparten un mismo ClienteHTTP y, por tanto, sus conexiones keep-alive.
+    """
+    with ClienteHTTP() as cliente:
+        return _rastrear_sitio(trabajo, cliente)
+
+
+def _rastrear_sitio(trabajo, cliente):
+    url = trabajo.url
+    crawl_scope = trabajo.crawl_scope
+    num_pages = trabajo.num_pages
+    website_technology = trabajo.tecnologia_sitio
+
+    if crawl_scope == 'single_url':
+        max_urls = 1
+    else: # multiple_pages
+        max_urls = num_pages if num_pages else 10 # Default to 10 if not provided for some reason
+
+    analisis_principal = None
+    sin_principal = [] # Análisis creados antes de conocer el principal
+    incidencias = {} # Huella -> Incidencia del sitio (ver _hallazgos_pagina)
+    bloqueadas = set() # URLs enlazadas que robots.txt no permite rastrear
+    sin_cambios = 0 # Páginas cuyo análisis se reutilizó del rastreo anterior
+
+    # Los agregados del resumen se actualizan con cada lote escrito
+    escritor = EscritorAnalisis(trabajo, resumen=ResumenRastreo())
+
+    # Realizar crawling del sitio: las descargas se hacen en paralelo
+    # y cada página se procesa aquí a medida que termina
+    rastreador = Rastreador(max_urls=max_urls, cliente=cliente)
+
+    # Un rastreo interrumpido (worker detenido o reiniciado) sigue desde su último punto de control
+    paginas_por_punto = getattr(settings, 'CRAWL_CHECKPOINT_PAGES', 200)
+    ultimo_punto = None # Páginas procesadas en el último punto de control
+    punto = trabajo.punto_control if crawl_scope == 'multiple_pages' else None
+    trabajo.paginas_procesadas = 0 # Sin punto de control, un trabajo devuelto a la cola empieza de cero
+    if punto:
+        analisis_principal, incidencias, escritor.resumen = _reanudar(trabajo, punto, rastreador)
+        if analisis_principal is not None:
+            bloqueadas, sin_cambios = set(punto['bloqueadas']), punto['sin_cambios']
+            ultimo_punto = trabajo.paginas_procesadas
+            trabajo.registrar_mensaje(
+                'info',
+                f"Rastreo reanudado desde el último punto de control ({trabajo.paginas_procesadas} página(s) ya procesadas)."
+            )
+
+    # En un nuevo rastreo del sitio, las páginas se piden de forma condicional y las
+    # recomendaciones de la IA que ya se generaron la vez anterior se reutilizan
+    recomendaciones_anteriores = {}
+    if crawl_scope == 'multiple_pages' and getattr(settings, 'CRAWL_CONDITIONAL_RECRAWL', True):
+        rastreador.validadores, recomendaciones_anteriores = _rastreo_anterior(
+            trabajo, excluir=analisis_principal.pk if analisis_principal else None
+        )
+    for pagina in rastreador.rastrear(url):
+        url_actual = pagina.url
+        if (crawl_scope == 'multiple_pages' and paginas_por_punto and analisis_principal is not None
+                and (ultimo_punto is None or trabajo.paginas_procesadas - ultimo_punto >= paginas_por_punto)):
+            _guardar_punto_control(
+                trabajo, escritor, rastreador, analisis_principal, sin_principal, incidencias,
+                sin_procesar=[(url_actual, pagina.profundidad)], bloqueadas=bloqueadas, sin_cambios=sin_cambios
+            )
+            ultimo_punto = trabajo.paginas_procesadas
+        trabajo.paginas_procesadas += 1
+
+        if isinstance(pagina.error, requests.RequestException):
+            trabajo.registrar_mensaje('warning', f"Error al acceder a {url_actual}: {str(pagina.error)}. Saltando esta URL.")
+            _escribir_si_toca(trabajo, escritor)
+            continue
+        elif pagina.error is not None:
+            trabajo.registrar_mensaje('error', f"Error inesperado analizando {url_actual}: {str(pagina.error)}. Saltando esta URL.")
+            _escribir_si_toca(trabajo, escritor)
+            continue
+
+        if pagina.estado_descarga == 'omitida':
+            # No es HTML: se deja constancia de la URL y del motivo, sin análisis
+            analisis_omitido = Analisis(
+                url=url_actual,
+                titulo=url_actual,
+                codigo_estado=pagina.response.status_code,
+                puntuacion=0,
+                estado_descarga='omitida',
+                motivo_descarga=pagina.motivo_descarga,
+                analisis_principal=analisis_principal,
+                **(_datos_analisis_principal(trabajo) if url_actual == url else {})
+            )
+            trabajo.registrar_mensaje('info', f"{url_actual} omitida: {pagina.motivo_descarga}.")
+            try:
+                analisis_principal = _agregar_analisis(escritor, analisis_omitido, url_actual == url, analisis_principal, sin_principal)
+            except ConcesionPerdida:
+                raise
+            except Exception as e: # El lote se descartó (ver EscritorAnalisis.escribir)
+                trabajo.registrar_mensaje('error', f"No se pudo guardar {url_actual}: {str(e)}.")
+            continue
+
+        try:
+            response = pagina.response
+            # Señales de la página, extraídas en el hilo de descarga en un único
+            # recorrido y compartidas por el análisis y el descubrimiento de URLs
+            extraccion = pagina.extraccion
+
+            # Inicializar puntuación para la página actual
+            puntuacion_pagina = 100 # Start with a base score for the page
+
+            if pagina.estado_descarga == 'sin_cambios':
+                # 304 o mismo contenido: se reutiliza el análisis anterior sin volver a analizar la página
+                anterior, contenido_info, extraccion = _contenido_anterior(rastreador.validadores[url_actual]['pk'])
+                sin_cambios += 1
+            else:
+                anterior = None
+                # Analizar contenido de la página usando la nueva función de utils.py
+                contenido_info = analizar_contenido_pagina(extraccion, url_actual, website_technology)
+            
+            # Extraer datos del resultado de analizar_contenido_pagina
+            titulo_pagina = contenido_info['titulo'] if contenido_info['titulo'] else url_actual # Use URL if title is empty
+            descripcion_pagina = contenido_info['descripcion_meta']
+            
+            # Lista para todos los hallazgos (de contenido y de archivos SEO)
+            todos_hallazgos_info_pagina = list(contenido_info['hallazgos_info']) # Make a mutable copy
+
+            # Ajustar puntuación basada en hallazgos de contenido (ejemplo)
+            # This simplistic scoring adjustment should be refined or replaced by calcular_puntuacion_seo
+            for hallazgo_item in todos_hallazgos_info_pagina:
+                if hallazgo_item['tipo'] == 'error':
+                    puntuacion_pagina -= 10
+                elif hallazgo_item['tipo'] == 'warning':
+                    puntuacion_pagina -= 5
+                elif hallazgo_item['tipo'] == 'info': # Infos usually don't decrease score, but can
+                    puntuacion_pagina -= 1
+            
+            # Crear el objeto Analisis
+            current_analisis_data = {
+                'url': url_actual,
+                'titulo': titulo_pagina,
+                'descripcion': descripcion_pagina,
+                'codigo_estado': anterior.codigo_estado if anterior else response.status_code,
+                'robots_txt': False,  # Default, será actualizado para la URL principal
+                'sitemap_xml': False, # Default, será actualizado para la URL principal
+                'estado_descarga': anterior.estado_descarga if anterior else pagina.estado_descarga,
+                'motivo_descarga': anterior.motivo_descarga if anterior else pagina.motivo_descarga,
+                'etag': response.headers.get('ETag', anterior.etag if anterior else '')[:255],
+                'ultima_modificacion': response.headers.get('Last-Modified', anterior.ultima_modificacion if anterior else '')[:64],
+                'huella_contenido': pagina.huella_contenido,
+                'sin_cambios': anterior is not None,
+                # 'puntuacion' se establecerá después de considerar archivos SEO si es la URL principal
+            }
+            if pagina.estado_descarga == 'truncada':
+                trabajo.registrar_mensaje('warning', f"{url_actual}: {pagina.motivo_descarga}. Solo se ha analizado esa parte.")
+
+            archivos_seo_descargados = []
+            if url_actual == url: # Es la URL principal del análisis
+                current_analisis_data.update(_datos_analisis_principal(trabajo))
+                
+                # Verificar robots.txt y sitemap.xml para la URL principal
+                archivos_seo_info = verificar_archivos_seo(url, cliente=cliente)
+                current_analisis_data['robots_txt'] = archivos_seo_info['robots_txt_exists']
+                current_analisis_data['sitemap_xml'] = archivos_seo_info['sitemap_xml_exists']
+                todos_hallazgos_info_pagina.extend(archivos_seo_info['hallazgos_info'])
+                archivos_seo_descargados = archivos_seo_info.get('archivos', [])
+                for archivo in archivos_seo_descargados:
+                    if archivo['tipo'] == 'robots.txt':
+                        # El robots.txt recién descargado sustituye al de la caché
+                        obtener_cache_robots().guardar(archivo['url'], archivo['codigo_estado'], archivo['contenido'])
+
+                # Ajustar puntuación por archivos SEO (ejemplo)
+                if not archivos_seo_info['robots_txt_exists']:
+                    puntuacion_pagina -= 2 # Similar to old logic
+                if not archivos_seo_info['sitemap_xml_exists']:
+                    puntuacion_pagina -= 2 # Similar to old logic
+            
+            current_analisis_data['puntuacion'] = max(0, min(100, puntuacion_pagina))
+            # Se guarda junto con sus filas al escribir el lote (ver EscritorAnalisis)
+            analisis_actual = Analisis(analisis_principal=analisis_principal, **current_analisis_data)
+
+            # Hallazgos agrupados en incidencias del sitio; la recomendación de la IA
+            # se genera después del rastreo, una vez por incidencia (ver recomendaciones.py)
+            hallazgos, incidencias_nuevas = _hallazgos_pagina(
+                todos_hallazgos_info_pagina, analisis_actual, url_actual,
+                analisis_actual if url_actual == url else analisis_principal, incidencias,
+                recomendaciones_anteriores
+            )
+
+            # Imágenes
+            imagenes = [
+                Imagen(analisis=analisis_actual, url=img_data['url'], alt=img_data['alt'])
+                for img_data in contenido_info['imagenes_info']
+            ]
+
+            # Enlaces
+            enlaces = [
+                Enlace(analisis=analisis_actual, url=enlace_data['url'], texto=enlace_data['texto'], tipo=enlace_data['tipo'])
+                for enlace_data in contenido_info['enlaces_info']
+            ]
+
+            # Copia de robots.txt y sitemap.xml (solo URL principal) para que los informes no los vuelvan a pedir
+            archivos = [ArchivoSEO(analisis=analisis_actual, **archivo) for archivo in archivos_seo_descargados]
+
+            analisis_principal = _agregar_analisis(
+                escritor, analisis_actual, url_actual == url, analisis_principal, sin_principal,
+                hallazgos=hallazgos, imagenes=imagenes, enlaces=enlaces, archivos=archivos,
+                incidencias=incidencias_nuevas
+            )
+            
+            # Obtener nuevas URLs para crawlear (si aplica)
+            if crawl_scope == 'multiple_pages':
+                reglas_robots = _reglas_robots(rastreador, url_actual, cliente)
+                if url_actual == url and getattr(settings, 'CRAWL_SITEMAP_SEED', True):
+                    # Las URLs de los sitemaps, las modificadas más recientemente primero
+                    sembradas = sembrar_desde_sitemaps(rastreador, url, cliente, archivos_seo_descargados, reglas_robots)
+                    if sembradas:
+                        trabajo.registrar_mensaje('info', f"Se añadieron {sembradas} URL(s) desde el sitemap.")
+                # La frontera descarta URLs ya conocidas y respeta max_urls y la profundidad máxima
+                nuevas_urls = obtener_urls_sitio(url_actual, extraccion, rastreador.frontera, reglas_robots, bloqueadas)
+                rastreador.encolar(nuevas_urls, profundidad=pagina.profundidad + 1)
+
+        except ConcesionPerdida: # Otro worker continúa el rastreo: no se escribe nada más
+            raise
+        except Exception as e: # Captura general para otros errores inesperados durante el análisis de una página
+            trabajo.registrar_mensaje('error', f"Error inesperado analizando {url_actual}: {str(e)}. Saltando esta URL.")
+            _escribir_si_toca(trabajo, escritor)
+
+    if bloqueadas:
+        trabajo.registrar_mensaje('info', f"Se omitieron {len(bloqueadas)} URL(s) no permitidas por robots.txt.")
+    if sin_cambios:
+        trabajo.registrar_mensaje('info', f"{sin_cambios} página(s) sin cambios desde el análisis anterior: se reutilizó su análisis.")
+    for host, estadisticas in rastreador.planificador.estadisticas().items():
+        if estadisticas['limitaciones']:
+            trabajo.registrar_mensaje(
+                'warning',
+                f"{host} pidió bajar el ritmo {estadisticas['limitaciones']} vez/veces (HTTP 429/503); "
+                f"el rastreo se ralentizó para respetarlo."
+            )
+    escritor.escribir()
+
+    with _con_concesion(trabajo):
+        if analisis_principal and sin_principal:
+            # Análisis guardados antes que el principal: se enlazan con una sola consulta
+            Analisis.objects.filter(pk__in=[analisis.pk for analisis in sin_principal]).update(analisis_principal=analisis_principal)
+
+        guardadas = [incidencia for incidencia in incidencias.values() if incidencia.pk is not None]
+        # El número de ocurrencias de cada incidencia se guarda una sola vez, al final
+        Incidencia.objects.bulk_update(guardadas, ['num_ocurrencias'], batch_size=500)
+        if analisis_principal:
+            Incidencia.objects.filter(
+                pk__in=[incidencia.pk for incidencia in guardadas if incidencia.analisis_principal_id is None]
+            ).update(analisis_principal=analisis_principal)
+
+    return analisis_principal
+
+
+def _reglas_robots(rastreador, url_pagina, cliente):
+    """
+    Reglas de robots.txt del host de `url_pagina` (None si CRAWL_RESPECT_ROBOTS
+    está desactivado). Su Crawl-delay se aplica a las descargas de ese host.
+    """
+    if not getattr(settings, 'CRAWL_RESPECT_ROBOTS', True):
+        return None
+    reglas = obtener_cache_robots().reglas(url_pagina, cliente)
+    rastreador.fijar_retraso(urlparse(url_pagina).netloc, reglas.crawl_delay)
+    return reglas
+
+
+def _hallazgos_pagina(hallazgos_info, analisis, url_pagina, analisis_principal, incidencias, recomendaciones_anteriores=None):
+    """
+    Construye los hallazgos de una página como ocurrencias de las incidencias
+    del sitio. Un hallazgo con la misma huella (tipo y descripción) que otro
+    ya visto en el rastreo suma una ocurrencia a su incidencia; si es nuevo,
+    crea la incidencia, con la recomendación del rastreo anterior si la hay
+    en `recomendaciones_anteriores` (huella -> recomendación). Retorna los
+    hallazgos y las incidencias nuevas.
+    """
+    hallazgos, nuevas = [], []
+    for hallazgo_data in hallazgos_info:
+        huella = Incidencia.calcular_huella(hallazgo_data['tipo'], hallazgo_data['descripcion'])
+        incidencia = incidencias.get(huella)
+        if incidencia is None:
+            incidencia = incidencias[huella] = Incidencia(
+                analisis_principal=analisis_principal,
+                huella=huella,
+                tipo=hallazgo_data['tipo'],
+                descripcion=hallazgo_data['descripcion'],
+                url_ejemplo=url_pagina
+            )
+            if recomendaciones_anteriores and huella in recomendaciones_anteriores:
+                incidencia.recomendacion = recomendaciones_anteriores[huella]
+                incidencia.estado_recomendacion = 'lista'
+            nuevas.append(incidencia)
+        incidencia.num_ocurrencias += 1
+        hallazgos.append(Hallazgo(
+            analisis=analisis, incidencia=incidencia, tipo=hallazgo_data['tipo'], descripcion=hallazgo_data['descripcion']
+        ))
+    return hallazgos, nuevas
+
+
+def _guardar_punto_control(trabajo, escritor, rastreador, analisis_principal, sin_principal, incidencias,
+                           sin_procesar, bloqueadas, sin_cambios):
+    """
+    Escribe lo pendiente y guarda en el trabajo el punto de control del
+    rastreo: la frontera y las URLs vistas del rastreador, el último
+    Analisis guardado y los contadores. `sin_procesar` son las URLs ya
+    entregadas por el rastreador que aún no se han guardado.
+    """
+    escritor.escribir()
+    with _con_concesion(trabajo):
+        if sin_principal:
+            # Al reanudar ya no se sabría qué análisis quedaron sin enlazar con el principal
+            Analisis.objects.filter(pk__in=[analisis.pk for analisis in sin_principal]).update(analisis_principal=analisis_principal)
+            sin_principal.clear()
+        sin_enlazar = [incidencia.pk for incidencia in incidencias.values() if incidencia.pk is not None and incidencia.analisis_principal_id is None]
+        if sin_enlazar:
+            Incidencia.objects.filter(pk__in=sin_enlazar).update(analisis_principal=analisis_principal)
+
+        ultimo_analisis = Analisis.objects.filter(
+            Q(pk=analisis_principal.pk) | Q(analisis_principal=analisis_principal)
+        ).order_by('-pk').values_list('pk', flat=True).first()
+        trabajo.punto_control = {
+            'version': 1,
+            'analisis_principal': analisis_principal.pk,
+            'ultimo_analisis': ultimo_analisis,
+            'paginas_procesadas': trabajo.paginas_procesadas,
+            'num_mensajes': len(trabajo.mensajes),
+            'bloqueadas': sorted(bloqueadas),
+            'sin_cambios': sin_cambios,
+            **rastreador.punto_control(sin_procesar=sin_procesar),
+        }
+        trabajo.save(update_fields=['punto_control_comprimido', 'fecha_actualizacion'])
+
+
+def _reanudar(trabajo, punto, rastreador):
+    """
+    Deja la base de datos y el rastreador como estaban en el punto de control
+    `punto`: borra los análisis guardados después, recuenta las ocurrencias
+    de las incidencias, recalcula el resumen y restaura la frontera. Retorna
+    el análisis principal, las incidencias (huella -> Incidencia) y el
+    resumen, o (None, {}, resumen vacío) si el análisis principal ya no existe.
+    """
+    analisis_principal = Analisis.objects.filter(pk=punto['analisis_principal']).first()
+    if analisis_principal is None:
+        return None, {}, ResumenRastreo()
+
+    with _con_concesion(trabajo): # Solo el worker que tiene el trabajo borra lo guardado después del punto de control
+        Analisis.objects.filter(analisis_principal=analisis_principal, pk__gt=punto['ultimo_analisis']).delete()
+        incidencias = {}
+        for incidencia in analisis_principal.incidencias.annotate(n=Count('ocurrencias')):
+            incidencia.num_ocurrencias = incidencia.n
+            incidencias[incidencia.huella] = incidencia
+        Incidencia.objects.bulk_update(list(incidencias.values()), ['num_ocurrencias'], batch_size=500)
+        vacias = [huella for huella, incidencia in incidencias.items() if not incidencia.num_ocurrencias]
+        Incidencia.objects.filter(pk__in=[incidencias.pop(huella).pk for huella in vacias]).delete()
+
+        ResumenRastreo.objects.filter(analisis_principal=analisis_principal).delete()
+        resumen = ResumenRastreo.calcular(analisis_principal)
+        resumen.save()
+
+    trabajo.paginas_procesadas = punto['paginas_procesadas']
+    del trabajo.mensajes[punto['num_mensajes']:]
+    rastreador.restaurar(punto)
+    return analisis_principal, incidencias, resumen
+
+
+def _rastreo_anterior(trabajo, excluir=None):
+    """
+    Datos del último rastreo de varias páginas del mismo sitio (sin contar
+    el análisis principal `excluir`, el del propio rastreo si se reanuda): los
+    validadores de cada página salvo la principal (URL -> 'pk', 'etag',
+    'ultima_modificacion' y 'huella'), para pedirlas de forma condicional,
+    y las recomendaciones ya generadas (huella -> recomendación) si la
+    tecnología del sitio no ha cambiado.
+    """
+    anterior = Analisis.objects.filter(
+        host=normalizar_host(trabajo.url), analisis_principal__isnull=True, crawl_scope='multiple_pages'
+    ).exclude(pk=excluir).order_by('-fecha_analisis').first()
+    if anterior is None:
+        return {}, {}
+
+    paginas = Analisis.objects.filter(
+        Q(pk=anterior.pk) | Q(analisis_principal=anterior), estado_descarga__in=('completa', 'truncada')
+    ).exclude(url=trabajo.url).exclude(etag='', ultima_modificacion='', huella_contenido='')
+    validadores = {
+        url: {'pk': pk, 'etag': etag, 'ultima_modificacion': ultima_modificacion, 'huella': huella}
+        for pk, url, etag, ultima_modificacion, huella in paginas.values_list(
+            'pk', 'url', 'etag', 'ultima_modificacion', 'huella_contenido'
+        )
+    }
+
+    recomendaciones = {}
+    if anterior.tecnologia_sitio == trabajo.tecnologia_sitio:
+        recomendaciones = dict(anterior.incidencias.filter(estado_recomendacion='lista').values_list('huella', 'recomendacion'))
+    return validadores, recomendaciones
+
+
+def _contenido_anterior(pk):
+    """
+    El análisis anterior de una página sin cambios, su contenido con la forma
+    que retorna `analizar_contenido_pagina` y una extracción con sus enlaces
+    para seguir descubriendo URLs, sin volver a analizar el HTML.
+    """
+    anterior = Analisis.objects.get(pk=pk)
+    enlaces = [
+        {'url': url, 'texto': texto, 'tipo': tipo}
+        for url, texto, tipo in anterior.enlaces.order_by('pk').values_list('url', 'texto', 'tipo')
+    ]
+    extraccion = ExtraccionPagina(anterior.url)
+    extraccion.hrefs = [enlace['url'] for enlace in enlaces]
+    contenido_info = {
+        'titulo': anterior.titulo,
+        'descripcion_meta': anterior.descripcion,
+        'hallazgos_info': [
+            {'tipo': tipo, 'descripcion': descripcion}
+            for tipo, descripcion in anterior.hallazgos.order_by('pk').values_list('tipo', 'descripcion')
+        ],
+        'imagenes_info': [{'url': url, 'alt': alt} for url, alt in anterior.imagenes.order_by('pk').values_list('url', 'alt')],
+        'enlaces_info': enlaces,
+    }
+    return anterior, contenido_info, extraccion
+
+
+def _agregar_analisis(escritor, analisis, es_principal, analisis_principal, sin_principal, **filas):
+    """
+    Encola un Analisis (y sus filas) en el escritor y retorna el análisis principal.
+    El principal se escribe enseguida: así el resto de páginas del rastreo
+    pueden referenciarlo al crearse y aparece cuanto antes en la base de datos.
+    Si su lote no se puede escribir, la excepción se propaga y el rastreo
+    sigue sin principal (ninguna página apunta a una fila que no existe).
+    """
+    if es_principal:
+        if escritor.resumen is not None:
+            escritor.resumen.analisis_principal = analisis
+        try:
+            escritor.agregar(analisis, **filas)
+            escritor.escribir()
+        except Exception:
+            # No se guardó: el rastreo sigue sin análisis principal
+            if escritor.resumen is not None:
+                escritor.resumen.analisis_principal = None
+            raise
+        return analisis
+    escritor.agregar(analisis, **filas)
+    if analisis_principal is None:
+        sin_principal.append(analisis)
+    return analisis_principal
+
+
+def _escribir_si_toca(trabajo, escritor):
+    """
+    escritor.escribir_si_toca() sin detener el rastreo: si el lote no se puede
+    escribir se descarta (ver EscritorAnalisis.escribir) y se avisa en el trabajo.
+    """
+    try:
+        escritor.escribir_si_toca()
+    except ConcesionPerdida:
+        raise
+    except Exception as e:
+        trabajo.registrar_mensaje('error', f"No se pudieron guardar las últimas páginas analizadas: {str(e)}.")
+
+
+def _datos_analisis_principal(trabajo):
+    """Campos que solo lleva el Analisis de la URL principal de un rastreo."""
+    return {
+        'crawl_scope': trabajo.crawl_scope,
+        'num_pages_solicitadas': trabajo.num_pages if trabajo.crawl_scope == 'multiple_pages' else 1,
+        'tecnologia_sitio': trabajo.tecnologia_sitio,
+    }
+
@@ -10,5 +10,12 @@ app_name = 'analizador'
 urlpatterns = [
     path('', views.inicio, name='inicio'),
     path('analisis/<int:pk>/', views.DetalleAnalisisView.as_view(), name='detalle_analisis'),
+    path('analisis/<int:pk>/recomendaciones/', views.recomendaciones_json, name='recomendaciones_json'),
+    path('analisis/<int:pk>/hallazgos/', views.hallazgos_json, name='hallazgos_json'),
+    path('analisis/<int:pk>/enlaces/', views.enlaces_json, name='enlaces_json'),
+    path('analisis/<int:pk>/imagenes/', views.imagenes_json, name='imagenes_json'),
     path('resumen/<int:pk>/', views.ResumenAnalisisView.as_view(), name='resumen_analisis'),
+    path('resumen/<int:pk>/paginas/', views.paginas_json, name='paginas_json'),
+    path('trabajo/<int:pk>/', views.EstadoTrabajoView.as_view(), name='estado_trabajo'),
+    path('trabajo/<int:pk>/estado/', views.estado_trabajo_json, name='estado_trabajo_json'),
 ] 
\ No newline at end of file
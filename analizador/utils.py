@@ -6,16 +6,26 @@ import requests
 from bs4 import BeautifulSoup
 from urllib.parse import urljoin, urlparse
 import re
+import json
 # import openai # No longer needed
 import os # For API Key
 import google.generativeai as genai # Added for Gemini
-
-def obtener_codigo_estado(url):
+from django.utils import timezone
+from django.conf import settings
+from .base_conocimiento import recomendacion_local
+from .cache_ia import clave_recomendacion, obtener_cache_recomendaciones
+from .cliente_ia import CircuitoAbierto, obtener_cliente_ia
+from .cliente_http import obtener_cliente_compartido
+from .extractor import ExtraccionPagina, extraer_pagina
+from .sitemap import abrir_cuerpo
+
+def obtener_codigo_estado(url, cliente=None):
     """
     Obtiene el código de estado HTTP de una URL.
     """
+    cliente = cliente or obtener_cliente_compartido()
     try:
-        response = requests.get(url, timeout=5)
+        response = cliente.get(url)
         return response.status_code
     except requests.RequestException:
         return None
@@ -79,16 +89,17 @@ def obtener_enlaces(soup, url):
     return enlaces
 
 
-def encontrar_robots_sitemap(url, tipo):
+def encontrar_robots_sitemap(url, tipo, cliente=None):
     """
     Encuentra y obtiene el contenido de robots.txt o sitemap.xml.
     """
+    cliente = cliente or obtener_cliente_compartido()
     parsed_url = urlparse(url)
     base_url = f"{parsed_url.scheme}://{parsed_url.netloc}"
     target_url = urljoin(base_url, f"/{tipo}")
     
     try:
-        response = requests.get(target_url, timeout=5)
+        response = cliente.get(target_url)
         return response.text if response.status_code == 200 else ""
     except:
         return ""
@@ -127,17 +138,15 @@ def calcular_puntuacion_seo(analisis):
 def analizar_contenido_pagina(soup, url_actual, website_technology=None):
     """
     Analiza el contenido SEO de una página (título, meta descripción, H1, imágenes, enlaces).
+    `soup` puede ser el árbol BeautifulSoup o un ExtraccionPagina ya calculado;
+    en ambos casos el documento se recorre una sola vez (ver extractor.py).
     Retorna un diccionario con la información extraída y hallazgos.
     """
-    # Extraer título
-    titulo = soup.title.string.strip() if soup.title and soup.title.string else ''
-    
-    # Extraer meta descripción
-    meta_desc_tag = soup.find('meta', attrs={'name': 'description'})
-    descripcion_meta = meta_desc_tag.get('content', '').strip() if meta_desc_tag else ''
-    
-    # Extraer H1 tags
-    h1_tags = [h1.get_text(strip=True) for h1 in soup.find_all('h1')]
+    extraccion = soup if isinstance(soup, ExtraccionPagina) else extraer_pagina(soup, url_actual)
+
+    titulo = extraccion.titulo
+    descripcion_meta = extraccion.descripcion_meta
+    h1_tags = extraccion.h1_tags
 
     hallazgos_info = []
     imagenes_info = []
@@ -199,10 +208,8 @@ def analizar_contenido_pagina(soup, url_actual, website_technology=None):
             # 'puntuacion_delta': -5
         })
 
-    # Analizar imágenes (reutilizando la función obtener_imagenes)
-    # La función obtener_imagenes ya devuelve {'src': ..., 'alt': ...}
-    temp_imagenes = obtener_imagenes(soup, url_actual) 
-    for img_data in temp_imagenes:
+    # Analizar imágenes (mismo formato que obtener_imagenes: {'src': ..., 'alt': ...})
+    for img_data in extraccion.imagenes:
         imagenes_info.append({'url': img_data['src'], 'alt': img_data['alt']})
         if not img_data['alt']:
             hallazgos_info.append({
@@ -211,13 +218,12 @@ def analizar_contenido_pagina(soup, url_actual, website_technology=None):
                 # 'puntuacion_delta': -2 # Per image, might be too much, handle in view
             })
 
-    # Analizar enlaces (reutilizando la función obtener_enlaces)
+    # Analizar enlaces (mismo formato que obtener_enlaces: {'url': ..., 'text': ...})
     dominio_base_actual = urlparse(url_actual).netloc
-    temp_enlaces = obtener_enlaces(soup, url_actual) # devuelve {'url': ..., 'text': ...}
     enlaces_internos_count = 0
     enlaces_externos_count = 0
 
-    for enlace_data in temp_enlaces:
+    for enlace_data in extraccion.enlaces:
         tipo_enlace = 'interno' if urlparse(enlace_data['url']).netloc == dominio_base_actual else 'externo'
         if tipo_enlace == 'interno':
             enlaces_internos_count += 1
@@ -252,24 +258,38 @@ def analizar_contenido_pagina(soup, url_actual, website_technology=None):
     }
 
 
-def verificar_archivos_seo(url_base):
+def verificar_archivos_seo(url_base, cliente=None):
     """
     Verifica la presencia de robots.txt y sitemap.xml en el sitio base.
     Retorna un diccionario con los resultados y hallazgos.
+    Usa el cliente HTTP del rastreo si se indica, o el compartido del proceso.
+
+    En 'archivos' se incluye lo descargado de cada archivo (URL, código de
+    estado, contenido y fecha) para guardarlo con el análisis como ArchivoSEO.
+    De sitemap.xml, que puede ocupar decenas de megas, solo se lee y se guarda
+    el principio (CRAWL_SITEMAP_PREVIEW_BYTES); la siembra desde los sitemaps
+    lo vuelve a leer entero por fragmentos (ver sitemap.py).
     """
+    cliente = cliente or obtener_cliente_compartido()
     resultados = {
         'robots_txt_exists': False,
         'sitemap_xml_exists': False,
-        'hallazgos_info': []
+        'hallazgos_info': [],
+        'archivos': []
         # 'puntuacion_delta': 0 # Example
     }
     parsed_url = urlparse(url_base)
     base_url = f"{parsed_url.scheme}://{parsed_url.netloc}"
 
     # Verificar robots.txt
+    robots_url_check = urljoin(base_url, 'robots.txt')
+    archivo = {'tipo': 'robots.txt', 'url': robots_url_check, 'codigo_estado': None, 'contenido': '', 'fecha_descarga': timezone.now()}
+    resultados['archivos'].append(archivo)
     try:
-        robots_url_check = urljoin(base_url, 'robots.txt')
-        robots_response = requests.get(robots_url_check, timeout=5)
+        robots_response = cliente.get(robots_url_check)
+        archivo['codigo_estado'] = robots_response.status_code
+        if robots_response.status_code == 200:
+            archivo['contenido'] = robots_response.text
         if robots_response.status_code == 200 and robots_response.text.strip(): # Check content not empty
             resultados['robots_txt_exists'] = True
         else:
@@ -285,10 +305,23 @@ def verificar_archivos_seo(url_base):
         })
 
     # Verificar sitemap.xml
+    sitemap_url_check = urljoin(base_url, 'sitemap.xml')
+    archivo = {'tipo': 'sitemap.xml', 'url': sitemap_url_check, 'codigo_estado': None, 'contenido': '', 'fecha_descarga': timezone.now()}
+    resultados['archivos'].append(archivo)
     try:
-        sitemap_url_check = urljoin(base_url, 'sitemap.xml')
-        sitemap_response = requests.get(sitemap_url_check, timeout=5)
-        if sitemap_response.status_code == 200 and sitemap_response.text.strip(): # Check content not empty
+        sitemap_response = cliente.get(sitemap_url_check, stream=True)
+        try:
+            archivo['codigo_estado'] = sitemap_response.status_code
+            if sitemap_response.status_code == 200:
+                inicio = abrir_cuerpo(sitemap_response).read(getattr(settings, 'CRAWL_SITEMAP_PREVIEW_BYTES', 64 * 1024))
+                archivo['contenido'] = inicio.decode('utf-8', errors='replace')
+        except requests.RequestException:
+            raise
+        except (OSError, EOFError):  # .gz dañado: se trata como vacío
+            archivo['contenido'] = ''
+        finally:
+            sitemap_response.close()
+        if sitemap_response.status_code == 200 and archivo['contenido'].strip(): # Check content not empty
             resultados['sitemap_xml_exists'] = True
         else:
             resultados['hallazgos_info'].append({
@@ -305,20 +338,64 @@ def verificar_archivos_seo(url_base):
     return resultados
 
 
+class RecomendacionNoDisponible(Exception):
+    """
+    No recommendation could be generated (no API key, circuit breaker open,
+    blocked or empty answer, API error). str(e) is the message to show instead.
+    """
+
+
 def obtener_recomendacion_ia(hallazgo_descripcion, url_pagina, tecnologia_sitio, tipo_hallazgo):
     """
     Generates an AI-powered SEO recommendation using Google Gemini.
+    If it can't be generated, returns a message explaining why; use
+    generar_recomendacion_ia to tell those messages apart from recommendations.
+    """
+    try:
+        return generar_recomendacion_ia(hallazgo_descripcion, url_pagina, tecnologia_sitio, tipo_hallazgo)
+    except RecomendacionNoDisponible as e:
+        return str(e)
+
+
+def generar_recomendacion_ia(hallazgo_descripcion, url_pagina, tecnologia_sitio, tipo_hallazgo):
+    """
+    Like obtener_recomendacion_ia, but raises RecomendacionNoDisponible
+    instead of returning a fallback message (also for findings the knowledge
+    base doesn't cover when IA_RECOMMENDATION_SOURCE is 'local').
+    Successful recommendations are cached by normalized finding, technology and
+    finding type (see cache_ia), so repeated findings don't hit the API again.
+    Findings covered by the local knowledge base (see base_conocimiento) are
+    answered from it unless IA_RECOMMENDATION_SOURCE is 'ia'.
+    """
+    fuente = getattr(settings, 'IA_RECOMMENDATION_SOURCE', 'mixta')
+    if fuente != 'ia':
+        recomendacion = recomendacion_local(hallazgo_descripcion, tecnologia_sitio)
+        if recomendacion is not None:
+            return recomendacion
+        if fuente == 'local':
+            raise RecomendacionNoDisponible(_recomendacion_sin_ia(hallazgo_descripcion, tipo_hallazgo))
+
+    recomendacion_en_cache = obtener_cache_recomendaciones().obtener(hallazgo_descripcion, tecnologia_sitio, tipo_hallazgo)
+    if recomendacion_en_cache is not None:
+        return recomendacion_en_cache
+    return _generar_recomendacion_ia(hallazgo_descripcion, url_pagina, tecnologia_sitio, tipo_hallazgo)
+
+
+def _generar_recomendacion_ia(hallazgo_descripcion, url_pagina, tecnologia_sitio, tipo_hallazgo):
+    """
+    Requests the recommendation for one finding from Gemini (without looking at
+    the cache) and caches it if it was generated successfully. Raises
+    RecomendacionNoDisponible if it couldn't be generated.
     """
     api_key = os.getenv("GEMINI_API_KEY")
     if not api_key:
         # Consider logging this error as well for server-side visibility
         # print("Error: GEMINI_API_KEY not configured.") 
-        return "Error: AI recommendations are currently unavailable (API key not configured). Please consult standard SEO best practices."
+        raise RecomendacionNoDisponible("Error: AI recommendations are currently unavailable (API key not configured). Please consult standard SEO best practices.")
 
     try:
-        genai.configure(api_key=api_key)
-        
-        model = genai.GenerativeModel('gemini-pro') # Or 'gemini-1.0-pro'
+        # Long-lived client: rate limiting, retries and circuit breaker (see cliente_ia)
+        cliente = obtener_cliente_ia(api_key)
 
         prompt = f"""As an expert SEO consultant, provide a specific, actionable recommendation to address the following SEO issue.
 The website is built with: {tecnologia_sitio if tecnologia_sitio else 'Unknown/Generic'}
@@ -345,53 +422,200 @@ Recommendation:
         # ]
         # response = model.generate_content(prompt, safety_settings=safety_settings)
         
-        response = model.generate_content(prompt)
+        response = cliente.generar(prompt)
 
         if response.parts:
             # Ensure all parts are concatenated if the response is chunked.
             recommendation = ''.join(part.text for part in response.parts if part.text)
             if not recommendation.strip(): # Check if recommendation is just whitespace
-                 recommendation = f"AI received an empty or non-textual response for: {hallazgo_descripcion}"
+                raise RecomendacionNoDisponible(f"AI received an empty or non-textual response for: {hallazgo_descripcion}")
         elif response.text and response.text.strip():
             recommendation = response.text
         else: # Fallback if response.text is empty or parts are empty
-            recommendation = f"AI analysis complete, but no specific textual recommendation was generated for: {hallazgo_descripcion}. Please review standard SEO best practices for this type of issue ({tipo_hallazgo})."
-            
+            raise RecomendacionNoDisponible(f"AI analysis complete, but no specific textual recommendation was generated for: {hallazgo_descripcion}. Please review standard SEO best practices for this type of issue ({tipo_hallazgo}).")
+
+        # Only generated recommendations are cached: failures are retried next time
+        obtener_cache_recomendaciones().guardar(hallazgo_descripcion, tecnologia_sitio, tipo_hallazgo, recommendation)
         return recommendation
 
+    except RecomendacionNoDisponible:
+        raise
+    except CircuitoAbierto:
+        raise RecomendacionNoDisponible(f"AI recommendation for '{hallazgo_descripcion}' was skipped because the AI service failed repeatedly and is paused for a while. Please review manually.")
     except ValueError as ve: # Handles errors like blocked prompts if safety settings are strict
         # Log the specific ValueError: print(f"ValueError from Gemini: {ve}")
-        return f"AI recommendation for '{hallazgo_descripcion}' could not be generated due to content restrictions or an internal API error. Please review manually."
+        raise RecomendacionNoDisponible(f"AI recommendation for '{hallazgo_descripcion}' could not be generated due to content restrictions or an internal API error. Please review manually.")
     except genai.types.BlockedPromptException as bpe:
         # Log the exception: print(f"BlockedPromptException from Gemini: {bpe}")
-        return f"AI recommendation for '{hallazgo_descripcion}' was blocked due to content safety policies. Please review the issue manually."
+        raise RecomendacionNoDisponible(f"AI recommendation for '{hallazgo_descripcion}' was blocked due to content safety policies. Please review the issue manually.")
     except genai.types.generation_types.StopCandidateException as sce:
         # Log the exception: print(f"StopCandidateException from Gemini: {sce}")
-        return f"AI recommendation generation for '{hallazgo_descripcion}' was stopped prematurely. The issue might be too complex or the response too long. Please review manually."
+        raise RecomendacionNoDisponible(f"AI recommendation generation for '{hallazgo_descripcion}' was stopped prematurely. The issue might be too complex or the response too long. Please review manually.")
     except Exception as e:
         # Log the general exception: print(f"General Error calling Gemini API: {type(e).__name__} - {e}")
-        return f"AI recommendation could not be generated for '{hallazgo_descripcion}'. An unexpected error occurred with the AI service."
+        raise RecomendacionNoDisponible(f"AI recommendation could not be generated for '{hallazgo_descripcion}'. An unexpected error occurred with the AI service.")
+
 
+def obtener_recomendaciones_ia_lote(hallazgos, url_pagina, tecnologia_sitio):
+    """
+    Generates AI recommendations for several findings with a single Gemini request.
+
+    `hallazgos` is a list of {'tipo', 'descripcion'} dicts; returns one
+    recommendation per finding, in the same order, or None for the findings
+    whose recommendation couldn't be generated. Cached findings are not
+    sent, repeated findings (same cache key) are sent once, and the request is
+    split into chunks of IA_BATCH_SIZE findings. The model is asked for a JSON
+    array; any finding missing from a response that can't be parsed falls
+    back to obtener_recomendacion_ia. As in obtener_recomendacion_ia, the local
+    knowledge base answers the findings it covers first; with
+    IA_RECOMMENDATION_SOURCE='local' the rest are None.
+    """
+    fuente = getattr(settings, 'IA_RECOMMENDATION_SOURCE', 'mixta')
+    cache = obtener_cache_recomendaciones()
+    recomendaciones = [None] * len(hallazgos)
+    pendientes = {} # cache key -> indexes of the findings that share it
+    for i, hallazgo in enumerate(hallazgos):
+        if fuente != 'ia':
+            recomendaciones[i] = recomendacion_local(hallazgo['descripcion'], tecnologia_sitio)
+            if recomendaciones[i] is not None:
+                continue
+            if fuente == 'local':
+                continue # Stays None: offline, only the knowledge base answers
+        en_cache = cache.obtener(hallazgo['descripcion'], tecnologia_sitio, hallazgo['tipo'])
+        if en_cache is not None:
+            recomendaciones[i] = en_cache
+        else:
+            pendientes.setdefault(clave_recomendacion(hallazgo['descripcion'], tecnologia_sitio, hallazgo['tipo']), []).append(i)
+
+    api_key = os.getenv("GEMINI_API_KEY")
+    if pendientes and api_key:
+        grupos = list(pendientes.values())
+        tamano_lote = getattr(settings, 'IA_BATCH_SIZE', 20)
+        lotes = [grupos[inicio:inicio + tamano_lote] for inicio in range(0, len(grupos), tamano_lote)]
+        prompts = [_prompt_lote_ia([hallazgos[indices[0]] for indices in lote], url_pagina, tecnologia_sitio) for lote in lotes]
+        try:
+            respuestas = obtener_cliente_ia(api_key).generar_varios(prompts) # Chunks are sent concurrently
+        except Exception:
+            respuestas = [None] * len(lotes)
+        for lote, respuesta in zip(lotes, respuestas):
+            generadas = _interpretar_respuesta_lote(_texto_respuesta(respuesta), len(lote))
+            for numero, indices in enumerate(lote):
+                texto = generadas.get(numero)
+                if texto:
+                    hallazgo = hallazgos[indices[0]]
+                    cache.guardar(hallazgo['descripcion'], tecnologia_sitio, hallazgo['tipo'], texto)
+                    for i in indices:
+                        recomendaciones[i] = texto
+
+    # Per-item fallback (one request per finding still missing): no API key,
+    # request errors or findings the model left out of its answer
+    for indices in pendientes.values():
+        if recomendaciones[indices[0]] is None:
+            hallazgo = hallazgos[indices[0]]
+            try:
+                texto = _generar_recomendacion_ia(hallazgo['descripcion'], url_pagina, tecnologia_sitio, hallazgo['tipo'])
+            except RecomendacionNoDisponible:
+                continue # Stays None: the caller decides when to retry
+            for i in indices:
+                recomendaciones[i] = texto
+    return recomendaciones
+
+
+def _recomendacion_sin_ia(hallazgo_descripcion, tipo_hallazgo):
+    """Message for findings the knowledge base doesn't cover when running offline (IA_RECOMMENDATION_SOURCE='local')."""
+    return f"AI recommendations are disabled (offline mode) and there is no local recommendation for: {hallazgo_descripcion}. Please review standard SEO best practices for this type of issue ({tipo_hallazgo})."
+
+
+def _prompt_lote_ia(hallazgos, url_pagina, tecnologia_sitio):
+    """Builds the prompt of a batch: the numbered findings and the JSON answer format."""
+    tecnologia = tecnologia_sitio if tecnologia_sitio else 'Unknown/Generic'
+    lista = '\n'.join(
+        f"{numero}. (Type: {hallazgo['tipo']}) {hallazgo['descripcion']}" for numero, hallazgo in enumerate(hallazgos)
+    )
+    prompt = f"""As an expert SEO consultant, provide a specific, actionable recommendation for EACH of the following SEO issues.
+The website is built with: {tecnologia}
+The issues were found on: {url_pagina}
+If the technology is '{tecnologia_sitio}', tailor the advice accordingly. If 'generic' or unknown, provide general advice.
+Keep any code examples brief and illustrative. For each issue, explain why it matters, how to fix it, useful tools or plugins and how to verify the fix.
+
+SEO Issues:
+{lista}
+
+Answer ONLY with a JSON array with one object per issue, in this exact format:
+[{{"id": <issue number>, "recomendacion": "<recommendation in Markdown>"}}]
+"""
+    return prompt
+
+
+def _texto_respuesta(response):
+    """Text of a model response (None if there is no response or it has no text)."""
+    if response is None:
+        return None
+    try:
+        return response.text
+    except Exception: # .text raises if the answer was blocked or has no text parts
+        return None
+
+
+def _interpretar_respuesta_lote(texto, total):
+    """Parses the JSON array of a batched answer (tolerating code fences or text around it)."""
+    if not texto:
+        return {}
+    inicio, fin = texto.find('['), texto.rfind(']')
+    if inicio < 0 or fin < inicio:
+        return {}
+    try:
+        elementos = json.loads(texto[inicio:fin + 1])
+    except ValueError:
+        return {}
 
-def obtener_urls_sitio(url_base_actual, soup, urls_globales_conocidas):
+    generadas = {}
+    for elemento in elementos if isinstance(elementos, list) else ():
+        if not isinstance(elemento, dict):
+            continue
+        numero, recomendacion = elemento.get('id'), elemento.get('recomendacion')
+        try:
+            numero = int(numero)
+        except (TypeError, ValueError):
+            continue
+        if 0 <= numero < total and isinstance(recomendacion, str) and recomendacion.strip():
+            generadas[numero] = recomendacion.strip()
+    return generadas
+
+
+def obtener_urls_sitio(url_base_actual, soup, urls_globales_conocidas, reglas_robots=None, bloqueadas=None):
     """
     Encuentra todos los enlaces únicos dentro del mismo dominio en la página actual,
-    excluyendo aquellos ya conocidos globalmente.
+    excluyendo aquellos ya conocidos globalmente y los que robots.txt no permite rastrear.
 
     Args:
         url_base_actual (str): La URL de la página que se está analizando actualmente.
-        soup (BeautifulSoup): El objeto BeautifulSoup de la página actual.
-        urls_globales_conocidas (set): Un conjunto de URLs que ya han sido visitadas
-                                      o están en la cola de URLs por visitar.
+        soup (BeautifulSoup | ExtraccionPagina): El objeto BeautifulSoup de la página
+                                      actual, o su extracción ya calculada (evita
+                                      volver a recorrer los enlaces del árbol).
+        urls_globales_conocidas (set | Frontera): URLs que ya han sido visitadas
+                                      o están en la cola de URLs por visitar. Basta
+                                      con que admita `in`, por lo que se puede pasar
+                                      la Frontera del rastreo sin copiarla.
+        reglas_robots (ReglasRobots, optional): Reglas de robots.txt del sitio; las URLs
+                                      que no permiten se descartan antes de encolarlas.
+        bloqueadas (set, optional): Si se indica, se le añaden las URLs descartadas por robots.txt.
     Returns:
-        set: Un conjunto de nuevas URLs encontradas en la página actual que pertenecen
-             al mismo dominio y no estaban en urls_globales_conocidas.
+        list: Las nuevas URLs encontradas en la página actual que pertenecen al mismo
+              dominio y no estaban en urls_globales_conocidas, sin repetir y en el orden
+              del documento (así la frontera las atiende en ese orden y el corte de
+              max_urls es el mismo en cada rastreo).
     """
-    urls_encontradas_pagina = set()
+    urls_encontradas_pagina = []
+    vistas_pagina = set()
     dominio_principal = urlparse(url_base_actual).netloc
 
-    for link in soup.find_all('a', href=True):
-        href = link.get('href')
+    if isinstance(soup, ExtraccionPagina):
+        hrefs = soup.hrefs
+    else:
+        hrefs = (link.get('href') for link in soup.find_all('a', href=True))
+
+    for href in hrefs:
         if not href:
             continue
 
@@ -411,7 +635,13 @@ def obtener_urls_sitio(url_base_actual, soup, urls_globales_conocidas):
             # Para este caso, solo eliminamos el fragmento para evitar duplicados por anclas.
             url_limpia = parsed_absoluta._replace(fragment="").geturl()
 
-            if url_limpia not in urls_globales_conocidas:
-                urls_encontradas_pagina.add(url_limpia)
+            if url_limpia in urls_globales_conocidas or url_limpia in vistas_pagina:
+                continue
+            vistas_pagina.add(url_limpia)
+            if reglas_robots is not None and not reglas_robots.permite(url_limpia):
+                if bloqueadas is not None:
+                    bloqueadas.add(url_limpia)
+                continue
+            urls_encontradas_pagina.append(url_limpia)
     
     return urls_encontradas_pagina
\ No newline at end of file
@@ -12,24 +12,12 @@ from django.views.generic import ListView, DetailView
 from django.contrib import messages
 from django.core.paginator import Paginator
 from django.conf import settings
-from .models import Analisis, Hallazgo, Imagen, Enlace
-from .utils import (
-    obtener_codigo_estado,
-    obtener_encabezados,
-    obtener_metadatos,
-    obtener_imagenes, 
-    obtener_enlaces,  
-    # encontrar_robots_sitemap, 
-    calcular_puntuacion_seo, 
-    obtener_urls_sitio,
-    analizar_contenido_pagina, 
-    verificar_archivos_seo,
-    obtener_recomendacion_ia # New import for AI recommendations
-)
+from django.http import JsonResponse
+from .models import Analisis, Hallazgo, Imagen, Enlace, Incidencia, ResumenRastreo, TrabajoRastreo
 from .forms import AnalisisForm
 from django.urls import reverse
-from django.db.models import Avg
-from collections import defaultdict
+from django.utils import timezone
+from django.db.models import Avg, Q
 
 
 class InicioView(ListView):
@@ -56,32 +44,30 @@ class DetalleAnalisisView(DetailView):
         context = super().get_context_data(**kwargs)
         analisis = self.get_object()
         
-        # Obtener hallazgos, imágenes y enlaces
-        context['hallazgos'] = analisis.hallazgos.all()
-        context['imagenes'] = analisis.imagenes.all()
-        context['enlaces'] = analisis.enlaces.all()
-
-        # Obtener el contenido de robots.txt y sitemap.xml si existen
+        # Hallazgos, imágenes y enlaces se cargan desde la página por partes (hallazgos_json,
+        # imagenes_json y enlaces_json): aquí solo se cuentan
+        context['total_hallazgos'] = analisis.hallazgos.count()
+        context['total_imagenes'] = analisis.imagenes.count()
+        context['total_enlaces'] = analisis.enlaces.count()
+        # La página pide a recomendaciones_json solo las recomendaciones de la IA que muestra pendientes
+
+        # Contenido de robots.txt y sitemap.xml guardado durante el rastreo
+        archivos_seo = _archivos_seo(analisis)
         if analisis.robots_txt:
-            try:
-                robots_response = requests.get(urljoin(analisis.url, '/robots.txt'), timeout=5)
-                context['robots_content'] = robots_response.text if robots_response.status_code == 200 else None
-            except:
-                context['robots_content'] = None
-
+            context['robots_content'] = archivos_seo['robots_content']
         if analisis.sitemap_xml:
-            try:
-                sitemap_response = requests.get(urljoin(analisis.url, '/sitemap.xml'), timeout=5)
-                context['sitemap_content'] = sitemap_response.text if sitemap_response.status_code == 200 else None
-            except:
-                context['sitemap_content'] = None
-
-        # Obtener todas las páginas analizadas del mismo dominio
-        dominio_base = urlparse(analisis.url).netloc
+            context['sitemap_content'] = archivos_seo['sitemap_content']
+
+        # Páginas del mismo rastreo y rastreos anteriores del mismo dominio, por índice
+        principal_id = analisis.analisis_principal_id or analisis.pk
         context['paginas_analizadas'] = Analisis.objects.filter(
-            url__contains=dominio_base,
-            fecha_analisis=analisis.fecha_analisis
+            Q(pk=principal_id) | Q(analisis_principal_id=principal_id)
         ).exclude(pk=analisis.pk)
+        context['historial'] = Analisis.objects.filter(
+            host=analisis.host,
+            analisis_principal__isnull=True,
+            fecha_analisis__lt=analisis.fecha_analisis
+        ).exclude(pk=principal_id).order_by('-fecha_analisis')[:10]
 
         return context
 
@@ -97,44 +83,212 @@ class ResumenAnalisisView(DetailView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         analisis_principal = self.get_object()
-        
-        # Obtener todas las URLs analizadas (principal + relacionadas)
-        context['urls_analizadas'] = [analisis_principal] + list(analisis_principal.urls_analizadas.all())
-        
-        # Estadísticas generales
-        context['total_urls'] = len(context['urls_analizadas'])
-        context['puntuacion_promedio'] = sum(url.puntuacion for url in context['urls_analizadas']) / context['total_urls'] if context['total_urls'] > 0 else 0
 
-        # Inicializar conteo de hallazgos por tipo con valores por defecto
-        hallazgos_totales = defaultdict(int)
-        
-        # Contar hallazgos
-        for analisis in context['urls_analizadas']:
-            for hallazgo in analisis.hallazgos.all():
-                hallazgos_totales[hallazgo.tipo] += 1
-
-        context['hallazgos_totales'] = dict(hallazgos_totales)
-        context['total_hallazgos'] = sum(hallazgos_totales.values())
-
-        # Obtener el contenido de robots.txt y sitemap.xml
-        try:
-            robots_url = urljoin(analisis_principal.url, '/robots.txt')
-            robots_response = requests.get(robots_url, timeout=5)
-            context['robots_content'] = robots_response.text if robots_response.status_code == 200 else None
-        except:
-            context['robots_content'] = None
-
-        try:
-            sitemap_url = urljoin(analisis_principal.url, '/sitemap.xml')
-            sitemap_response = requests.get(sitemap_url, timeout=5)
-            context['sitemap_content'] = sitemap_response.text if sitemap_response.status_code == 200 else None
-        except:
-            context['sitemap_content'] = None
+        # La tabla de URLs analizadas se carga desde la página por partes (paginas_json)
+        # Estadísticas generales, precalculadas al escribir las páginas del rastreo
+        resumen = ResumenRastreo.de_analisis(analisis_principal)
+        context['resumen'] = resumen
+        context['total_urls'] = resumen.total_paginas
+        # Las URLs omitidas (contenido no HTML) no tienen puntuación y no cuentan en el promedio
+        context['puntuacion_promedio'] = resumen.puntuacion_promedio
+        context['total_hallazgos'] = resumen.total_hallazgos
+        context['codigos_estado'] = sorted(resumen.codigos_estado.items())
+
+        # Incidencias del sitio: cada hallazgo repetido en varias páginas aparece una sola vez
+        incidencias = list(analisis_principal.incidencias.all())
+        context['incidencias'] = incidencias
+        # Recomendaciones de la IA: las de las incidencias más las de análisis anteriores, guardadas como hallazgos 'recomendacion'
+        hallazgos_totales = dict(resumen.hallazgos_por_tipo)
+        hallazgos_totales['recomendacion'] = hallazgos_totales.get('recomendacion', 0) + sum(
+            1 for incidencia in incidencias if incidencia.recomendacion
+        )
+        context['hallazgos_totales'] = hallazgos_totales
+        context['recomendaciones_pendientes'] = sum(
+            1 for incidencia in incidencias if incidencia.estado_recomendacion == 'pendiente'
+        )
+
+        # Contenido de robots.txt y sitemap.xml guardado durante el rastreo (sin peticiones al sitio)
+        context.update(_archivos_seo(analisis_principal))
 
         return context
 
 
+def _archivos_seo(analisis):
+    """
+    Contenido y fecha de descarga de robots.txt y sitemap.xml guardados con el análisis.
+    Los análisis anteriores a que se guardaran no tienen copia y se muestran como no encontrados.
+    """
+    contexto = {'robots_content': None, 'sitemap_content': None, 'robots_fecha': None, 'sitemap_fecha': None}
+    for archivo in analisis.archivos_seo.all():
+        prefijo = 'robots' if archivo.tipo == 'robots.txt' else 'sitemap'
+        if archivo.codigo_estado == 200:
+            contexto[f'{prefijo}_content'] = archivo.contenido or None
+        contexto[f'{prefijo}_fecha'] = archivo.fecha_descarga
+    return contexto
+
+
+class EstadoTrabajoView(DetailView):
+    """
+    Vista para seguir el avance de un trabajo de rastreo en segundo plano.
+    """
+    model = TrabajoRastreo
+    template_name = 'analizador/estado_trabajo.html'
+    context_object_name = 'trabajo'
+
+
+def estado_trabajo_json(request, pk):
+    """Retorna el estado de un trabajo de rastreo en formato JSON."""
+    trabajo = get_object_or_404(TrabajoRastreo, pk=pk)
+    return JsonResponse({
+        'id': trabajo.pk,
+        'estado': trabajo.estado,
+        'estado_display': trabajo.get_estado_display(),
+        'terminado': trabajo.terminado,
+        'paginas_procesadas': trabajo.paginas_procesadas,
+        'mensajes': trabajo.mensajes,
+        'error': trabajo.error,
+        'url_resumen': reverse('analizador:resumen_analisis', args=[trabajo.analisis_principal_id])
+                       if trabajo.analisis_principal_id else None,
+    })
+
+
+def recomendaciones_json(request, pk):
+    """
+    Retorna el estado de las recomendaciones de la IA de los hallazgos de un
+    análisis (las de sus incidencias); nunca las genera durante la petición.
+
+    La página pasa en `ids` los hallazgos que muestra con la recomendación
+    pendiente y recibe solo esos (como mucho REPORT_MAX_PAGE_SIZE); sin `ids`,
+    los hallazgos se recorren por clave con `despues` y `limite`, como en los
+    listados. `pendientes` cuenta los que siguen sin recomendación: los pedidos
+    o, sin `ids`, todos los del análisis.
+    Con IA_ENRICHMENT_MODE='bajo_demanda' la consulta encola las que falten y
+    las genera el worker (ver enriquecer_programadas).
+    """
+    analisis = get_object_or_404(Analisis, pk=pk)
+    if getattr(settings, 'IA_ENRICHMENT_MODE', 'tras_rastreo') == 'bajo_demanda':
+        Incidencia.objects.filter(
+            ocurrencias__analisis=analisis,
+            estado_recomendacion='pendiente',
+            proximo_intento__isnull=True
+        ).update(proximo_intento=timezone.now())
+
+    hallazgos = analisis.hallazgos.select_related('incidencia')
+    ids = request.GET.get('ids')
+    if ids is None:
+        pendientes = analisis.hallazgos.filter(incidencia__estado_recomendacion='pendiente').count()
+        return _pagina_json(request, hallazgos, _serializar_hallazgo, pendientes=pendientes)
+
+    try:
+        ids = [int(id_hallazgo) for id_hallazgo in ids.split(',') if id_hallazgo]
+    except ValueError:
+        return _filtro_invalido('ids', ids)
+    hallazgos = list(hallazgos.filter(pk__in=ids[:getattr(settings, 'REPORT_MAX_PAGE_SIZE', 500)]).order_by('pk'))
+    return JsonResponse({
+        'resultados': [_serializar_hallazgo(hallazgo) for hallazgo in hallazgos],
+        'pendientes': sum(1 for hallazgo in hallazgos if hallazgo.estado_recomendacion == 'pendiente'),
+    })
+
+
+def _pagina_json(request, queryset, serializar, **extra):
+    """
+    Retorna en JSON una página de `queryset` con paginación por clave (keyset).
+
+    El cliente pasa en `despues` el `siguiente` de la respuesta anterior (el
+    id del último elemento recibido) y, opcionalmente, `limite`. A diferencia
+    de OFFSET, cada página es una búsqueda por índice aunque la colección
+    tenga miles de elementos. `siguiente` es None en la última página.
+    Los argumentos de `extra` se añaden tal cual a la respuesta.
+    """
+    try:
+        despues = int(request.GET.get('despues', 0))
+        limite = int(request.GET.get('limite', getattr(settings, 'REPORT_PAGE_SIZE', 100)))
+    except ValueError:
+        return JsonResponse({'error': 'Los parámetros despues y limite deben ser números enteros.'}, status=400)
+    limite = max(1, min(limite, getattr(settings, 'REPORT_MAX_PAGE_SIZE', 500)))
+
+    filas = list(queryset.filter(pk__gt=despues).order_by('pk')[:limite + 1])
+    siguiente = filas[limite - 1].pk if len(filas) > limite else None
+    return JsonResponse({
+        'resultados': [serializar(fila) for fila in filas[:limite]],
+        'siguiente': siguiente,
+        **extra,
+    })
+
+
+def _filtro_invalido(parametro, valor):
+    return JsonResponse({'error': f"Valor no válido para {parametro}: {valor}"}, status=400)
+
+
+def hallazgos_json(request, pk):
+    """Hallazgos de un análisis, paginados; `tipo` filtra por tipo de hallazgo."""
+    analisis = get_object_or_404(Analisis, pk=pk)
+    hallazgos = analisis.hallazgos.select_related('incidencia')
+    tipo = request.GET.get('tipo')
+    if tipo:
+        if tipo not in dict(Hallazgo.TIPOS):
+            return _filtro_invalido('tipo', tipo)
+        hallazgos = hallazgos.filter(tipo=tipo)
+    return _pagina_json(request, hallazgos, _serializar_hallazgo)
+
+
+def _serializar_hallazgo(hallazgo):
+    return {
+        'id': hallazgo.pk,
+        'tipo': hallazgo.tipo,
+        'tipo_display': hallazgo.get_tipo_display(),
+        'descripcion': hallazgo.descripcion,
+        'ocurrencias_sitio': hallazgo.incidencia.num_ocurrencias if hallazgo.incidencia_id else 1,
+        'estado_recomendacion': hallazgo.estado_recomendacion,
+        'recomendacion': hallazgo.recomendacion,
+    }
+
+
+def enlaces_json(request, pk):
+    """Enlaces de un análisis, paginados; `tipo` ('interno' o 'externo') filtra por tipo de enlace."""
+    analisis = get_object_or_404(Analisis, pk=pk)
+    enlaces = analisis.enlaces.all()
+    tipo = request.GET.get('tipo')
+    if tipo:
+        if tipo not in dict(Enlace._meta.get_field('tipo').choices):
+            return _filtro_invalido('tipo', tipo)
+        enlaces = enlaces.filter(tipo=tipo)
+    return _pagina_json(request, enlaces, lambda enlace: {
+        'id': enlace.pk, 'url': enlace.url, 'texto': enlace.texto, 'tipo': enlace.tipo,
+    })
+
+
+def imagenes_json(request, pk):
+    """Imágenes de un análisis, paginadas; con `sin_alt=1` solo las que no tienen texto alternativo."""
+    analisis = get_object_or_404(Analisis, pk=pk)
+    imagenes = analisis.imagenes.all()
+    if request.GET.get('sin_alt') in ('1', 'true'):
+        imagenes = imagenes.filter(alt='')
+    return _pagina_json(request, imagenes, lambda imagen: {
+        'id': imagen.pk, 'url': imagen.url, 'alt': imagen.alt,
+    })
+
+
+def paginas_json(request, pk):
+    """Páginas de un rastreo (la principal y las relacionadas), paginadas, para la tabla del resumen."""
+    analisis_principal = get_object_or_404(Analisis, pk=pk)
+    paginas = Analisis.objects.filter(
+        Q(pk=analisis_principal.pk) | Q(analisis_principal_id=analisis_principal.pk)
+    ).only('url', 'titulo', 'puntuacion', 'estado_descarga', 'motivo_descarga', 'sin_cambios')
+    return _pagina_json(request, paginas, lambda pagina: {
+        'id': pagina.pk,
+        'url': pagina.url,
+        'titulo': pagina.titulo,
+        'puntuacion': pagina.puntuacion,
+        'estado_descarga': pagina.estado_descarga,
+        'motivo_descarga': pagina.motivo_descarga,
+        'sin_cambios': pagina.sin_cambios,
+        'url_detalle': reverse('analizador:detalle_analisis', args=[pagina.pk]),
+    })
+
+
 # obtener_urls_sitio function has been moved to utils.py
+# El rastreo de sitios se ejecuta en trabajos.py (worker en segundo plano)
 
 
 def inicio(request):
@@ -147,176 +301,16 @@ def inicio(request):
             num_pages = form.cleaned_data.get('num_pages') # Can be None
             website_technology = form.cleaned_data.get('website_technology')
 
-            # Conjunto para almacenar todas las URLs encontradas
-            urls_visitadas = set()
-            urls_por_visitar = {url}
-
-            if crawl_scope == 'single_url':
-                max_urls = 1
-            else: # multiple_pages
-                max_urls = num_pages if num_pages else 10 # Default to 10 if not provided for some reason
-
-            # Crear el análisis principal
-            analisis_principal = None
-            analisis_relacionados = []
-            
-            # Realizar crawling del sitio
-            while urls_por_visitar and len(urls_visitadas) < max_urls:
-                url_actual = urls_por_visitar.pop()
-                
-                if url_actual in urls_visitadas:
-                    continue
-                
-                try:
-                    # Realizar el análisis de la URL actual
-                    response = requests.get(url_actual, timeout=10)
-                    response.raise_for_status()
-                    soup = BeautifulSoup(response.text, 'html.parser')
-
-                    # Inicializar puntuación para la página actual
-                    puntuacion_pagina = 100 # Start with a base score for the page
-
-                    # Analizar contenido de la página usando la nueva función de utils.py
-                    contenido_info = analizar_contenido_pagina(soup, url_actual, website_technology)
-                    
-                    # Extraer datos del resultado de analizar_contenido_pagina
-                    titulo_pagina = contenido_info['titulo'] if contenido_info['titulo'] else url_actual # Use URL if title is empty
-                    descripcion_pagina = contenido_info['descripcion_meta']
-                    
-                    # Lista para todos los hallazgos (de contenido y de archivos SEO)
-                    todos_hallazgos_info_pagina = list(contenido_info['hallazgos_info']) # Make a mutable copy
-
-                    # Ajustar puntuación basada en hallazgos de contenido (ejemplo)
-                    # This simplistic scoring adjustment should be refined or replaced by calcular_puntuacion_seo
-                    for hallazgo_item in todos_hallazgos_info_pagina:
-                        if hallazgo_item['tipo'] == 'error':
-                            puntuacion_pagina -= 10
-                        elif hallazgo_item['tipo'] == 'warning':
-                            puntuacion_pagina -= 5
-                        elif hallazgo_item['tipo'] == 'info': # Infos usually don't decrease score, but can
-                            puntuacion_pagina -= 1
-                    
-                    # Crear el objeto Analisis
-                    current_analisis_data = {
-                        'url': url_actual,
-                        'titulo': titulo_pagina,
-                        'descripcion': descripcion_pagina,
-                        'codigo_estado': response.status_code,
-                        'robots_txt': False,  # Default, será actualizado para la URL principal
-                        'sitemap_xml': False, # Default, será actualizado para la URL principal
-                        # 'puntuacion' se establecerá después de considerar archivos SEO si es la URL principal
-                    }
-
-                    if url_actual == url: # Es la URL principal del análisis
-                        current_analisis_data['crawl_scope'] = crawl_scope
-                        current_analisis_data['num_pages_solicitadas'] = num_pages if crawl_scope == 'multiple_pages' else 1
-                        current_analisis_data['tecnologia_sitio'] = website_technology
-                        
-                        # Verificar robots.txt y sitemap.xml para la URL principal
-                        archivos_seo_info = verificar_archivos_seo(url)
-                        current_analisis_data['robots_txt'] = archivos_seo_info['robots_txt_exists']
-                        current_analisis_data['sitemap_xml'] = archivos_seo_info['sitemap_xml_exists']
-                        todos_hallazgos_info_pagina.extend(archivos_seo_info['hallazgos_info'])
-
-                        # Ajustar puntuación por archivos SEO (ejemplo)
-                        if not archivos_seo_info['robots_txt_exists']:
-                            puntuacion_pagina -= 2 # Similar to old logic
-                        if not archivos_seo_info['sitemap_xml_exists']:
-                            puntuacion_pagina -= 2 # Similar to old logic
-                    
-                    current_analisis_data['puntuacion'] = max(0, min(100, puntuacion_pagina))
-                    analisis_actual = Analisis.objects.create(**current_analisis_data)
-
-                    # Guardar el análisis principal o agregarlo a la lista de relacionados
-                    if url_actual == url:
-                        analisis_principal = analisis_actual
-                    else:
-                        analisis_relacionados.append(analisis_actual)
-
-                    # Guardar Hallazgos (con recomendaciones IA)
-                    for hallazgo_data in todos_hallazgos_info_pagina:
-                        # Generate AI recommendation for each original finding
-                        recomendacion_ai = obtener_recomendacion_ia(
-                            hallazgo_descripcion=hallazgo_data['descripcion'],
-                            url_pagina=url_actual,
-                            tecnologia_sitio=website_technology, # from form.cleaned_data
-                            tipo_hallazgo=hallazgo_data['tipo']
-                        )
-                        
-                        # Create a new Hallazgo for the AI recommendation
-                        Hallazgo.objects.create(
-                            analisis=analisis_actual,
-                            tipo='recomendacion', # All AI-generated advice is a 'recomendacion'
-                            descripcion=recomendacion_ai 
-                        )
-                        
-                        # Optionally, you might still want to save the original finding if it's distinct
-                        # from the recommendation or if recommendations are supplementary.
-                        # For this subtask, we are replacing/focusing on the AI recommendation.
-                        # If original findings are still needed, they should be created here as well:
-                        # Hallazgo.objects.create(
-                        #     analisis=analisis_actual,
-                        #     tipo=hallazgo_data['tipo'], # Original type
-                        #     descripcion=hallazgo_data['descripcion'] # Original description
-                        # )
-
-
-                    # Guardar Imágenes
-                    for img_data in contenido_info['imagenes_info']:
-                        Imagen.objects.create(
-                            analisis=analisis_actual,
-                            url=img_data['url'],
-                            alt=img_data['alt']
-                        )
-                    
-                    # Guardar Enlaces
-                    for enlace_data in contenido_info['enlaces_info']:
-                        Enlace.objects.create(
-                            analisis=analisis_actual,
-                            url=enlace_data['url'],
-                            texto=enlace_data['texto'],
-                            tipo=enlace_data['tipo']
-                        )
-                    
-                    # Obtener nuevas URLs para crawlear (si aplica)
-                    if crawl_scope == 'multiple_pages':
-                        # urls_visitadas se usa para no agregar URLs ya procesadas o en cola
-                        # max_urls es el límite global
-                        if len(urls_visitadas) < max_urls:
-                            nuevas_urls = obtener_urls_sitio(url_actual, soup, urls_visitadas.union(urls_por_visitar))
-                            for nueva_url in nuevas_urls:
-                                if len(urls_visitadas) + len(urls_por_visitar) < max_urls:
-                                     urls_por_visitar.add(nueva_url)
-                                else:
-                                    break # Stop adding if we've hit the limit
-
-                    # Marcar URL como visitada
-                    urls_visitadas.add(url_actual)
-
-                except requests.RequestException as e:
-                    messages.warning(request, f"Error al acceder a {url_actual}: {str(e)}. Saltando esta URL.")
-                    urls_visitadas.add(url_actual) # Marcar como visitada para no reintentar
-                    continue
-                except Exception as e: # Captura general para otros errores inesperados durante el análisis de una página
-                    messages.error(request, f"Error inesperado analizando {url_actual}: {str(e)}. Saltando esta URL.")
-                    urls_visitadas.add(url_actual) # Marcar como visitada para no reintentar
-                    continue
-
-            if analisis_principal:
-                # Actualizar la relación entre análisis (si hay análisis relacionados)
-                for analisis in analisis_relacionados:
-                    analisis.analisis_principal = analisis_principal
-                    analisis.save()
-
-                messages.success(request, f'Análisis completado. Se procesaron {len(urls_visitadas)} página(s).')
-                return redirect('analizador:resumen_analisis', pk=analisis_principal.pk)
-            elif not urls_visitadas and crawl_scope == 'single_url': # Failed to analyze even the single main URL
-                 messages.error(request, f'No se pudo analizar la URL proporcionada: {url}. Verifique la URL e intente de nuevo.')
-            elif not urls_visitadas and crawl_scope == 'multiple_pages':
-                 messages.error(request, f'No se pudo analizar la URL inicial: {url}. No se pudieron rastrear más páginas.')
-            else: # Should ideally be caught by specific errors, but as a fallback
-                 messages.info(request, f'Análisis finalizado. Se procesaron {len(urls_visitadas)} páginas, pero la URL principal no pudo ser completamente analizada o no se encontraron páginas adicionales.')
-
+            # El rastreo lo ejecuta el worker (manage.py procesar_rastreos);
+            # aquí solo se encola el trabajo y se responde de inmediato
+            trabajo = TrabajoRastreo.objects.create(
+                url=url,
+                crawl_scope=crawl_scope,
+                num_pages=num_pages,
+                tecnologia_sitio=website_technology or ''
+            )
+            messages.info(request, f'Análisis de {url} en cola (trabajo #{trabajo.pk}).')
+            return redirect('analizador:estado_trabajo', pk=trabajo.pk)
 
         else: # Form is not valid
             # Django renders form errors automatically via {% bootstrap_form form %}
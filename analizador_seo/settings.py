@@ -106,4 +106,91 @@ AWS_SECRET_ACCESS_KEY = os.getenv('AWS_SECRET_ACCESS_KEY')
 AWS_REGION = os.getenv('AWS_REGION')
 
 # Configuración de OpenAI
-OPENAI_API_KEY = os.getenv('OPENAI_API_KEY') 
\ No newline at end of file
+OPENAI_API_KEY = os.getenv('OPENAI_API_KEY') 
+
+# Configuración del rastreador
+CRAWL_MAX_WORKERS = int(os.getenv('CRAWL_MAX_WORKERS', '8'))
+CRAWL_MAX_PER_HOST = int(os.getenv('CRAWL_MAX_PER_HOST', '4'))
+CRAWL_POOL_PER_HOST = int(os.getenv('CRAWL_POOL_PER_HOST', '10'))
+CRAWL_TIMEOUT = int(os.getenv('CRAWL_TIMEOUT', '10'))
+CRAWL_USER_AGENT = os.getenv('CRAWL_USER_AGENT', 'AnalizadorSEO/1.0 (+https://github.com/stiv-seo/crawling-seo)')
+# Profundidad máxima en clics desde la URL inicial (vacío = sin límite)
+CRAWL_MAX_DEPTH = int(os.getenv('CRAWL_MAX_DEPTH')) if os.getenv('CRAWL_MAX_DEPTH') else None
+# Conjunto de URLs vistas: 'set' (exacto), 'huellas' (64 bits por URL) o 'bloom' (aproximado)
+CRAWL_SEEN_SET = os.getenv('CRAWL_SEEN_SET', 'set')
+CRAWL_BLOOM_ERROR_RATE = float(os.getenv('CRAWL_BLOOM_ERROR_RATE', '0.001'))
+# Backend de análisis HTML: 'html.parser' (por defecto), 'lxml' o 'selectolax' (requieren instalarse aparte)
+HTML_PARSER_BACKEND = os.getenv('HTML_PARSER_BACKEND', 'html.parser')
+# Las páginas de más de HTML_STREAMING_THRESHOLD bytes se analizan por fragmentos de
+# HTML_STREAMING_CHUNK_SIZE bytes sin construir el árbol HTML (0 = siempre por fragmentos)
+HTML_STREAMING_THRESHOLD = int(os.getenv('HTML_STREAMING_THRESHOLD', '2097152'))
+HTML_STREAMING_CHUNK_SIZE = int(os.getenv('HTML_STREAMING_CHUNK_SIZE', '65536'))
+# Solo se analizan las respuestas con estos tipos de contenido (el resto se omite sin leer el cuerpo)
+CRAWL_ALLOWED_CONTENT_TYPES = [
+    tipo.strip().lower() for tipo in os.getenv('CRAWL_ALLOWED_CONTENT_TYPES', 'text/html,application/xhtml+xml').split(',') if tipo.strip()
+]
+# Máximo de bytes del cuerpo que se leen por página; lo que sobra se descarta (0 = sin límite)
+CRAWL_MAX_PAGE_BYTES = int(os.getenv('CRAWL_MAX_PAGE_BYTES', '10485760'))
+# Los resultados se escriben en lotes de CRAWL_DB_BATCH_PAGES páginas o cada CRAWL_DB_BATCH_SECONDS segundos
+CRAWL_DB_BATCH_PAGES = int(os.getenv('CRAWL_DB_BATCH_PAGES', '50'))
+CRAWL_DB_BATCH_SECONDS = float(os.getenv('CRAWL_DB_BATCH_SECONDS', '2'))
+# Caché de recomendaciones de la IA: entradas en memoria, días de validez y máximo de entradas en la base de datos
+IA_CACHE_LRU_SIZE = int(os.getenv('IA_CACHE_LRU_SIZE', '1024'))
+IA_CACHE_TTL_DAYS = int(os.getenv('IA_CACHE_TTL_DAYS', '30'))
+IA_CACHE_MAX_ENTRIES = int(os.getenv('IA_CACHE_MAX_ENTRIES', '50000'))
+# Recomendaciones de la IA por lotes: 'hallazgo' (una petición por hallazgo), 'pagina' (una por
+# página) o 'rastreo' (una por tipo de hallazgo con los de todo el rastreo); IA_BATCH_SIZE hallazgos por petición como máximo
+IA_BATCH_MODE = os.getenv('IA_BATCH_MODE', 'pagina')
+IA_BATCH_SIZE = int(os.getenv('IA_BATCH_SIZE', '20'))
+# Cliente de la IA: modelo ('falso' = modelo local sin API), peticiones simultáneas, cuota por minuto,
+# reintentos con espera exponencial ante errores transitorios y pausa tras IA_CIRCUIT_FAILURES fallos seguidos
+IA_MODEL = os.getenv('IA_MODEL', 'gemini-pro')
+IA_MAX_CONCURRENCY = int(os.getenv('IA_MAX_CONCURRENCY', '4'))
+IA_REQUESTS_PER_MINUTE = int(os.getenv('IA_REQUESTS_PER_MINUTE', '60'))
+IA_MAX_RETRIES = int(os.getenv('IA_MAX_RETRIES', '3'))
+IA_BACKOFF_BASE_SECONDS = float(os.getenv('IA_BACKOFF_BASE_SECONDS', '1'))
+IA_BACKOFF_MAX_SECONDS = float(os.getenv('IA_BACKOFF_MAX_SECONDS', '30'))
+IA_CIRCUIT_FAILURES = int(os.getenv('IA_CIRCUIT_FAILURES', '5'))
+IA_CIRCUIT_COOLDOWN_SECONDS = float(os.getenv('IA_CIRCUIT_COOLDOWN_SECONDS', '60'))
+# Las recomendaciones de la IA se generan después del rastreo: 'tras_rastreo' (el worker, al terminar
+# cada trabajo) o 'bajo_demanda' (el worker, cuando se consulta cada página por primera vez)
+IA_ENRICHMENT_MODE = os.getenv('IA_ENRICHMENT_MODE', 'tras_rastreo')
+# Origen de las recomendaciones: 'mixta' (base de conocimiento local y la IA para los hallazgos que
+# no cubre), 'local' (solo la base local, sin llamadas a la API) o 'ia' (siempre la IA)
+IA_RECOMMENDATION_SOURCE = os.getenv('IA_RECOMMENDATION_SOURCE', 'mixta')
+# Recomendaciones que la IA no pudo generar: el worker las reintenta tras IA_RECOMMENDATION_RETRY_SECONDS segundos
+# (el doble en cada intento) y, tras IA_RECOMMENDATION_MAX_ATTEMPTS intentos, quedan como no disponibles
+IA_RECOMMENDATION_MAX_ATTEMPTS = int(os.getenv('IA_RECOMMENDATION_MAX_ATTEMPTS', '3'))
+IA_RECOMMENDATION_RETRY_SECONDS = int(os.getenv('IA_RECOMMENDATION_RETRY_SECONDS', '300'))
+# Elementos por página de los listados JSON de un informe (enlaces, imágenes y hallazgos) y máximo que se puede pedir
+REPORT_PAGE_SIZE = int(os.getenv('REPORT_PAGE_SIZE', '100'))
+REPORT_MAX_PAGE_SIZE = int(os.getenv('REPORT_MAX_PAGE_SIZE', '500'))
+# Siembra de la frontera con las URLs de los sitemaps (líneas Sitemap: de robots.txt y /sitemap.xml): máximo de
+# archivos de sitemap por rastreo, bytes descomprimidos por archivo y antigüedad máxima de <lastmod> en días (vacío = sin límite)
+CRAWL_SITEMAP_SEED = os.getenv('CRAWL_SITEMAP_SEED', 'true').lower() in ('1', 'true', 'yes')
+CRAWL_SITEMAP_MAX_FILES = int(os.getenv('CRAWL_SITEMAP_MAX_FILES', '50'))
+CRAWL_SITEMAP_MAX_BYTES = int(os.getenv('CRAWL_SITEMAP_MAX_BYTES', '52428800'))
+CRAWL_SITEMAP_MAX_AGE_DAYS = int(os.getenv('CRAWL_SITEMAP_MAX_AGE_DAYS')) if os.getenv('CRAWL_SITEMAP_MAX_AGE_DAYS') else None
+# Fracción de las páginas de un rastreo que se pueden sembrar desde los sitemaps; el resto se descubre por los enlaces
+CRAWL_SITEMAP_SHARE = float(os.getenv('CRAWL_SITEMAP_SHARE', '0.5'))
+# Bytes del principio de /sitemap.xml que se guardan con el análisis para mostrarlos en los informes
+CRAWL_SITEMAP_PREVIEW_BYTES = int(os.getenv('CRAWL_SITEMAP_PREVIEW_BYTES', '65536'))
+# robots.txt: se respetan sus reglas Allow/Disallow y su Crawl-delay (como mucho CRAWL_MAX_CRAWL_DELAY segundos);
+# las reglas de cada host se guardan en caché CRAWL_ROBOTS_CACHE_TTL segundos
+CRAWL_RESPECT_ROBOTS = os.getenv('CRAWL_RESPECT_ROBOTS', 'true').lower() in ('1', 'true', 'yes')
+CRAWL_MAX_CRAWL_DELAY = float(os.getenv('CRAWL_MAX_CRAWL_DELAY', '30'))
+CRAWL_ROBOTS_CACHE_TTL = int(os.getenv('CRAWL_ROBOTS_CACHE_TTL', '86400'))
+# Cortesía adaptativa por host: las URLs que reciben 429/503 se reintentan hasta CRAWL_MAX_RETRIES veces tras la pausa
+# que pida Retry-After o, si no la indica, una espera exponencial desde CRAWL_BACKOFF_BASE_SECONDS hasta CRAWL_BACKOFF_MAX_SECONDS
+CRAWL_MAX_RETRIES = int(os.getenv('CRAWL_MAX_RETRIES', '3'))
+CRAWL_BACKOFF_BASE_SECONDS = float(os.getenv('CRAWL_BACKOFF_BASE_SECONDS', '1'))
+CRAWL_BACKOFF_MAX_SECONDS = float(os.getenv('CRAWL_BACKOFF_MAX_SECONDS', '120'))
+# Nuevos rastreos de un sitio: las páginas se piden con If-None-Match/If-Modified-Since y, si no han cambiado
+# (304 o misma huella del contenido), se reutiliza su análisis y las recomendaciones de la IA del rastreo anterior
+CRAWL_CONDITIONAL_RECRAWL = os.getenv('CRAWL_CONDITIONAL_RECRAWL', 'true').lower() in ('1', 'true', 'yes')
+# Reanudación de rastreos: cada CRAWL_CHECKPOINT_PAGES páginas (0 lo desactiva) se guarda un punto de control del
+# rastreo. El worker de un trabajo tiene una concesión de CRAWL_STALE_JOB_SECONDS que renueva cada
+# CRAWL_JOB_HEARTBEAT_SECONDS (debe ser bastante menor); si caduca, el trabajo se vuelve a poner en cola
+CRAWL_CHECKPOINT_PAGES = int(os.getenv('CRAWL_CHECKPOINT_PAGES', '200'))
+CRAWL_STALE_JOB_SECONDS = int(os.getenv('CRAWL_STALE_JOB_SECONDS', '600'))
+CRAWL_JOB_HEARTBEAT_SECONDS = int(os.getenv('CRAWL_JOB_HEARTBEAT_SECONDS', '60'))